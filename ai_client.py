@@ -13,7 +13,7 @@ import json
 import base64
 from typing import Any, Optional
 
-from openai import AzureOpenAI
+from openai import APITimeoutError, AzureOpenAI
 
 
 # ---------------------------------------------------------------------------
@@ -72,7 +72,8 @@ def generate_text(prompt: str, system_message: Optional[str] = None) -> str:
     return response.choices[0].message.content or ""
 
 
-def generate_json(prompt: str, system_message: Optional[str] = None) -> Any:
+def generate_json(prompt: str, system_message: Optional[str] = None,
+                  timeout: Optional[float] = None) -> Any:
     """Generate a chat completion that must return JSON, parse and return it.
 
     Tries Azure OpenAI's ``response_format={"type": "json_object"}`` first
@@ -80,8 +81,14 @@ def generate_json(prompt: str, system_message: Optional[str] = None) -> Any:
     the largest JSON-looking block from the text if the model doesn't support
     the parameter. Always returns a Python object (dict/list); raises
     ``ValueError`` only if no JSON can be recovered at all.
+
+    ``timeout`` (seconds) caps the whole call: the SDK's automatic retries
+    are disabled and a timeout is raised as ``openai.APITimeoutError``
+    instead of being retried without ``response_format``.
     """
     client = get_client()
+    if timeout is not None:
+        client = client.with_options(timeout=timeout, max_retries=0)
     messages = []
     if system_message:
         messages.append({"role": "system", "content": system_message})
@@ -95,6 +102,8 @@ def generate_json(prompt: str, system_message: Optional[str] = None) -> Any:
             response_format={"type": "json_object"},
         )
         text = response.choices[0].message.content or ""
+    except APITimeoutError:
+        raise
     except Exception:
         # Older deployments may not support response_format; retry without it.
         response = client.chat.completions.create(
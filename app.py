@@ -1,9 +1,11 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import gzip
 import io
 import os
 import logging
+import time
 from datetime import datetime
 import json
 from config import (
@@ -17,8 +19,27 @@ from config import (
     PORT,
 )
 import ai_client
+import audit_executor
+import audit_store
+import code_audit
+import code_diff
+import code_review
+import code_project
+import prompt_budget
+
+class _JSONProvider(DefaultJSONProvider):
+    """Lint findings (``code_audit.Finding``) become dicts only here."""
+
+    @staticmethod
+    def default(o):
+        try:
+            return code_audit.json_default(o)
+        except TypeError:
+            return DefaultJSONProvider.default(o)
+
 
 app = Flask(__name__, static_folder='.', static_url_path='')
+app.json = _JSONProvider(app)
 app.secret_key = FLASK_SECRET_KEY
 
 # ---------------------------------------------------------------------------
@@ -103,7 +124,7 @@ def _post_process(response):
         return response
     if response.status_code < 200 or response.status_code >= 300:
         return response
-    if 'Content-Encoding' in response.headers:
+    if 'Content-Encoding' in response.headers or response.is_streamed:
         return response
 
     content_type = (response.headers.get('Content-Type') or '').split(';', 1)[0].strip().lower()
@@ -128,6 +149,10 @@ def _post_process(response):
     response.headers.add('Vary', 'Accept-Encoding')
     return response
 
+# Start the auditor worker processes now rather than on the first request
+# (only with AUDIT_PREWARM=true: every gunicorn worker would spawn a pool).
+audit_executor.prewarm_in_background()
+
 # Configure Azure OpenAI
 if not ai_client.is_configured():
     log.warning('Azure OpenAI is not configured! AI-powered features will be disabled.')
@@ -204,10 +229,10 @@ def generate_alt_text():
         if not image_data:
             return jsonify({'error': 'No image provided'}), 400
 
-        from image_audit import audit_image, evidence_summary_for_prompt, ALT_TEXT_REFERENCES
+        from image_audit import evidence_summary_for_prompt, ALT_TEXT_REFERENCES
 
         # ---- 1. Inspect the file (real evidence) -----------------------
-        evidence = audit_image(image_data)
+        evidence = audit_executor.run('audit_image', image_data)
         if not evidence.get('ok'):
             return jsonify({'error': evidence.get('error', 'Could not decode image')}), 400
 
@@ -224,8 +249,6 @@ def generate_alt_text():
         }
 
         # ---- 2. Ground the LLM in the file analysis --------------------
-        evidence_summary = evidence_summary_for_prompt(evidence)
-
         system_prompt = (
             "You are a senior accessibility specialist generating alt-text. You "
             "receive both the image AND a deterministic FILE ANALYSIS REPORT "
@@ -258,18 +281,28 @@ def generate_alt_text():
             "}"
         )
 
-        user_prompt = (
-            f"DETAIL LEVEL: {detail_instructions.get(detail_level, detail_instructions['standard'])}\n"
-            f"CONTEXT GIVEN BY USER: {context or '(none)'}\n"
-            f"TONE REQUESTED: {tone}\n\n"
-            "FILE ANALYSIS REPORT (deterministic, computed locally):\n"
-            "----------------------------------------------------------\n"
-            f"{evidence_summary}\n"
-            "----------------------------------------------------------\n\n"
-            "Now look at the attached image and produce the JSON described above. "
-            "Cite at least one concrete detail from the FILE ANALYSIS REPORT in "
-            "pattern_rationale."
+        def user_prompt_for(evidence_summary, context_text):
+            return (
+                f"DETAIL LEVEL: {detail_instructions.get(detail_level, detail_instructions['standard'])}\n"
+                f"CONTEXT GIVEN BY USER: {context_text or '(none)'}\n"
+                f"TONE REQUESTED: {tone}\n\n"
+                "FILE ANALYSIS REPORT (deterministic, computed locally):\n"
+                "----------------------------------------------------------\n"
+                f"{evidence_summary}\n"
+                "----------------------------------------------------------\n\n"
+                "Now look at the attached image and produce the JSON described above. "
+                "Cite at least one concrete detail from the FILE ANALYSIS REPORT in "
+                "pattern_rationale."
+            )
+
+        # File analysis and the user's context share the alt_text budget.
+        token_budget = prompt_budget.budget_for('alt_text')
+        evidence_summary, context_text, context_truncated = prompt_budget.share_budget(
+            token_budget - prompt_budget.estimate_tokens(user_prompt_for('', '')),
+            lambda max_tokens: evidence_summary_for_prompt(evidence, max_tokens=max_tokens),
+            str(context or ''),
         )
+        user_prompt = user_prompt_for(evidence_summary, context_text)
 
         # ---- 3. Call the LLM (or fall back gracefully) -----------------
         if not ai_client.is_configured():
@@ -341,6 +374,11 @@ def generate_alt_text():
 
         result["evidence"] = evidence
         result["sources"] = ALT_TEXT_REFERENCES
+        result["prompt_tokens"] = {
+            "estimated": prompt_budget.estimate_tokens(user_prompt),
+            "budget": token_budget,
+            "truncated": context_truncated or bool(evidence_summary.dropped),
+        }
         result["differentiator"] = (
             "This isn't a one-shot vision call. We first inspected the file "
             "(dimensions, palette, EXIF, decorative heuristics) and grounded the "
@@ -349,6 +387,12 @@ def generate_alt_text():
         )
         return jsonify(result)
 
+    except audit_executor.AuditTimeout as te:
+        print(f"Audit timed out: {te}")
+        return jsonify({'error': 'Analysis took too long. Please try a smaller input.'}), 504
+    except audit_executor.AuditCrashed as ce:
+        print(f"Audit worker crashed: {ce}")
+        return jsonify({'error': 'The analysis worker stopped unexpectedly. Please try again.'}), 503
     except ValueError as ve:
         print(f"Alt-text JSON parse error: {ve}")
         return jsonify({'error': 'AI returned an unexpected response. Please try again.'}), 502
@@ -356,6 +400,90 @@ def generate_alt_text():
         print(f"Error generating alt text: {str(e)}")
         return jsonify({'error': str(e) if FLASK_DEBUG else 'Failed to generate alt text. Please try again.'}), 500
 
+def _remember(kind, key, result, label=''):
+    """Queue ``result`` for the audit history and tell the client its key."""
+    try:
+        if audit_store.record(kind, key, result, label=label):
+            result['history'] = {'kind': kind, 'target': key}
+    except Exception as e:  # the history is a nice-to-have, never a failure
+        print(f"[history] result not recorded: {e}")
+
+
+def _json_body():
+    """Return ``(dict, None)`` for a JSON object body, else ``(None, 400 response)``."""
+    if not request.is_json:
+        return None, (jsonify({'error': 'Content-Type must be application/json'}), 400)
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return None, (jsonify({'error': 'Invalid JSON format'}), 400)
+    return data, None
+
+
+@app.route('/api/score', methods=['POST', 'OPTIONS'])
+def score_website():
+    """Evidence-grounded accessibility score for a live URL.
+
+    Runs ``score_pipeline.run``: fetch → deterministic audit → prompt → LLM
+    → merge, each stage budgeted against ``SCORE_DEADLINE_SECONDS``. When
+    the model is unavailable or too slow the response is built from the
+    deterministic evidence alone (``pipeline.degraded`` is then true), so a
+    slow upstream never holds the worker until gunicorn kills it.
+    """
+    if request.method == 'OPTIONS':
+        return jsonify({'status': 'ok'})
+
+    data, error = _json_body()
+    if error:
+        return error
+    url = str(data.get('url') or '').strip()
+    if not url:
+        return jsonify({'error': 'No URL provided'}), 400
+
+    import score_pipeline
+
+    try:
+        result = score_pipeline.run(url)
+        _remember('score', audit_store.url_key(url), result, label=url)
+        return jsonify(result)
+    except score_pipeline.ScoreError as se:
+        return jsonify({'error': str(se), 'error_kind': se.kind}), se.status
+    except Exception as e:
+        print(f"Error scoring website: {str(e)}")
+        return jsonify({'error': str(e) if FLASK_DEBUG else 'Failed to score website. Please try again.'}), 500
+
+
+@app.route('/api/score/batch', methods=['POST', 'OPTIONS'])
+def score_batch():
+    """Score many URLs or raw HTML documents in one request, streamed as NDJSON.
+
+    Body: ``{"items": ["https://…", {"url": "…"}, {"html": "…", "base_url": "…",
+    "id": "…"}], "include_evidence": false}``. Documents are fetched and
+    audited concurrently (deterministic score only, no LLM) and each result
+    is written as one JSON line the moment it is ready; a final
+    ``{"done": true, …}`` line closes the stream.
+    """
+    if request.method == 'OPTIONS':
+        return jsonify({'status': 'ok'})
+
+    data, error = _json_body()
+    if error:
+        return error
+
+    import score_pipeline
+
+    try:
+        entries = score_pipeline.parse_batch_items(data.get('items', data.get('urls')))
+    except ValueError as ve:
+        return jsonify({'error': str(ve)}), 400
+
+    results = score_pipeline.score_batch(entries, include_evidence=bool(data.get('include_evidence')))
+    response = Response(stream_with_context(score_pipeline.ndjson_lines(results)),
+                        mimetype='application/x-ndjson')
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['X-Accel-Buffering'] = 'no'  # don't let a proxy hold lines back
+    return response
+
+
 @app.route('/api/review-code', methods=['POST', 'OPTIONS'])
 def review_code():
     """Differentiated, evidence-grounded code review.
@@ -369,6 +497,18 @@ def review_code():
          issues the lint missed (e.g. semantic / contextual problems) but
          cannot contradict what was statically detected.
       4. Return the merged report + sources for every triggered rule.
+
+    An optional ``rules`` list (rule_ids, see ``/api/review-code/rules``)
+    limits the lint to those rules.
+
+    A file too large for one prompt is reviewed in windows split at element
+    boundaries, several model calls at a time; the response then carries a
+    ``chunks`` report (see ``code_review``).
+
+    Pull-request mode: send ``diff`` (a unified diff) instead of ``code``,
+    and optionally ``base`` (the pre-change file, or ``{path: contents}``).
+    Only the changed lines are linted and sent to the model, with their
+    hunks as context; see ``code_diff``.
     """
     if request.method == 'OPTIONS':
         return jsonify({'status': 'ok'})
@@ -377,14 +517,40 @@ def review_code():
         data = request.json or {}
         code = data.get('code', '')
         code_type = data.get('code_type', 'html')
-        if not code.strip():
+        diff = data.get('diff')
+        base = data.get('base')
+        if diff is not None:
+            if not isinstance(diff, str) or not diff.strip():
+                return jsonify({'error': 'diff must be a non-empty unified diff'}), 400
+            if base is not None and not (isinstance(base, str) or (
+                    isinstance(base, dict) and all(isinstance(v, str) for v in base.values()))):
+                return jsonify({'error': 'base must be the file text or an object of path: text'}), 400
+        elif not code.strip():
             return jsonify({'error': 'No code provided'}), 400
 
-        from code_audit import audit_code, evidence_summary_for_prompt
+        from code_audit import evidence_summary_for_prompt, select_rules
+
+        rules = data.get('rules')
+        if rules is not None:
+            if not isinstance(rules, list):
+                return jsonify({'error': 'rules must be a list of rule_ids'}), 400
+            try:
+                rules = select_rules(rules)
+            except ValueError as ve:
+                return jsonify({'error': str(ve)}), 400
 
         # ---- 1. Deterministic lint (real evidence) ---------------------
-        evidence = audit_code(code, hint_lang=code_type)
-        evidence_summary = evidence_summary_for_prompt(evidence)
+        if diff is not None:
+            try:
+                evidence = audit_executor.run('audit_diff', diff, base=base, hint_lang=code_type, rules=rules)
+            except ValueError as ve:
+                return jsonify({'error': str(ve)}), 400
+            code = code_diff.diff_for_prompt(diff)
+            code_heading = ("CHANGED CODE (diff hunks: new-file line numbers, '+' added, "
+                            "'-' removed; cite new-file line numbers):")
+        else:
+            evidence = audit_executor.run('audit_code', code, hint_lang=code_type, rules=rules)
+            code_heading = "ORIGINAL CODE (cite line numbers):"
 
         system_prompt = (
             "You are a senior web accessibility code reviewer. You receive both "
@@ -420,25 +586,62 @@ def review_code():
             "}"
         )
 
-        user_prompt = (
-            f"LANGUAGE (auto-detected): {evidence['language']}\n"
-            f"DETERMINISTIC SCORE: {evidence['deterministic_score']} / 100\n\n"
-            "STATIC LINT REPORT:\n"
-            "----------------------------------------------------------\n"
-            f"{evidence_summary}\n"
-            "----------------------------------------------------------\n\n"
-            "ORIGINAL CODE (cite line numbers):\n"
-            "----------------------------------------------------------\n"
-            f"{code[:8000]}\n"
-            "----------------------------------------------------------\n\n"
-            "Produce the JSON described in the system prompt. Every issue you list "
-            "MUST cite a line number that exists in the code. Use the rule_id from "
-            "the lint report for findings it already raised."
+        def user_prompt_for(evidence_summary, code_text, heading=code_heading):
+            return (
+                f"LANGUAGE (auto-detected): {evidence['language']}\n"
+                f"DETERMINISTIC SCORE: {evidence['deterministic_score']} / 100\n\n"
+                "STATIC LINT REPORT:\n"
+                "----------------------------------------------------------\n"
+                f"{evidence_summary}\n"
+                "----------------------------------------------------------\n\n"
+                f"{heading}\n"
+                "----------------------------------------------------------\n"
+                f"{code_text}\n"
+                "----------------------------------------------------------\n\n"
+                "Produce the JSON described in the system prompt. Every issue you list "
+                "MUST cite a line number that exists in the code. Use the rule_id from "
+                "the lint report for findings it already raised."
+            )
+
+        # Lint report and code share the review_code token budget. A file
+        # that does not fit is reviewed in windows, concurrently (see
+        # code_review); without a model it is cut at a line boundary.
+        token_budget = prompt_budget.budget_for('review_code')
+        evidence_summary, code_text, truncated = prompt_budget.share_budget(
+            token_budget - prompt_budget.estimate_tokens(user_prompt_for('', '')),
+            lambda max_tokens: evidence_summary_for_prompt(evidence, max_tokens=max_tokens),
+            code,
         )
+        user_prompt = user_prompt_for(evidence_summary, code_text)
+        chunks = None
 
         # ---- 2. LLM call (or evidence-only fallback) -------------------
         if not ai_client.is_configured():
             ai_result = _code_evidence_only_fallback(evidence)
+        elif truncated and diff is None:
+            window_heading = "CODE, lines {} to {} of {} (each line starts with its line number; cite it):"
+            window_template = prompt_budget.estimate_tokens(
+                user_prompt_for('', '', window_heading.format(99999, 99999, 99999)))
+
+            def build_window_prompt(scoped, text, window):
+                summary, text, cut = prompt_budget.share_budget(
+                    token_budget - window_template,
+                    lambda max_tokens: evidence_summary_for_prompt(scoped, max_tokens=max_tokens),
+                    text,
+                )
+                heading = window_heading.format(window[0], window[1], evidence['line_count'])
+                return user_prompt_for(summary, text, heading), cut
+
+            windows, lines_left_out = code_review.plan_windows(
+                code, evidence['language'], evidence['findings'],
+                (token_budget - window_template) * 3 // 5)
+            ai_result, chunks = code_review.review_windows(
+                code, evidence, windows, build_window_prompt,
+                lambda prompt: ai_client.generate_json(prompt, system_message=system_prompt),
+                _code_evidence_only_fallback,
+            )
+            chunks['lines_not_reviewed'] = lines_left_out
+            truncated = lines_left_out > 0 or any(w['truncated'] for w in chunks['windows'])
         else:
             try:
                 ai_result = ai_client.generate_json(user_prompt, system_message=system_prompt)
@@ -453,14 +656,31 @@ def review_code():
         result = dict(ai_result)
         result['evidence'] = evidence
         result['sources'] = evidence['sources']
+        result['prompt_tokens'] = {
+            'estimated': (sum(w['prompt_tokens'] for w in chunks['windows']) if chunks
+                          else prompt_budget.estimate_tokens(user_prompt)),
+            'budget': token_budget,
+            'truncated': truncated,
+        }
+        if chunks:
+            result['chunks'] = chunks
         result['differentiator'] = (
             "We ran a deterministic accessibility lint against your code first — "
             f"detecting {sum(evidence['severity_counts'].values())} issue(s) at exact "
             "line numbers — then grounded the AI in those findings. The AI adds "
             "semantic context and fixes, but every cited line is real."
         )
+        history_key = str(data.get('history_key') or '').strip()
+        _remember('review_code', history_key or audit_store.content_key(diff if diff is not None else code),
+                  result, label=history_key)
         return jsonify(result)
 
+    except audit_executor.AuditTimeout as te:
+        print(f"Audit timed out: {te}")
+        return jsonify({'error': 'Analysis took too long. Please try a smaller input.'}), 504
+    except audit_executor.AuditCrashed as ce:
+        print(f"Audit worker crashed: {ce}")
+        return jsonify({'error': 'The analysis worker stopped unexpectedly. Please try again.'}), 503
     except ValueError as ve:
         print(f"Review-code JSON parse error: {ve}")
         return jsonify({'error': 'AI returned an unexpected response. Please try again.'}), 502
@@ -469,6 +689,54 @@ def review_code():
         return jsonify({'error': str(e) if FLASK_DEBUG else 'Failed to review code. Please try again.'}), 500
 
 
+@app.route('/api/review-code/rules', methods=['GET'])
+def review_code_rules():
+    """The lint rules ``/api/review-code`` can run, with their WCAG
+    criterion and severity, plus per-rule counters (calls, findings, ms)
+    including the audits run in this process's worker pools."""
+    from code_audit import rule_catalog, rule_stats
+    return jsonify({'rules': rule_catalog(), 'stats': rule_stats()})
+
+
+@app.route('/api/review-code/project', methods=['POST', 'OPTIONS'])
+def review_code_project():
+    """Deterministic lint of a whole frontend project (no LLM call).
+
+    Body: a zip or tar archive, raw or as the ``archive`` field of a
+    multipart form. Query: optional ``rules`` (comma-separated rule_ids)
+    and ``include_findings=1``. Returns per-file and per-rule rollups and a
+    combined score; see ``code_project``.
+    """
+    if request.method == 'OPTIONS':
+        return jsonify({'status': 'ok'})
+
+    limit = code_project.CODE_PROJECT_MAX_UPLOAD_BYTES
+    if (request.content_length or 0) > limit:
+        return jsonify({'error': f'Upload exceeds {limit // (1024 * 1024)} MB'}), 413
+    upload = request.files.get('archive')
+    data = upload.read(limit + 1) if upload else request.get_data()
+    if not data:
+        return jsonify({'error': 'No archive provided'}), 400
+    if len(data) > limit:
+        return jsonify({'error': f'Upload exceeds {limit // (1024 * 1024)} MB'}), 413
+
+    rules = request.args.get('rules')
+    rules = [r for r in rules.split(',') if r.strip()] if rules else None
+    try:
+        files, skipped = code_project.files_from_archive(data)
+        # The shared pool: a pool per request would multiply processes under
+        # concurrent uploads and pay interpreter start-up every time.
+        report = code_project.audit_project(
+            files, skipped, rules=rules, executor=code_project.shared_executor(), workers=0,
+            include_findings=request.args.get('include_findings', '').lower() in ('1', 'true', 'yes'))
+    except ValueError as ve:
+        return jsonify({'error': str(ve)}), 400
+    except Exception as e:
+        print(f"Error linting project: {str(e)}")
+        return jsonify({'error': str(e) if FLASK_DEBUG else 'Failed to lint project. Please try again.'}), 500
+    return jsonify(report)
+
+
 def _code_evidence_only_fallback(evidence):
     """Build a usable review purely from the deterministic lint."""
     issues = []
@@ -481,6 +749,7 @@ def _code_evidence_only_fallback(evidence):
             'severity': f['severity'].capitalize(),
             'wcag_criterion': f['wcag_criterion'],
             'line': f['line'],
+            **({'path': f['path']} if 'path' in f else {}),
             'description': f['message'],
             'user_impact': '—',
             'code_snippet': f['snippet'],
@@ -547,8 +816,6 @@ def simplify_content():
         if not before_evidence.get('ok'):
             return jsonify({'error': before_evidence.get('error', 'Could not analyse text')}), 400
 
-        before_summary = evidence_summary_for_prompt(before_evidence)
-
         system_prompt = (
             "You are a plain-language editor and accessibility specialist. You "
             "receive both the ORIGINAL text AND a deterministic READABILITY "
@@ -572,21 +839,30 @@ def simplify_content():
             "}"
         )
 
-        user_prompt = (
-            f"TARGET READING LEVEL: {target_grade_text}\n"
-            f"SIMPLIFICATION INTENSITY: {simplification_level}\n"
-            f"CONTENT TYPE: {content_type}\n\n"
-            "READABILITY REPORT FOR ORIGINAL TEXT (must improve every metric):\n"
-            "----------------------------------------------------------\n"
-            f"{before_summary}\n"
-            "----------------------------------------------------------\n\n"
-            "ORIGINAL TEXT:\n"
-            "----------------------------------------------------------\n"
-            f"{content[:6000]}\n"
-            "----------------------------------------------------------\n\n"
-            "Rewrite the text and return the JSON described in the system prompt. "
-            "Each improvement must cite a number from the report (e.g. \"FK grade 14.2 → ~6\")."
+        def user_prompt_for(before_summary, content_text):
+            return (
+                f"TARGET READING LEVEL: {target_grade_text}\n"
+                f"SIMPLIFICATION INTENSITY: {simplification_level}\n"
+                f"CONTENT TYPE: {content_type}\n\n"
+                "READABILITY REPORT FOR ORIGINAL TEXT (must improve every metric):\n"
+                "----------------------------------------------------------\n"
+                f"{before_summary}\n"
+                "----------------------------------------------------------\n\n"
+                "ORIGINAL TEXT:\n"
+                "----------------------------------------------------------\n"
+                f"{content_text}\n"
+                "----------------------------------------------------------\n\n"
+                "Rewrite the text and return the JSON described in the system prompt. "
+                "Each improvement must cite a number from the report (e.g. \"FK grade 14.2 → ~6\")."
+            )
+
+        token_budget = prompt_budget.budget_for('simplify')
+        before_summary, content_text, truncated = prompt_budget.share_budget(
+            token_budget - prompt_budget.estimate_tokens(user_prompt_for('', '')),
+            lambda max_tokens: evidence_summary_for_prompt(before_evidence, max_tokens=max_tokens),
+            content,
         )
+        user_prompt = user_prompt_for(before_summary, content_text)
 
         # ---- 2. LLM call (or fallback) ---------------------------------
         if not ai_client.is_configured():
@@ -663,6 +939,11 @@ def simplify_content():
             'after_evidence': after_evidence,
             'deltas': deltas,
             'sources': READABILITY_REFERENCES,
+            'prompt_tokens': {
+                'estimated': prompt_budget.estimate_tokens(user_prompt),
+                'budget': token_budget,
+                'truncated': truncated,
+            },
             'differentiator': (
                 "We measure your text BEFORE and AFTER the AI rewrite using the "
                 "same Flesch / Flesch-Kincaid / ARI formulas used by editors and "
@@ -672,6 +953,8 @@ def simplify_content():
         }
         if '_fallback_reason' in ai_result:
             result['_fallback_reason'] = ai_result['_fallback_reason']
+        history_key = str(data.get('history_key') or '').strip()
+        _remember('simplify', history_key or audit_store.content_key(content), result, label=history_key)
         return jsonify(result)
 
     except ValueError as ve:
@@ -681,6 +964,61 @@ def simplify_content():
         print(f"Error simplifying content: {str(e)}")
         return jsonify({'error': str(e) if FLASK_DEBUG else 'Failed to simplify content. Please try again.'}), 500
 
+@app.route('/api/history', methods=['GET'])
+def audit_history():
+    """Score trend of one target plus what changed in its latest audit.
+
+    Query: ``kind`` (score | review_code | simplify, default score),
+    ``target`` (the URL, or the ``history`` key a review/simplify response
+    returned), optional ``days`` and ``limit``.
+    """
+    store = audit_store.get_store()
+    if store is None:
+        return jsonify({'error': 'Audit history is disabled'}), 503
+    kind = request.args.get('kind', 'score')
+    target = request.args.get('target', '').strip()
+    if kind not in audit_store.KINDS:
+        return jsonify({'error': f"kind must be one of {', '.join(audit_store.KINDS)}"}), 400
+    if not target:
+        return jsonify({'error': 'No target provided'}), 400
+    if kind == 'score':
+        target = audit_store.url_key(target)
+    try:
+        days = float(request.args.get('days', 0))
+        limit = max(1, min(int(request.args.get('limit', 100)), 1000))
+    except ValueError:
+        return jsonify({'error': 'days and limit must be numbers'}), 400
+    since = time.time() - days * 86400 if days > 0 else None
+    return jsonify({
+        'kind': kind,
+        'target': target,
+        'audits': store.trend(kind, target, since=since, limit=limit),
+        'latest_change': store.diff_latest(kind, target),
+    })
+
+
+@app.route('/api/history/regressions', methods=['GET'])
+def audit_regressions():
+    """Targets whose latest audit (within ``days``, default 7) scored lowest
+    against the audit before it. Query: ``kind``, ``days``, ``limit``."""
+    store = audit_store.get_store()
+    if store is None:
+        return jsonify({'error': 'Audit history is disabled'}), 503
+    kind = request.args.get('kind', 'score')
+    if kind not in audit_store.KINDS:
+        return jsonify({'error': f"kind must be one of {', '.join(audit_store.KINDS)}"}), 400
+    try:
+        days = float(request.args.get('days', 7))
+        limit = max(1, min(int(request.args.get('limit', 10)), 100))
+    except ValueError:
+        return jsonify({'error': 'days and limit must be numbers'}), 400
+    return jsonify({
+        'kind': kind,
+        'days': days,
+        'regressions': store.top_regressions(kind, since=time.time() - days * 86400, limit=limit),
+    })
+
+
 if __name__ == '__main__':
     print(f"Starting server on {HOST}:{PORT}")
     print(f"Azure OpenAI Status: {'Configured' if ai_client.is_configured() else 'NOT CONFIGURED'}")
@@ -0,0 +1,305 @@
+"""
+audit_executor.py
+=================
+
+Process pool for the CPU-bound deterministic auditors (``audit_html``,
+``audit_code``, ``audit_diff``, ``audit_image``, ``audit_text``).
+
+Run inline, a 2 MB page or a 20-megapixel image holds the request thread —
+and the GIL — for hundreds of milliseconds, stalling every other request in
+the worker, including ones that are only waiting on Azure OpenAI. Handlers
+instead call ``run("audit_image", data)``: the evidence cache is checked in
+this process first, and on a miss the work is shipped to a worker process.
+LLM calls stay on threads; they are I/O-bound and gain nothing from a
+process.
+
+* ``AUDIT_WORKERS`` worker processes (``0`` runs auditors inline, the old
+  behaviour). Every gunicorn worker has its own pool, so the default splits
+  the CPUs between ``WEB_CONCURRENCY`` of them (at most 4 each). Workers are
+  started with ``spawn`` on the first task and import every auditor module
+  up front; ``AUDIT_PREWARM=true`` starts them all at app import instead.
+* Each task has a timeout (``AUDIT_TASK_TIMEOUT_SECONDS`` unless the caller
+  passes a tighter one). A task still queued when it expires is cancelled.
+  One already running is not left to occupy its worker: the pool is
+  recycled — new tasks go to a fresh pool, and the old one's processes are
+  terminated once its other tasks are done. Either way the caller gets
+  ``AuditTimeout`` promptly.
+* A worker that dies (e.g. the OOM killer) breaks the pool; it is rebuilt
+  and the caller gets ``AuditCrashed``.
+* Each task also ships back the worker's ``code_audit`` rule counters,
+  so ``code_audit.rule_stats()`` in this process covers pooled audits.
+* Each task reports the peak RSS of the process that ran it (the worker's
+  high-water mark is reset before every task; see ``memory_budget``).
+  ``last_peak_rss()`` returns it for the calling thread's latest task and
+  ``stats()`` the largest seen. An auditor that exceeds
+  ``AUDIT_MAX_MEMORY_MB`` raises ``memory_budget.MemoryLimitExceeded``,
+  which reaches the caller unchanged.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import importlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+import memory_budget
+
+# ---------------------------------------------------------------------------
+# Configuration (read from environment / .env)
+# ---------------------------------------------------------------------------
+# Gunicorn's worker count (gunicorn reads the same variable); each has a pool.
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+AUDIT_WORKERS = int(os.getenv("AUDIT_WORKERS", str(max(1, min(4, (os.cpu_count() or 1) // WEB_CONCURRENCY)))))
+AUDIT_TASK_TIMEOUT_SECONDS = float(os.getenv("AUDIT_TASK_TIMEOUT_SECONDS", "20"))
+AUDIT_PREWARM = os.getenv("AUDIT_PREWARM", "false").strip().lower() in ("1", "true", "yes")
+
+# Auditor name -> module that defines it.
+AUDITORS: Dict[str, str] = {
+    "audit_html": "web_audit",
+    "audit_code": "code_audit",
+    "audit_diff": "code_diff",
+    "audit_image": "image_audit",
+    "audit_text": "text_audit",
+}
+
+
+class AuditTimeout(TimeoutError):
+    """The auditor did not finish within its budget."""
+
+
+class AuditCrashed(RuntimeError):
+    """The worker process running the auditor died."""
+
+
+def _auditor(name: str):
+    return getattr(importlib.import_module(AUDITORS[name]), name)
+
+
+# ---- worker-side ----------------------------------------------------------
+def _init_worker() -> None:
+    for module in set(AUDITORS.values()):
+        importlib.import_module(module)
+
+
+def _run_in_worker(name: str, args: tuple,
+                   kwargs: Dict[str, Any]) -> Tuple[Any, int, Dict[str, List[float]]]:
+    # Bypass the worker's own evidence cache; the parent caches the result.
+    memory_budget.reset_peak()
+    result = _auditor(name).__wrapped__(*args, **kwargs)
+    # The lint rules' counters go back with the result (see code_audit.rule_stats).
+    rule_stats = importlib.import_module("code_audit").take_rule_stats()
+    return result, memory_budget.peak_rss_bytes(), rule_stats
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+# ---- parent-side ----------------------------------------------------------
+class AuditExecutor:
+    """Runs auditors in a process pool with per-task timeouts."""
+
+    def __init__(self, workers: int = AUDIT_WORKERS,
+                 timeout: float = AUDIT_TASK_TIMEOUT_SECONDS) -> None:
+        self.workers = workers
+        self.timeout = timeout
+        self._pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self._pid = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # Unfinished futures per pool, and the timed-out ones of each pool
+        # being recycled: its processes go once the rest have finished.
+        self._inflight: Dict[concurrent.futures.ProcessPoolExecutor, set] = {}
+        self._retiring: Dict[concurrent.futures.ProcessPoolExecutor, set] = {}
+        self._changed = threading.Condition(self._lock)
+        self.counters = {"submitted": 0, "completed": 0, "cache_hits": 0, "inline": 0,
+                         "timeouts": 0, "cancelled": 0, "recycled": 0, "crashes": 0}
+        self.max_peak_rss = 0
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def _get_pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        if self._pool is None or self._pid != os.getpid():
+            with self._lock:
+                if self._pool is None or self._pid != os.getpid():
+                    self._pool = concurrent.futures.ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_worker)
+                    self._pid = os.getpid()
+        return self._pool
+
+    def _discard_pool(self, pool: concurrent.futures.ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _track(self, pool: concurrent.futures.ProcessPoolExecutor,
+               future: concurrent.futures.Future) -> None:
+        with self._lock:
+            self._inflight.setdefault(pool, set()).add(future)
+
+        def done(finished: concurrent.futures.Future) -> None:
+            with self._changed:
+                tasks = self._inflight.get(pool)
+                if tasks is not None:
+                    tasks.discard(finished)
+                    if not tasks:
+                        del self._inflight[pool]
+                self._changed.notify_all()
+
+        future.add_done_callback(done)
+
+    def _recycle(self, pool: concurrent.futures.ProcessPoolExecutor,
+                 stuck: concurrent.futures.Future) -> None:
+        """Retire ``pool``, whose task ``stuck`` overran its timeout: later
+        tasks get a fresh pool, and the old processes are terminated once
+        its other tasks finish or overrun too (or have had a full timeout)."""
+        with self._changed:
+            if self._pool is pool:
+                self._pool = None
+            abandoned = self._retiring.setdefault(pool, set())
+            first = not abandoned
+            abandoned.add(stuck)
+            self.counters["recycled"] += first
+            self._changed.notify_all()
+        if first:
+            threading.Thread(target=self._terminate, args=(pool,),
+                             name="audit-recycle", daemon=True).start()
+
+    def _terminate(self, pool: concurrent.futures.ProcessPoolExecutor) -> None:
+        with self._changed:
+            self._changed.wait_for(
+                lambda: self._inflight.get(pool, set()) <= self._retiring[pool], timeout=self.timeout)
+            del self._retiring[pool]
+        for process in list((getattr(pool, "_processes", None) or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def prewarm(self) -> None:
+        """Start every worker and import the auditors in it (blocks)."""
+        if self.workers <= 0:
+            return
+        pool = self._get_pool()
+        # Enough pings that the pool has to spawn all of its workers.
+        futures = [pool.submit(_ping) for _ in range(self.workers)]
+        concurrent.futures.wait(futures)
+
+    def run(self, name: str, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """``name(*args, **kwargs)`` via the evidence cache and the pool.
+
+        Arguments and the result cross a process boundary, so they must be
+        picklable and output arguments (``audit_html``'s ``links``) are not
+        supported; call the auditor directly for those.
+        """
+        func = _auditor(name)
+        self._local.peak_rss = None
+        key, hit, value = func.cache_lookup(*args, **kwargs)
+        if hit:
+            self._count("cache_hits")
+            return value
+        if self.workers <= 0:
+            # Shared process: the high-water mark cannot be reset per task.
+            self._count("inline")
+            result = func.__wrapped__(*args, **kwargs)
+            peak = memory_budget.peak_rss_bytes()
+        else:
+            result, peak = self._submit_and_wait(name, args, kwargs,
+                                                 self.timeout if timeout is None else timeout)
+        self._local.peak_rss = peak
+        with self._lock:
+            self.max_peak_rss = max(self.max_peak_rss, peak)
+        func.cache_store(key, result)
+        return result
+
+    def last_peak_rss(self) -> Optional[int]:
+        """Peak RSS in bytes of the calling thread's last task (``None`` on a cache hit)."""
+        return getattr(self._local, "peak_rss", None)
+
+    def _submit_and_wait(self, name: str, args: tuple, kwargs: Dict[str, Any],
+                         timeout: float) -> Tuple[Any, int]:
+        pool = self._get_pool()
+        try:
+            future = pool.submit(_run_in_worker, name, args, kwargs)
+        except BrokenProcessPool:
+            self._discard_pool(pool)
+            pool = self._get_pool()
+            future = pool.submit(_run_in_worker, name, args, kwargs)
+        self._count("submitted")
+        self._track(pool, future)
+        try:
+            result = future.result(timeout=max(0.0, timeout))
+        except concurrent.futures.TimeoutError:
+            if future.cancel():
+                self._count("cancelled")
+            else:
+                self._count("timeouts")
+                self._recycle(pool, future)
+            raise AuditTimeout(f"{name} did not finish within {timeout:.1f}s") from None
+        except BrokenProcessPool as exc:
+            self._count("crashes")
+            self._discard_pool(pool)
+            raise AuditCrashed(f"{name} worker process died") from exc
+        self._count("completed")
+        result, peak, rule_stats = result
+        if rule_stats:
+            importlib.import_module("code_audit").add_rule_stats(rule_stats)
+        return result, peak
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.counters, workers=self.workers, max_peak_rss_bytes=self.max_peak_rss)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+_executor: Optional[AuditExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> AuditExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = AuditExecutor()
+    return _executor
+
+
+def set_executor(executor: Optional[AuditExecutor]) -> None:
+    """Replace the shared executor (tests, benchmarks); shuts the old one down."""
+    global _executor
+    with _executor_lock:
+        old, _executor = _executor, executor
+    if old is not None and old is not executor:
+        old.shutdown()
+
+
+def run(name: str, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+    return get_executor().run(name, *args, timeout=timeout, **kwargs)
+
+
+def last_peak_rss() -> Optional[int]:
+    return get_executor().last_peak_rss()
+
+
+def prewarm_in_background() -> None:
+    """With ``AUDIT_PREWARM``, spawn the workers on a daemon thread so
+    start-up is not delayed (otherwise they start with the first task)."""
+    if AUDIT_PREWARM and AUDIT_WORKERS > 0:
+        threading.Thread(target=get_executor().prewarm, name="audit-prewarm", daemon=True).start()
+
+
+def stats() -> Dict[str, Any]:
+    return get_executor().stats()
@@ -0,0 +1,182 @@
+"""
+audit_limits.py
+===============
+
+Input caps and wall-clock budgets for the deterministic auditors, so that
+no single request holds a worker for longer than its budget.
+
+* ``limits_for(auditor)`` — ``(max_chars, budget_seconds)`` for
+  ``audit_code``, ``audit_diff``, ``audit_text`` and ``audit_html``, from
+  ``AUDIT_<NAME>_MAX_CHARS`` / ``AUDIT_<NAME>_BUDGET_SECONDS`` (``0``
+  disables either).
+* ``AuditGuard`` — created when an audit starts, like
+  ``memory_budget.MemoryBudget``. ``cap(text)`` cuts the input at the last
+  line break before the cap; ``expired()`` is cheap enough to call between
+  elements, slices and rules, and once it returns ``True`` the auditor
+  stops at that point and returns what it has, naming the checks it
+  skipped with ``skip()``. ``mark(evidence)`` flags the result.
+* ``prompt_note(evidence)`` — one line telling the model the evidence is
+  partial (``None`` when it is not), for the prompt summaries.
+
+A flagged result carries ``"truncated": true`` and::
+
+    "truncation": {"reasons": ["input_cap", "time_budget"],
+                   "input_chars": …, "analyzed_chars": …,
+                   "max_chars": …, "budget_seconds": …, "skipped": […]}
+
+Every check sits between units of work whose cost is bounded by the
+(capped) input size, so an audit overruns its budget by at most one unit.
+``bench_audit_limits.py`` runs a corpus of worst-case inputs against the
+caps and fails if any of them does not finish within budget plus slack.
+
+An audit that runs others (``audit_diff`` lints regions with
+``audit_code``) makes its guard ``active()``; guards created inside it
+never outlast its deadline.
+
+Keep the budgets below ``AUDIT_TASK_TIMEOUT_SECONDS``: the executor's
+timeout discards the worker and returns nothing, the budget returns
+partial evidence.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# ---------------------------------------------------------------------------
+# Configuration (read from environment / .env)
+# ---------------------------------------------------------------------------
+AUDIT_CODE_MAX_CHARS = int(os.getenv("AUDIT_CODE_MAX_CHARS", str(1024 * 1024)))
+AUDIT_CODE_BUDGET_SECONDS = float(os.getenv("AUDIT_CODE_BUDGET_SECONDS", "5"))
+AUDIT_DIFF_MAX_CHARS = int(os.getenv("AUDIT_DIFF_MAX_CHARS", str(1024 * 1024)))
+AUDIT_DIFF_BUDGET_SECONDS = float(os.getenv("AUDIT_DIFF_BUDGET_SECONDS", "5"))
+AUDIT_TEXT_MAX_CHARS = int(os.getenv("AUDIT_TEXT_MAX_CHARS", str(512 * 1024)))
+AUDIT_TEXT_BUDGET_SECONDS = float(os.getenv("AUDIT_TEXT_BUDGET_SECONDS", "5"))
+AUDIT_HTML_MAX_CHARS = int(os.getenv("AUDIT_HTML_MAX_CHARS", str(4 * 1024 * 1024)))
+AUDIT_HTML_BUDGET_SECONDS = float(os.getenv("AUDIT_HTML_BUDGET_SECONDS", "10"))
+
+_LIMITS = {
+    "audit_code": lambda: (AUDIT_CODE_MAX_CHARS, AUDIT_CODE_BUDGET_SECONDS),
+    "audit_diff": lambda: (AUDIT_DIFF_MAX_CHARS, AUDIT_DIFF_BUDGET_SECONDS),
+    "audit_text": lambda: (AUDIT_TEXT_MAX_CHARS, AUDIT_TEXT_BUDGET_SECONDS),
+    "audit_html": lambda: (AUDIT_HTML_MAX_CHARS, AUDIT_HTML_BUDGET_SECONDS),
+}
+
+
+_active: contextvars.ContextVar = contextvars.ContextVar("audit_guard", default=None)
+
+
+def limits_for(auditor: str) -> Tuple[int, float]:
+    """``(max_chars, budget_seconds)`` configured for ``auditor``."""
+    return _LIMITS[auditor]()
+
+
+def prompt_note(evidence: Dict) -> Optional[str]:
+    """``"PARTIAL ANALYSIS: …"`` for truncated evidence, else ``None``."""
+    if not evidence.get("truncated"):
+        return None
+    t = evidence.get("truncation") or {}
+    why = " and ".join({"input_cap": "input size cap", "time_budget": "time budget"}.get(r, r)
+                       for r in t.get("reasons", []))
+    parts = []
+    if (t.get("analyzed_chars") or 0) < (t.get("input_chars") or 0):
+        parts.append(f"only the first {t['analyzed_chars']} of {t['input_chars']} characters were checked")
+    if t.get("skipped"):
+        parts.append(f"not run: {', '.join(t['skipped'])}")
+    return f"PARTIAL ANALYSIS ({why}): {'; '.join(parts) or 'cut short'}. Do not treat the rest as issue-free."
+
+
+class AuditGuard:
+    """One audit's input cap and deadline."""
+
+    __slots__ = ("max_chars", "seconds", "started", "deadline", "reasons",
+                 "input_chars", "analyzed_chars", "skipped")
+
+    def __init__(self, auditor: Optional[str] = None, max_chars: Optional[int] = None,
+                 seconds: Optional[float] = None) -> None:
+        default_chars, default_seconds = limits_for(auditor) if auditor else (0, 0.0)
+        self.max_chars = default_chars if max_chars is None else max_chars
+        self.seconds = default_seconds if seconds is None else seconds
+        self.started = time.monotonic()
+        self.deadline = self.started + self.seconds if self.seconds > 0 else float("inf")
+        outer = _active.get()
+        if outer is not None:
+            self.deadline = min(self.deadline, outer.deadline)
+        self.reasons: List[str] = []
+        self.input_chars: Optional[int] = None
+        self.analyzed_chars: Optional[int] = None
+        self.skipped: List[str] = []
+
+    def cap(self, text: str, boundary: str = "\n") -> str:
+        """``text`` cut to at most ``max_chars``, at the last ``boundary``
+        before the cap when there is one."""
+        self.input_chars = len(text)
+        if self.max_chars <= 0 or len(text) <= self.max_chars:
+            return text
+        cut = text.rfind(boundary, 0, self.max_chars) + len(boundary)
+        if cut < len(boundary):
+            cut = self.max_chars
+        self.capped_at(cut)
+        return text[:cut]
+
+    def capped_at(self, analyzed_chars: int) -> None:
+        """Record that only the first ``analyzed_chars`` fit the input cap."""
+        self._stop("input_cap", analyzed_chars)
+
+    def expired(self) -> bool:
+        """Whether the budget is spent (stays ``True`` once it is)."""
+        if "time_budget" in self.reasons:
+            return True
+        if time.monotonic() < self.deadline:
+            return False
+        self.reasons.append("time_budget")
+        return True
+
+    def stopped_at(self, analyzed_chars: int) -> None:
+        """Record how far the audit got when ``expired()`` stopped it."""
+        self._stop("time_budget", analyzed_chars)
+
+    def skip(self, checks: Iterable[str]) -> None:
+        """Name checks the truncated audit did not run."""
+        self.skipped.extend(c for c in checks if c not in self.skipped)
+
+    @contextlib.contextmanager
+    def active(self):
+        """Audits started inside the block share this guard's deadline."""
+        token = _active.set(self)
+        try:
+            yield self
+        finally:
+            _active.reset(token)
+
+    @property
+    def truncated(self) -> bool:
+        return bool(self.reasons)
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def mark(self, evidence: Dict) -> Dict:
+        """Flag ``evidence`` when the audit was truncated; unchanged otherwise."""
+        if not self.reasons:
+            return evidence
+        evidence["truncated"] = True
+        evidence["truncation"] = {
+            "reasons": list(self.reasons),
+            "input_chars": self.input_chars,
+            "analyzed_chars": self.analyzed_chars,
+            "max_chars": self.max_chars,
+            "budget_seconds": self.seconds,
+            "skipped": list(self.skipped),
+        }
+        return evidence
+
+    def _stop(self, reason: str, analyzed_chars: int) -> None:
+        if reason not in self.reasons:
+            self.reasons.append(reason)
+        if self.analyzed_chars is None or analyzed_chars < self.analyzed_chars:
+            self.analyzed_chars = analyzed_chars
@@ -0,0 +1,420 @@
+"""
+audit_store.py
+==============
+
+Embedded history of audit results, so re-auditing the same URL (or the same
+file) week after week builds a trend instead of vanishing with the response.
+
+Everything lives in one SQLite database at ``AUDIT_STORE_PATH`` in WAL mode:
+readers never block the writer, and several worker processes can share the
+file. No database server is involved.
+
+The history holds submitted code and content evidence, so it is off unless
+``AUDIT_STORE_ENABLED=true`` *and* ``AUDIT_STORE_PATH`` name a location;
+there is no default under the shared temp directory. A new database file
+(and any directory made for it) is created readable by its owner only.
+
+Schema
+------
+* ``targets``  — one row per audited thing: ``kind`` (``score``,
+  ``review_code``, ``simplify``) plus ``key`` (the normalised URL, a
+  caller-chosen name, or ``sha256:<hex>`` of the submitted text).
+* ``audits``   — one row per result: time, model score, deterministic score
+  and a few headline metrics (JSON). Indexed on ``(target_id, created_at)``
+  for trends and on ``created_at`` for time windows.
+* ``findings`` — normalised evidence: ``(audit_id, code, count)`` per WCAG
+  criterion or lint rule, which is what diffs compare.
+* ``evidence`` — the full evidence dict, zlib-compressed JSON, kept apart so
+  scans over ``audits`` stay narrow. Off with ``AUDIT_STORE_KEEP_EVIDENCE``.
+
+Writing
+-------
+``record(kind, key, result)`` normalises a response and queues it; a
+background thread writes queued records in batches, one transaction each,
+so a request never waits on the disk. ``AuditStore.insert_many`` is the same
+bulk path for imports. A store that cannot be opened or written only costs
+the history, never the request.
+
+Reading
+-------
+* ``trend(kind, key)``         — scores and metrics over time.
+* ``diff(old_id, new_id)``     — findings added, removed or changed.
+* ``diff_latest(kind, key)``   — the same for a target's last two audits.
+* ``top_regressions(kind)``    — targets whose latest audit scored worst
+  against the one before it.
+
+Each query is a few index seeks per target touched, so they stay fast with
+hundreds of thousands of audits on disk.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+import code_audit
+
+# ---------------------------------------------------------------------------
+# Configuration (read from environment / .env)
+# ---------------------------------------------------------------------------
+AUDIT_STORE_ENABLED = os.getenv("AUDIT_STORE_ENABLED", "false").strip().lower() in ("1", "true", "yes")
+AUDIT_STORE_PATH = os.getenv("AUDIT_STORE_PATH", "").strip()
+AUDIT_STORE_KEEP_EVIDENCE = os.getenv("AUDIT_STORE_KEEP_EVIDENCE", "true").strip().lower() in ("1", "true", "yes")
+
+KINDS = ("score", "review_code", "simplify")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS targets (
+    id      INTEGER PRIMARY KEY,
+    kind    TEXT NOT NULL,
+    key     TEXT NOT NULL,
+    label   TEXT NOT NULL DEFAULT '',
+    UNIQUE (kind, key)
+);
+CREATE TABLE IF NOT EXISTS audits (
+    id                  INTEGER PRIMARY KEY,
+    target_id           INTEGER NOT NULL REFERENCES targets (id),
+    created_at          REAL NOT NULL,
+    score               INTEGER,
+    deterministic_score INTEGER,
+    metrics             TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS audits_by_target ON audits (target_id, created_at);
+CREATE INDEX IF NOT EXISTS audits_by_time ON audits (created_at);
+CREATE TABLE IF NOT EXISTS findings (
+    audit_id INTEGER NOT NULL,
+    code     TEXT NOT NULL,
+    count    INTEGER NOT NULL,
+    PRIMARY KEY (audit_id, code)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS evidence (
+    audit_id INTEGER PRIMARY KEY,
+    body     BLOB NOT NULL
+);
+"""
+
+_WRITE_BATCH = 500      # records per transaction on the background writer
+
+
+# ---------------------------------------------------------------------------
+# Normalisation: API response -> stored record
+# ---------------------------------------------------------------------------
+def url_key(url: str) -> str:
+    """``url`` with scheme and host lower-cased and the fragment dropped."""
+    parts = urlsplit(url.strip())
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", parts.query, ""))
+
+
+def content_key(text: str) -> str:
+    return "sha256:" + hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _as_int(value: Any) -> Optional[int]:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(round(value))
+    return None
+
+
+def normalize(kind: str, key: str, result: Dict[str, Any], label: str = "",
+              created_at: Optional[float] = None) -> Dict[str, Any]:
+    """The storable record for one ``/api/score``, ``/api/review-code`` or
+    ``/api/simplify-content`` response.
+
+    ``findings`` maps a WCAG criterion (score) or lint rule id (code review)
+    to how often it fired; ``metrics`` keeps a few headline numbers.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unknown audit kind {kind!r}")
+    findings: Dict[str, int] = {}
+    metrics: Dict[str, Any] = {}
+    score = _as_int(result.get("score"))
+    deterministic = _as_int(result.get("deterministic_score"))
+    if kind == "score":
+        evidence = result.get("evidence") or {}
+        for finding in evidence.get("flagged_findings", []):
+            findings[finding["wcag"]] = findings.get(finding["wcag"], 0) + 1
+        images = evidence.get("images") or {}
+        forms = evidence.get("forms") or {}
+        metrics = {
+            "missing_alt": images.get("missing_alt"),
+            "inputs_unlabeled": forms.get("inputs_unlabeled"),
+            "links_no_text": (evidence.get("links") or {}).get("no_text"),
+            "contrast_below_aa": (evidence.get("contrast") or {}).get("below_aa"),
+        }
+    elif kind == "review_code":
+        evidence = result.get("evidence") or {}
+        for finding in evidence.get("findings", []):
+            findings[finding["rule_id"]] = findings.get(finding["rule_id"], 0) + 1
+        deterministic = _as_int(evidence.get("deterministic_score"))
+        metrics = dict(evidence.get("severity_counts") or {}, line_count=evidence.get("line_count"))
+    else:
+        evidence = {"before": result.get("before_evidence"), "after": result.get("after_evidence")}
+        before = result.get("before_evidence") or {}
+        after = result.get("after_evidence") or {}
+        if before.get("ok"):
+            issues = before["issues"]
+            findings = {"jargon": len(issues["jargon_hits"]), "passive_voice": issues["passive_voice_count"],
+                        "long_sentences": before["stats"]["long_sentences_over_25"]}
+            findings = {code: n for code, n in findings.items() if n}
+            metrics["fk_grade_before"] = before["readability"]["fk_grade_level"]
+        if after.get("ok"):
+            metrics["fk_grade_after"] = after["readability"]["fk_grade_level"]
+    return {
+        "kind": kind,
+        "key": key,
+        "label": label,
+        "created_at": time.time() if created_at is None else created_at,
+        "score": score,
+        "deterministic_score": deterministic,
+        "findings": findings,
+        "metrics": {name: value for name, value in metrics.items() if value is not None},
+        "evidence": evidence,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Store
+# ---------------------------------------------------------------------------
+class AuditStore:
+    """SQLite (WAL) audit history. Thread-safe: one connection per thread."""
+
+    def __init__(self, path: str = AUDIT_STORE_PATH, keep_evidence: bool = AUDIT_STORE_KEEP_EVIDENCE) -> None:
+        self.path = path
+        self.keep_evidence = keep_evidence
+        self._local = threading.local()
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        if not path:
+            raise ValueError("AuditStore needs a path (AUDIT_STORE_PATH)")
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        # Created 0600 before SQLite opens it; its -wal / -shm files copy the mode.
+        os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")   # durable at checkpoints; fine for history
+            self._local.conn = conn
+        return conn
+
+    # ---- writing ---------------------------------------------------------
+    def insert_many(self, records: Iterable[Dict[str, Any]]) -> List[int]:
+        """Insert normalised records in one transaction; returns their audit ids."""
+        records = list(records)
+        if not records:
+            return []
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO targets (kind, key, label) VALUES (?, ?, ?) "
+                "ON CONFLICT (kind, key) DO UPDATE SET label = excluded.label WHERE excluded.label != ''",
+                [(r["kind"], r["key"], r.get("label", "")) for r in records])
+            target_ids = self._target_ids(conn, {(r["kind"], r["key"]) for r in records})
+            # Ids are assigned here, under the write lock, so every table can
+            # be filled with one executemany.
+            first = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM audits").fetchone()[0]
+            ids = list(range(first, first + len(records)))
+            conn.executemany(
+                "INSERT INTO audits (id, target_id, created_at, score, deterministic_score, metrics) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(audit_id, target_ids[(r["kind"], r["key"])], r["created_at"], r.get("score"),
+                  r.get("deterministic_score"), json.dumps(r.get("metrics") or {}, separators=(",", ":")))
+                 for audit_id, r in zip(ids, records)])
+            conn.executemany(
+                "INSERT INTO findings (audit_id, code, count) VALUES (?, ?, ?)",
+                [(audit_id, code, count)
+                 for audit_id, r in zip(ids, records) for code, count in (r.get("findings") or {}).items()])
+            if self.keep_evidence:
+                conn.executemany(
+                    "INSERT INTO evidence (audit_id, body) VALUES (?, ?)",
+                    [(audit_id, zlib.compress(json.dumps(r["evidence"], separators=(",", ":"),
+                                                   default=code_audit.json_default).encode("utf-8")))
+                     for audit_id, r in zip(ids, records) if r.get("evidence") is not None])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return ids
+
+    @staticmethod
+    def _target_ids(conn: sqlite3.Connection, pairs: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], int]:
+        ids = {}
+        for kind, key in pairs:
+            row = conn.execute("SELECT id FROM targets WHERE kind = ? AND key = ?", (kind, key)).fetchone()
+            ids[(kind, key)] = row[0]
+        return ids
+
+    def enqueue(self, record: Dict[str, Any]) -> None:
+        """Queue ``record`` for the background writer."""
+        self._queue.put(record)
+        if self._writer is None:
+            with self._writer_lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name="audit-store", daemon=True)
+                    self._writer.start()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything queued so far is written (tests, shutdown)."""
+        done = threading.Event()
+        self.enqueue({"_flush": done})
+        return done.wait(timeout)
+
+    def _write_loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < _WRITE_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            records = [r for r in batch if "_flush" not in r]
+            try:
+                self.insert_many(records)
+            except Exception as exc:  # a full or locked disk only costs the history
+                print(f"[audit-store] dropped {len(records)} record(s): {exc}")
+            for marker in batch:
+                if "_flush" in marker:
+                    marker["_flush"].set()
+
+    # ---- reading ---------------------------------------------------------
+    def _target_id(self, kind: str, key: str) -> Optional[int]:
+        row = self._conn().execute(
+            "SELECT id FROM targets WHERE kind = ? AND key = ?", (kind, key)).fetchone()
+        return row[0] if row else None
+
+    def trend(self, kind: str, key: str, since: Optional[float] = None, limit: int = 500) -> List[Dict[str, Any]]:
+        """The target's most recent ``limit`` audits (since ``since``), oldest first."""
+        target_id = self._target_id(kind, key)
+        if target_id is None:
+            return []
+        rows = self._conn().execute(
+            "SELECT id, created_at, score, deterministic_score, metrics FROM audits "
+            "WHERE target_id = ? AND created_at >= ? ORDER BY created_at DESC, id DESC LIMIT ?",
+            (target_id, since or 0.0, limit)).fetchall()
+        return [{"id": audit_id, "created_at": created_at, "score": score,
+                 "deterministic_score": deterministic, "metrics": json.loads(metrics)}
+                for audit_id, created_at, score, deterministic, metrics in reversed(rows)]
+
+    def findings(self, audit_id: int) -> Dict[str, int]:
+        return dict(self._conn().execute(
+            "SELECT code, count FROM findings WHERE audit_id = ?", (audit_id,)).fetchall())
+
+    def evidence(self, audit_id: int) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT body FROM evidence WHERE audit_id = ?", (audit_id,)).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row else None
+
+    def diff(self, old_id: int, new_id: int) -> Dict[str, Any]:
+        """What changed between two audits: findings, score and metrics."""
+        conn = self._conn()
+        rows = dict((row[0], row[1:]) for row in conn.execute(
+            "SELECT id, created_at, score, metrics FROM audits WHERE id IN (?, ?)", (old_id, new_id)))
+        if old_id not in rows or new_id not in rows:
+            raise KeyError("Unknown audit id")
+        old, new = self.findings(old_id), self.findings(new_id)
+        old_metrics, new_metrics = json.loads(rows[old_id][2]), json.loads(rows[new_id][2])
+        return {
+            "from": {"id": old_id, "created_at": rows[old_id][0], "score": rows[old_id][1]},
+            "to": {"id": new_id, "created_at": rows[new_id][0], "score": rows[new_id][1]},
+            "score_change": (rows[new_id][1] - rows[old_id][1]
+                             if rows[new_id][1] is not None and rows[old_id][1] is not None else None),
+            "added": {code: n for code, n in sorted(new.items()) if code not in old},
+            "resolved": {code: n for code, n in sorted(old.items()) if code not in new},
+            "changed": {code: {"from": old[code], "to": n} for code, n in sorted(new.items())
+                        if code in old and old[code] != n},
+            "metrics_change": {name: new_metrics[name] - old_metrics[name] for name in sorted(new_metrics)
+                               if isinstance(old_metrics.get(name), (int, float))
+                               and isinstance(new_metrics[name], (int, float))
+                               and new_metrics[name] != old_metrics[name]},
+        }
+
+    def diff_latest(self, kind: str, key: str) -> Optional[Dict[str, Any]]:
+        """``diff`` of the target's last two audits (``None`` with fewer than two)."""
+        last = self.trend(kind, key, limit=2)
+        return self.diff(last[0]["id"], last[1]["id"]) if len(last) == 2 else None
+
+    def top_regressions(self, kind: str = "score", since: Optional[float] = None,
+                        limit: int = 10) -> List[Dict[str, Any]]:
+        """Targets audited since ``since`` whose latest score fell the most
+        against their previous audit (which may be older than ``since``)."""
+        rows = self._conn().execute(
+            """
+            SELECT t.key, t.label, cur.id, cur.created_at, cur.score, prev.id, prev.created_at, prev.score
+            FROM targets t
+            JOIN audits cur ON cur.id = (
+                SELECT id FROM audits WHERE target_id = t.id
+                ORDER BY created_at DESC, id DESC LIMIT 1)
+            JOIN audits prev ON prev.id = (
+                SELECT id FROM audits WHERE target_id = t.id AND id != cur.id
+                  AND (created_at < cur.created_at OR (created_at = cur.created_at AND id < cur.id))
+                ORDER BY created_at DESC, id DESC LIMIT 1)
+            WHERE t.kind = ? AND cur.created_at >= ? AND cur.score < prev.score
+            ORDER BY cur.score - prev.score, cur.created_at DESC
+            LIMIT ?
+            """,
+            (kind, since or 0.0, limit)).fetchall()
+        return [{"target": key, "label": label, "score_change": score - prev_score,
+                 "from": {"id": prev_id, "created_at": prev_at, "score": prev_score},
+                 "to": {"id": audit_id, "created_at": created_at, "score": score}}
+                for key, label, audit_id, created_at, score, prev_id, prev_at, prev_score in rows]
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM audits").fetchone()[0]
+
+
+# ---------------------------------------------------------------------------
+# Process-wide store
+# ---------------------------------------------------------------------------
+_store: Optional[AuditStore] = None
+_store_lock = threading.Lock()
+_store_failed = False
+
+
+def get_store() -> Optional[AuditStore]:
+    """The process-wide store, or ``None`` when disabled, without a path
+    or unusable."""
+    global _store, _store_failed
+    if _store is not None or not AUDIT_STORE_ENABLED or _store_failed:
+        return _store
+    if not AUDIT_STORE_PATH:
+        print("[audit-store] disabled: AUDIT_STORE_ENABLED is set but AUDIT_STORE_PATH is empty")
+        _store_failed = True
+        return None
+    with _store_lock:
+        if _store is None and not _store_failed:
+            try:
+                _store = AuditStore()
+            except (OSError, sqlite3.Error) as exc:
+                print(f"[audit-store] disabled: {exc}")
+                _store_failed = True
+    return _store
+
+
+def set_store(store: Optional[AuditStore]) -> None:
+    """Replace the process-wide store (tests, or a custom path)."""
+    global _store
+    with _store_lock:
+        _store = store
+
+
+def record(kind: str, key: str, result: Dict[str, Any], label: str = "") -> bool:
+    """Queue ``result`` for the history; ``False`` when the store is off."""
+    store = get_store()
+    if store is None:
+        return False
+    store.enqueue(normalize(kind, key, result, label=label))
+    return True
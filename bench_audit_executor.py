@@ -0,0 +1,137 @@
+"""
+bench_audit_executor.py
+=======================
+
+Mixed-load latency benchmark for ``audit_executor``.
+
+Simulates a worker serving a mix of requests from several client threads:
+
+* ``llm``   — a request that mostly waits on Azure OpenAI (a sleep standing
+  in for the network call) after a tiny inline text audit;
+* ``html``  — a large page through ``audit_html``;
+* ``code``  — a long snippet through ``audit_code``;
+* ``image`` — a multi-megapixel photo through ``audit_image``.
+
+Each mix is run twice — auditors inline on the request threads
+(``AUDIT_WORKERS=0`` behaviour) and on the process pool — and p50/p95/p99
+latency is printed per request kind. The evidence cache is disabled so every
+request does the real work. The interesting column is ``llm`` p99: inline,
+those requests queue behind the GIL held by the heavy audits.
+
+Usage::
+
+    python bench_audit_executor.py
+    python bench_audit_executor.py --requests 400 --clients 16 --workers 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import io
+import os
+import random
+import statistics
+import threading
+import time
+from typing import Dict, List
+
+import audit_executor
+import evidence_cache
+
+KINDS = ("llm", "html", "code", "image")
+MIX = ("llm",) * 6 + ("html",) * 2 + ("code",) + ("image",)
+
+
+def _inputs(megapixels: float) -> Dict[str, tuple]:
+    from PIL import Image
+
+    html = ("<!DOCTYPE html><html lang='en'><head><title>Bench</title></head><body><main>"
+            + "".join(f"<section><h2>Section {i}</h2><p>Text <a href='/p{i}'>read more</a></p>"
+                      f"<img src='i{i}.png'><button></button><input type='text'></section>"
+                      for i in range(4000))
+            + "</main></body></html>")
+    code = "\n".join(f'<div onclick="go({i})"><img src="x{i}.png"><a href="#">click here</a></div>'
+                     for i in range(100))
+    side = int((megapixels * 1_000_000) ** 0.5)
+    image = Image.effect_noise((side * 4 // 3, side * 3 // 4), 64).convert("RGB")
+    buf = io.BytesIO()
+    image.save(buf, format="JPEG", quality=85)
+    return {
+        "llm": ("audit_text", ("Short status update. " * 5,)),
+        "html": ("audit_html", (html, "https://example.com/")),
+        "code": ("audit_code", (code,)),
+        "image": ("audit_image", (base64.b64encode(buf.getvalue()).decode(),)),
+    }
+
+
+def _run_mix(executor: audit_executor.AuditExecutor, inputs, requests: int,
+             clients: int, llm_wait: float) -> Dict[str, List[float]]:
+    plan = [MIX[i % len(MIX)] for i in range(requests)]
+    random.Random(1).shuffle(plan)
+    lock = threading.Lock()
+    latencies: Dict[str, List[float]] = {kind: [] for kind in KINDS}
+
+    def client() -> None:
+        while True:
+            with lock:
+                if not plan:
+                    return
+                kind = plan.pop()
+            name, args = inputs[kind]
+            started = time.perf_counter()
+            if kind == "llm":
+                # Like /api/simplify-content: a cheap inline audit, then the model call.
+                audit_executor._auditor(name).__wrapped__(*args)
+                time.sleep(llm_wait)
+            else:
+                executor.run(name, *args)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies[kind].append(elapsed)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies
+
+
+def _pct(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))] * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=max(2, min(4, os.cpu_count() or 1)))
+    parser.add_argument("--megapixels", type=float, default=12.0)
+    parser.add_argument("--llm-wait", type=float, default=0.05,
+                        help="seconds an llm request spends waiting on the network")
+    args = parser.parse_args()
+
+    evidence_cache.EVIDENCE_CACHE_ENABLED = False
+    inputs = _inputs(args.megapixels)
+    print(f"{args.requests} requests, {args.clients} clients, CPUs={os.cpu_count()}, "
+          f"mix={{llm:6, html:2, code:1, image:1}}")
+    print(f"{'mode':<16}{'kind':<7}{'n':>5}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'wall s':>8}")
+    for label, workers in (("inline", 0), (f"pool({args.workers})", args.workers)):
+        executor = audit_executor.AuditExecutor(workers=workers, timeout=120)
+        executor.prewarm()
+        started = time.perf_counter()
+        latencies = _run_mix(executor, inputs, args.requests, args.clients, args.llm_wait)
+        wall = time.perf_counter() - started
+        executor.shutdown()
+        for kind in KINDS:
+            values = latencies[kind]
+            print(f"{label:<16}{kind:<7}{len(values):>5}{_pct(values, .5):>9.1f}"
+                  f"{_pct(values, .95):>9.1f}{_pct(values, .99):>9.1f}{wall:>8.1f}")
+        mean = statistics.mean(v for vs in latencies.values() for v in vs) * 1000
+        print(f"{label:<16}{'all':<7}{args.requests:>5}{'mean':>9}{mean:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
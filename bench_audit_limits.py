@@ -0,0 +1,160 @@
+"""
+bench_audit_limits.py
+=====================
+
+Worst-case inputs for every auditor, run at the configured input caps and
+time budgets (``audit_limits``): each case must finish within its
+auditor's budget plus ``SLACK_SECONDS``, and the table shows which ones
+were cut short (``truncated``) and why.
+
+The corpus holds inputs that used to be superlinear somewhere: links and
+buttons that are never closed (each one's text ran to the end of the
+file), a tag or attribute value that never ends, deep nesting for the
+tree builders, minified and unbalanced CSS, a long brace-free run after a
+``{`` for the language sniff (``hint_lang="auto"``), and prose without
+sentence breaks. Every case is padded to the auditor's cap (or ``--max-chars``).
+
+Usage::
+
+    python bench_audit_limits.py                      # configured caps/budgets
+    python bench_audit_limits.py --max-chars 262144 --budget 1
+    python bench_audit_limits.py --only audit_code
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+import audit_limits
+import code_audit
+import code_diff
+import memory_budget
+import text_audit
+import web_audit
+
+# One unit of work past the deadline (an element, a 64 KB slice, a region)
+# plus timer noise on a loaded machine.
+SLACK_SECONDS = 1.0
+
+
+def _repeat(unit: str, size: int) -> str:
+    return unit * max(1, size // len(unit))
+
+
+def _new_file_diff(code: str, path: str = "page.html") -> str:
+    lines = code.rstrip("\n").split("\n")
+    return (f"--- /dev/null\n+++ b/{path}\n"
+            f"@@ -0,0 +1,{len(lines)} @@\n" + "\n".join("+" + line for line in lines) + "\n")
+
+
+def _wrapped_lines(unit: str, size: int, per_line: int = 16) -> str:
+    """``unit`` in lines of ``per_line``, sized so the diff (a ``+`` per
+    line and the headers) stays within ``size``."""
+    line = unit * per_line + "\n"
+    return _repeat(line, (size - 64) * len(line) // (len(line) + 3))
+
+
+# ---------------------------------------------------------------------------
+# Corpus: auditor → case → builder(size)
+# ---------------------------------------------------------------------------
+_MARKUP: Dict[str, Callable[[int], str]] = {
+    "unclosed-links": lambda n: _repeat("<a>x", n - 4) + "</a>",
+    "unclosed-buttons": lambda n: _repeat("<button>x<", n - 9) + "</button>",
+    "link-text-braces": lambda n: _repeat("<a>{", n - 4) + "</a>",
+    "open-tag": lambda n: _repeat("<a ", n),
+    "label-for-quotes": lambda n: _repeat('<label for="', n),
+    "unterminated-attr": lambda n: '<div title="' + _repeat("x", n - 12),
+    "deep-nesting": lambda n: _repeat("<div>", n),
+    "css-unbalanced": lambda n: _repeat("a{outline:none x", n),
+    "css-minified": lambda n: _repeat("a:focus{outline:none}.m{color:#777;background:#888}", n),
+    "css-sniff": lambda n: "{" + _repeat(":", n - 1),
+}
+
+CORPUS: Dict[str, Dict[str, Callable[[int], str]]] = {
+    "audit_code": _MARKUP,
+    "audit_diff": {
+        "unclosed-links": lambda n: _new_file_diff(_wrapped_lines("<a>x", n)),
+        "open-tag": lambda n: _new_file_diff(_wrapped_lines("<a ", n)),
+        "deep-nesting": lambda n: _new_file_diff(_wrapped_lines("<div>", n)),
+        # No extension to go by: the language is sniffed from the hunks.
+        "css-sniff": lambda n: _new_file_diff("{\n" + _wrapped_lines(":", n - 2), "snippet.txt"),
+    },
+    "audit_text": {
+        "one-sentence": lambda n: _repeat("word ", n),
+        "no-spaces": lambda n: _repeat("x", n),
+        "acronyms": lambda n: _repeat("WCAG ARIA ", n),
+        "passive": lambda n: _repeat("was written by them ", n),
+        "jargon": lambda n: _repeat("leverage synergy utilize ", n),
+    },
+    "audit_html": {
+        "deep-nesting": lambda n: _repeat("<div>", n),
+        "unclosed-links": lambda n: _repeat('<a href="/x">', n),
+        "nested-tables": lambda n: _repeat("<table><tr><td>", n),
+        "open-tag": lambda n: "<div " + _repeat("a=1 ", n - 5),
+        "open-comment": lambda n: "<!--" + _repeat("x", n - 4),
+        "inline-styles": lambda n: _repeat('<p style="color:#777;background:#888">x</p>', n),
+    },
+}
+
+_RUNNERS: Dict[str, Callable[[str], Dict]] = {
+    "audit_code": lambda s: code_audit.audit_code.__wrapped__(s, "auto"),
+    "audit_diff": lambda s: code_diff.audit_diff.__wrapped__(s, hint_lang="auto"),
+    "audit_text": lambda s: text_audit.audit_text.__wrapped__(s),
+    "audit_html": lambda s: web_audit.audit_html.__wrapped__(s, "https://example.com/"),
+}
+
+
+def _set_limits(auditor: str, max_chars: int, budget: float) -> None:
+    prefix = f"AUDIT_{auditor.split('_', 1)[1].upper()}"
+    setattr(audit_limits, f"{prefix}_MAX_CHARS", max_chars)
+    setattr(audit_limits, f"{prefix}_BUDGET_SECONDS", budget)
+
+
+def run(auditor: str, case: str, size: int) -> Tuple[float, Dict]:
+    """``(seconds, evidence)``; a page stopped by the memory ceiling comes
+    back as ``{"memory_limit": message}``."""
+    text = CORPUS[auditor][case](size)
+    started = time.perf_counter()
+    try:
+        evidence = _RUNNERS[auditor](text)
+    except memory_budget.MemoryLimitExceeded as exc:
+        evidence = {"memory_limit": str(exc)}
+    return time.perf_counter() - started, evidence
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--max-chars", type=int, default=0,
+                        help="input cap for every auditor (default: configured)")
+    parser.add_argument("--budget", type=float, default=0,
+                        help="time budget in seconds for every auditor (default: configured)")
+    parser.add_argument("--only", choices=sorted(CORPUS), action="append")
+    parser.add_argument("--slack", type=float, default=SLACK_SECONDS)
+    args = parser.parse_args()
+
+    print(f"{'auditor':<12}{'case':<20}{'KB':>7}{'budget s':>10}{'elapsed s':>11}  truncated")
+    failed: List[str] = []
+    for auditor in args.only or CORPUS:
+        max_chars, budget = audit_limits.limits_for(auditor)
+        max_chars, budget = args.max_chars or max_chars, args.budget or budget
+        _set_limits(auditor, max_chars, budget)
+        for case in CORPUS[auditor]:
+            elapsed, evidence = run(auditor, case, max_chars)
+            reasons = ",".join((evidence.get("truncation") or {}).get("reasons", [])) or "-"
+            if "memory_limit" in evidence:
+                reasons = "memory_limit"
+            over = budget > 0 and elapsed > budget + args.slack
+            if over:
+                failed.append(f"{auditor}/{case}")
+            print(f"{auditor:<12}{case:<20}{max_chars / 1024:>7.0f}{budget:>10.1f}"
+                  f"{elapsed:>11.2f}  {reasons}{'  OVER BUDGET' if over else ''}")
+    if failed:
+        print(f"over budget: {', '.join(failed)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,336 @@
+"""
+bench_code_audit.py
+===================
+
+Benchmark for the markup lint in ``code_audit``: times the single-pass
+tokenizer (``lint_markup``, every markup rule through ``code_audit``'s rule
+runner) against the original implementation (kept below as
+``legacy_lint_markup``) on synthetic templates of growing size, and checks
+that both report identical findings.
+
+The original counted newlines from offset 0 for every tag, searched for the
+closing tag of every ``<a>``/``<button>`` and searched the whole document
+for a ``<label for>`` per ``<input id>``, so its time grows with the square
+of the template; the tokenizer's ``per-kline`` column stays flat.
+
+Usage::
+
+    python bench_code_audit.py              # 1k … 16k lines, 3 rounds
+    python bench_code_audit.py --max-lines 64000 --rounds 1
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+import code_audit
+from code_audit import _GENERIC_LINK_TEXTS, _TAG_RE, _has_accessible_name, _make_finding, _parse_attrs, _snippet_of
+
+def _legacy_inner_text_after(code: str, end_pos: int, tag: str) -> str:
+    """Best-effort extraction of inner text up to closing </tag>."""
+    closer = re.compile(r'<\s*/\s*' + re.escape(tag) + r'\s*>', re.IGNORECASE)
+    m = closer.search(code, end_pos)
+    if not m:
+        return ""
+    inner = code[end_pos:m.start()]
+    # Strip nested tags + JSX expressions.
+    inner = re.sub(r'<[^>]+>', ' ', inner)
+    inner = re.sub(r'\{[^{}]*\}', ' ', inner)
+    return inner.strip()
+
+
+def lint_markup(code: str, lines: List[str]) -> List[code_audit.Finding]:
+    """Every markup rule over ``code`` with the current rule runner."""
+    markup_rules = tuple(sorted(r.rule_id for r in code_audit.RULES.values() if r.text is None))
+    return code_audit._run_rules(code_audit._plan_for("html", markup_rules), code, lines)
+
+
+def legacy_lint_markup(code: str, lines: List[str]) -> List[code_audit.Finding]:
+    """The original markup lint: a line count from offset 0, a closing-tag
+    search per ``<a>``/``<button>`` and a whole-document ``<label for>`` search
+    per ``<input id>``. Kept as the reference the tokenizer must match."""
+    findings: List[code_audit.Finding] = []
+    has_html_tag = False
+    has_lang = False
+    has_title = False
+    has_viewport = False
+    has_h1 = False
+    last_heading_level: Optional[int] = None
+    ids_seen: Counter = Counter()
+    id_first_line: Dict[str, int] = {}
+
+    for m in _TAG_RE.finditer(code):
+        tag = m.group("tag").lower()
+        attrs = _parse_attrs(m.group("attrs") or "")
+        line = code.count("\n", 0, m.start()) + 1
+        snip = _snippet_of(lines, line)
+
+        # Track ids for duplicate detection.
+        elem_id = attrs.get("id", "").strip()
+        if elem_id:
+            ids_seen[elem_id] += 1
+            id_first_line.setdefault(elem_id, line)
+
+        # aria-hidden on inherently focusable elements.
+        if attrs.get("aria-hidden", "").lower() == "true" and tag in {
+            "a", "button", "input", "select", "textarea", "iframe",
+        }:
+            findings.append(_make_finding(
+                "aria-hidden-on-focusable", line,
+                f"<{tag}> has aria-hidden=\"true\" but is focusable.", snip,
+            ))
+
+        # Positive tabindex.
+        if "tabindex" in attrs:
+            try:
+                if int(attrs["tabindex"]) > 0:
+                    findings.append(_make_finding(
+                        "positive-tabindex", line,
+                        f"tabindex={attrs['tabindex']} forces a non-natural focus order.",
+                        snip,
+                    ))
+            except ValueError:
+                pass
+
+        if tag == "html":
+            has_html_tag = True
+            if attrs.get("lang", "").strip():
+                has_lang = True
+            else:
+                findings.append(_make_finding(
+                    "missing-lang", line,
+                    "<html> element has no lang attribute.", snip,
+                ))
+
+        elif tag == "title":
+            has_title = True
+
+        elif tag == "meta":
+            name = attrs.get("name", "").lower()
+            if name == "viewport":
+                has_viewport = True
+                content = attrs.get("content", "").lower()
+                if "user-scalable=no" in content or re.search(r'maximum-scale\s*=\s*1(?!\.)', content):
+                    findings.append(_make_finding(
+                        "viewport-blocks-zoom", line,
+                        "Viewport meta blocks user zoom.", snip,
+                    ))
+
+        elif tag == "img":
+            # JSX/Vue dynamic alt: alt={...} or :alt="..." should not flag.
+            attr_blob = m.group("attrs") or ""
+            has_dynamic_alt = bool(
+                re.search(r'\balt\s*=\s*\{', attr_blob) or
+                re.search(r'\b:alt\s*=', attr_blob) or
+                re.search(r'\bv-bind:alt\s*=', attr_blob)
+            )
+            if "alt" not in attrs and not has_dynamic_alt:
+                # Decorative role exception.
+                if attrs.get("role", "").lower() != "presentation" and \
+                   attrs.get("aria-hidden", "").lower() != "true":
+                    findings.append(_make_finding(
+                        "img-missing-alt", line,
+                        "<img> is missing an alt attribute.", snip,
+                    ))
+            elif "alt" in attrs:
+                alt_val = attrs["alt"].strip().lower()
+                if re.match(r'^(image|photo|picture|graphic|icon)\s+of\b', alt_val):
+                    findings.append(_make_finding(
+                        "img-redundant-alt", line,
+                        f"alt=\"{attrs['alt']}\" starts with a redundant phrase.",
+                        snip,
+                    ))
+
+        elif tag == "input":
+            input_type = attrs.get("type", "text").lower()
+            if input_type in {"hidden", "submit", "button", "reset", "image"}:
+                pass  # no label needed
+            else:
+                has_label_attr = bool(
+                    attrs.get("aria-label", "").strip() or
+                    attrs.get("aria-labelledby", "").strip() or
+                    attrs.get("title", "").strip()
+                )
+                # Look for an associated <label for="id">.
+                input_id = attrs.get("id", "").strip()
+                has_for_label = False
+                if input_id:
+                    has_for_label = bool(re.search(
+                        r'<\s*label\b[^>]*\bfor\s*=\s*["\']' + re.escape(input_id) + r'["\']',
+                        code, re.IGNORECASE,
+                    ))
+                if not (has_label_attr or has_for_label):
+                    findings.append(_make_finding(
+                        "input-missing-label", line,
+                        f"<input type=\"{input_type}\"> has no associated <label> or aria-label.",
+                        snip,
+                    ))
+
+        elif tag == "button":
+            inner = _legacy_inner_text_after(code, m.end(), "button")
+            if not _has_accessible_name(attrs, inner):
+                findings.append(_make_finding(
+                    "button-empty-name", line,
+                    "<button> has no accessible name.", snip,
+                ))
+
+        elif tag == "a":
+            inner = _legacy_inner_text_after(code, m.end(), "a")
+            if not _has_accessible_name(attrs, inner):
+                findings.append(_make_finding(
+                    "link-empty-name", line,
+                    "<a> has no accessible name.", snip,
+                ))
+            else:
+                text_for_check = (inner or attrs.get("aria-label", "") or attrs.get("title", "")).strip().lower()
+                # Strip surrounding punctuation.
+                text_for_check = re.sub(r'[^\w\s]', '', text_for_check).strip()
+                if text_for_check in _GENERIC_LINK_TEXTS:
+                    findings.append(_make_finding(
+                        "link-generic-text", line,
+                        f"Link text \"{text_for_check}\" is too generic.", snip,
+                    ))
+
+        elif tag == "iframe":
+            if not (attrs.get("title", "").strip() or attrs.get("aria-label", "").strip()):
+                findings.append(_make_finding(
+                    "iframe-missing-title", line,
+                    "<iframe> is missing a title attribute.", snip,
+                ))
+
+        elif tag in {"h1", "h2", "h3", "h4", "h5", "h6"}:
+            level = int(tag[1])
+            if level == 1:
+                has_h1 = True
+            if last_heading_level is not None and level > last_heading_level + 1:
+                findings.append(_make_finding(
+                    "heading-skipped-level", line,
+                    f"Heading jumps from h{last_heading_level} to h{level}.",
+                    snip,
+                ))
+            last_heading_level = level
+
+        elif tag in {"div", "span"}:
+            attr_blob = m.group("attrs") or ""
+            if re.search(r'\bonclick\s*=', attr_blob, re.IGNORECASE):
+                # Acceptable when role and tabindex make it focusable.
+                role = attrs.get("role", "").lower()
+                if role not in {"button", "link", "menuitem", "tab", "switch", "checkbox"} \
+                   or "tabindex" not in attrs:
+                    findings.append(_make_finding(
+                        "click-on-non-interactive", line,
+                        f"<{tag}> has an onClick handler but is not a true interactive element.",
+                        snip,
+                    ))
+
+    # ---- Document-level checks (only when this looks like a full HTML doc).
+    looks_like_doc = has_html_tag or "<!doctype" in code.lower() or "<head" in code.lower()
+    if looks_like_doc:
+        if not has_lang and not has_html_tag:
+            findings.append(_make_finding(
+                "missing-lang", 1,
+                "Document does not declare a lang attribute on <html>.",
+                _snippet_of(lines, 1),
+            ))
+        if not has_title:
+            findings.append(_make_finding(
+                "missing-title", 1,
+                "Document is missing a <title> element.",
+                _snippet_of(lines, 1),
+            ))
+        if not has_viewport:
+            findings.append(_make_finding(
+                "missing-viewport", 1,
+                "Document is missing a responsive viewport meta tag.",
+                _snippet_of(lines, 1),
+            ))
+        if not has_h1:
+            findings.append(_make_finding(
+                "no-h1", 1,
+                "Document defines no <h1> heading.",
+                _snippet_of(lines, 1),
+            ))
+
+    for elem_id, count in ids_seen.items():
+        if count > 1:
+            line = id_first_line.get(elem_id, 1)
+            findings.append(_make_finding(
+                "duplicate-id", line,
+                f"Duplicate id=\"{elem_id}\" appears {count} times.",
+                _snippet_of(lines, line),
+            ))
+
+    return findings
+
+
+# ---------------------------------------------------------------------------
+# Synthetic templates
+# ---------------------------------------------------------------------------
+_BLOCK = """<section class="card" id="card-{i}">
+  <h2>Item {i}</h2>
+  <img src="/img/{i}.png">
+  <a href="/items/{i}">click here</a>
+  <a href="/items/{i}/more"><span class="icon"></span></a>
+  <button type="button" onclick="buy({i})">Buy</button>
+  <button class="close"><svg></svg></button>
+  <label for="qty-{i}">Quantity</label>
+  <input id="qty-{i}" type="number">
+  <input id="note-{i}" type="text" placeholder="Note">
+  <div onclick="toggle({i})" tabindex="2">{{details}}</div>
+</section>
+"""
+
+
+def template(lines: int) -> str:
+    """A flawed component template of roughly ``lines`` lines."""
+    head = ('<!DOCTYPE html>\n<html>\n<head><meta name="viewport" content="width=device-width, '
+            'maximum-scale=1"></head>\n<body>\n')
+    per_block = _BLOCK.count("\n")
+    blocks = [_BLOCK.format(i=i) for i in range(max(1, lines // per_block))]
+    return head + "".join(blocks) + "</body>\n</html>\n"
+
+
+def identical(code: str, lines: List[str]) -> bool:
+    """Whether both implementations serialize to the same findings."""
+    return (json.dumps(legacy_lint_markup(code, lines), default=code_audit.json_default)
+            == json.dumps(lint_markup(code, lines), default=code_audit.json_default))
+
+
+def _best_of(lint, code: str, rounds: int) -> float:
+    lines = code.splitlines()
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        lint(code, lines)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--max-lines", type=int, default=16000)
+    args = parser.parse_args()
+
+    print(f"{'lines':>7}{'legacy ms':>11}{'per-kline':>11}{'single ms':>11}{'per-kline':>11}"
+          f"{'speedup':>9}  identical")
+    size = 1000
+    while size <= args.max_lines:
+        code = template(size)
+        lines = code.splitlines()
+        same = identical(code, lines)
+        legacy = _best_of(legacy_lint_markup, code, args.rounds)
+        single = _best_of(lint_markup, code, args.rounds)
+        klines = len(lines) / 1000
+        print(f"{len(lines):>7}{legacy * 1000:>11.1f}{legacy * 1000 / klines:>11.2f}"
+              f"{single * 1000:>11.1f}{single * 1000 / klines:>11.2f}{legacy / single:>8.1f}x  {same}")
+        size *= 2
+
+
+if __name__ == "__main__":
+    main()
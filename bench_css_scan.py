@@ -0,0 +1,183 @@
+"""
+bench_css_scan.py
+=================
+
+Benchmark and fuzz reference for the CSS rules in ``code_audit``
+(``outline-none``, ``color-contrast-suspect``): times the ``css_scan``
+implementation against the original regex scans (kept below as
+``legacy_outline_none`` / ``legacy_color_contrast``) on pathological
+stylesheets of growing size, and checks that both report identical
+findings.
+
+The original ``outline`` pattern retried its ``[^{}]+`` selector from every
+position of a brace-free run, so one long run costs its length squared;
+the scanner's ``ms/KB`` column stays flat, and the run fails when any case
+exceeds ``--max-ms-per-kb``.
+
+Usage::
+
+    python bench_css_scan.py                  # 16 … 256 KB, 3 rounds
+    python bench_css_scan.py --max-kb 1024 --rounds 1 --legacy-max-kb 64
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+import code_audit
+import contrast
+
+# Generous for slow CI machines: the scanner needs well under 1 ms per KB.
+MAX_MS_PER_KB = 2.0
+
+# ---------------------------------------------------------------------------
+# The original regex rules
+# ---------------------------------------------------------------------------
+_LEGACY_OUTLINE_NONE_RE = re.compile(
+    r'(?P<sel>[^{}]+)\{[^{}]*outline\s*:\s*(?:none|0(?:px)?)\s*[;}]',
+    re.IGNORECASE,
+)
+_LEGACY_RULE_BODY_RE = re.compile(r'\{(?P<body>[^{}]+)\}')
+
+
+def legacy_outline_none(code: str, newlines: List[int]) -> List[Tuple[int, str]]:
+    out = []
+    if not code_audit._OUTLINE_WORD_RE.search(code):
+        return out
+    for m in _LEGACY_OUTLINE_NONE_RE.finditer(code):
+        block = m.group(0).lower()
+        if code_audit._VISIBLE_FOCUS_RE.search(block):
+            continue
+        sel = m.group("sel").lower()
+        if ":focus" in sel or sel.strip() in {"*", "a", "button", "input", "textarea", "select"}:
+            out.append((code_audit._line_at(newlines, m.start()),
+                        "Removes focus outline without providing a visible alternative."))
+    return out
+
+
+def legacy_color_contrast(code: str, newlines: List[int]) -> List[Tuple[int, str]]:
+    declared = []
+    for rb in _LEGACY_RULE_BODY_RE.finditer(code):
+        pair = contrast.declared_pair(rb.group("body"))
+        if pair is not None and pair[0] and pair[1]:
+            declared.append((rb.start(), pair[0].lower(), pair[1].lower(), pair[2]))
+    ratios = contrast.contrast_ratios([(c, b) for _, c, b, _ in declared])
+    out = []
+    for (start, c, b, large), ratio in zip(declared, ratios):
+        needed = contrast.AA_LARGE if large else contrast.AA_NORMAL
+        if ratio is not None and ratio < needed:
+            message = (f"color {c} on background {b} has a contrast ratio of "
+                       f"{ratio:.2f}:1 (WCAG AA needs {needed:g}:1).")
+        elif ratio is None and c == b:
+            message = f"color and background-color set to the same value ({c})."
+        else:
+            continue
+        out.append((code_audit._line_at(newlines, start), message))
+    return out
+
+
+def legacy_css(code: str) -> List[Tuple[str, int, str]]:
+    newlines = code_audit._newline_offsets(code)
+    return ([("outline-none", line, msg) for line, msg in legacy_outline_none(code, newlines)]
+            + [("color-contrast-suspect", line, msg) for line, msg in legacy_color_contrast(code, newlines)])
+
+
+def scanner_css(code: str) -> List[Tuple[str, int, str]]:
+    newlines = code_audit._newline_offsets(code)
+    blocks = code_audit._css_blocks(code)
+    outline = code_audit.RULES["outline-none"].text
+    contrast_rule = code_audit.RULES["color-contrast-suspect"].text
+    return ([("outline-none", line, msg) for line, msg in outline(code, newlines, blocks)]
+            + [("color-contrast-suspect", line, msg)
+               for line, msg in contrast_rule(code, newlines, blocks)])
+
+
+# ---------------------------------------------------------------------------
+# Pathological stylesheets
+# ---------------------------------------------------------------------------
+def _repeat(unit: str, size: int) -> str:
+    return unit * max(1, size // len(unit))
+
+
+def minified(size: int) -> str:
+    """One line of small rules, half of them findings."""
+    return _repeat("a:focus{outline:none}.m{color:#777;background:#888}b{border:0}", size)
+
+
+def nested(size: int) -> str:
+    """``@media`` blocks nested thousands deep around a few rules."""
+    depth = size // len("@media screen{}")
+    return ("@media screen{" * depth + "a:focus{outline:0}.x{color:#aaa;background:#fff}"
+            + "}" * depth)
+
+
+def brace_free(size: int) -> str:
+    """A run with "outline" in it but no braces: the selector is retried
+    from every position."""
+    return "outline " + _repeat("x ", size)
+
+
+def long_selector(size: int) -> str:
+    """A long selector before one body that almost matches."""
+    return _repeat("a ", size // 2) + "{" + _repeat("outline : ", size // 2) + "}"
+
+
+def unbalanced(size: int) -> str:
+    """Open braces that never close, each with an unterminated outline."""
+    return _repeat("a{outline:none x", size)
+
+
+CASES: Dict[str, Callable[[int], str]] = {
+    "minified": minified,
+    "nested": nested,
+    "brace-free": brace_free,
+    "long-selector": long_selector,
+    "unbalanced": unbalanced,
+}
+
+
+def _best_of(lint: Callable[[str], object], code: str, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        lint(code)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--max-kb", type=int, default=256)
+    parser.add_argument("--legacy-max-kb", type=int, default=32,
+                        help="skip the regex reference above this size (it is quadratic)")
+    parser.add_argument("--max-ms-per-kb", type=float, default=MAX_MS_PER_KB)
+    args = parser.parse_args()
+
+    print(f"{'case':<14}{'KB':>6}{'legacy ms':>11}{'scan ms':>10}{'ms/KB':>8}  identical")
+    slow = False
+    for name, build in CASES.items():
+        kb = 16
+        while kb <= args.max_kb:
+            code = build(kb * 1024)
+            size_kb = len(code) / 1024
+            scan = _best_of(scanner_css, code, args.rounds)
+            per_kb = scan * 1000 / size_kb
+            if kb <= args.legacy_max_kb:
+                legacy = f"{_best_of(legacy_css, code, 1) * 1000:>11.1f}"
+                same = str(legacy_css(code) == scanner_css(code))
+            else:
+                legacy, same = f"{'-':>11}", "-"
+            flag = "  SLOW" if per_kb > args.max_ms_per_kb else ""
+            slow = slow or bool(flag)
+            print(f"{name:<14}{size_kb:>6.0f}{legacy}{scan * 1000:>10.1f}{per_kb:>8.3f}  {same}{flag}")
+            kb *= 4
+    return 1 if slow else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,591 @@
+"""
+bench_web_audit.py
+==================
+
+Benchmark for ``web_audit.audit_html``: times the single-pass DOM walk
+against a multi-pass implementation (kept below as ``legacy_audit_html``)
+on the repo's own pages plus synthetic pages sized up to
+``web_audit.MAX_RESPONSE_BYTES``, and checks that both produce
+byte-for-byte identical evidence.
+
+``legacy_audit_html`` started as the original multi-pass ``audit_html`` but
+has since taken on the accessible-name rules and the contrast check, so it
+is a current multi-pass reference, not the baseline. Equivalence with the
+pre-rewrite output is pinned separately in ``test_web_audit_baseline.json``
+(``test_web_audit.BaselineTests``).
+
+Usage::
+
+    python bench_web_audit.py            # default corpus, 3 rounds
+    python bench_web_audit.py --rounds 5
+    python bench_web_audit.py --backends # end-to-end time per parser backend
+    python bench_web_audit.py --memory   # tree vs low-memory: time, peak allocation
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import os
+import re
+import time
+import tracemalloc
+from typing import Any, Dict, List, Tuple
+from urllib.parse import urljoin, urlparse
+
+from bs4 import BeautifulSoup, CData, Comment, NavigableString, Tag
+
+import contrast
+import html_parsers
+import web_audit
+from web_audit import GENERIC_LINK_TEXTS, WCAG_REFERENCES, _selector_for, _short
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def legacy_audit_html(html: str, base_url: str) -> Dict[str, Any]:
+    """A multi-pass ``audit_html`` (one ``find_all`` per signal).
+
+    The original implementation, kept in step with the features added since
+    (accessible names, contrast): the benchmark times it against the
+    single-pass walk and the tests assert identical output. Its
+    accessible-name checks apply the same W3C rules as ``web_audit._Names``,
+    but top-down — recursing into each element's subtree per check. For the
+    unchanged pre-rewrite output see ``test_web_audit_baseline.json``.
+    """
+    return legacy_audit_soup(BeautifulSoup(html or "", "html.parser"), base_url)
+
+
+def _legacy_named_content(tag) -> bool:
+    for child in tag.children:
+        if isinstance(child, Tag):
+            if (child.get("aria-hidden") or "").strip().lower() == "true":
+                continue
+            if (child.get("aria-label") or "").strip():
+                return True
+            if child.name == "img" and (child.get("alt") or "").strip():
+                return True
+            if _legacy_named_content(child):
+                return True
+        elif type(child) in (NavigableString, CData) and child.strip():
+            return True
+    return False
+
+
+def _legacy_own_name(tag) -> bool:
+    return bool((tag.get("aria-label") or "").strip()
+                or (tag.name == "img" and (tag.get("alt") or "").strip())
+                or _legacy_named_content(tag)
+                or (tag.get("title") or "").strip())
+
+
+def _legacy_labelledby(tag, soup) -> bool:
+    for ref in (tag.get("aria-labelledby") or "").split():
+        target = soup.find(id=ref)
+        if target is not None and _legacy_own_name(target):
+            return True
+    return False
+
+
+def legacy_audit_soup(soup, base_url: str = "") -> Dict[str, Any]:
+
+    # ---- <style> blocks (read before they are stripped) -----------------
+    style_css: List[str] = []
+    style_chars = 0
+    for style in soup.find_all("style"):
+        if style.find_parent(["script", "noscript", "template"]):
+            continue
+        css = style.get_text()[:web_audit._MAX_STYLE_CHARS - style_chars]
+        style_chars += len(css)
+        if css:
+            style_css.append(css)
+
+    # Strip script/style/comments so text-content checks aren't polluted
+    for s in soup(["script", "style", "noscript"]):
+        s.extract()
+    for c in soup.find_all(string=lambda t: isinstance(t, Comment)):
+        c.extract()
+
+    # ---- Page names the <style> rules are matched against ----------------
+    names: Dict[str, set] = {"tags": set(), "classes": set(), "ids": set(), "attributes": set()}
+    for tag in soup.find_all(True):
+        if tag.name == "template" or tag.find_parent("template"):
+            continue  # never rendered
+        names["tags"].add(tag.name)
+        names["attributes"].update(tag.attrs)
+        names["classes"].update(tag.get("class") or ())
+        if tag.get("id"):
+            names["ids"].add(tag["id"])
+    page_selectors = contrast.inventory(**names)
+    style_contrast = contrast.ContrastTally()
+    for css in style_css:
+        style_contrast.add_css(css, "style", contrast.selector_matcher(page_selectors))
+
+    html_tag = soup.find("html")
+    head = soup.find("head")
+    body = soup.find("body") or soup
+
+    # ---- Meta -----------------------------------------------------------
+    title = (soup.title.string.strip() if soup.title and soup.title.string else "")
+    lang = html_tag.get("lang", "").strip() if html_tag else ""
+    viewport_meta = ""
+    if head:
+        vp = head.find("meta", attrs={"name": "viewport"})
+        if vp:
+            viewport_meta = vp.get("content", "")
+    charset = ""
+    if head:
+        meta_charset = head.find("meta", attrs={"charset": True})
+        if meta_charset:
+            charset = meta_charset.get("charset", "")
+        else:
+            ct = head.find("meta", attrs={"http-equiv": re.compile("content-type", re.I)})
+            if ct and ct.get("content"):
+                m = re.search(r"charset=([\w-]+)", ct["content"], re.I)
+                if m:
+                    charset = m.group(1)
+
+    # ---- Images ---------------------------------------------------------
+    images = body.find_all("img")
+    imgs_total = len(images)
+    imgs_missing_alt: List[Dict[str, str]] = []
+    imgs_empty_alt = 0  # decorative — alt="" present, this is OK
+    imgs_redundant_alt = 0  # alt that just says "image of …" / filename
+    alt_samples: List[str] = []
+    for img in images:
+        alt = img.get("alt")
+        src = img.get("src", "") or img.get("data-src", "")
+        if alt is None:
+            imgs_missing_alt.append({
+                "selector": _selector_for(img),
+                "src": _short(src, 100),
+            })
+        elif alt.strip() == "":
+            imgs_empty_alt += 1
+        else:
+            alt_low = alt.lower().strip()
+            if (alt_low.startswith(("image of", "picture of", "photo of", "graphic of"))
+                    or alt_low.endswith((".jpg", ".png", ".jpeg", ".gif", ".webp", ".svg"))):
+                imgs_redundant_alt += 1
+            if len(alt_samples) < 5:
+                alt_samples.append(_short(alt, 60))
+
+    # ---- Headings -------------------------------------------------------
+    headings: List[Tuple[int, str]] = []
+    for h in body.find_all(re.compile(r"^h[1-6]$")):
+        level = int(h.name[1])
+        headings.append((level, _short(h.get_text(" ", strip=True), 80)))
+    h1_count = sum(1 for lvl, _ in headings if lvl == 1)
+    skipped_levels: List[str] = []
+    if headings:
+        prev = 0
+        for lvl, text in headings:
+            if prev and lvl > prev + 1:
+                skipped_levels.append(f"jumped from h{prev} → h{lvl} at \"{text}\"")
+            prev = lvl
+
+    # ---- Landmarks ------------------------------------------------------
+    landmarks = {
+        "main": len(body.find_all("main")),
+        "nav": len(body.find_all("nav")),
+        "header": len(body.find_all("header")),
+        "footer": len(body.find_all("footer")),
+        "aside": len(body.find_all("aside")),
+        "section": len(body.find_all("section")),
+        "article": len(body.find_all("article")),
+        "role_main": len(body.find_all(attrs={"role": "main"})),
+        "role_navigation": len(body.find_all(attrs={"role": "navigation"})),
+        "role_contentinfo": len(body.find_all(attrs={"role": "contentinfo"})),
+    }
+    # Skip link — first anchor whose href starts with '#' (excluding '#')
+    skip_link_present = False
+    for a in body.find_all("a", href=True):
+        if a["href"].startswith("#") and a["href"] != "#":
+            text = a.get_text(" ", strip=True).lower()
+            if "skip" in text and ("content" in text or "main" in text or "navigation" in text):
+                skip_link_present = True
+                break
+
+    # ---- Links ----------------------------------------------------------
+    anchors = body.find_all("a")
+    links_total = len(anchors)
+    links_no_text = 0
+    links_generic_text: List[str] = []
+    links_target_blank_no_rel = 0
+    for a in anchors:
+        text = a.get_text(" ", strip=True)
+        if not (_legacy_own_name(a) or _legacy_labelledby(a, soup)):
+            links_no_text += 1
+        elif text and text.lower().strip(".:! ") in GENERIC_LINK_TEXTS:
+            if len(links_generic_text) < 5:
+                links_generic_text.append(_short(text, 30))
+        if a.get("target") == "_blank":
+            rel = (a.get("rel") or [])
+            if isinstance(rel, list):
+                rel_str = " ".join(rel).lower()
+            else:
+                rel_str = str(rel).lower()
+            if "noopener" not in rel_str:
+                links_target_blank_no_rel += 1
+
+    # ---- Buttons --------------------------------------------------------
+    buttons = body.find_all("button")
+    buttons_no_accessible_name = 0
+    for b in buttons:
+        if not (_legacy_own_name(b) or _legacy_labelledby(b, soup)):
+            buttons_no_accessible_name += 1
+
+    # ---- Forms ----------------------------------------------------------
+    forms = body.find_all("form")
+    inputs = body.find_all(["input", "textarea", "select"])
+    inputs_total = 0
+    inputs_unlabeled: List[Dict[str, str]] = []
+    label_for_ids = {lbl.get("for") for lbl in body.find_all("label")
+                     if lbl.get("for") and _legacy_own_name(lbl)}
+    for el in inputs:
+        if el.name == "input" and el.get("type", "text").lower() in ("hidden", "submit", "button", "reset", "image"):
+            continue
+        inputs_total += 1
+        el_id = el.get("id")
+        has_label = bool(el_id and el_id in label_for_ids)
+        wrapped_in_label = any(_legacy_own_name(lbl) for lbl in el.find_parents("label"))
+        has_aria_label = bool((el.get("aria-label") or "").strip() or _legacy_labelledby(el, soup))
+        has_title = bool((el.get("title") or "").strip())
+        if not (has_label or wrapped_in_label or has_aria_label or has_title):
+            inputs_unlabeled.append({
+                "selector": _selector_for(el),
+                "type": el.get("type", el.name),
+                "placeholder": _short(el.get("placeholder", ""), 40),
+            })
+
+    # ---- ARIA / interactive -------------------------------------------
+    aria_attr_count = 0
+    for tag in body.find_all(True):
+        for attr in tag.attrs:
+            if attr.startswith("aria-") or attr == "role":
+                aria_attr_count += 1
+    inline_onclick_non_interactive = 0
+    for tag in body.find_all(attrs={"onclick": True}):
+        if tag.name not in ("button", "a", "input"):
+            inline_onclick_non_interactive += 1
+
+    # ---- Tables ---------------------------------------------------------
+    tables = body.find_all("table")
+    tables_no_th = sum(1 for t in tables if not t.find("th"))
+    tables_no_caption = sum(1 for t in tables if not t.find("caption"))
+
+    # ---- iframes --------------------------------------------------------
+    iframes = body.find_all("iframe")
+    iframes_no_title = sum(1 for f in iframes if not (f.get("title") or "").strip())
+
+    # ---- Inline style colours (best-effort sample) ----------------------
+    style_color_pairs: List[Dict[str, str]] = []
+    for tag in body.find_all(style=True)[:100]:
+        style = tag.get("style", "")
+        fg = re.search(r"(?<!background-)color\s*:\s*([^;]+)", style, re.I)
+        bg = re.search(r"background(?:-color)?\s*:\s*([^;]+)", style, re.I)
+        if fg and bg:
+            style_color_pairs.append({
+                "selector": _selector_for(tag),
+                "color": fg.group(1).strip(),
+                "background": bg.group(1).strip(),
+                "sample_text": _short(tag.get_text(" ", strip=True), 40),
+            })
+        if len(style_color_pairs) >= 5:
+            break
+
+    # ---- Contrast -------------------------------------------------------
+    inline_contrast = contrast.ContrastTally()
+    for tag in body.find_all(style=True):
+        if tag.name == "template" or tag.find_parent("template"):
+            continue  # never rendered
+        declared = contrast.declared_pair(tag.get("style") or "")
+        if declared is not None:
+            inline_contrast.add(declared[0], declared[1], declared[2], _selector_for(tag), "inline")
+    contrast_summary = contrast.merge_summaries(style_contrast.summary(), inline_contrast.summary())
+    base_href = next((b["href"] for b in soup.find_all("base") if b.get("href")), None)
+    base = urljoin(base_url, base_href) if base_href else base_url
+    hrefs: List[str] = []
+    for link in soup.find_all("link"):
+        href = (link.get("href") or "").strip()
+        rel = [r.lower() for r in (link.get("rel") or [])]
+        if (href and "stylesheet" in rel and "alternate" not in rel
+                and (link.get("media") or "").strip().lower() != "print"
+                and href not in hrefs and len(hrefs) < web_audit.STYLESHEET_MAX_PER_PAGE):
+            hrefs.append(href)
+    contrast_summary["stylesheets"] = [
+        url for url in (urljoin(base, href) for href in hrefs)
+        if urlparse(url).scheme in ("http", "https")
+    ]
+    contrast_summary["page_selectors"] = page_selectors
+
+    # ---- Build evidence ------------------------------------------------
+    evidence = {
+        "page": {
+            "title": title,
+            "title_length": len(title),
+            "lang": lang,
+            "viewport": viewport_meta,
+            "charset": charset,
+            "doctype_present": str(soup).lstrip()[:9].lower().startswith("<!doctype"),
+        },
+        "images": {
+            "total": imgs_total,
+            "missing_alt": len(imgs_missing_alt),
+            "missing_alt_samples": imgs_missing_alt[:5],
+            "decorative_alt_empty": imgs_empty_alt,
+            "redundant_alt": imgs_redundant_alt,
+            "alt_samples": alt_samples,
+            "coverage_percent": (
+                round(100 * (imgs_total - len(imgs_missing_alt)) / imgs_total, 1)
+                if imgs_total else 100.0
+            ),
+        },
+        "headings": {
+            "total": len(headings),
+            "h1_count": h1_count,
+            "outline": [{"level": lvl, "text": txt} for lvl, txt in headings[:15]],
+            "skipped_levels": skipped_levels,
+        },
+        "landmarks": landmarks,
+        "skip_link_present": skip_link_present,
+        "links": {
+            "total": links_total,
+            "no_text": links_no_text,
+            "generic_text_samples": links_generic_text,
+            "target_blank_missing_noopener": links_target_blank_no_rel,
+        },
+        "buttons": {
+            "total": len(buttons),
+            "no_accessible_name": buttons_no_accessible_name,
+        },
+        "forms": {
+            "form_count": len(forms),
+            "inputs_total": inputs_total,
+            "inputs_unlabeled": len(inputs_unlabeled),
+            "inputs_unlabeled_samples": inputs_unlabeled[:5],
+        },
+        "aria": {
+            "attribute_count": aria_attr_count,
+            "inline_onclick_on_non_interactive": inline_onclick_non_interactive,
+        },
+        "tables": {
+            "total": len(tables),
+            "missing_th": tables_no_th,
+            "missing_caption": tables_no_caption,
+        },
+        "iframes": {
+            "total": len(iframes),
+            "missing_title": iframes_no_title,
+        },
+        "color_samples_inline": style_color_pairs,
+        "contrast": contrast_summary,
+    }
+
+    # Lightweight pre-flagging — these are the criteria the LLM should at
+    # minimum address (since we have hard evidence one way or the other).
+    flagged: List[Dict[str, Any]] = []
+    if imgs_total and len(imgs_missing_alt) > 0:
+        flagged.append({
+            "wcag": "1.1.1",
+            "summary": f"{len(imgs_missing_alt)} of {imgs_total} images have no alt attribute",
+        })
+    if not lang:
+        flagged.append({"wcag": "3.1.1", "summary": "<html> is missing a lang attribute"})
+    if not title:
+        flagged.append({"wcag": "2.4.2", "summary": "<title> is empty or missing"})
+    if not viewport_meta:
+        flagged.append({"wcag": "1.4.10", "summary": "No <meta name='viewport'> declared"})
+    if h1_count == 0 and len(headings) > 0:
+        flagged.append({"wcag": "2.4.6", "summary": "No <h1> heading on the page"})
+    if h1_count > 1:
+        flagged.append({"wcag": "1.3.1", "summary": f"Multiple <h1> elements found ({h1_count})"})
+    if skipped_levels:
+        flagged.append({"wcag": "1.3.1", "summary": f"Heading hierarchy skips levels: {skipped_levels[0]}"})
+    if landmarks["main"] == 0 and landmarks["role_main"] == 0:
+        flagged.append({"wcag": "1.3.1", "summary": "No <main> landmark"})
+    if not skip_link_present and (landmarks["nav"] > 0 or landmarks["role_navigation"] > 0):
+        flagged.append({"wcag": "2.4.1", "summary": "Navigation present but no skip-to-content link"})
+    if links_no_text > 0:
+        flagged.append({"wcag": "2.4.4", "summary": f"{links_no_text} link(s) with no accessible name"})
+    if links_generic_text:
+        flagged.append({
+            "wcag": "2.4.4",
+            "summary": f"Generic link text found: {', '.join(links_generic_text)}",
+        })
+    if buttons_no_accessible_name > 0:
+        flagged.append({
+            "wcag": "4.1.2",
+            "summary": f"{buttons_no_accessible_name} button(s) without accessible name",
+        })
+    if len(inputs_unlabeled) > 0:
+        flagged.append({
+            "wcag": "3.3.2",
+            "summary": f"{len(inputs_unlabeled)} form input(s) with no associated label",
+        })
+    if iframes_no_title > 0:
+        flagged.append({
+            "wcag": "4.1.2",
+            "summary": f"{iframes_no_title} iframe(s) without a title attribute",
+        })
+    if inline_onclick_non_interactive > 0:
+        flagged.append({
+            "wcag": "2.1.1",
+            "summary": f"{inline_onclick_non_interactive} non-interactive element(s) with inline onclick — likely keyboard-inaccessible",
+        })
+    contrast_finding = web_audit._contrast_finding(contrast_summary)
+    if contrast_finding:
+        flagged.append(contrast_finding)
+
+    # Attach canonical sources for every flagged criterion.
+    referenced_criteria = sorted({f["wcag"] for f in flagged})
+    sources: List[Dict[str, str]] = []
+    for crit in referenced_criteria:
+        ref = WCAG_REFERENCES.get(crit)
+        if not ref:
+            continue
+        sources.append({
+            "wcag_criterion": crit,
+            "title": ref["title"],
+            "level": ref["level"],
+            "principle": ref["principle"],
+            "w3c_understanding_url": ref["w3c"],
+            "deep_dive_url": ref["deep_dive"],
+        })
+
+    evidence["flagged_findings"] = flagged
+    evidence["sources"] = sources
+    return evidence
+
+
+# ---------------------------------------------------------------------------
+# Corpus
+# ---------------------------------------------------------------------------
+_SECTION = """
+<section class="card" style="color:#777;background:#fff">
+  <h2>Section {i}</h2>
+  <nav role="navigation"><a href="#main">Skip to main content</a> <a href="/p/{i}">Read more</a></nav>
+  <p>Paragraph {i} with <a href="/x/{i}" target="_blank">a link</a> and <span onclick="go()">fake button</span>.</p>
+  <img src="/img/{i}.png"><img src="/img/{i}b.png" alt="photo of thing {i}">
+  <button><img src="/i.svg" alt=""></button><button aria-label="Close"></button><button></button>
+  <form><label for="f{i}">Name</label><input id="f{i}"><input type="email" placeholder="Email">
+    <label>Wrapped <select><option>1</option></select></label><textarea></textarea></form>
+  <table><tr><td>{i}</td></tr></table>
+  <div><h4>Deep heading {i}</h4><!-- comment {i} --><script>var x = {i};</script></div>
+  <iframe src="/embed/{i}"></iframe>
+</section>
+"""
+
+
+def synthetic_page(target_bytes: int) -> str:
+    """A page of repeated, deliberately flawed sections of ~``target_bytes``."""
+    head = ('<!DOCTYPE html><html lang="en"><head><title>Synthetic</title>'
+            '<meta name="viewport" content="width=device-width"><meta charset="utf-8">'
+            '</head><body><header><h1>Synthetic page</h1></header><main>')
+    parts: List[str] = [head]
+    size = len(head)
+    i = 0
+    while size < target_bytes:
+        chunk = _SECTION.format(i=i)
+        parts.append(chunk)
+        size += len(chunk)
+        i += 1
+    parts.append("</main><footer>end</footer></body></html>")
+    return "".join(parts)
+
+
+def corpus() -> List[Tuple[str, str]]:
+    docs: List[Tuple[str, str]] = []
+    for name in ["index.html", "help.html"] + sorted(
+            os.path.basename(p) for p in glob.glob(os.path.join(HERE, "Blog_*.html"))):
+        path = os.path.join(HERE, name)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8", errors="replace") as fh:
+                docs.append((name, fh.read()))
+    for kb in (256, 1024, web_audit.MAX_RESPONSE_BYTES // 1024):
+        docs.append((f"synthetic-{kb}KB", synthetic_page(kb * 1024)))
+    return docs
+
+
+def _best_of(audit, html: str, rounds: int) -> Tuple[float, float]:
+    """Best (parse, audit) wall time over ``rounds``; each round re-parses
+    because both audits strip script/style/comments from the tree."""
+    best_parse = best_audit = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        soup = BeautifulSoup(html, "html.parser")
+        parsed = time.perf_counter()
+        audit(soup)
+        best_parse = min(best_parse, parsed - started)
+        best_audit = min(best_audit, time.perf_counter() - parsed)
+    return best_parse, best_audit
+
+
+def _compare_backends(rounds: int) -> None:
+    backends = html_parsers.available_backends()
+    print(f"{'document':<20}{'size':>9}" + "".join(f"{b + ' ms':>16}" for b in backends))
+    for name, html in corpus():
+        row = f"{name:<20}{len(html):>9}"
+        for backend in backends:
+            best = float("inf")
+            for _ in range(rounds):
+                t0 = time.perf_counter()
+                web_audit.audit_html.__wrapped__(html, "", parser=backend, low_memory=False)
+                best = min(best, time.perf_counter() - t0)
+            row += f"{best * 1000:>16.1f}"
+        print(row)
+
+
+def _compare_memory(rounds: int) -> None:
+    """Tree vs low-memory ``audit_html``: best time and peak Python allocation."""
+    backend = html_parsers.get_backend().name
+    print(f"default backend: {backend}; low-memory uses {html_parsers.get_incremental().name}")
+    print(f"{'document':<20}{'size':>9}{'tree ms':>9}{'tree MB':>9}{'lowmem ms':>11}{'lowmem MB':>11}  identical")
+    for name, html in corpus():
+        row = f"{name:<20}{len(html):>9}"
+        results = []
+        for low_memory in (False, True):
+            best = float("inf")
+            for _ in range(rounds):
+                t0 = time.perf_counter()
+                web_audit.audit_html.__wrapped__(html, "", low_memory=low_memory)
+                best = min(best, time.perf_counter() - t0)
+            tracemalloc.start()
+            results.append(web_audit.audit_html.__wrapped__(html, "", low_memory=low_memory))
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            row += f"{best * 1000:>{9 if not low_memory else 11}.1f}{peak / 2**20:>{9 if not low_memory else 11}.1f}"
+        print(f"{row}  {results[0] == results[1]}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--backends", action="store_true",
+                        help="compare end-to-end audit_html time per parser backend")
+    parser.add_argument("--memory", action="store_true",
+                        help="compare tree and low-memory audit_html (time, peak allocation)")
+    args = parser.parse_args()
+    if args.backends:
+        _compare_backends(args.rounds)
+        return
+    if args.memory:
+        _compare_memory(args.rounds)
+        return
+
+    # Parsing costs the same for both implementations, so it is reported
+    # separately and the speedup is for the audit walk alone.
+    print(f"{'document':<20}{'size':>9}{'parse ms':>10}{'legacy ms':>11}{'single ms':>11}"
+          f"{'speedup':>9}  identical")
+    for name, html in corpus():
+        same = (json.dumps(legacy_audit_html(html, ""))
+                == json.dumps(web_audit.audit_html(html, "", parser="html.parser")))
+        parse, legacy = _best_of(legacy_audit_soup, html, args.rounds)
+        _, single = _best_of(web_audit._audit_soup, html, args.rounds)
+        print(f"{name:<20}{len(html):>9}{parse * 1000:>10.1f}{legacy * 1000:>11.1f}"
+              f"{single * 1000:>11.1f}{legacy / single:>8.1f}x  {same}")
+
+
+if __name__ == "__main__":
+    main()
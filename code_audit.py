@@ -13,18 +13,46 @@ top.
 
 Public API
 ----------
-* ``audit_code(code, hint_lang='auto')`` → ``evidence`` dict
+* ``audit_code(code, hint_lang='auto', rules=None)`` → ``evidence`` dict;
+  ``rules`` limits the lint to those rule_ids
 * ``evidence_summary_for_prompt(evidence)`` → plain-text summary for the LLM
 * ``CODE_RULE_REFERENCES`` → mapping rule_id → {title, wcag_criterion, …}
+* ``rule_catalog()`` / ``select_rules(ids)`` → the registered rules; a
+  validated selection
+* ``rule_stats()`` / ``reset_rule_stats()`` → per-rule calls, findings, time;
+  ``take_rule_stats()`` / ``add_rule_stats()`` carry a worker's to the parent
+* ``Finding`` — a finding in ``evidence["findings"]``: compact, read like
+  a dict; ``json_default`` serializes it (responses, the audit history)
+
+Rules live in a registry (``RULES``): each ``@rule`` function declares the
+tags, attributes and languages it looks at, and a dispatch table compiled
+per (language, selection) hands every start tag only to the rules for that
+tag.
+
+Input past ``AUDIT_CODE_MAX_CHARS`` is cut at a line break and the rules
+stop once ``AUDIT_CODE_BUDGET_SECONDS`` is spent (``audit_limits``); the
+evidence is then flagged ``truncated``.
 
 Severity scale: ``critical | high | moderate | low``.
 """
 
 from __future__ import annotations
 
+import functools
+import operator
 import re
+import threading
+import time
+from bisect import bisect_left
 from collections import Counter
-from typing import Dict, List, Optional
+from collections.abc import Mapping
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import audit_limits
+import contrast
+import css_scan
+import evidence_cache
+import prompt_budget
 
 
 # ---------------------------------------------------------------------------
@@ -191,8 +219,12 @@ _SEVERITY: Dict[str, str] = {
     "color-contrast-suspect": "low",
 }
 
+_WCAG_CRITERION: Dict[str, str] = {rule_id: ref.get("wcag_criterion", "")
+                                    for rule_id, ref in CODE_RULE_REFERENCES.items()}
+
 # Per-occurrence point deductions — same scale as the score endpoint.
 _POINTS = {"critical": 10, "high": 7, "moderate": 4, "low": 2}
+_SEVERITY_RANK = {"critical": 3, "high": 2, "moderate": 1, "low": 0}
 _GENERIC_LINK_TEXTS = {
     "click here", "here", "read more", "more", "learn more",
     "this", "this link", "link", "details", "info", "more info",
@@ -203,30 +235,42 @@ _GENERIC_LINK_TEXTS = {
 # ---------------------------------------------------------------------------
 # Public entry point
 # ---------------------------------------------------------------------------
-def audit_code(code: str, hint_lang: str = "auto") -> Dict:
-    """Run the deterministic lint and return an evidence dict."""
+@evidence_cache.memoize("audit_code")
+def audit_code(code: str, hint_lang: str = "auto", rules: Optional[Iterable[str]] = None) -> Dict:
+    """Run the deterministic lint and return an evidence dict.
+
+    ``rules`` (rule_ids) runs only those rules; unknown ids raise
+    ``ValueError``. The evidence then lists the selection under ``rules``.
+    Past the input cap or time budget the evidence covers what was linted
+    and carries ``truncated`` / ``truncation`` (see ``audit_limits``).
+    """
+    selection = select_rules(rules)
     if not code:
-        return _empty_result(hint_lang)
+        return _empty_result(hint_lang, selection)
 
+    guard = audit_limits.AuditGuard("audit_code")
+    code = guard.cap(code)
     language = _detect_language(code, hint_lang)
     lines = code.splitlines()
-    findings: List[Dict] = []
+    findings = _run_rules(_plan_for(language, selection), code, lines, guard)
+    return guard.mark(_evidence(language, findings, len(lines), len(code), selection))
 
-    if language in {"html", "jsx", "vue", "auto"}:
-        findings.extend(_lint_markup(code, lines))
-    if language in {"css", "html", "jsx", "vue", "auto"}:
-        findings.extend(_lint_css(code, lines))
 
+def _evidence(language: str, findings: List[Dict], line_count: int, char_count: int,
+              selection: Optional[Tuple[str, ...]] = None) -> Dict:
+    """The evidence dict for raw ``findings``: deduplicated per
+    ``(rule_id, line)`` (and ``path``, when findings carry one), sorted,
+    scored and with a source per triggered rule."""
     # Deduplicate identical (rule_id, line) pairs.
     seen = set()
     unique: List[Dict] = []
     for f in findings:
-        key = (f["rule_id"], f["line"])
+        key = (f.get("path"), f["rule_id"], f["line"])
         if key in seen:
             continue
         seen.add(key)
         unique.append(f)
-    findings = sorted(unique, key=lambda f: (f["line"] or 0, f["rule_id"]))
+    findings = sorted(unique, key=lambda f: (f.get("path") or "", f["line"] or 0, f["rule_id"]))
 
     severity_counts = Counter({"critical": 0, "high": 0, "moderate": 0, "low": 0})
     for f in findings:
@@ -253,21 +297,36 @@ def audit_code(code: str, hint_lang: str = "auto") -> Dict:
                 "deep_dive": ref.get("deep_dive"),
             })
 
-    return {
+    evidence = {
         "language": language,
-        "line_count": len(lines),
-        "char_count": len(code),
+        "line_count": line_count,
+        "char_count": char_count,
         "deterministic_score": score,
         "severity_counts": dict(severity_counts),
         "findings": findings,
         "sources": sources,
     }
+    if selection is not None:
+        evidence["rules"] = list(selection)
+    return evidence
+
 
+def evidence_summary_for_prompt(evidence: Dict, max_tokens: Optional[int] = None) -> str:
+    """Compact text representation of the lint, fed to the LLM as ground truth.
 
-def evidence_summary_for_prompt(evidence: Dict) -> str:
-    """Compact text representation of the lint, fed to the LLM as ground truth."""
+    Findings are listed most severe first, identical findings collapsed into
+    one line with all their line numbers, and packed into ``max_tokens``
+    (default: the ``review_code`` budget, see ``prompt_budget``); lower
+    severities are the first to be left out. The returned string carries
+    ``.tokens``.
+    """
     sc = evidence["severity_counts"]
-    lines = [
+    out = prompt_budget.Packer(
+        prompt_budget.budget_for("review_code") if max_tokens is None else max_tokens)
+    note = audit_limits.prompt_note(evidence)
+    if note:
+        out.require(note)
+    for line in (
         f"Language: {evidence['language']}",
         f"Lines of code: {evidence['line_count']}",
         f"Deterministic score: {evidence['deterministic_score']}/100",
@@ -275,25 +334,33 @@ def evidence_summary_for_prompt(evidence: Dict) -> str:
         f"moderate={sc['moderate']} low={sc['low']}",
         "",
         "Findings (rule_id @ line — severity — message):",
-    ]
+    ):
+        out.require(line)
     if not evidence["findings"]:
-        lines.append("  (no static issues detected)")
-    else:
-        for f in evidence["findings"][:60]:  # cap to keep prompt small
-            lines.append(
-                f"  {f['rule_id']} @ L{f['line']} — {f['severity']} — "
-                f"WCAG {f['wcag_criterion']} — {f['message']}"
-            )
-        if len(evidence["findings"]) > 60:
-            lines.append(f"  ... and {len(evidence['findings']) - 60} more.")
-    return "\n".join(lines)
+        out.require("  (no static issues detected)")
+    groups = prompt_budget.group_duplicates(
+        evidence["findings"], key=lambda f: (f["rule_id"], f["message"]))
+    groups.sort(key=lambda g: (-_SEVERITY_RANK.get(g[0]["severity"], 0), g[0]["line"]))
+    for first, same in groups:
+        where = ", ".join(f"{f['path']}:L{f['line']}" if f.get("path") else f"L{f['line']}"
+                          for f in same[:8])
+        if len(same) > 8:
+            where += f", … ({len(same)}×)"
+        elif len(same) > 1:
+            where += f" ({len(same)}×)"
+        out.add(
+            f"  {first['rule_id']} @ {where} — {first['severity']} — "
+            f"WCAG {first['wcag_criterion']} — {first['message']}",
+            priority=_SEVERITY_RANK.get(first["severity"], 0), group="findings",
+        )
+    return out.render()
 
 
 # ---------------------------------------------------------------------------
 # Internals
 # ---------------------------------------------------------------------------
-def _empty_result(language: str) -> Dict:
-    return {
+def _empty_result(language: str, selection: Optional[Tuple[str, ...]] = None) -> Dict:
+    evidence = {
         "language": language,
         "line_count": 0,
         "char_count": 0,
@@ -302,6 +369,9 @@ def _empty_result(language: str) -> Dict:
         "findings": [],
         "sources": [],
     }
+    if selection is not None:
+        evidence["rules"] = list(selection)
+    return evidence
 
 
 def _detect_language(code: str, hint: str) -> str:
@@ -315,13 +385,22 @@ def _detect_language(code: str, hint: str) -> str:
         return "jsx"
     if "<html" in sample or "<!doctype" in sample or re.search(r'<\w+[^>]*>', sample):
         return "html"
-    if re.search(r'\{[^{}]*:[^{}]*;[^{}]*\}', code):
-        return "css"
+    # A "{ … : … ; … }" block with no brace inside. One brace scan (the
+    # equivalent regex retried every "{" of a long run: quadratic).
+    for _, open_, end, closed, _ in css_scan.scan(code, raw=True):
+        colon = code.find(":", open_, end) if closed else -1
+        if colon >= 0 and code.find(";", colon, end) >= 0:
+            return "css"
     return "html"
 
 
-def _line_of(code: str, pos: int) -> int:
-    return code.count("\n", 0, pos) + 1
+def _newline_offsets(code: str) -> List[int]:
+    return [m.start() for m in re.finditer("\n", code)]
+
+
+def _line_at(newlines: List[int], pos: int) -> int:
+    """1-based line of offset ``pos``, given ``_newline_offsets(code)``."""
+    return bisect_left(newlines, pos) + 1
 
 
 def _snippet_of(lines: List[str], line_no: int) -> str:
@@ -330,23 +409,351 @@ def _snippet_of(lines: List[str], line_no: int) -> str:
     return lines[line_no - 1].strip()[:200]
 
 
-def _make_finding(rule_id: str, line: int, message: str, snippet: str) -> Dict:
-    return {
-        "rule_id": rule_id,
-        "severity": _SEVERITY.get(rule_id, "moderate"),
-        "wcag_criterion": CODE_RULE_REFERENCES.get(rule_id, {}).get("wcag_criterion", ""),
-        "line": line,
-        "message": message,
-        "snippet": snippet,
-    }
+_FINDING_KEYS = ("rule_id", "severity", "wcag_criterion", "line", "message", "snippet")
+_FINDING_KEY_SET = frozenset(_FINDING_KEYS)
+
+
+class Finding(Mapping):
+    """One lint finding.
+
+    Only ``rule_id`` (the registry's string), ``line``, ``message`` and
+    ``snippet`` are stored, in slots; ``severity`` and ``wcag_criterion``
+    are looked up from the rule when read. A finding reads like the dict it
+    stands for — ``f["line"]``, ``f.get("path")``, ``dict(f)``, equal to
+    that dict — and ``to_dict()`` turns it into one where a response is
+    serialized. It pickles as a plain tuple.
+    """
+
+    __slots__ = ("rule_id", "line", "message", "snippet")
+
+    def __init__(self, rule_id: str, line: int, message: str, snippet: str) -> None:
+        self.rule_id = rule_id
+        self.line = line
+        self.message = message
+        self.snippet = snippet
+
+    def __getitem__(self, key: str):
+        return _FINDING_FIELDS[key](self)
+
+    # Mapping's get / in go through a raised KeyError; these are hot in _evidence.
+    def get(self, key: str, default=None):
+        return self[key] if key in _FINDING_KEY_SET else default
+
+    def __contains__(self, key) -> bool:
+        return key in _FINDING_KEY_SET
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(_FINDING_KEYS)
+
+    def __len__(self) -> int:
+        return len(_FINDING_KEYS)
+
+    def __reduce__(self):
+        return Finding, (self.rule_id, self.line, self.message, self.snippet)
+
+    def __repr__(self) -> str:
+        return f"Finding({self.rule_id!r}, {self.line!r}, {self.message!r}, {self.snippet!r})"
+
+    def to_dict(self) -> Dict:
+        return {key: self[key] for key in _FINDING_KEYS}
+
+
+_FINDING_FIELDS: Dict[str, Callable[[Finding], object]] = {
+    "rule_id": operator.attrgetter("rule_id"),
+    "severity": lambda f: _SEVERITY.get(f.rule_id, "moderate"),
+    "wcag_criterion": lambda f: _WCAG_CRITERION.get(f.rule_id, ""),
+    "line": operator.attrgetter("line"),
+    "message": operator.attrgetter("message"),
+    "snippet": operator.attrgetter("snippet"),
+}
+
+
+def _make_finding(rule_id: str, line: int, message: str, snippet: str) -> Finding:
+    return Finding(rule_id, line, message, snippet)
+
+
+def json_default(obj):
+    """``default=`` for ``json.dumps``: a ``Finding`` as its dict."""
+    if isinstance(obj, Finding):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+# ---------------------------------------------------------------------------
+# Rule registry
+# ---------------------------------------------------------------------------
+_MARKUP_LANGUAGES = frozenset({"html", "jsx", "vue", "auto"})
+_CSS_LANGUAGES = frozenset({"css", "html", "jsx", "vue", "auto"})
+
+
+class Rule:
+    """One lint rule and what it needs to see.
+
+    Hooks (any of them, registered with ``@rule``):
+
+    * ``element(el, ctx)`` → message or ``None``, called for the start tags
+      in ``tags`` (``None``: every tag) whose raw attribute text mentions one
+      of ``attrs`` (``None``: no filter);
+    * ``document(ctx)`` → ``(line, message)`` pairs, once after the elements;
+    * ``text(code, newlines, blocks)`` → ``(line, message)`` pairs over the
+      whole source (the CSS rules); ``blocks`` is ``_css_blocks(code)``,
+      scanned once for all of them.
+
+    ``scope`` says what the element hook reads besides the start tag, so an
+    incremental linter (``code_lsp``) knows what an edit invalidates:
+    ``"tag"`` nothing; ``"content"`` the text up to the element's closing
+    tag; ``"document"`` ``ctx.state`` or document-wide indexes.
+
+    Title, WCAG criterion and severity are looked up in
+    ``CODE_RULE_REFERENCES`` and ``_SEVERITY``.
+    """
+
+    def __init__(self, rule_id: str, languages: frozenset, tags: Optional[frozenset],
+                 attrs: Optional[frozenset], scope: str = "tag") -> None:
+        self.rule_id = rule_id
+        self.languages = languages
+        self.tags = tags
+        self.attrs = attrs
+        self.scope = scope
+        self.element: Optional[Callable] = None
+        self.document: Optional[Callable] = None
+        self.text: Optional[Callable] = None
+
+    @property
+    def severity(self) -> str:
+        return _SEVERITY.get(self.rule_id, "moderate")
+
+    @property
+    def reference(self) -> Dict[str, str]:
+        return CODE_RULE_REFERENCES.get(self.rule_id, {})
+
+
+# rule_id → Rule, in registration order (which is also the order findings
+# for one element are reported in).
+RULES: Dict[str, Rule] = {}
+
+
+def rule(rule_id: str, tags: Optional[Iterable[str]] = None, attrs: Optional[Iterable[str]] = None,
+         languages: frozenset = _MARKUP_LANGUAGES, hook: str = "element", scope: str = "tag") -> Callable:
+    """Register the decorated function as the ``hook`` of rule ``rule_id``.
+
+    The first registration of a rule fixes its ``tags``, ``attrs``,
+    ``languages`` and ``scope``; later ones (e.g. the ``document`` half of a
+    rule) only add a hook.
+    """
+    if rule_id not in CODE_RULE_REFERENCES:
+        raise KeyError(f"{rule_id!r} has no entry in CODE_RULE_REFERENCES")
+
+    def decorator(func: Callable) -> Callable:
+        registered = RULES.get(rule_id)
+        if registered is None:
+            registered = RULES[rule_id] = Rule(
+                rule_id, frozenset(languages),
+                None if tags is None else frozenset(tags),
+                None if attrs is None else frozenset(a.lower() for a in attrs), scope)
+        setattr(registered, hook, func)
+        return func
+    return decorator
+
+
+def rule_catalog() -> List[Dict]:
+    """Every registered rule with its metadata, for clients choosing ``rules``."""
+    return [{
+        "rule_id": r.rule_id,
+        "title": r.reference.get("title", ""),
+        "wcag_criterion": r.reference.get("wcag_criterion", ""),
+        "level": r.reference.get("level", ""),
+        "severity": r.severity,
+        "languages": sorted(r.languages - {"auto"}),
+    } for r in RULES.values()]
+
+
+def select_rules(rule_ids: Optional[Iterable[str]]) -> Optional[Tuple[str, ...]]:
+    """Validated, canonical (sorted) rule selection; ``None`` means all rules.
+
+    Raises ``ValueError`` naming any unknown rule_id.
+    """
+    if rule_ids is None:
+        return None
+    selected = {str(r).strip() for r in rule_ids}
+    unknown = sorted(selected - RULES.keys())
+    if unknown:
+        raise ValueError(f"Unknown rule_id(s): {', '.join(unknown)}")
+    return tuple(sorted(selected))
+
+
+class _Plan:
+    """Dispatch table for one (language, rule selection): tag → rules."""
+
+    def __init__(self, rules: List[Rule]) -> None:
+        element_rules = [r for r in rules if r.element is not None]
+        self.any_tag = tuple(r for r in element_rules if r.tags is None)
+        tags = {tag for r in element_rules if r.tags is not None for tag in r.tags}
+        self.by_tag = {tag: tuple(r for r in element_rules if r.tags is None or tag in r.tags)
+                       for tag in tags}
+        self.document = tuple(r for r in rules if r.document is not None)
+        self.text = tuple(r for r in rules if r.text is not None)
+        self.markup = bool(element_rules or self.document)
+
+
+@functools.lru_cache(maxsize=128)
+def _plan_for(language: str, selection: Optional[Tuple[str, ...]]) -> _Plan:
+    return _Plan([r for r in RULES.values()
+                  if language in r.languages and (selection is None or r.rule_id in selection)])
+
+
+# Per-rule counters for this process: rule_id → [calls, findings, seconds].
+_rule_stats: Dict[str, List[float]] = {}
+_rule_stats_lock = threading.Lock()
+
+
+def _count(stats: Dict[str, List[float]]) -> None:
+    with _rule_stats_lock:
+        for rule_id, (calls, found, seconds) in stats.items():
+            total = _rule_stats.setdefault(rule_id, [0, 0, 0.0])
+            total[0] += calls
+            total[1] += found
+            total[2] += seconds
+
+
+def rule_stats() -> Dict[str, Dict[str, float]]:
+    """Calls, findings and time per rule since start (or the last reset).
+
+    Runs in ``audit_executor`` and ``code_project`` worker processes are
+    included: each task ships its counters back (``take_rule_stats``) and
+    the parent adds them to its own (``add_rule_stats``).
+    """
+    with _rule_stats_lock:
+        return {rule_id: {"calls": int(calls), "findings": int(found), "ms": round(seconds * 1000, 3)}
+                for rule_id, (calls, found, seconds) in _rule_stats.items()}
+
+
+def reset_rule_stats() -> None:
+    with _rule_stats_lock:
+        _rule_stats.clear()
+
+
+def take_rule_stats() -> Dict[str, List[float]]:
+    """This process's raw counters, which are then cleared. Called by a pool
+    worker after each task; not for the process that serves ``rule_stats()``."""
+    with _rule_stats_lock:
+        taken = dict(_rule_stats)
+        _rule_stats.clear()
+    return taken
+
+
+def add_rule_stats(stats: Dict[str, List[float]]) -> None:
+    """Add counters taken in a worker process to this process's."""
+    _count(stats)
+
+
+def _run_rules(plan: _Plan, code: str, lines: List[str],
+               guard: Optional[audit_limits.AuditGuard] = None) -> List[Finding]:
+    """Every rule of ``plan`` over ``code``. With a ``guard`` the element
+    walk stops at the first tag past its deadline, and the document and
+    text rules not yet run are skipped (a document rule over half a walk
+    would report a missing title that is further down)."""
+    findings: List[Finding] = []
+    stats: Dict[str, List[float]] = {}
+    clock = time.perf_counter
+    # Findings on one line share its snippet, and equal messages one string.
+    snippets: Dict[int, str] = {}
+    messages: Dict[str, str] = {}
+
+    def finding(rule_id: str, line: int, message: str) -> Finding:
+        snippet = snippets.get(line)
+        if snippet is None:
+            snippet = snippets[line] = _snippet_of(lines, line)
+        return Finding(rule_id, line, messages.setdefault(message, message), snippet)
+
+    def report(r: Rule, started: float, found: int) -> None:
+        entry = stats.get(r.rule_id)
+        if entry is None:
+            entry = stats[r.rule_id] = [0, 0, 0.0]
+        entry[0] += 1
+        entry[1] += found
+        entry[2] += clock() - started
+
+    if plan.markup:
+        ctx = _MarkupContext(code, lines)
+        for m, line in ctx.index.tags:
+            tag = m.group("tag").lower()
+            rules = plan.by_tag.get(tag, plan.any_tag)
+            if not rules:
+                continue
+            if guard is not None and guard.expired():
+                guard.stopped_at(m.start())
+                break
+            el = _Element(tag, m.group("attrs") or "", line, m.end())
+            for r in rules:
+                if r.attrs is not None and not el.mentions(r.attrs):
+                    continue
+                started = clock()
+                message = r.element(el, ctx)
+                report(r, started, message is not None)
+                if message is not None:
+                    findings.append(finding(r.rule_id, line, message))
+        for r in plan.document:
+            if guard is not None and guard.expired():
+                guard.stopped_at(len(code))
+                guard.skip([r.rule_id])
+                continue
+            started = clock()
+            found = [finding(r.rule_id, line, message)
+                     for line, message in r.document(ctx)]
+            report(r, started, len(found))
+            findings.extend(found)
+
+    if plan.text:
+        newlines = _newline_offsets(code)
+        blocks = _css_blocks(code)
+        for r in plan.text:
+            if guard is not None and guard.expired():
+                guard.stopped_at(len(code))
+                guard.skip([r.rule_id])
+                continue
+            started = clock()
+            found = [finding(r.rule_id, line, message)
+                     for line, message in r.text(code, newlines, blocks)]
+            report(r, started, len(found))
+            findings.extend(found)
+
+    _count(stats)
+    return findings
 
 
 # ---------------------------------------------------------------------------
 # Markup (HTML / JSX / Vue) lint
 # ---------------------------------------------------------------------------
 _TAG_RE = re.compile(r'<\s*(?P<tag>[A-Za-z][A-Za-z0-9]*)\b(?P<attrs>[^>]*?)/?\s*>', re.IGNORECASE)
-_ATTR_RE = re.compile(r'''(?P<name>[\w:-]+)\s*=\s*(?P<q>["'])(?P<val>.*?)(?P=q)''', re.DOTALL)
+# The look-behind starts names at word boundaries only: a later start in the
+# same word fails exactly like the first, after the same scan for a closing
+# quote, so without it an unterminated value cost the word's length squared.
+_ATTR_RE = re.compile(r'''(?<![\w:-])(?P<name>[\w:-]+)\s*=\s*(?P<q>["'])(?P<val>.*?)(?P=q)''', re.DOTALL)
 _BARE_ATTR_RE = re.compile(r'(?<![\w:-])(?P<name>[\w:-]+)(?=\s|/?>|$)')
+_CLOSER_RE = re.compile(r'<\s*/\s*(?P<tag>a|button)\s*>', re.IGNORECASE)
+_LABEL_RE = re.compile(r'<\s*label\b', re.IGNORECASE)
+_FOR_RE = re.compile(r'\bfor\s*=\s*["\']', re.IGNORECASE)
+_QUOTE_RE = re.compile(r'["\']')
+# Longest <label for> id matched against input ids (ids are short; the bound
+# keeps a for= with many later quotes from producing a candidate per quote).
+_MAX_LABEL_ID_CHARS = 256
+_INNER_TAG_RE = re.compile(r'<[^>]+>')
+_INNER_EXPR_RE = re.compile(r'\{[^{}]*\}')
+_DYNAMIC_ALT_RE = re.compile(r'\balt\s*=\s*\{|\b:alt\s*=|\bv-bind:alt\s*=')
+_ONCLICK_RE = re.compile(r'\bonclick\s*=', re.IGNORECASE)
+_REDUNDANT_ALT_RE = re.compile(r'^(image|photo|picture|graphic|icon)\s+of\b')
+_BLOCKS_ZOOM_RE = re.compile(r'maximum-scale\s*=\s*1(?!\.)')
+
+
+def _start_tags(code: str) -> Iterator["re.Match"]:
+    """``_TAG_RE`` matches in ``code``.
+
+    Every match ends at a '>': stopping the scan after the last one only
+    drops attempts that would each run to the end of the text (quadratic in
+    a tail of unclosed ``<a <a <a``).
+    """
+    return _TAG_RE.finditer(code, 0, code.rfind(">") + 1)
 
 
 def _parse_attrs(attr_blob: str) -> Dict[str, str]:
@@ -371,276 +778,393 @@ def _has_accessible_name(attrs: Dict[str, str], inner_text: str = "") -> bool:
     return False
 
 
-def _inner_text_after(code: str, end_pos: int, tag: str) -> str:
-    """Best-effort extraction of inner text up to closing </tag>."""
-    closer = re.compile(r'<\s*/\s*' + re.escape(tag) + r'\s*>', re.IGNORECASE)
-    m = closer.search(code, end_pos)
-    if not m:
+class _MarkupIndex:
+    """Everything the markup rules need from the document, in linear passes.
+
+    * ``tags``    — the ``_TAG_RE`` element stream as ``(match, line)``, with
+      line numbers counted incrementally instead of from offset 0 per tag.
+    * ``closers`` — start offsets of every ``</a>`` / ``</button>``, so an
+      element's inner text runs to the first closer after it (a bisect).
+    * ``label_for`` — lower-cased ids any ``<label … for="…">`` points at.
+
+    ``closers`` and ``label_for`` are built on first use, so a rule
+    selection without link/button or input rules never scans for them.
+    """
+
+    def __init__(self, code: str) -> None:
+        self.code = code
+        self.tags = []
+        line, last = 1, 0
+        for m in _start_tags(code):
+            line += code.count("\n", last, m.start())
+            last = m.start()
+            self.tags.append((m, line))
+        self._closers: Optional[Dict[str, List[int]]] = None
+        self._label_for: Optional[set] = None
+
+    @property
+    def closers(self) -> Dict[str, List[int]]:
+        if self._closers is None:
+            self._closers = {"a": [], "button": []}
+            for m in _CLOSER_RE.finditer(self.code):
+                self._closers[m.group("tag").lower()].append(m.start())
+        return self._closers
+
+    @property
+    def label_for(self) -> set:
+        if self._label_for is None:
+            # Matches what a per-input search for <label[^>]*\bfor=["']ID["']
+            # would: any for= before the label tag's first '>', the id running
+            # from the opening quote to any later quote (ids never contain '>').
+            code = self.code
+            self._label_for = set()
+            scanned_to = -1
+            for m in _LABEL_RE.finditer(code):
+                end = code.find(">", m.end())
+                if end < 0:
+                    end = len(code)
+                if end == scanned_to:
+                    continue  # same tag body as the previous <label
+                scanned_to = end
+                for f in _FOR_RE.finditer(code, m.end(), end):
+                    stop = min(end, f.end() + _MAX_LABEL_ID_CHARS + 1)
+                    for q in _QUOTE_RE.finditer(code, f.end(), stop):
+                        self._label_for.add(code[f.end():q.start()].lower())
+        return self._label_for
+
+    def inner_text(self, end_pos: int, tag: str) -> str:
+        """Inner text of the element whose start tag ends at ``end_pos``."""
+        return _inner_text(self.code, self.closers[tag], end_pos)
+
+
+def _inner_text(code: str, closers: List[int], end_pos: int) -> str:
+    """Text from ``end_pos`` up to the first of ``closers`` (sorted start
+    offsets of ``</tag>``) at or after it, nested tags and JSX expressions
+    removed; ``""`` when no closer follows."""
+    i = bisect_left(closers, end_pos)
+    if i == len(closers):
         return ""
-    inner = code[end_pos:m.start()]
-    # Strip nested tags + JSX expressions.
-    inner = re.sub(r'<[^>]+>', ' ', inner)
-    inner = re.sub(r'\{[^{}]*\}', ' ', inner)
-    return inner.strip()
-
-
-def _lint_markup(code: str, lines: List[str]) -> List[Dict]:
-    findings: List[Dict] = []
-    has_html_tag = False
-    has_lang = False
-    has_title = False
-    has_viewport = False
-    has_h1 = False
-    last_heading_level: Optional[int] = None
-    ids_seen: Counter = Counter()
-    id_first_line: Dict[str, int] = {}
-
-    for m in _TAG_RE.finditer(code):
-        tag = m.group("tag").lower()
-        attrs = _parse_attrs(m.group("attrs") or "")
-        line = _line_of(code, m.start())
-        snip = _snippet_of(lines, line)
-
-        # Track ids for duplicate detection.
-        elem_id = attrs.get("id", "").strip()
-        if elem_id:
-            ids_seen[elem_id] += 1
-            id_first_line.setdefault(elem_id, line)
-
-        # aria-hidden on inherently focusable elements.
-        if attrs.get("aria-hidden", "").lower() == "true" and tag in {
-            "a", "button", "input", "select", "textarea", "iframe",
-        }:
-            findings.append(_make_finding(
-                "aria-hidden-on-focusable", line,
-                f"<{tag}> has aria-hidden=\"true\" but is focusable.", snip,
-            ))
-
-        # Positive tabindex.
-        if "tabindex" in attrs:
-            try:
-                if int(attrs["tabindex"]) > 0:
-                    findings.append(_make_finding(
-                        "positive-tabindex", line,
-                        f"tabindex={attrs['tabindex']} forces a non-natural focus order.",
-                        snip,
-                    ))
-            except ValueError:
-                pass
-
-        if tag == "html":
-            has_html_tag = True
-            if attrs.get("lang", "").strip():
-                has_lang = True
-            else:
-                findings.append(_make_finding(
-                    "missing-lang", line,
-                    "<html> element has no lang attribute.", snip,
-                ))
-
-        elif tag == "title":
-            has_title = True
-
-        elif tag == "meta":
-            name = attrs.get("name", "").lower()
-            if name == "viewport":
-                has_viewport = True
-                content = attrs.get("content", "").lower()
-                if "user-scalable=no" in content or re.search(r'maximum-scale\s*=\s*1(?!\.)', content):
-                    findings.append(_make_finding(
-                        "viewport-blocks-zoom", line,
-                        "Viewport meta blocks user zoom.", snip,
-                    ))
-
-        elif tag == "img":
-            # JSX/Vue dynamic alt: alt={...} or :alt="..." should not flag.
-            attr_blob = m.group("attrs") or ""
-            has_dynamic_alt = bool(
-                re.search(r'\balt\s*=\s*\{', attr_blob) or
-                re.search(r'\b:alt\s*=', attr_blob) or
-                re.search(r'\bv-bind:alt\s*=', attr_blob)
-            )
-            if "alt" not in attrs and not has_dynamic_alt:
-                # Decorative role exception.
-                if attrs.get("role", "").lower() != "presentation" and \
-                   attrs.get("aria-hidden", "").lower() != "true":
-                    findings.append(_make_finding(
-                        "img-missing-alt", line,
-                        "<img> is missing an alt attribute.", snip,
-                    ))
-            elif "alt" in attrs:
-                alt_val = attrs["alt"].strip().lower()
-                if re.match(r'^(image|photo|picture|graphic|icon)\s+of\b', alt_val):
-                    findings.append(_make_finding(
-                        "img-redundant-alt", line,
-                        f"alt=\"{attrs['alt']}\" starts with a redundant phrase.",
-                        snip,
-                    ))
-
-        elif tag == "input":
-            input_type = attrs.get("type", "text").lower()
-            if input_type in {"hidden", "submit", "button", "reset", "image"}:
-                pass  # no label needed
-            else:
-                has_label_attr = bool(
-                    attrs.get("aria-label", "").strip() or
-                    attrs.get("aria-labelledby", "").strip() or
-                    attrs.get("title", "").strip()
-                )
-                # Look for an associated <label for="id">.
-                input_id = attrs.get("id", "").strip()
-                has_for_label = False
-                if input_id:
-                    has_for_label = bool(re.search(
-                        r'<\s*label\b[^>]*\bfor\s*=\s*["\']' + re.escape(input_id) + r'["\']',
-                        code, re.IGNORECASE,
-                    ))
-                if not (has_label_attr or has_for_label):
-                    findings.append(_make_finding(
-                        "input-missing-label", line,
-                        f"<input type=\"{input_type}\"> has no associated <label> or aria-label.",
-                        snip,
-                    ))
-
-        elif tag == "button":
-            inner = _inner_text_after(code, m.end(), "button")
-            if not _has_accessible_name(attrs, inner):
-                findings.append(_make_finding(
-                    "button-empty-name", line,
-                    "<button> has no accessible name.", snip,
-                ))
-
-        elif tag == "a":
-            inner = _inner_text_after(code, m.end(), "a")
-            if not _has_accessible_name(attrs, inner):
-                findings.append(_make_finding(
-                    "link-empty-name", line,
-                    "<a> has no accessible name.", snip,
-                ))
-            else:
-                text_for_check = (inner or attrs.get("aria-label", "") or attrs.get("title", "")).strip().lower()
-                # Strip surrounding punctuation.
-                text_for_check = re.sub(r'[^\w\s]', '', text_for_check).strip()
-                if text_for_check in _GENERIC_LINK_TEXTS:
-                    findings.append(_make_finding(
-                        "link-generic-text", line,
-                        f"Link text \"{text_for_check}\" is too generic.", snip,
-                    ))
-
-        elif tag == "iframe":
-            if not (attrs.get("title", "").strip() or attrs.get("aria-label", "").strip()):
-                findings.append(_make_finding(
-                    "iframe-missing-title", line,
-                    "<iframe> is missing a title attribute.", snip,
-                ))
-
-        elif tag in {"h1", "h2", "h3", "h4", "h5", "h6"}:
-            level = int(tag[1])
-            if level == 1:
-                has_h1 = True
-            if last_heading_level is not None and level > last_heading_level + 1:
-                findings.append(_make_finding(
-                    "heading-skipped-level", line,
-                    f"Heading jumps from h{last_heading_level} to h{level}.",
-                    snip,
-                ))
-            last_heading_level = level
-
-        elif tag in {"div", "span"}:
-            attr_blob = m.group("attrs") or ""
-            if re.search(r'\bonclick\s*=', attr_blob, re.IGNORECASE):
-                # Acceptable when role and tabindex make it focusable.
-                role = attrs.get("role", "").lower()
-                if role not in {"button", "link", "menuitem", "tab", "switch", "checkbox"} \
-                   or "tabindex" not in attrs:
-                    findings.append(_make_finding(
-                        "click-on-non-interactive", line,
-                        f"<{tag}> has an onClick handler but is not a true interactive element.",
-                        snip,
-                    ))
-
-    # ---- Document-level checks (only when this looks like a full HTML doc).
-    looks_like_doc = has_html_tag or "<!doctype" in code.lower() or "<head" in code.lower()
-    if looks_like_doc:
-        if not has_lang and not has_html_tag:
-            findings.append(_make_finding(
-                "missing-lang", 1,
-                "Document does not declare a lang attribute on <html>.",
-                _snippet_of(lines, 1),
-            ))
-        if not has_title:
-            findings.append(_make_finding(
-                "missing-title", 1,
-                "Document is missing a <title> element.",
-                _snippet_of(lines, 1),
-            ))
-        if not has_viewport:
-            findings.append(_make_finding(
-                "missing-viewport", 1,
-                "Document is missing a responsive viewport meta tag.",
-                _snippet_of(lines, 1),
-            ))
-        if not has_h1:
-            findings.append(_make_finding(
-                "no-h1", 1,
-                "Document defines no <h1> heading.",
-                _snippet_of(lines, 1),
-            ))
-
-    for elem_id, count in ids_seen.items():
-        if count > 1:
-            line = id_first_line.get(elem_id, 1)
-            findings.append(_make_finding(
-                "duplicate-id", line,
-                f"Duplicate id=\"{elem_id}\" appears {count} times.",
-                _snippet_of(lines, line),
-            ))
+    inner = code[end_pos:closers[i]]
+    # Nested tags end at a '>': text after the last one is kept as is rather
+    # than retried from every '<' in it.
+    cut = inner.rfind(">") + 1
+    inner = _INNER_TAG_RE.sub(' ', inner[:cut]) + inner[cut:]
+    return _INNER_EXPR_RE.sub(' ', inner).strip()
+
+
+class _Element:
+    """One start tag (``blob`` is its raw attribute text, ``end`` the offset
+    just past it), with its attributes parsed on first use."""
+
+    __slots__ = ("tag", "blob", "line", "end", "_attrs", "_blob_lower", "_inner")
 
-    return findings
+    def __init__(self, tag: str, blob: str, line: int, end: int) -> None:
+        self.tag = tag
+        self.blob = blob
+        self.line = line
+        self.end = end
+        self._attrs: Optional[Dict[str, str]] = None
+        self._blob_lower: Optional[str] = None
+        self._inner: Optional[str] = None
 
+    @property
+    def attrs(self) -> Dict[str, str]:
+        if self._attrs is None:
+            self._attrs = _parse_attrs(self.blob)
+        return self._attrs
 
-# ---------------------------------------------------------------------------
-# CSS lint (focus + suspicious contrast pairings)
-# ---------------------------------------------------------------------------
-_OUTLINE_NONE_RE = re.compile(
-    r'(?P<sel>[^{}]+)\{[^{}]*outline\s*:\s*(?:none|0(?:px)?)\s*[;}]',
-    re.IGNORECASE,
-)
+    def mentions(self, names: frozenset) -> bool:
+        """Whether the raw attribute text contains any of ``names`` (a cheap
+        filter: a parsed attribute name always appears in it)."""
+        if self._blob_lower is None:
+            self._blob_lower = self.blob.lower()
+        return any(name in self._blob_lower for name in names)
+
+    def inner_text(self, ctx: "_MarkupContext") -> str:
+        if self._inner is None:
+            self._inner = ctx.index.inner_text(self.end, self.tag)
+        return self._inner
+
+
+class _MarkupContext:
+    """Per-audit state shared by the markup rules."""
+
+    def __init__(self, code: str, lines: List[str]) -> None:
+        self.code = code
+        self.lines = lines
+        self.index = _MarkupIndex(code)
+        self.state: Dict[str, object] = {}
+        self._looks_like_doc: Optional[bool] = None
+
+    @property
+    def has_html_tag(self) -> bool:
+        if "has_html_tag" not in self.state:
+            self.state["has_html_tag"] = any(m.group("tag").lower() == "html" for m, _ in self.index.tags)
+        return bool(self.state["has_html_tag"])
+
+    @property
+    def looks_like_doc(self) -> bool:
+        """Document-level checks only apply to what looks like a full HTML doc."""
+        if self._looks_like_doc is None:
+            lowered = self.code.lower()
+            self._looks_like_doc = self.has_html_tag or "<!doctype" in lowered or "<head" in lowered
+        return self._looks_like_doc
+
+
+# ---- Markup rules, in reporting order --------------------------------------
+_FOCUSABLE_TAGS = ("a", "button", "input", "select", "textarea", "iframe")
+_HEADING_TAGS = ("h1", "h2", "h3", "h4", "h5", "h6")
+
+
+@rule("aria-hidden-on-focusable", tags=_FOCUSABLE_TAGS, attrs=("aria-hidden",))
+def _aria_hidden_on_focusable(el: _Element, ctx: _MarkupContext) -> Optional[str]:
+    if el.attrs.get("aria-hidden", "").lower() == "true":
+        return f"<{el.tag}> has aria-hidden=\"true\" but is focusable."
+    return None
+
+
+@rule("positive-tabindex", attrs=("tabindex",))
+def _positive_tabindex(el: _Element, ctx: _MarkupContext) -> Optional[str]:
+    if "tabindex" in el.attrs:
+        try:
+            if int(el.attrs["tabindex"]) > 0:
+                return f"tabindex={el.attrs['tabindex']} forces a non-natural focus order."
+        except ValueError:
+            pass
+    return None
+
+
+@rule("missing-lang", tags=("html",))
+def _html_missing_lang(el: _Element, ctx: _MarkupContext) -> Optional[str]:
+    if not el.attrs.get("lang", "").strip():
+        return "<html> element has no lang attribute."
+    return None
+
+
+@rule("missing-lang", hook="document")
+def _document_missing_lang(ctx: _MarkupContext) -> Iterable[Tuple[int, str]]:
+    if ctx.looks_like_doc and not ctx.has_html_tag:
+        yield 1, "Document does not declare a lang attribute on <html>."
+
+
+@rule("missing-title", tags=("title",), scope="document")
+def _title_seen(el: _Element, ctx: _MarkupContext) -> None:
+    ctx.state["has_title"] = True
+
+
+@rule("missing-title", hook="document")
+def _document_missing_title(ctx: _MarkupContext) -> Iterable[Tuple[int, str]]:
+    if ctx.looks_like_doc and not ctx.state.get("has_title"):
+        yield 1, "Document is missing a <title> element."
+
+
+@rule("missing-viewport", tags=("meta",), scope="document")
+def _viewport_seen(el: _Element, ctx: _MarkupContext) -> None:
+    if el.attrs.get("name", "").lower() == "viewport":
+        ctx.state["has_viewport"] = True
+
+
+@rule("missing-viewport", hook="document")
+def _document_missing_viewport(ctx: _MarkupContext) -> Iterable[Tuple[int, str]]:
+    if ctx.looks_like_doc and not ctx.state.get("has_viewport"):
+        yield 1, "Document is missing a responsive viewport meta tag."
+
+
+@rule("viewport-blocks-zoom", tags=("meta",))
+def _viewport_blocks_zoom(el: _Element, ctx: _MarkupContext) -> Optional[str]:
+    if el.attrs.get("name", "").lower() == "viewport":
+        content = el.attrs.get("content", "").lower()
+        if "user-scalable=no" in content or _BLOCKS_ZOOM_RE.search(content):
+            return "Viewport meta blocks user zoom."
+    return None
+
+
+@rule("img-missing-alt", tags=("img",))
+def _img_missing_alt(el: _Element, ctx: _MarkupContext) -> Optional[str]:
+    attrs = el.attrs
+    # JSX/Vue dynamic alt: alt={...} or :alt="..." should not flag.
+    if "alt" not in attrs and not _DYNAMIC_ALT_RE.search(el.blob):
+        # Decorative role exception.
+        if attrs.get("role", "").lower() != "presentation" and \
+           attrs.get("aria-hidden", "").lower() != "true":
+            return "<img> is missing an alt attribute."
+    return None
+
+
+@rule("img-redundant-alt", tags=("img",))
+def _img_redundant_alt(el: _Element, ctx: _MarkupContext) -> Optional[str]:
+    if "alt" in el.attrs and _REDUNDANT_ALT_RE.match(el.attrs["alt"].strip().lower()):
+        return f"alt=\"{el.attrs['alt']}\" starts with a redundant phrase."
+    return None
+
+
+@rule("input-missing-label", tags=("input",), scope="document")
+def _input_missing_label(el: _Element, ctx: _MarkupContext) -> Optional[str]:
+    attrs = el.attrs
+    input_type = attrs.get("type", "text").lower()
+    if input_type in {"hidden", "submit", "button", "reset", "image"}:
+        return None  # no label needed
+    if (attrs.get("aria-label", "").strip() or attrs.get("aria-labelledby", "").strip()
+            or attrs.get("title", "").strip()):
+        return None
+    # Look for an associated <label for="id">.
+    input_id = attrs.get("id", "").strip()
+    if input_id and input_id.lower() in ctx.index.label_for:
+        return None
+    return f"<input type=\"{input_type}\"> has no associated <label> or aria-label."
+
+
+@rule("button-empty-name", tags=("button",), scope="content")
+def _button_empty_name(el: _Element, ctx: _MarkupContext) -> Optional[str]:
+    if not _has_accessible_name(el.attrs, el.inner_text(ctx)):
+        return "<button> has no accessible name."
+    return None
+
+
+@rule("link-empty-name", tags=("a",), scope="content")
+def _link_empty_name(el: _Element, ctx: _MarkupContext) -> Optional[str]:
+    if not _has_accessible_name(el.attrs, el.inner_text(ctx)):
+        return "<a> has no accessible name."
+    return None
+
+
+@rule("link-generic-text", tags=("a",), scope="content")
+def _link_generic_text(el: _Element, ctx: _MarkupContext) -> Optional[str]:
+    inner = el.inner_text(ctx)
+    if not _has_accessible_name(el.attrs, inner):
+        return None  # link-empty-name's case
+    text = (inner or el.attrs.get("aria-label", "") or el.attrs.get("title", "")).strip().lower()
+    # Strip surrounding punctuation.
+    text = re.sub(r'[^\w\s]', '', text).strip()
+    if text in _GENERIC_LINK_TEXTS:
+        return f"Link text \"{text}\" is too generic."
+    return None
 
 
-def _lint_css(code: str, lines: List[str]) -> List[Dict]:
-    findings: List[Dict] = []
+@rule("iframe-missing-title", tags=("iframe",))
+def _iframe_missing_title(el: _Element, ctx: _MarkupContext) -> Optional[str]:
+    if not (el.attrs.get("title", "").strip() or el.attrs.get("aria-label", "").strip()):
+        return "<iframe> is missing a title attribute."
+    return None
+
+
+@rule("no-h1", tags=("h1",), scope="document")
+def _h1_seen(el: _Element, ctx: _MarkupContext) -> None:
+    ctx.state["has_h1"] = True
+
+
+@rule("no-h1", hook="document")
+def _document_no_h1(ctx: _MarkupContext) -> Iterable[Tuple[int, str]]:
+    if ctx.looks_like_doc and not ctx.state.get("has_h1"):
+        yield 1, "Document defines no <h1> heading."
+
+
+@rule("heading-skipped-level", tags=_HEADING_TAGS, scope="document")
+def _heading_skipped_level(el: _Element, ctx: _MarkupContext) -> Optional[str]:
+    level = int(el.tag[1])
+    last = ctx.state.get("last_heading_level")
+    ctx.state["last_heading_level"] = level
+    if last is not None and level > last + 1:
+        return f"Heading jumps from h{last} to h{level}."
+    return None
+
+
+@rule("click-on-non-interactive", tags=("div", "span"), attrs=("onclick",))
+def _click_on_non_interactive(el: _Element, ctx: _MarkupContext) -> Optional[str]:
+    if _ONCLICK_RE.search(el.blob):
+        # Acceptable when role and tabindex make it focusable.
+        role = el.attrs.get("role", "").lower()
+        if role not in {"button", "link", "menuitem", "tab", "switch", "checkbox"} \
+           or "tabindex" not in el.attrs:
+            return f"<{el.tag}> has an onClick handler but is not a true interactive element."
+    return None
+
+
+@rule("duplicate-id", attrs=("id",), scope="document")
+def _id_seen(el: _Element, ctx: _MarkupContext) -> None:
+    elem_id = el.attrs.get("id", "").strip()
+    if elem_id:
+        ids = ctx.state.setdefault("ids", {})
+        if elem_id in ids:
+            ids[elem_id][0] += 1
+        else:
+            ids[elem_id] = [1, el.line]
+
+
+@rule("duplicate-id", hook="document")
+def _document_duplicate_id(ctx: _MarkupContext) -> Iterable[Tuple[int, str]]:
+    for elem_id, (count, line) in ctx.state.get("ids", {}).items():
+        if count > 1:
+            yield line, f"Duplicate id=\"{elem_id}\" appears {count} times."
+
 
-    for m in _OUTLINE_NONE_RE.finditer(code):
-        block = m.group(0).lower()
-        # If the same rule sets a visible alternative, skip.
-        if re.search(r'(box-shadow|outline-offset|border|background)\s*:', block):
+# ---------------------------------------------------------------------------
+# CSS lint (focus + low-contrast pairings)
+# ---------------------------------------------------------------------------
+# Both rules run on one ``css_scan`` pass over the braces. It is raw (a
+# brace in a comment or string still counts) so that the findings match the
+# regexes these rules replaced and stay within one ``}``-terminated segment,
+# which ``code_lsp`` and ``code_diff`` re-lint on their own.
+_OUTLINE_WORD_RE = re.compile(r'outline', re.IGNORECASE)
+_OUTLINE_DECL_RE = re.compile(r'outline\s*:\s*(?:none|0(?:px)?)\s*\Z', re.IGNORECASE)
+_VISIBLE_FOCUS_RE = re.compile(r'(box-shadow|outline-offset|border|background)\s*:')
+
+
+def _css_blocks(code: str) -> List[css_scan.Block]:
+    return css_scan.scan(code, raw=True)
+
+
+@rule("outline-none", languages=_CSS_LANGUAGES, hook="text")
+def _outline_none(code: str, newlines: List[int],
+                  blocks: List[css_scan.Block]) -> Iterable[Tuple[int, str]]:
+    # A rule's last ``outline: none | 0 | 0px`` declaration; the selector is
+    # the text since the previous brace (or since the previous match, when
+    # that ended at a ";" just before a nested block) and is reported at its
+    # first character — which may still be on the line of the previous "}".
+    matched_to = 0
+    for start, open_, end, closed, _ in blocks:
+        start = max(start, matched_to)
+        if start >= open_ or not _OUTLINE_WORD_RE.search(code, open_, end):
+            continue
+        match_end = 0
+        for decl_start, decl_end, terminated in css_scan.declarations(code, open_, end, closed, raw=True):
+            if terminated and _OUTLINE_DECL_RE.search(code, decl_start, decl_end):
+                match_end = decl_end + 1
+        if not match_end:
+            continue
+        matched_to = match_end
+        # If the same rule sets a visible alternative (before the outline), skip.
+        if _VISIBLE_FOCUS_RE.search(code[start:match_end].lower()):
             continue
         # If the selector targets :focus/:focus-visible specifically, that's worse.
-        sel = m.group("sel").lower()
+        sel = code[start:open_].lower()
         if ":focus" in sel or sel.strip() in {"*", "a", "button", "input", "textarea", "select"}:
-            line = _line_of(code, m.start())
-            findings.append(_make_finding(
-                "outline-none", line,
-                "Removes focus outline without providing a visible alternative.",
-                _snippet_of(lines, line),
-            ))
-
-    # Heuristic low-contrast: same color for color and background.
-    rule_blocks = re.finditer(r'\{(?P<body>[^{}]+)\}', code)
-    for rb in rule_blocks:
-        body = rb.group("body")
-        color = re.search(r'(?<!-)color\s*:\s*([^;]+);', body, re.IGNORECASE)
-        bg = re.search(r'background(?:-color)?\s*:\s*([^;]+);', body, re.IGNORECASE)
-        if color and bg:
-            c = color.group(1).strip().lower()
-            b = bg.group(1).strip().lower()
-            if c and c == b:
-                line = _line_of(code, rb.start())
-                findings.append(_make_finding(
-                    "color-contrast-suspect", line,
-                    f"color and background-color set to the same value ({c}).",
-                    _snippet_of(lines, line),
-                ))
-
-    return findings
+            yield (_line_at(newlines, start),
+                   "Removes focus outline without providing a visible alternative.")
+
+
+@rule("color-contrast-suspect", languages=_CSS_LANGUAGES, hook="text")
+def _color_contrast_suspect(code: str, newlines: List[int],
+                            blocks: List[css_scan.Block]) -> Iterable[Tuple[int, str]]:
+    # Low contrast: WCAG ratio of the color/background a rule declares. All
+    # of a file's pairs are evaluated in one batch; pairs that cannot be
+    # resolved statically (var(), currentColor) are only flagged when both
+    # sides are the same value.
+    declared = []
+    for _, open_, end, closed, _ in blocks:
+        if not closed or end == open_ + 1:
+            continue    # a block with nested rules, or an empty one
+        pair = contrast.declared_pair(code[open_ + 1:end])
+        if pair is not None and pair[0] and pair[1]:
+            declared.append((open_, pair[0].lower(), pair[1].lower(), pair[2]))
+    ratios = contrast.contrast_ratios([(c, b) for _, c, b, _ in declared])
+    for (start, c, b, large), ratio in zip(declared, ratios):
+        needed = contrast.AA_LARGE if large else contrast.AA_NORMAL
+        if ratio is not None and ratio < needed:
+            message = (f"color {c} on background {b} has a contrast ratio of "
+                       f"{ratio:.2f}:1 (WCAG AA needs {needed:g}:1).")
+        elif ratio is None and c == b:
+            message = f"color and background-color set to the same value ({c})."
+        else:
+            continue
+        yield _line_at(newlines, start), message
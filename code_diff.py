@@ -0,0 +1,582 @@
+"""
+code_diff.py
+============
+
+Pull-request mode for ``/api/review-code``: lint what a unified diff
+changes instead of whole files, so the lint report and the code the model
+sees grow with the diff, not with the files it touches.
+
+* ``parse_unified_diff(text)`` → one patch per file: paths and hunks, each
+  hunk's lines tagged ``" "`` (context), ``"-"`` or ``"+"``. ``git diff``
+  and ``diff -u`` output both work; new files count from an empty base,
+  deleted and binary files are skipped.
+* ``apply_hunks(base, hunks)`` → the new file; ``ValueError`` when the base
+  does not match the hunks' context.
+* ``audit_diff(diff, base=None, hint_lang, rules)`` → evidence in the
+  ``audit_code`` shape, holding only the findings the diff touches (each
+  with its ``path``), plus a per-file ``files`` list.
+* ``diff_for_prompt(diff)`` → the hunks with new-file line numbers, for
+  the model.
+
+What is linted, per file:
+
+* **Changed lines** — added lines (new-file numbering), and the line a
+  removal happened at.
+* **Element rules** (``scope`` tag / content) run on each run of changed
+  lines widened to whole elements: every start tag it overlaps and, for a
+  link or button, the text up to its closing tag. A finding is kept when
+  its element overlaps a changed line.
+* **CSS rules** run on the changed lines widened to the surrounding
+  ``}`` … ``}`` blocks.
+* **Document rules** (duplicate ids, heading order, input labels, missing
+  title / lang / viewport / h1) need the whole file. With the base file
+  (``base``: its text, or ``{path: text}`` for several files) they run on
+  the old and new versions, and a finding is kept when it sits on a
+  changed line or is new — its rule and message occur more often than
+  before.
+  Without it only the hunks are known: document rules are skipped (the
+  file's ``document_rules`` says so), link / button text that runs past
+  the end of a hunk is not judged, and a hunk that starts inside a tag
+  opened above it can be misread.
+
+Files are linted whole or not at all against ``AUDIT_DIFF_MAX_CHARS`` of
+hunk text, and ``AUDIT_DIFF_BUDGET_SECONDS`` covers the whole diff, the
+``audit_code`` calls inside it included (``audit_limits``). Files left out
+are listed in ``files_skipped``, a file cut short has ``"complete":
+false``, and the evidence is flagged ``truncated``.
+"""
+
+from __future__ import annotations
+
+import re
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+import audit_limits
+import code_audit
+import code_project
+import evidence_cache
+
+_HUNK_RE = re.compile(r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+_GIT_HEADER_RE = re.compile(r'^diff --git "?a/(.*?)"? "?b/(.*?)"?$')
+_CONTENT_TAGS = frozenset({"a", "button"})
+
+
+# ---------------------------------------------------------------------------
+# Parsing and applying
+# ---------------------------------------------------------------------------
+def _path_of(header: str, git: bool) -> Optional[str]:
+    """Path from a ``---`` / ``+++`` header; ``None`` for ``/dev/null``."""
+    path = header[4:].split("\t", 1)[0].strip()
+    if path.startswith('"') and path.endswith('"'):
+        path = path[1:-1]
+    if path == "/dev/null":
+        return None
+    if git and path[:2] in ("a/", "b/"):
+        path = path[2:]
+    return path
+
+
+def parse_unified_diff(text: str) -> List[Dict]:
+    """Patches in ``text``: ``{"path", "old_path", "new_file", "deleted",
+    "binary", "hunks"}``. A hunk is ``{"old_start", "old_count",
+    "new_start", "new_count", "lines": [(op, text)], "old_eof_newline",
+    "new_eof_newline"}``; the ``*_eof_newline`` flags are ``False`` when a
+    ``\\ No newline at end of file`` marker applies to that side.
+
+    Raises ``ValueError`` for a hunk outside a file or cut short.
+    """
+    patches: List[Dict] = []
+    patch: Optional[Dict] = None
+    hunk: Optional[Dict] = None
+    old_left = new_left = 0
+    git = False
+    last_op = " "
+
+    def start_patch() -> Dict:
+        entry = {"path": None, "old_path": None, "new_file": False, "deleted": False,
+                 "binary": False, "hunks": []}
+        patches.append(entry)
+        return entry
+
+    for raw in text.split("\n"):
+        line = raw[:-1] if raw.endswith("\r") else raw
+        if hunk is not None and (old_left > 0 or new_left > 0):
+            op = line[:1] or " "  # some tools strip the blank of empty context lines
+            if op in " -+":
+                hunk["lines"].append((op, line[1:]))
+                if op != "+":
+                    old_left -= 1
+                if op != "-":
+                    new_left -= 1
+                last_op = op
+                continue
+            if op != "\\":
+                raise ValueError(f"Hunk at +{hunk['new_start']} in {patch['path']} ends early")
+        if line.startswith("\\"):
+            if hunk is not None:
+                if last_op != "+":
+                    hunk["old_eof_newline"] = False
+                if last_op != "-":
+                    hunk["new_eof_newline"] = False
+            continue
+        hunk = None
+        match = _GIT_HEADER_RE.match(line)
+        if match:
+            git = True
+            patch = start_patch()
+            patch["old_path"], patch["path"] = match.group(1), match.group(2)
+        elif line.startswith("--- "):
+            if patch is None or patch["hunks"] or patch["binary"] or (not git and patch["old_path"]):
+                patch = start_patch()
+            patch["old_path"] = _path_of(line, git)
+            patch["new_file"] = patch["old_path"] is None
+        elif line.startswith("+++ ") and patch is not None:
+            path = _path_of(line, git)
+            patch["deleted"] = path is None
+            if path is not None:
+                patch["path"] = path
+            elif patch["path"] is None:
+                patch["path"] = patch["old_path"]
+        elif line.startswith("new file mode") and patch is not None:
+            patch["new_file"] = True
+        elif line.startswith("deleted file mode") and patch is not None:
+            patch["deleted"] = True
+        elif (line.startswith("Binary files ") or line == "GIT binary patch") and patch is not None:
+            patch["binary"] = True
+        else:
+            match = _HUNK_RE.match(line)
+            if match:
+                if patch is None:
+                    raise ValueError("Hunk before any file header")
+                old_start, old_count, new_start, new_count = match.groups()
+                hunk = {
+                    "old_start": int(old_start), "old_count": 1 if old_count is None else int(old_count),
+                    "new_start": int(new_start), "new_count": 1 if new_count is None else int(new_count),
+                    "lines": [], "old_eof_newline": True, "new_eof_newline": True,
+                }
+                old_left, new_left = hunk["old_count"], hunk["new_count"]
+                patch["hunks"].append(hunk)
+    if hunk is not None and (old_left > 0 or new_left > 0):
+        raise ValueError(f"Hunk at +{hunk['new_start']} in {patch['path']} ends early")
+    for entry in patches:
+        old, new = entry["old_path"], entry["path"]
+        if not git and (old or "a/")[:2] == "a/" and (new or "b/")[:2] == "b/":
+            # diff -u a/… b/… from two checkouts, as git would write it
+            entry["old_path"], entry["path"] = old and old[2:], new and new[2:]
+        if entry["path"] is None:
+            entry["path"] = entry["old_path"]
+    return [entry for entry in patches if entry["path"]]
+
+
+def apply_hunks(base: str, hunks: List[Dict]) -> str:
+    """``base`` with ``hunks`` applied (exact context match, trailing
+    ``\\r`` ignored); raises ``ValueError`` on a mismatch."""
+    old = base.split("\n") if base else []
+    ends_with_newline = not base or base.endswith("\n")
+    if base.endswith("\n"):
+        old.pop()  # the final newline, restored below
+    out: List[str] = []
+    pos = 0
+    for hunk in hunks:
+        # A hunk that only adds lines names the line it comes after.
+        start = hunk["old_start"] - 1 if hunk["old_count"] else hunk["old_start"]
+        if start < pos or start > len(old):
+            raise ValueError(f"Hunk at -{hunk['old_start']} does not fit the base file")
+        out.extend(old[pos:start])
+        pos = start
+        for op, text in hunk["lines"]:
+            if op != "+":
+                if pos >= len(old) or old[pos].rstrip("\r") != text.rstrip("\r"):
+                    raise ValueError(f"Base file does not match the diff at line {pos + 1}")
+                pos += 1
+            if op != "-":
+                out.append(text)
+        if pos == len(old):
+            ends_with_newline = hunk["new_eof_newline"]
+    out.extend(old[pos:])
+    text = "\n".join(out)
+    return text + "\n" if ends_with_newline and out else text
+
+
+def _new_side(hunk: Dict) -> Tuple[List[str], Set[int]]:
+    """The hunk's new-file lines and which of them (absolute numbers) the
+    diff changed: added lines, and the line a removal happened at."""
+    lines: List[str] = []
+    changed: Set[int] = set()
+    number = hunk["new_start"] if hunk["new_count"] else hunk["new_start"] + 1
+    removed = False
+    for op, text in hunk["lines"]:
+        if op == "-":
+            removed = True
+            continue
+        if op == "+" or removed:
+            changed.add(number)
+        removed = False
+        lines.append(text)
+        number += 1
+    if removed and lines:
+        changed.add(number - 1)  # removed at the end of the hunk
+    elif removed:
+        changed.add(max(1, number - 1))
+    return lines, changed
+
+
+# ---------------------------------------------------------------------------
+# Linting changed regions
+# ---------------------------------------------------------------------------
+def _rule_groups(language: str, selection: Optional[Tuple[str, ...]]) -> Tuple[Tuple[str, ...], ...]:
+    """(element, css, document) rule ids for ``language``: element rules
+    only read their element; document rules need the whole file."""
+    element, css, document = [], [], []
+    for r in code_audit.RULES.values():
+        if language not in r.languages or (selection is not None and r.rule_id not in selection):
+            continue
+        if r.text is not None:
+            css.append(r.rule_id)
+        elif r.scope == "document" or r.document is not None:
+            document.append(r.rule_id)
+        else:
+            element.append(r.rule_id)
+    return tuple(element), tuple(css), tuple(document)
+
+
+def _runs(lines: Iterable[int]) -> List[Tuple[int, int]]:
+    """Sorted line numbers → ``[(first, last), …]`` runs of consecutive lines."""
+    runs: List[Tuple[int, int]] = []
+    for line in sorted(lines):
+        if runs and line == runs[-1][1] + 1:
+            runs[-1] = (runs[-1][0], line)
+        else:
+            runs.append((line, line))
+    return runs
+
+
+class _Chunk:
+    """A contiguous stretch of the new file: the whole file, or one hunk's
+    new side when the base is unknown (``whole`` false)."""
+
+    def __init__(self, text: str, first_line: int, whole: bool) -> None:
+        self.text = text
+        self.first_line = first_line
+        self.whole = whole
+        self.lines = text.split("\n")
+        self.newlines = code_audit._newline_offsets(text)
+        self._tags: Optional[List[Tuple[int, int, str]]] = None
+        self.tag_starts: List[int] = []
+        self._closers: Optional[Dict[str, List[int]]] = None
+
+    def offset_of_line(self, line: int) -> int:
+        """Offset where absolute ``line`` starts (clamped to the chunk)."""
+        index = line - self.first_line
+        if index <= 0:
+            return 0
+        if index > len(self.newlines):
+            return len(self.text)
+        return self.newlines[index - 1] + 1
+
+    def line_at(self, offset: int) -> int:
+        return self.first_line + bisect_left(self.newlines, offset)
+
+    @property
+    def tags(self) -> List[Tuple[int, int, str]]:
+        if self._tags is None:
+            self._tags = [(m.start(), m.end(), m.group("tag").lower())
+                          for m in code_audit._start_tags(self.text)]
+            self.tag_starts = [t[0] for t in self._tags]
+        return self._tags
+
+    @property
+    def closers(self) -> Dict[str, List[int]]:
+        if self._closers is None:
+            self._closers = {"a": [], "button": []}
+            for m in code_audit._CLOSER_RE.finditer(self.text):
+                self._closers[m.group("tag").lower()].append(m.end())
+        return self._closers
+
+    def element_end(self, tag_end: int, tag: str) -> Optional[int]:
+        """Where what a rule reads of this element ends: its start tag, or
+        for a link / button its closing tag (``None``: not in the chunk)."""
+        if tag not in _CONTENT_TAGS:
+            return tag_end
+        closers = self.closers[tag]
+        # closers holds end offsets; the first closer starting at or after
+        # tag_end is the first whose end is past it.
+        i = bisect_right(closers, tag_end)
+        return closers[i] if i < len(closers) else None
+
+
+def _element_regions(chunk: _Chunk, runs: List[Tuple[int, int]]) -> List[Tuple[int, int, Set[int]]]:
+    """``(start, end, incomplete)`` offsets of the changed runs widened to
+    whole elements; ``incomplete`` holds lines of links / buttons whose
+    closing tag lies outside the chunk."""
+    tags = chunk.tags
+    starts = chunk.tag_starts
+    regions: List[List] = []
+    for first, last in runs:
+        start, end = chunk.offset_of_line(first), chunk.offset_of_line(last + 1)
+        incomplete: Set[int] = set()
+        # Links / buttons before the run whose text reaches into it: those
+        # after the last closing tag of their kind that ends before it.
+        run_start = start
+        for kind, closer_ends in chunk.closers.items():
+            i = bisect_right(closer_ends, run_start) - 1
+            low = closer_ends[i] if i >= 0 else 0
+            for j in range(max(0, bisect_left(starts, low) - 1), bisect_left(starts, run_start)):
+                tag_start, tag_end, tag = tags[j]
+                if tag == kind and (chunk.element_end(tag_end, tag) or 0) > run_start:
+                    start = min(start, tag_start)
+                    break
+        grown = True
+        while grown:
+            grown = False
+            j = max(0, bisect_left(starts, start) - 1)
+            while j < len(tags) and tags[j][0] < end:
+                tag_start, tag_end, tag = tags[j]
+                j += 1
+                if tag_end <= start:
+                    continue
+                reach = chunk.element_end(tag_end, tag)
+                if reach is None:
+                    if not chunk.whole:  # its closing tag may be past the hunk
+                        incomplete.add(chunk.line_at(tag_start))
+                    reach = tag_end
+                if tag_start < start or reach > end:
+                    start, end = min(start, tag_start), max(end, reach)
+                    grown = True
+        if regions and start <= regions[-1][1]:
+            regions[-1][1] = max(regions[-1][1], end)
+            regions[-1][2] |= incomplete
+        else:
+            regions.append([start, end, incomplete])
+    return [tuple(r) for r in regions]
+
+
+def _css_regions(chunk: _Chunk, runs: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """The changed runs widened to the ``}`` … ``}`` blocks around them."""
+    text = chunk.text
+    regions: List[List[int]] = []
+    for first, last in runs:
+        start = text.rfind("}", 0, chunk.offset_of_line(first)) + 1
+        if not start and not chunk.whole and chunk.first_line > 1:
+            # The block began before the hunk: it cannot be judged.
+            start = text.find("}") + 1
+            if not start or start >= chunk.offset_of_line(last + 1):
+                continue
+        end = text.find("}", max(start, chunk.offset_of_line(last + 1) - 1))
+        end = len(text) if end < 0 else end + 1
+        if regions and start <= regions[-1][1]:
+            regions[-1][1] = max(regions[-1][1], end)
+        else:
+            regions.append([start, end])
+    return [tuple(r) for r in regions]
+
+
+def _lint(chunk: _Chunk, start: int, end: int, language: str, rule_ids: Tuple[str, ...]) -> List[Dict]:
+    """``audit_code`` over ``chunk.text[start:end]``, lines made absolute."""
+    if not rule_ids or start >= end:
+        return []
+    region = chunk.text[start:end]
+    offset = chunk.line_at(start) - 1
+    findings = []
+    for f in code_audit.audit_code(region, language, rules=rule_ids)["findings"]:
+        f = dict(f, line=f["line"] + offset)
+        f["snippet"] = code_audit._snippet_of(chunk.lines, f["line"] - chunk.first_line + 1)
+        findings.append(f)
+    return findings
+
+
+def _touches(chunk: _Chunk, start: int, end: int, changed: Set[int]) -> Dict[int, bool]:
+    """Line → whether an element starting on it (in ``[start, end)``)
+    overlaps a changed line."""
+    touched: Dict[int, bool] = {}
+    tags = chunk.tags
+    i = bisect_left(chunk.tag_starts, start)
+    while i < len(tags) and tags[i][0] < end:
+        tag_start, tag_end, tag = tags[i]
+        i += 1
+        first = chunk.line_at(tag_start)
+        reach = chunk.element_end(tag_end, tag) or tag_end
+        last = chunk.line_at(max(tag_start, reach - 1))
+        if not touched.get(first):
+            touched[first] = any(line in changed for line in range(first, last + 1))
+    return touched
+
+
+def _patch_chars(patch: Dict) -> int:
+    return sum(len(text) + 2 for hunk in patch["hunks"] for _, text in hunk["lines"])
+
+
+def _audit_file(patch: Dict, base: Optional[str], hint_lang: str,
+                selection: Optional[Tuple[str, ...]],
+                guard: audit_limits.AuditGuard) -> Tuple[Dict, List[Dict]]:
+    hunks = patch["hunks"]
+    changed: Set[int] = set()
+    sides = []
+    for hunk in hunks:
+        lines, hunk_changed = _new_side(hunk)
+        sides.append(lines)
+        changed |= hunk_changed
+
+    if patch["new_file"]:
+        base = ""
+    if base is not None:
+        new_text = apply_hunks(base, hunks)
+        chunks = [_Chunk(new_text, 1, True)]
+    else:
+        new_text = None
+        chunks = [_Chunk("\n".join(lines), h["new_start"] if h["new_count"] else h["new_start"] + 1, False)
+                  for h, lines in zip(hunks, sides) if lines]
+
+    language = code_project.language_of(patch["path"]) or code_audit._detect_language(
+        "\n".join("\n".join(lines) for lines in sides), hint_lang)
+    element_rules, css_rules, document_rules = _rule_groups(language, selection)
+
+    findings: List[Dict] = []
+    linted = 0
+    complete = True
+    for chunk in chunks:
+        last_line = chunk.first_line + len(chunk.lines) - 1
+        runs = _runs(line for line in changed if chunk.first_line <= line <= last_line)
+        if not runs:
+            continue
+        if element_rules:
+            for start, end, incomplete in _element_regions(chunk, runs):
+                if guard.expired():
+                    complete = False
+                    break
+                touched = _touches(chunk, start, end, changed)
+                linted += end - start
+                for f in _lint(chunk, start, end, language, element_rules):
+                    if code_audit.RULES[f["rule_id"]].scope == "content" and f["line"] in incomplete:
+                        continue  # its text runs past what the diff shows
+                    if f["line"] in changed or touched.get(f["line"]):
+                        findings.append(f)
+        if css_rules:
+            for start, end in _css_regions(chunk, runs):
+                if guard.expired():
+                    complete = False
+                    break
+                linted += end - start
+                findings.extend(_lint(chunk, start, end, language, css_rules))
+
+    if guard.expired():
+        complete = False  # the last region's audit_code may have been cut short
+    if document_rules and not complete:
+        document_status = "skipped: time budget"
+    elif document_rules and new_text is not None:
+        before = Counter((f["rule_id"], f["message"]) for f in
+                         code_audit.audit_code(base, language, rules=document_rules)["findings"]) \
+            if base else Counter()
+        after = code_audit.audit_code(new_text, language, rules=document_rules)["findings"]
+        grew = Counter((f["rule_id"], f["message"]) for f in after) - before
+        for f in after:
+            if f["line"] in changed or grew[(f["rule_id"], f["message"])]:
+                findings.append(f)
+        document_status = "checked"
+    elif document_rules:
+        document_status = "skipped: base file not provided"
+    else:
+        document_status = "none selected"
+
+    findings = [dict(f, path=patch["path"]) for f in findings]
+    summary = {
+        "path": patch["path"],
+        "language": language,
+        "new_file": patch["new_file"],
+        "hunks": len(hunks),
+        "lines_added": sum(op == "+" for hunk in hunks for op, _ in hunk["lines"]),
+        "lines_removed": sum(op == "-" for hunk in hunks for op, _ in hunk["lines"]),
+        "changed_lines": len(changed),
+        "linted_chars": linted,
+        "document_rules": document_status,
+        "complete": complete,
+    }
+    return summary, findings
+
+
+@evidence_cache.memoize("audit_diff")
+def audit_diff(diff: str, base: Union[str, Dict[str, str], None] = None, hint_lang: str = "auto",
+               rules: Optional[Iterable[str]] = None) -> Dict:
+    """Lint the changes in a unified ``diff``; see the module docstring.
+
+    ``base`` is the pre-change text of the (single) file, or a mapping of
+    paths to pre-change texts. Raises ``ValueError`` for a diff with no
+    file changes, a base that does not match it, or unknown rules.
+    Files past the input cap or time budget are skipped (see the module
+    docstring).
+    """
+    guard = audit_limits.AuditGuard("audit_diff")
+    selection = code_audit.select_rules(rules)
+    patches = [p for p in parse_unified_diff(diff) if p["hunks"]]
+    if not patches:
+        raise ValueError("The diff contains no file changes")
+    if isinstance(base, str):
+        if len(patches) > 1:
+            raise ValueError("The diff changes several files; send base as {path: contents}")
+        base = {patches[0]["old_path"] or patches[0]["path"]: base}
+    base = base or {}
+
+    guard.input_chars = sum(_patch_chars(p) for p in patches)
+    used = 0
+    files: List[Dict] = []
+    findings: List[Dict] = []
+    skipped: List[Dict] = []
+    for patch in patches:
+        if patch["deleted"] or patch["binary"]:
+            skipped.append({"path": patch["path"], "reason": "deleted" if patch["deleted"] else "binary"})
+            continue
+        if code_project.language_of(patch["path"]) is None and len(patches) > 1:
+            skipped.append({"path": patch["path"], "reason": "not a markup or stylesheet file"})
+            continue
+        old = base.get(patch["old_path"]) if patch["old_path"] else None
+        if old is None:
+            old = base.get(patch["path"])
+        size = _patch_chars(patch)
+        if 0 < guard.max_chars < used + size:
+            guard.capped_at(used)
+            skipped.append({"path": patch["path"], "reason": "input cap"})
+            continue
+        if guard.expired():
+            guard.stopped_at(used)
+            skipped.append({"path": patch["path"], "reason": "time budget"})
+            continue
+        with guard.active():
+            summary, found = _audit_file(patch, old, hint_lang, selection, guard)
+        if not summary["complete"]:
+            guard.stopped_at(used)
+        used += size
+        files.append(summary)
+        findings.extend(found)
+
+    languages = sorted({f["language"] for f in files})
+    evidence = code_audit._evidence(
+        languages[0] if len(languages) == 1 else "mixed" if languages else hint_lang,
+        findings, sum(f["changed_lines"] for f in files), sum(f["linted_chars"] for f in files),
+        selection)
+    evidence["mode"] = "diff"
+    evidence["files"] = files
+    if skipped:
+        evidence["files_skipped"] = skipped
+    return guard.mark(evidence)
+
+
+def diff_for_prompt(diff: str) -> str:
+    """The diff's hunks for the model: new-file line numbers on kept and
+    added lines (``+``), removed lines (``-``) unnumbered."""
+    out: List[str] = []
+    for patch in parse_unified_diff(diff):
+        if patch["deleted"] or patch["binary"] or not patch["hunks"]:
+            continue
+        out.append(f"=== {patch['path']}{' (new file)' if patch['new_file'] else ''}")
+        for hunk in patch["hunks"]:
+            number = hunk["new_start"] if hunk["new_count"] else hunk["new_start"] + 1
+            out.append(f"@@ new lines {number}-{number + max(hunk['new_count'], 1) - 1}")
+            for op, text in hunk["lines"]:
+                if op == "-":
+                    out.append(f"{'':>5} - {text}")
+                else:
+                    out.append(f"{number:>5} {op} {text}")
+                    number += 1
+    return "\n".join(out)
@@ -0,0 +1,677 @@
+"""
+code_lsp.py
+===========
+
+The ``code_audit`` lint as a language server (LSP over stdio), so editors
+show accessibility findings while the markup is being typed.
+
+Each open document keeps what the rules need, split into runs of regex
+matches that an edit can update in place:
+
+* **Start tags** (``code_audit._TAG_RE``) — each with the findings of its
+  ``scope="tag"`` rules, which only read the tag itself, and of its
+  ``scope="content"`` rules (link / button text), which read up to the
+  next ``</a>`` / ``</button>``.
+* **Closers, ``<label>`` bodies, line starts** — the indexes behind inner
+  text, ``label_for`` and line numbers.
+* **CSS segments** — the text between ``}`` characters. No CSS rule match
+  spans a ``}``, so the text rules can run per segment.
+
+An edit re-matches each run from the last match that ends before the edit
+until the matches line up with the old ones again (shifted by the edit's
+length), and only the new matches are linted. Content rules are re-run for
+the links / buttons whose closing tag may have moved. The document-level
+rules (``scope="document"``: duplicate-id, heading order, missing title /
+viewport / h1, input labels) are re-run only when the edit adds or
+removes a tag they look at, changes the ``<label for>`` ids or whether
+the text looks like a full document, or touches a line they reported on;
+otherwise their findings just move with the lines.
+
+Diagnostics carry the rule_id as ``code``, the severity mapped to LSP
+severities, the WCAG criterion and level in the message and the W3C
+reference as ``codeDescription``. ``initializationOptions.rules`` limits
+the lint to those rule_ids; ``languageId`` picks the lint language
+(``html``, ``javascriptreact`` / ``typescriptreact``, ``vue``, ``css`` /
+``scss`` / ``less``; others are ignored).
+
+Command line (the editor starts it)::
+
+    python code_lsp.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import json
+import os
+import re
+import sys
+import time
+from bisect import bisect_left
+from collections import Counter
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+import code_audit
+
+# ---------------------------------------------------------------------------
+# Configuration (read from environment / .env)
+# ---------------------------------------------------------------------------
+CODE_LSP_MAX_DIAGNOSTICS = int(os.getenv("CODE_LSP_MAX_DIAGNOSTICS", "1000"))
+
+# LSP languageId -> code_audit language.
+LANGUAGE_IDS = {
+    "html": "html",
+    "javascriptreact": "jsx", "typescriptreact": "jsx",
+    "vue": "vue",
+    "css": "css", "scss": "css", "less": "css",
+}
+_LSP_SEVERITY = {"critical": 1, "high": 1, "moderate": 2, "low": 3}
+
+_CLOSER_RES = {
+    "a": re.compile(r'<\s*/\s*a\s*>', re.IGNORECASE),
+    "button": re.compile(r'<\s*/\s*button\s*>', re.IGNORECASE),
+}
+# One <label …> body: what code_audit's label_for scans for for= ids.
+_LABEL_BODY_RE = re.compile(r'(?P<head><\s*label\b)[^>]*', re.IGNORECASE)
+_SEGMENT_RE = re.compile(r'[^}]*\}|[^}]+')
+# What makes markup "look like a document" besides an <html> tag (ASCII
+# case-insensitive, as ``str.lower()`` + ``in`` is for these words).
+_DOC_MARKER_RE = re.compile(r'<(?:!doctype|head)', re.IGNORECASE | re.ASCII)
+_DOC_MARKER_LEN = len("<!doctype")
+
+
+def _by_line_and_rule(item: tuple) -> Tuple[int, str]:
+    return item[0], item[1]
+
+
+# ---------------------------------------------------------------------------
+# Incrementally maintained match runs
+# ---------------------------------------------------------------------------
+class _Stream:
+    """Non-overlapping matches of ``pattern`` over a text, as parallel
+    ``starts`` / ``lengths`` / ``items`` (a payload per match) lists.
+
+    ``lookahead`` is how many characters past its end a match depends on
+    (``\\b``, a greedy run that stops at a character or the end). ``until``
+    is a character every match ends with: scans stop after its last
+    occurrence (see ``code_audit._start_tags``).
+    """
+
+    def __init__(self, pattern: "re.Pattern", lookahead: int = 0, until: str = "") -> None:
+        self.pattern = pattern
+        self.lookahead = lookahead
+        self.until = until
+        self.starts: List[int] = []
+        self.lengths: List[int] = []
+        self.items: List[Any] = []
+
+    def edit(self, text: str, start: int, old_end: int, delta: int) -> Tuple[int, List[Any], list]:
+        """Re-match after the old ``[start, old_end)`` was replaced by
+        ``delta`` more characters, giving the new ``text``.
+
+        Returns ``(i, removed, matches)``: the old items ``removed`` were at
+        ``i``; ``matches`` now take their place, with ``None`` items for the
+        caller to fill in. Later matches are only shifted.
+        """
+        starts, lengths = self.starts, self.lengths
+        i = bisect_left(starts, start)
+        while i and starts[i - 1] + lengths[i - 1] + self.lookahead > start:
+            i -= 1
+        pos = starts[i - 1] + lengths[i - 1] if i else 0
+        new_end = old_end + delta
+        k = bisect_left(starts, old_end, i)
+        count = len(starts)
+        found = []
+        stop = text.rfind(self.until) + 1 if self.until else len(text)
+        for m in self.pattern.finditer(text, pos, stop):
+            m_start = m.start()
+            if m_start >= new_end:
+                # Past the edit: stop at the first match the old run had too.
+                target = m_start - delta
+                while k < count and starts[k] < target:
+                    k += 1
+                if k < count and starts[k] == target and lengths[k] == m.end() - m_start:
+                    break
+            found.append(m)
+        else:
+            k = count
+        removed = self.items[i:k]
+        self.starts[i:] = [m.start() for m in found] + [s + delta for s in starts[k:]]
+        self.lengths[i:k] = [m.end() - m.start() for m in found]
+        self.items[i:k] = [None] * len(found)
+        return i, removed, found
+
+
+class _Token:
+    """A start tag that some rule looks at, with the findings of its
+    tag- and content-scope rules as ``(rule_id, message)``."""
+
+    __slots__ = ("el", "rules", "local", "content", "content_rules", "doc_rules")
+
+    def __init__(self, el: "code_audit._Element", rules: tuple) -> None:
+        self.el = el
+        self.rules = rules
+        self.local: List[Tuple[str, str]] = []
+        self.content: List[Tuple[str, str]] = []
+        self.content_rules = tuple(r for r in rules if r.scope == "content")
+        self.doc_rules = tuple(r for r in rules if r.scope == "document")
+
+
+class _Context:
+    """What ``code_audit``'s markup rules read from ``ctx``, answered from a
+    ``Document`` (which also plays ``ctx.index``)."""
+
+    def __init__(self, document: "Document") -> None:
+        self.code = document.text
+        self.index = document
+        self.state: Dict[str, object] = {}
+        self.has_html_tag = document._html_tags > 0
+        self.looks_like_doc = self.has_html_tag or document._doc_markers > 0
+
+
+# ---------------------------------------------------------------------------
+# Documents
+# ---------------------------------------------------------------------------
+class Document:
+    """One open document and its lint state.
+
+    ``edit(start, end, text)`` replaces ``[start, end)`` (code-point
+    offsets) and re-lints what the edit can affect; ``findings()`` gives
+    the same findings ``code_audit.audit_code`` would, plus each one's
+    source ``range``. ``last_edit`` says how much work the last edit took.
+    """
+
+    def __init__(self, text: str, language: str, rules: Optional[List[str]] = None) -> None:
+        self.language = language
+        self.plan = code_audit._plan_for(language, code_audit.select_rules(rules))
+        kinds = {tag for tag, rules in self.plan.by_tag.items()
+                 if any(r.scope == "content" for r in rules)}
+        self._closers = {kind: _Stream(_CLOSER_RES[kind]) for kind in _CLOSER_RES if kind in kinds}
+        # Rules whose findings need more than one tag, and those of them
+        # that also depend on whether the text looks like a full document.
+        self._document_rules = tuple(dict.fromkeys(
+            [r.rule_id for rules in (*self.plan.by_tag.values(), self.plan.any_tag)
+             for r in rules if r.scope == "document"]
+            + [r.rule_id for r in self.plan.document]))
+        self._doc_like_rules = {r.rule_id for r in self.plan.document}
+        self.last_edit: Dict[str, Any] = {}
+        self.replace(text)
+
+    def replace(self, text: str) -> None:
+        """Start over with ``text`` (a full-document change)."""
+        self.text = ""
+        self._newlines: List[int] = []
+        self._tokens = _Stream(code_audit._TAG_RE, until=">")
+        self._labels = _Stream(_LABEL_BODY_RE, lookahead=1)
+        self._label_for: Counter = Counter()
+        self._segments = _Stream(_SEGMENT_RE, lookahead=1)
+        for kind in self._closers:
+            self._closers[kind] = _Stream(_CLOSER_RES[kind])
+        self._doc_markers = 0
+        self._html_tags = 0
+        # rule_id -> its document-scope findings, [line, message, start, end].
+        self._doc: Dict[str, List[list]] = {}
+        self.edit(0, 0, text)
+
+    # ---- what the rules read through ctx.index ---------------------------
+    @property
+    def label_for(self) -> Counter:
+        return self._label_for
+
+    def inner_text(self, end_pos: int, tag: str) -> str:
+        return code_audit._inner_text(self.text, self._closers[tag].starts, end_pos)
+
+    # ---- editing ---------------------------------------------------------
+    def edit(self, start: int, end: int, new_text: str) -> None:
+        started = time.perf_counter()
+        old = self.text
+        start = max(0, min(start, len(old)))
+        end = max(start, min(end, len(old)))
+        text = self.text = old[:start] + new_text + old[end:]
+        delta = len(new_text) - (end - start)
+
+        newlines = self._newlines
+        lo, hi = bisect_left(newlines, start), bisect_left(newlines, end)
+        added = [m.start() + start for m in re.finditer("\n", new_text)]
+        self._newlines = newlines[:lo] + added + [p + delta for p in newlines[hi:]]
+        first_line, last_line, line_delta = lo + 1, hi + 1, len(added) - (hi - lo)
+
+        self.last_edit = {"tags_relinted": 0, "content_relinted": 0, "segments_relinted": 0,
+                          "document_rules": []}
+        if self.plan.markup:
+            dirty = self._edit_markup(old, start, end, delta)
+            if not old:
+                dirty.update(self._document_rules)
+            for rule_id, found in self._doc.items():
+                if rule_id not in dirty:
+                    if any(first_line <= f[0] <= last_line for f in found):
+                        dirty.add(rule_id)
+                        continue
+                    for f in found:
+                        if f[0] > last_line:
+                            f[0] += line_delta
+                        if f[2] is not None and f[2] >= end:
+                            f[2] += delta
+                            f[3] += delta
+            if dirty:
+                self._document_pass(dirty)
+        if self.plan.text:
+            self._edit_segments(start, end, delta)
+        self.last_edit["ms"] = round((time.perf_counter() - started) * 1000, 3)
+
+    def _edit_markup(self, old: str, start: int, end: int, delta: int) -> set:
+        """Update the markup indexes and tag / content findings; the
+        document-scope rules that must run again."""
+        text = self.text
+        dirty: set = set()
+
+        # Closers first: content rules of new tags read them.
+        stable_closer = {}
+        for kind, stream in self._closers.items():
+            i, _, found = stream.edit(text, start, end, delta)
+            resync = i + len(found)
+            stable_closer[kind] = (stream.starts[i - 1] if i else -1,
+                                   stream.starts[resync] if resync < len(stream.starts) else len(text))
+
+        i, removed, found = self._labels.edit(text, start, end, delta)
+        label_for = self._label_for
+        for j, m in enumerate(found):
+            ids = set()
+            for f in code_audit._FOR_RE.finditer(text, m.end("head"), m.end()):
+                stop = min(m.end(), f.end() + code_audit._MAX_LABEL_ID_CHARS + 1)
+                for q in code_audit._QUOTE_RE.finditer(text, f.end(), stop):
+                    ids.add(text[f.end():q.start()].lower())
+            self._labels.items[i + j] = ids
+            for label_id in ids:
+                label_for[label_id] += 1
+                if label_for[label_id] == 1:
+                    dirty.add("input-missing-label")
+        for ids in removed:
+            for label_id in ids:
+                label_for[label_id] -= 1
+                if not label_for[label_id]:
+                    del label_for[label_id]
+                    dirty.add("input-missing-label")
+
+        window = _DOC_MARKER_LEN - 1
+        before = len(_DOC_MARKER_RE.findall(old, max(0, start - window), end + window))
+        after = len(_DOC_MARKER_RE.findall(text, max(0, start - window), end + delta + window))
+        looked_like_doc = self._html_tags > 0 or self._doc_markers > 0
+        self._doc_markers += after - before
+
+        tokens = self._tokens
+        i, removed, found = tokens.edit(text, start, end, delta)
+        html_tags = self._html_tags
+        ctx = _Context(self)
+        for tok in removed:
+            if tok is not None:
+                dirty.update(r.rule_id for r in tok.doc_rules)
+                html_tags -= tok.el.tag == "html"
+        for j, m in enumerate(found):
+            tok = tokens.items[i + j] = self._token(m, ctx)
+            if tok is not None:
+                dirty.update(r.rule_id for r in tok.doc_rules)
+                html_tags += tok.el.tag == "html"
+                if tok.content_rules:
+                    self._content(tok, m.end(), ctx)
+        if (self._html_tags > 0) != (html_tags > 0):
+            dirty.update(self._doc_like_rules)  # missing-lang reads has_html_tag
+        self._html_tags = html_tags
+        if looked_like_doc != (html_tags > 0 or self._doc_markers > 0):
+            dirty.update(self._doc_like_rules)
+        self.last_edit["tags_relinted"] = len(found)
+
+        # Links / buttons whose next closer lies between the last closer
+        # before the edit and the first one matched again after it.
+        new = range(i, i + len(found))
+        for kind, (low, high) in stable_closer.items():
+            j = max(0, bisect_left(tokens.starts, low) - 1)
+            starts, lengths, items = tokens.starts, tokens.lengths, tokens.items
+            while j < len(starts) and starts[j] < high:
+                tok = items[j]
+                if (tok is not None and tok.content_rules and tok.el.tag == kind
+                        and j not in new and starts[j] + lengths[j] > low):
+                    self._content(tok, starts[j] + lengths[j], ctx)
+                j += 1
+        return dirty
+
+    def _token(self, m: "re.Match", ctx: _Context) -> Optional[_Token]:
+        tag = m.group("tag").lower()
+        rules = self.plan.by_tag.get(tag, self.plan.any_tag)
+        if not rules and tag != "html":
+            return None
+        el = code_audit._Element(tag, m.group("attrs") or "", 0, m.end())
+        rules = tuple(r for r in rules if r.attrs is None or el.mentions(r.attrs))
+        if not rules and tag != "html":
+            return None  # html tags are kept: they make a document
+        tok = _Token(el, rules)
+        for r in rules:
+            if r.scope == "tag":
+                message = r.element(el, ctx)
+                if message is not None:
+                    tok.local.append((r.rule_id, message))
+        return tok
+
+    def _content(self, tok: _Token, end: int, ctx: _Context) -> None:
+        el = tok.el
+        el.end = end
+        el._inner = None
+        tok.content = []
+        for r in tok.content_rules:
+            message = r.element(el, ctx)
+            if message is not None:
+                tok.content.append((r.rule_id, message))
+        self.last_edit["content_relinted"] += 1
+
+    def _document_pass(self, rule_ids: set) -> None:
+        """Re-run the document-scope rules ``rule_ids`` (element hooks over
+        every tag they look at, then their document hook)."""
+        ctx = _Context(self)
+        found: Dict[str, List[list]] = {rule_id: [] for rule_id in self._document_rules
+                                        if rule_id in rule_ids}
+        newlines = self._newlines
+        tokens = self._tokens
+        for start, length, tok in zip(tokens.starts, tokens.lengths, tokens.items):
+            if tok is None or not tok.doc_rules:
+                continue
+            el = None
+            for r in tok.doc_rules:
+                if r.rule_id not in found:
+                    continue
+                if el is None:
+                    el = tok.el
+                    el.line = bisect_left(newlines, start) + 1
+                    el.end = start + length
+                message = r.element(el, ctx)
+                if message is not None:
+                    found[r.rule_id].append([el.line, message, start, start + length])
+        for r in self.plan.document:
+            if r.rule_id in found:
+                found[r.rule_id].extend([line, message, None, None] for line, message in r.document(ctx))
+        self._doc.update(found)
+        self.last_edit["document_rules"] = list(found)
+
+    def _edit_segments(self, start: int, end: int, delta: int) -> None:
+        segments = self._segments
+        i, _, found = segments.edit(self.text, start, end, delta)
+        for j, m in enumerate(found):
+            segment = m.group()
+            newlines = code_audit._newline_offsets(segment)
+            blocks = code_audit._css_blocks(segment)
+            hits = [(line, r.rule_id, message) for r in self.plan.text
+                    for line, message in r.text(segment, newlines, blocks)]
+            segments.items[i + j] = hits or None
+        self.last_edit["segments_relinted"] = len(found)
+
+    # ---- results -----------------------------------------------------------
+    def findings(self, limit: Optional[int] = None) -> List[Dict]:
+        """Findings as ``audit_code`` reports them (same order, deduplicated
+        per rule and line), each with ``range``: the ``(start, end)`` offsets
+        of the start tag, or ``None`` for line-level findings. ``limit``
+        keeps only the first ones."""
+        newlines = self._newlines
+
+        def tag_findings():
+            # Tags are in line order; a line's findings are sorted by rule.
+            tokens = self._tokens
+            pending: list = []
+            for start, length, tok in zip(tokens.starts, tokens.lengths, tokens.items):
+                if tok is not None and (tok.local or tok.content):
+                    line = bisect_left(newlines, start) + 1
+                    if pending and pending[0][0] != line:
+                        pending.sort(key=_by_line_and_rule)
+                        yield from pending
+                        pending = []
+                    span = (start, start + length)
+                    pending.extend((line, rule_id, message, span) for rule_id, message in tok.local)
+                    pending.extend((line, rule_id, message, span) for rule_id, message in tok.content)
+            pending.sort(key=_by_line_and_rule)
+            yield from pending
+
+        document = [(line, rule_id, message, None if start is None else (start, end))
+                    for rule_id, found in self._doc.items() for line, message, start, end in found]
+        document.sort(key=_by_line_and_rule)
+        stylesheet = [(bisect_left(newlines, start) + line, rule_id, message, None)
+                      for start, hits in zip(self._segments.starts, self._segments.items) if hits
+                      for line, rule_id, message in hits]
+        stylesheet.sort(key=_by_line_and_rule)
+
+        results = []
+        last = None
+        # Ties keep audit_code's order: tags, then document rules, then CSS.
+        for line, rule_id, message, span in heapq.merge(tag_findings(), document, stylesheet,
+                                                        key=_by_line_and_rule):
+            if (line, rule_id) == last:
+                continue
+            last = (line, rule_id)
+            if limit is not None and len(results) >= limit:
+                break
+            finding = code_audit._make_finding(rule_id, line, message, self.line_text(line).strip()[:200]).to_dict()
+            finding["range"] = span
+            results.append(finding)
+        return results
+
+    # ---- positions ---------------------------------------------------------
+    def line_text(self, line: int) -> str:
+        """Text of 1-based ``line``, without its newline."""
+        newlines = self._newlines
+        if line < 1 or line > len(newlines) + 1:
+            return ""
+        begin = newlines[line - 2] + 1 if line > 1 else 0
+        return self.text[begin:newlines[line - 1] if line <= len(newlines) else len(self.text)]
+
+    def offset_at(self, line: int, character: int, utf16: bool = True) -> int:
+        """Offset of the LSP position (0-based ``line``; ``character`` in
+        UTF-16 code units, or code points when ``utf16`` is false)."""
+        if line < 0:
+            return 0
+        if line > len(self._newlines):
+            return len(self.text)
+        begin = self._newlines[line - 1] + 1 if line else 0
+        text = self.line_text(line + 1)
+        if not utf16 or text.isascii():
+            return begin + max(0, min(character, len(text)))
+        units = 0
+        for i, ch in enumerate(text):
+            if units >= character:
+                return begin + i
+            units += 2 if ord(ch) > 0xFFFF else 1
+        return begin + len(text)
+
+    def position_of(self, offset: int, utf16: bool = True) -> Dict[str, int]:
+        line = bisect_left(self._newlines, offset)
+        begin = self._newlines[line - 1] + 1 if line else 0
+        before = self.text[begin:offset]
+        character = len(before)
+        if utf16 and not before.isascii():
+            character += sum(1 for ch in before if ord(ch) > 0xFFFF)
+        return {"line": line, "character": character}
+
+
+# ---------------------------------------------------------------------------
+# Diagnostics
+# ---------------------------------------------------------------------------
+def diagnostic(document: Document, finding: Dict, utf16: bool = True) -> Dict:
+    """LSP ``Diagnostic`` for one finding: the start tag's range, or the
+    whole line for line-level findings."""
+    if finding["range"] is not None:
+        start, end = finding["range"]
+        span = {"start": document.position_of(start, utf16), "end": document.position_of(end, utf16)}
+    else:
+        line = finding["line"] - 1
+        length = len(document.line_text(finding["line"]))
+        end = document.position_of(document.offset_at(line, 0, False) + length, utf16)
+        span = {"start": {"line": line, "character": 0}, "end": end}
+    ref = code_audit.CODE_RULE_REFERENCES.get(finding["rule_id"], {})
+    message = finding["message"]
+    if ref:
+        message += f" (WCAG {ref.get('wcag_criterion', '')} level {ref.get('level', '')}: {ref.get('title', '')})"
+    result = {
+        "range": span,
+        "severity": _LSP_SEVERITY.get(finding["severity"], 2),
+        "code": finding["rule_id"],
+        "source": "accessai",
+        "message": message,
+    }
+    if ref.get("w3c"):
+        result["codeDescription"] = {"href": ref["w3c"]}
+    return result
+
+
+# ---------------------------------------------------------------------------
+# JSON-RPC over stdio
+# ---------------------------------------------------------------------------
+def read_message(stream: BinaryIO) -> Optional[Dict]:
+    """Next ``Content-Length``-framed message, or ``None`` at end of input."""
+    length = None
+    while True:
+        header = stream.readline()
+        if not header:
+            return None
+        header = header.strip()
+        if not header:
+            if length is None:
+                continue
+            break
+        name, _, value = header.decode("ascii", "replace").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    body = stream.read(length)
+    if len(body) < length:
+        return None
+    return json.loads(body)
+
+
+def write_message(stream: BinaryIO, message: Dict) -> None:
+    body = json.dumps(message, separators=(",", ":")).encode("utf-8")
+    stream.write(b"Content-Length: %d\r\n\r\n" % len(body) + body)
+    stream.flush()
+
+
+class LanguageServer:
+    """The stdio server: full and incremental document sync, diagnostics
+    published after every change."""
+
+    def __init__(self, reader: BinaryIO, writer: BinaryIO) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.documents: Dict[str, Document] = {}
+        self.rules: Optional[List[str]] = None
+        self.utf16 = True
+        self.shutdown_requested = False
+        self._handlers = {
+            "initialize": self._initialize,
+            "initialized": lambda params: None,
+            "shutdown": self._shutdown,
+            "textDocument/didOpen": self._did_open,
+            "textDocument/didChange": self._did_change,
+            "textDocument/didClose": self._did_close,
+        }
+
+    def serve(self) -> int:
+        """Handle messages until ``exit``; the process exit code."""
+        while True:
+            message = read_message(self.reader)
+            if message is None:
+                return 1
+            if message.get("method") == "exit":
+                return 0 if self.shutdown_requested else 1
+            self.handle(message)
+
+    def handle(self, message: Dict) -> None:
+        method = message.get("method")
+        if method is None:
+            return  # a response to something we never ask
+        handler = self._handlers.get(method)
+        params = message.get("params") or {}
+        if "id" not in message:
+            if handler is not None:
+                try:
+                    handler(params)
+                except Exception as exc:  # keep serving the other documents
+                    print(f"code_lsp: {method} failed: {exc!r}", file=sys.stderr)
+            return
+        if handler is None:
+            self._send({"id": message["id"], "error": {"code": -32601, "message": f"Unknown method {method}"}})
+            return
+        try:
+            result = handler(params)
+        except ValueError as exc:
+            self._send({"id": message["id"], "error": {"code": -32602, "message": str(exc)}})
+        except Exception as exc:
+            self._send({"id": message["id"], "error": {"code": -32603, "message": repr(exc)}})
+        else:
+            self._send({"id": message["id"], "result": result})
+
+    def _send(self, message: Dict) -> None:
+        message["jsonrpc"] = "2.0"
+        write_message(self.writer, message)
+
+    def _initialize(self, params: Dict) -> Dict:
+        options = params.get("initializationOptions") or {}
+        rules = options.get("rules")
+        self.rules = list(code_audit.select_rules(rules)) if rules is not None else None
+        encodings = (params.get("capabilities") or {}).get("general", {}).get("positionEncodings") or []
+        self.utf16 = "utf-32" not in encodings
+        return {
+            "capabilities": {
+                "positionEncoding": "utf-16" if self.utf16 else "utf-32",
+                "textDocumentSync": {"openClose": True, "change": 2},
+            },
+            "serverInfo": {"name": "accessai-code-lsp"},
+        }
+
+    def _shutdown(self, params: Dict) -> None:
+        self.shutdown_requested = True
+        self.documents.clear()
+        return None
+
+    def _did_open(self, params: Dict) -> None:
+        item = params["textDocument"]
+        language = LANGUAGE_IDS.get(item.get("languageId", ""))
+        if language is None:
+            return
+        document = Document(item.get("text", ""), language, self.rules)
+        self.documents[item["uri"]] = document
+        self._publish(item["uri"], document, item.get("version"))
+
+    def _did_change(self, params: Dict) -> None:
+        item = params["textDocument"]
+        document = self.documents.get(item["uri"])
+        if document is None:
+            return
+        for change in params.get("contentChanges", []):
+            span = change.get("range")
+            if span is None:
+                document.replace(change["text"])
+                continue
+            start = document.offset_at(span["start"]["line"], span["start"]["character"], self.utf16)
+            end = document.offset_at(span["end"]["line"], span["end"]["character"], self.utf16)
+            document.edit(start, end, change["text"])
+        self._publish(item["uri"], document, item.get("version"))
+
+    def _did_close(self, params: Dict) -> None:
+        uri = params["textDocument"]["uri"]
+        if self.documents.pop(uri, None) is not None:
+            self._send({"method": "textDocument/publishDiagnostics",
+                        "params": {"uri": uri, "diagnostics": []}})
+
+    def _publish(self, uri: str, document: Document, version: Optional[int]) -> None:
+        findings = document.findings(CODE_LSP_MAX_DIAGNOSTICS)
+        params: Dict[str, Any] = {"uri": uri,
+                                  "diagnostics": [diagnostic(document, f, self.utf16) for f in findings]}
+        if version is not None:
+            params["version"] = version
+        self._send({"method": "textDocument/publishDiagnostics", "params": params})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Accessibility lint language server (LSP over stdio).")
+    parser.add_argument("--stdio", action="store_true", help="accepted for editor compatibility (always stdio)")
+    parser.parse_args()
+    sys.exit(LanguageServer(sys.stdin.buffer, sys.stdout.buffer).serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,524 @@
+"""
+code_project.py
+===============
+
+Project mode for the ``/api/review-code`` lint: every markup and stylesheet
+file of a frontend repository in one run, built on ``code_audit.audit_code``.
+
+* **Sources** — a zip or tar (optionally gzip/bz2/xz) archive
+  (``files_from_archive``) or a local directory (``files_from_directory``).
+  Archives are read in memory and never extracted. Only regular files with a
+  known extension are kept (``.html``/``.htm``, ``.jsx``/``.tsx``, ``.vue``,
+  ``.css``/``.scss``/``.less``); ``node_modules``, VCS and hidden
+  directories are skipped, as are files over ``CODE_PROJECT_MAX_FILE_BYTES``
+  and anything past ``CODE_PROJECT_MAX_FILES`` files or
+  ``CODE_PROJECT_MAX_TOTAL_BYTES`` bytes. Skipped entries cost too, so an
+  archive of more than ``CODE_PROJECT_MAX_ENTRIES`` entries of any kind, or
+  one that unpacks past ``CODE_PROJECT_MAX_ARCHIVE_BYTES``, is refused
+  (``ValueError``) as soon as that is known: for a zip, from its central
+  directory before any entry is loaded; for a tar, at the member that
+  crosses the limit.
+* **Fan-out** — files are grouped into batches and audited on a process
+  pool (``CODE_PROJECT_WORKERS`` processes; ``workers=0`` audits inline).
+  Each gunicorn worker has its own, so the default splits the CPUs between
+  ``WEB_CONCURRENCY`` of them (at most 4 each).
+  The command line starts a pool per run; the web endpoint passes
+  ``shared_executor()``, one long-lived pool started on first use, so
+  concurrent uploads share its processes instead of each spawning its own.
+* **Cache** — evidence is kept per file hash (SHA-256 of the bytes, with
+  the language, the rule selection and the ``code_audit`` source version),
+  so re-auditing a project only lints the files that changed, and identical
+  files in one project are linted once. Evidence a time budget cut short
+  (``audit_limits``) is not kept.
+* **Truncation** — a file the input cap or time budget cut short carries
+  ``truncated``/``truncation`` in its row, and the report's ``truncated``
+  flag is set when any file was.
+* **Report** — one row per file, per-rule rollups (findings, files affected,
+  first locations), severity totals and a combined deterministic score: the
+  per-file scores averaged with each file weighted by its line count.
+
+Command line::
+
+    python code_project.py ./frontend
+    python code_project.py site.zip --rules img-missing-alt,link-empty-name
+"""
+
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import pickle
+import posixpath
+import struct
+import tarfile
+import threading
+import time
+import zipfile
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import code_audit
+import evidence_cache
+
+# ---------------------------------------------------------------------------
+# Configuration (read from environment / .env)
+# ---------------------------------------------------------------------------
+# Gunicorn's worker count (gunicorn reads the same variable); each has a pool.
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+CODE_PROJECT_WORKERS = int(os.getenv("CODE_PROJECT_WORKERS",
+                                     str(max(1, min(4, (os.cpu_count() or 2) // WEB_CONCURRENCY)))))
+CODE_PROJECT_MAX_FILES = int(os.getenv("CODE_PROJECT_MAX_FILES", "20000"))
+CODE_PROJECT_MAX_ENTRIES = int(os.getenv("CODE_PROJECT_MAX_ENTRIES", "100000"))
+CODE_PROJECT_MAX_ARCHIVE_BYTES = int(os.getenv("CODE_PROJECT_MAX_ARCHIVE_BYTES", str(512 * 1024 * 1024)))
+CODE_PROJECT_MAX_FILE_BYTES = int(os.getenv("CODE_PROJECT_MAX_FILE_BYTES", str(1024 * 1024)))
+CODE_PROJECT_MAX_TOTAL_BYTES = int(os.getenv("CODE_PROJECT_MAX_TOTAL_BYTES", str(256 * 1024 * 1024)))
+CODE_PROJECT_MAX_UPLOAD_BYTES = int(os.getenv("CODE_PROJECT_MAX_UPLOAD_BYTES", str(64 * 1024 * 1024)))
+CODE_PROJECT_CACHE_ENTRIES = int(os.getenv("CODE_PROJECT_CACHE_ENTRIES", "50000"))
+CODE_PROJECT_CACHE_BYTES = int(os.getenv("CODE_PROJECT_CACHE_BYTES", str(256 * 1024 * 1024)))
+
+# File extension -> hint_lang passed to audit_code.
+LANGUAGES = {
+    ".html": "html", ".htm": "html",
+    ".jsx": "jsx", ".tsx": "jsx",
+    ".vue": "vue",
+    ".css": "css", ".scss": "css", ".less": "css",
+}
+_SKIP_DIRS = frozenset({"node_modules", "bower_components", "__MACOSX", ".git", ".hg", ".svn"})
+_SEVERITIES = ("critical", "high", "moderate", "low")
+
+# Files per worker task: enough to amortise the pickling round trip, small
+# enough that the last batches spread over all workers.
+_BATCH_FILES = 64
+_BATCH_BYTES = 1024 * 1024
+
+# A file: (path relative to the project root, language, raw bytes).
+SourceFile = Tuple[str, str, bytes]
+
+_cache = evidence_cache.EvidenceCache(CODE_PROJECT_CACHE_ENTRIES, CODE_PROJECT_CACHE_BYTES,
+                                      evidence_cache.EVIDENCE_CACHE_TTL)
+
+_shared_pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+_shared_pid = 0
+_shared_lock = threading.Lock()
+
+
+# ---------------------------------------------------------------------------
+# Sources
+# ---------------------------------------------------------------------------
+def language_of(path: str) -> Optional[str]:
+    """hint_lang for ``path``, or None when it is not a lintable file or
+    lives under a skipped directory."""
+    parts = path.split("/")
+    if any(part in _SKIP_DIRS or part.startswith(".") for part in parts[:-1]):
+        return None
+    return LANGUAGES.get(posixpath.splitext(parts[-1])[1].lower())
+
+
+class _Collector:
+    """Applies the file-count and size limits while a source is read."""
+
+    def __init__(self, max_files: int, max_file_bytes: int, max_total_bytes: int) -> None:
+        self.max_files = max_files
+        self.max_file_bytes = max_file_bytes
+        self.max_total_bytes = max_total_bytes
+        self.files: List[SourceFile] = []
+        self.total_bytes = 0
+        self.skipped = {"unsupported": 0, "too_large": 0, "over_limit": 0, "unreadable": 0}
+
+    def accepts(self, path: str, size: int) -> Optional[str]:
+        """Language to read ``path`` as, or None (the reason is counted)."""
+        language = language_of(path)
+        if language is None:
+            self.skipped["unsupported"] += 1
+        elif size > self.max_file_bytes:
+            self.skipped["too_large"] += 1
+        elif len(self.files) >= self.max_files or self.total_bytes + size > self.max_total_bytes:
+            self.skipped["over_limit"] += 1
+        else:
+            return language
+        return None
+
+    def add(self, path: str, language: str, data: bytes) -> None:
+        # Declared sizes can lie; callers read at most max_file_bytes + 1.
+        if len(data) > self.max_file_bytes:
+            self.skipped["too_large"] += 1
+        elif self.total_bytes + len(data) > self.max_total_bytes:
+            self.skipped["over_limit"] += 1
+        else:
+            self.files.append((path, language, data))
+            self.total_bytes += len(data)
+
+
+def _clean_path(name: str) -> str:
+    return posixpath.normpath(name.replace("\\", "/")).lstrip("/")
+
+
+def files_from_directory(root: str, max_files: int = CODE_PROJECT_MAX_FILES,
+                         max_file_bytes: int = CODE_PROJECT_MAX_FILE_BYTES,
+                         max_total_bytes: int = CODE_PROJECT_MAX_TOTAL_BYTES
+                         ) -> Tuple[List[SourceFile], Dict[str, int]]:
+    """``(files, skipped_counts)`` for the lintable files under ``root``."""
+    collector = _Collector(max_files, max_file_bytes, max_total_bytes)
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in _SKIP_DIRS and not d.startswith("."))
+        for filename in sorted(filenames):
+            full = os.path.join(dirpath, filename)
+            path = os.path.relpath(full, root).replace(os.sep, "/")
+            try:
+                if os.path.islink(full) or not os.path.isfile(full):
+                    continue
+                language = collector.accepts(path, os.path.getsize(full))
+                if language is None:
+                    continue
+                with open(full, "rb") as fh:
+                    collector.add(path, language, fh.read(max_file_bytes + 1))
+            except OSError:
+                collector.skipped["unreadable"] += 1
+    return collector.files, collector.skipped
+
+
+def _zip_entries(data: bytes) -> int:
+    """Central directory headers in a zip, counted in its raw bytes (so
+    before ``ZipFile`` builds a ``ZipInfo`` for each). May overcount, never
+    undercounts: ``ZipFile`` reads the same ``size_cd`` bytes before the end
+    record, whatever entry count the record declares."""
+    end = data.rfind(b"PK\x05\x06", max(0, len(data) - 22 - 0xFFFF))
+    if end < 0 or end + 22 > len(data):
+        return 0  # ZipFile will reject it
+    size_cd = struct.unpack_from("<I", data, end + 12)[0]
+    locator = end - 20
+    if locator >= 0 and data.startswith(b"PK\x06\x07", locator):
+        # Zip64: the directory ends before the zip64 record (56+ bytes) and
+        # locator, and its size is the record's.
+        record = struct.unpack_from("<Q", data, locator + 8)[0]
+        if data.startswith(b"PK\x06\x06", record) and record + 48 <= len(data):
+            size_cd = struct.unpack_from("<Q", data, record + 40)[0]
+            end = record
+    return data.count(b"PK\x01\x02", max(0, end - size_cd), end)
+
+
+def files_from_archive(data: bytes, max_files: int = CODE_PROJECT_MAX_FILES,
+                       max_file_bytes: int = CODE_PROJECT_MAX_FILE_BYTES,
+                       max_total_bytes: int = CODE_PROJECT_MAX_TOTAL_BYTES,
+                       max_entries: int = CODE_PROJECT_MAX_ENTRIES,
+                       max_archive_bytes: int = CODE_PROJECT_MAX_ARCHIVE_BYTES
+                       ) -> Tuple[List[SourceFile], Dict[str, int]]:
+    """``(files, skipped_counts)`` for the lintable files in a zip or tar
+    archive. Raises ``ValueError`` if ``data`` is neither, or has more than
+    ``max_entries`` entries or ``max_archive_bytes`` unpacked."""
+    collector = _Collector(max_files, max_file_bytes, max_total_bytes)
+    too_many = ValueError(f"Archive has more than {max_entries} entries")
+    too_big = ValueError(f"Archive unpacks to more than {max_archive_bytes // (1024 * 1024)} MB")
+    buffer = io.BytesIO(data)
+    if zipfile.is_zipfile(buffer):
+        if _zip_entries(data) > max_entries:
+            raise too_many
+        unpacked = 0
+        with zipfile.ZipFile(buffer) as archive:
+            for info in archive.infolist():
+                is_link = (info.external_attr >> 16) & 0o170000 == 0o120000
+                if info.is_dir() or is_link:
+                    continue
+                path = _clean_path(info.filename)
+                language = collector.accepts(path, info.file_size)
+                if language is None:
+                    continue
+                try:
+                    with archive.open(info) as fh:
+                        content = fh.read(max_file_bytes + 1)
+                    # Only accepted entries are inflated; skipped ones cost nothing.
+                    unpacked += len(content)
+                    if unpacked > max_archive_bytes:
+                        raise too_big
+                    collector.add(path, language, content)
+                except (RuntimeError, zipfile.BadZipFile, OSError, EOFError):  # encrypted / corrupt
+                    collector.skipped["unreadable"] += 1
+        return collector.files, collector.skipped
+
+    buffer.seek(0)
+    try:
+        archive = tarfile.open(fileobj=buffer, mode="r:*")
+    except (tarfile.TarError, EOFError, OSError) as exc:
+        raise ValueError("Upload is not a zip or tar archive") from exc
+    with archive:
+        try:
+            entries = 0
+            while True:
+                member = archive.next()
+                if member is None:
+                    break
+                # TarFile keeps every member it has read; nothing here looks back.
+                archive.members = []
+                entries += 1
+                if entries > max_entries:
+                    raise too_many
+                # Reaching the next header decompresses this member, read or not.
+                if member.offset_data + member.size > max_archive_bytes:
+                    raise too_big
+                if not member.isfile():
+                    continue  # directories, links, devices
+                path = _clean_path(member.name)
+                language = collector.accepts(path, member.size)
+                if language is None:
+                    continue
+                fh = archive.extractfile(member)
+                if fh is None:
+                    collector.skipped["unreadable"] += 1
+                    continue
+                collector.add(path, language, fh.read(max_file_bytes + 1))
+        except (tarfile.TarError, EOFError, OSError):
+            collector.skipped["unreadable"] += 1  # truncated archive: keep what was read
+    return collector.files, collector.skipped
+
+
+# ---------------------------------------------------------------------------
+# Worker-pool task (must be top level so process pools can pickle it)
+# ---------------------------------------------------------------------------
+def _audit_batch(batch: List[Tuple[bytes, str]], rules: Optional[Tuple[str, ...]]) -> List[Dict[str, Any]]:
+    results = []
+    for data, language in batch:
+        try:
+            # Bypass the worker's own evidence cache; the parent caches by file hash.
+            results.append(code_audit.audit_code.__wrapped__(
+                data.decode("utf-8-sig", errors="replace"), language, rules))
+        except Exception as exc:  # one bad file must not stop the project
+            results.append({"error": str(exc)})
+    return results
+
+
+def _pooled_batch(batch: List[Tuple[bytes, str]], rules: Optional[Tuple[str, ...]],
+                  parent: int) -> Tuple[List[Dict[str, Any]], Dict[str, List[float]]]:
+    results = _audit_batch(batch, rules)
+    # A worker process ships its rule counters to the parent; on a thread
+    # pool they were counted in the parent already.
+    return results, code_audit.take_rule_stats() if os.getpid() != parent else {}
+
+
+def _batches(items: List[Tuple[bytes, bytes, str]]) -> Iterable[List[Tuple[bytes, bytes, str]]]:
+    batch: List[Tuple[bytes, bytes, str]] = []
+    size = 0
+    for item in items:
+        if batch and (len(batch) >= _BATCH_FILES or size + len(item[1]) > _BATCH_BYTES):
+            yield batch
+            batch, size = [], 0
+        batch.append(item)
+        size += len(item[1])
+    if batch:
+        yield batch
+
+
+# ---------------------------------------------------------------------------
+# Project audit
+# ---------------------------------------------------------------------------
+def audit_project(files: List[SourceFile], skipped: Optional[Dict[str, int]] = None,
+                  rules: Optional[Iterable[str]] = None, workers: int = CODE_PROJECT_WORKERS,
+                  executor: Optional[concurrent.futures.Executor] = None,
+                  include_findings: bool = False) -> Dict[str, Any]:
+    """Lint every file and return the aggregate report.
+
+    ``rules`` limits the lint as in ``audit_code`` (unknown ids raise
+    ``ValueError``). ``executor`` runs the batches on a pool the caller
+    owns (``shared_executor()`` for the web endpoint); otherwise one of
+    ``workers`` processes is started for this call when there is more than
+    one batch to audit.
+    """
+    started = time.monotonic()
+    selection = code_audit.select_rules(rules)
+    version = evidence_cache.module_version("code_audit") + repr(selection).encode()
+
+    # One audit per distinct (content, language).
+    digests: List[str] = []
+    keys: List[bytes] = []
+    pending: Dict[bytes, Tuple[bytes, str]] = {}
+    evidence_by_key: Dict[bytes, Dict[str, Any]] = {}
+    hits = 0
+    for _, language, data in files:
+        digest = hashlib.sha256(data).hexdigest()
+        key = hashlib.blake2b(version + language.encode() + digest.encode(), digest_size=32).digest()
+        digests.append(digest)
+        keys.append(key)
+        if key in evidence_by_key or key in pending:
+            continue
+        blob = _cache.get(key) if evidence_cache.EVIDENCE_CACHE_ENABLED else None
+        if blob is not None:
+            evidence_by_key[key] = pickle.loads(blob)
+            hits += 1
+        else:
+            pending[key] = (data, language)
+
+    batches = list(_batches([(key, data, language) for key, (data, language) in pending.items()]))
+    for batch, results in zip(batches, _run_batches(batches, selection, workers, executor)):
+        for (key, _, _), evidence in zip(batch, results):
+            evidence_by_key[key] = evidence
+            if ("error" not in evidence and evidence_cache.EVIDENCE_CACHE_ENABLED
+                    and not evidence_cache.time_truncated(evidence)):
+                _cache.put(key, pickle.dumps(evidence, protocol=pickle.HIGHEST_PROTOCOL))
+
+    report = _report(files, digests, [evidence_by_key[key] for key in keys], include_findings)
+    elapsed = time.monotonic() - started
+    report.update(
+        files_skipped=dict(skipped or {}),
+        cache={"hits": hits, "misses": len(pending)},
+        elapsed_ms=int(elapsed * 1000),
+        files_per_second=round(len(files) / elapsed, 1) if elapsed else 0.0,
+    )
+    if selection is not None:
+        report["rules_selected"] = list(selection)
+    return report
+
+
+def _new_pool(workers: int) -> concurrent.futures.ProcessPoolExecutor:
+    # spawn, not fork: the web server process already runs threads.
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def shared_executor() -> Optional[concurrent.futures.Executor]:
+    """The long-lived pool of ``CODE_PROJECT_WORKERS`` processes for the
+    web endpoint, started on first use (and again after a worker died);
+    ``None`` when ``CODE_PROJECT_WORKERS`` is 0."""
+    global _shared_pool, _shared_pid
+    if CODE_PROJECT_WORKERS <= 0:
+        return None
+    with _shared_lock:
+        if _shared_pool is None or _shared_pid != os.getpid():
+            _shared_pool = _new_pool(CODE_PROJECT_WORKERS)
+            _shared_pid = os.getpid()
+        return _shared_pool
+
+
+def shutdown_shared_executor() -> None:
+    global _shared_pool
+    with _shared_lock:
+        pool, _shared_pool = _shared_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+def _discard_shared(pool: concurrent.futures.Executor) -> None:
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is pool:
+            _shared_pool = None
+
+
+def _run_batches(batches: List[List[Tuple[bytes, bytes, str]]], selection: Optional[Tuple[str, ...]],
+                 workers: int, executor: Optional[concurrent.futures.Executor]) -> List[List[Dict[str, Any]]]:
+    tasks = [[(data, language) for _, data, language in batch] for batch in batches]
+    if executor is None and (workers <= 0 or len(tasks) <= 1):
+        return [_audit_batch(task, selection) for task in tasks]
+    owns_pool = executor is None
+    if owns_pool:
+        executor = _new_pool(min(workers, len(tasks)))
+    try:
+        done = list(executor.map(_pooled_batch, tasks, [selection] * len(tasks),
+                                 [os.getpid()] * len(tasks)))
+    except BrokenProcessPool:
+        _discard_shared(executor)  # a worker died: the next call starts a new pool
+        raise
+    finally:
+        if owns_pool:
+            executor.shutdown(wait=True)
+    for _, rule_stats in done:
+        code_audit.add_rule_stats(rule_stats)
+    return [results for results, _ in done]
+
+
+def _report(files: List[SourceFile], digests: List[str], evidences: List[Dict[str, Any]],
+            include_findings: bool) -> Dict[str, Any]:
+    severity_counts = {sev: 0 for sev in _SEVERITIES}
+    languages: Dict[str, int] = {}
+    per_rule: Dict[str, Dict[str, Any]] = {}
+    rows: List[Dict[str, Any]] = []
+    errors: List[Dict[str, str]] = []
+    weighted = weight = truncated = 0
+    for (path, language, _), digest, evidence in zip(files, digests, evidences):
+        languages[language] = languages.get(language, 0) + 1
+        if "error" in evidence:
+            errors.append({"path": path, "error": evidence["error"]})
+            continue
+        rule_counts: Dict[str, int] = {}
+        for f in evidence["findings"]:
+            rule_counts[f["rule_id"]] = rule_counts.get(f["rule_id"], 0) + 1
+            entry = per_rule.get(f["rule_id"])
+            if entry is None:
+                entry = per_rule[f["rule_id"]] = {"rule_id": f["rule_id"], "severity": f["severity"],
+                                                  "wcag_criterion": f["wcag_criterion"],
+                                                  "findings": 0, "files": 0, "locations": []}
+            entry["findings"] += 1
+            if len(entry["locations"]) < 5:
+                entry["locations"].append(f"{path}:{f['line']}")
+        for rule_id in rule_counts:
+            per_rule[rule_id]["files"] += 1
+        for sev, n in evidence["severity_counts"].items():
+            severity_counts[sev] += n
+        lines = max(1, evidence["line_count"])
+        weighted += evidence["deterministic_score"] * lines
+        weight += lines
+        row = {"path": path, "language": evidence["language"], "sha256": digest,
+               "lines": evidence["line_count"], "score": evidence["deterministic_score"],
+               "severity_counts": evidence["severity_counts"], "rules": rule_counts}
+        if evidence.get("truncated"):
+            row["truncated"] = True
+            row["truncation"] = evidence["truncation"]
+            truncated += 1
+        if include_findings:
+            row["findings"] = evidence["findings"]
+        rows.append(row)
+
+    for entry in per_rule.values():
+        entry["title"] = code_audit.CODE_RULE_REFERENCES.get(entry["rule_id"], {}).get("title", "")
+    rank = {sev: i for i, sev in enumerate(_SEVERITIES)}
+    worst = sorted(rows, key=lambda r: (r["score"], r["path"]))[:10]
+    return {
+        "files_found": len(files),
+        "files_audited": len(rows),
+        "files_failed": len(errors),
+        "files_truncated": truncated,
+        "truncated": bool(truncated),
+        "languages": languages,
+        "deterministic_score": round(weighted / weight) if weight else 100,
+        "severity_counts": severity_counts,
+        "findings_total": sum(severity_counts.values()),
+        "rules": sorted(per_rule.values(), key=lambda e: (rank[e["severity"]], -e["findings"], e["rule_id"])),
+        "worst_files": [{"path": r["path"], "score": r["score"], "findings": sum(r["rules"].values())}
+                        for r in worst if r["rules"]],
+        "errors": errors[:50],
+        "files": sorted(rows, key=lambda r: r["path"]),
+    }
+
+
+def cache_stats() -> Dict[str, Any]:
+    return _cache.stats()
+
+
+def clear_cache() -> None:
+    _cache.clear()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Accessibility lint of every markup/CSS file in a project.")
+    parser.add_argument("path", help="project directory, or a zip / tar archive of one")
+    parser.add_argument("--rules", help="comma-separated rule_ids to run (default: all)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--max-files", type=int, default=CODE_PROJECT_MAX_FILES)
+    parser.add_argument("--include-findings", action="store_true")
+    args = parser.parse_args()
+    if os.path.isdir(args.path):
+        files, skipped = files_from_directory(args.path, max_files=args.max_files)
+    else:
+        with open(args.path, "rb") as fh:
+            files, skipped = files_from_archive(fh.read(), max_files=args.max_files)
+    rules = [r for r in args.rules.split(",") if r.strip()] if args.rules else None
+    report = audit_project(files, skipped, rules=rules, workers=args.workers,
+                           include_findings=args.include_findings)
+    print(json.dumps(report, indent=2, default=code_audit.json_default))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""
+code_review.py
+==============
+
+Chunked LLM review for source files too large for one ``review_code``
+prompt.
+
+A file that fits the prompt budget is reviewed in one call, as before. A
+larger one used to be cut at the budget, so everything past the first
+screenful got no AI review while still paying a full call's latency.
+Instead:
+
+* ``plan_windows(code, language, findings, max_tokens)`` splits the file
+  into line windows of at most ``max_tokens`` of code each. Cuts go where
+  the markup (or CSS brace) nesting is shallowest in the second half of
+  the window, never inside a tag, so an element and its lint findings stay
+  in one window. When there are more than ``CODE_REVIEW_MAX_WINDOWS``, the
+  windows holding the most (and most severe) ``audit_code`` findings are
+  kept, in file order.
+* ``review_windows(...)`` sends one prompt per window — the window's lines
+  numbered with their line in the file, plus that window's findings — on
+  a thread pool of at most ``CODE_REVIEW_CONCURRENCY`` calls, so the wall
+  clock stays close to a single call. A window whose call fails falls back
+  to its lint findings alone.
+* The answers are merged: issue lines are mapped to file lines (a model
+  that counted from the top of its excerpt is corrected), issues are
+  deduplicated by rule and line (a document rule the lint reported once,
+  such as a missing title, by rule alone), and the score is the
+  line-weighted mean of the windows' scores.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import os
+import re
+import time
+from bisect import bisect_right
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+import code_audit
+import prompt_budget
+
+# ---------------------------------------------------------------------------
+# Configuration (read from environment / .env)
+# ---------------------------------------------------------------------------
+CODE_REVIEW_CONCURRENCY = int(os.getenv("CODE_REVIEW_CONCURRENCY", "4"))
+CODE_REVIEW_MAX_WINDOWS = int(os.getenv("CODE_REVIEW_MAX_WINDOWS", "8"))
+
+_CLOSE_TAG_RE = re.compile(r'<\s*/\s*[A-Za-z][\w:-]*\s*>')
+_VOID_TAGS = frozenset({
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+    "param", "source", "track", "wbr",
+})
+_SEVERITY_WEIGHT = {"critical": 8, "high": 4, "moderate": 2, "low": 1}
+_SEVERITY_ORDER = {"critical": 0, "high": 1, "moderate": 2, "low": 3}
+_MAX_RECOMMENDATIONS = 10
+
+
+# ---------------------------------------------------------------------------
+# Windows
+# ---------------------------------------------------------------------------
+def _line_depths(code: str, language: str, starts: List[int]) -> List[Optional[int]]:
+    """Nesting depth at the start of each line; ``None`` when the line
+    starts inside a tag (CSS: brace depth, never ``None``)."""
+    events: List[Tuple[int, int]] = []
+    spans: List[Tuple[int, int]] = []
+    if language == "css":
+        events = [(i, 1 if ch == "{" else -1) for i, ch in enumerate(code) if ch in "{}"]
+    else:
+        for m in code_audit._start_tags(code):
+            spans.append((m.start(), m.end()))
+            if m.group("tag").lower() not in _VOID_TAGS and not m.group(0).endswith("/>"):
+                events.append((m.start(), 1))
+        for m in _CLOSE_TAG_RE.finditer(code):
+            spans.append((m.start(), m.end()))
+            events.append((m.start(), -1))
+        events.sort()
+        spans.sort()
+
+    depths: List[Optional[int]] = []
+    depth = e = s = 0
+    for offset in starts:
+        while e < len(events) and events[e][0] < offset:
+            depth = max(0, depth + events[e][1])
+            e += 1
+        while s < len(spans) and spans[s][1] <= offset:
+            s += 1
+        inside = s < len(spans) and spans[s][0] < offset
+        depths.append(None if inside else depth)
+    return depths
+
+
+def plan_windows(code: str, language: str, findings: List[Dict], max_tokens: int,
+                 max_windows: Optional[int] = None) -> Tuple[List[Tuple[int, int]], int]:
+    """``([(first_line, last_line), …], lines_left_out)`` covering ``code``.
+
+    Lines are 1-based and inclusive. A single line longer than
+    ``max_tokens`` gets a window of its own (the prompt truncates it).
+    """
+    lines = code.split("\n")
+    starts = [0]
+    for line in lines[:-1]:
+        starts.append(starts[-1] + len(line) + 1)
+    # The excerpt numbers every line: "{n:>5}  " costs about two tokens.
+    costs = [prompt_budget.estimate_tokens(line) + 3 for line in lines]
+    depths = _line_depths(code, language, starts)
+
+    windows: List[Tuple[int, int]] = []
+    start, n = 0, len(lines)
+    while start < n:
+        used, end = 0, start
+        while end < n and (end == start or used + costs[end] <= max_tokens):
+            used += costs[end]
+            end += 1
+        if end < n:
+            # Cut before the shallowest line in the window's second half.
+            best = None
+            for cut in range(end, start + max(1, (end - start) // 2) - 1, -1):
+                if cut > start and depths[cut] is not None and (best is None or depths[cut] < depths[best]):
+                    best = cut
+            end = best or end
+        windows.append((start + 1, end))
+        start = end
+
+    limit = CODE_REVIEW_MAX_WINDOWS if max_windows is None else max_windows
+    if len(windows) <= limit:
+        return windows, 0
+    firsts = [w[0] for w in windows]
+    weight = [0] * len(windows)
+    for f in findings:
+        if f.get("line"):
+            weight[bisect_right(firsts, f["line"]) - 1] += _SEVERITY_WEIGHT.get(f["severity"], 1)
+    keep = sorted(sorted(range(len(windows)), key=lambda i: (-weight[i], i))[:limit])
+    kept = [windows[i] for i in keep]
+    return kept, n - sum(b - a + 1 for a, b in kept)
+
+
+def window_text(lines: List[str], window: Tuple[int, int]) -> str:
+    """The window's lines, each prefixed with its line number in the file."""
+    first, last = window
+    return "\n".join(f"{n:>5}  {lines[n - 1]}" for n in range(first, last + 1))
+
+
+def window_evidence(evidence: Dict, window: Tuple[int, int]) -> Dict:
+    """``evidence`` restricted to the findings inside ``window``."""
+    first, last = window
+    findings = [f for f in evidence["findings"] if first <= (f["line"] or 1) <= last]
+    return code_audit._evidence(evidence["language"], findings, last - first + 1,
+                                evidence["char_count"])
+
+
+# ---------------------------------------------------------------------------
+# Review and merge
+# ---------------------------------------------------------------------------
+def _once_per_file(evidence: Dict) -> frozenset:
+    """Document rules the lint reported once (missing title, lang, …): every
+    window's model may repeat them, at whatever line it picks."""
+    counts = Counter(f["rule_id"] for f in evidence["findings"])
+    return frozenset(rule_id for rule_id, n in counts.items()
+                     if n == 1 and code_audit.RULES[rule_id].document is not None)
+
+
+def _file_line(value, window: Tuple[int, int]) -> Optional[int]:
+    """An issue's ``line`` as a line of the file, or ``None``."""
+    try:
+        line = int(value)
+    except (TypeError, ValueError):
+        return None
+    first, last = window
+    if first <= line <= last:
+        return line
+    if 1 <= line <= last - first + 1:
+        return first + line - 1    # counted from the top of the excerpt
+    return None
+
+
+def merge_reviews(parts: List[Tuple[Tuple[int, int], Dict]], evidence: Dict) -> Dict:
+    """One review from the per-window ``(window, result)`` answers."""
+    document_rules = _once_per_file(evidence)
+    issues: Dict[Tuple, Dict] = {}
+    recommendations: List[str] = []
+    explanations: List[str] = []
+    next_steps = ""
+    weighted = weight = 0
+    for window, result in parts:
+        span = window[1] - window[0] + 1
+        try:
+            weighted += max(0, min(100, int(result.get("score")))) * span
+            weight += span
+        except (TypeError, ValueError):
+            pass
+        for issue in result.get("issues") or []:
+            if not isinstance(issue, dict):
+                continue
+            issue = dict(issue, line=_file_line(issue.get("line"), window))
+            rule_id = str(issue.get("rule_id") or "").strip()
+            if rule_id in document_rules:
+                key = (rule_id,)
+            elif rule_id:
+                key = (rule_id, issue["line"])
+            else:
+                key = (str(issue.get("title", "")).strip().lower(), issue["line"])
+            kept = issues.get(key)
+            if kept is None or (_SEVERITY_ORDER.get(str(issue.get("severity", "")).lower(), 4)
+                                < _SEVERITY_ORDER.get(str(kept.get("severity", "")).lower(), 4)):
+                issues[key] = issue
+        for text in result.get("recommendations") or []:
+            if isinstance(text, str) and text not in recommendations:
+                recommendations.append(text)
+        if isinstance(result.get("score_explanation"), str):
+            explanations.append(result["score_explanation"])
+        if not next_steps and isinstance(result.get("next_steps"), str):
+            next_steps = result["next_steps"]
+
+    merged = sorted(issues.values(), key=lambda i: (
+        _SEVERITY_ORDER.get(str(i.get("severity", "")).lower(), 4), i["line"] or 0))
+    counts = {"critical": 0, "high": 0, "moderate": 0, "low": 0}
+    for issue in merged:
+        severity = str(issue.get("severity", "")).lower()
+        if severity in counts:
+            counts[severity] += 1
+    return {
+        "score": round(weighted / weight) if weight else evidence["deterministic_score"],
+        "score_explanation": (
+            f"Reviewed in {len(parts)} parts; score weighted by lines. "
+            + (explanations[0] if explanations else "")).strip(),
+        "summary_counts": counts,
+        "issues": merged,
+        "recommendations": recommendations[:_MAX_RECOMMENDATIONS],
+        "next_steps": next_steps,
+    }
+
+
+def review_windows(code: str, evidence: Dict, windows: List[Tuple[int, int]],
+                   build_prompt: Callable[[Dict, str, Tuple[int, int]], Tuple[str, bool]],
+                   generate: Callable[[str], Dict], fallback: Callable[[Dict], Dict],
+                   concurrency: Optional[int] = None) -> Tuple[Dict, Dict]:
+    """Review each window concurrently and merge the answers.
+
+    ``build_prompt(window_evidence, window_text, window)`` → ``(prompt,
+    truncated)``; ``generate(prompt)`` → the model's JSON object;
+    ``fallback(window_evidence)`` → a review from the lint alone, used
+    for a window whose call raised. Returns ``(review, chunks)``, where
+    ``chunks`` reports each window's lines, findings, timing and prompt
+    size.
+    """
+    lines = code.split("\n")
+    started = time.monotonic()
+
+    def one(window: Tuple[int, int]) -> Tuple[Dict, Dict]:
+        t0 = time.monotonic()
+        scoped = window_evidence(evidence, window)
+        prompt, truncated = build_prompt(scoped, window_text(lines, window), window)
+        info = {"lines": list(window), "findings": len(scoped["findings"]),
+                "prompt_tokens": prompt_budget.estimate_tokens(prompt), "truncated": truncated}
+        try:
+            result = generate(prompt)
+            if not isinstance(result, dict):
+                raise ValueError("Model did not return a JSON object")
+        except Exception as exc:
+            print(f"[review-code] window {window[0]}-{window[1]} failed, falling back: {exc}")
+            result = fallback(scoped)
+            info["fallback_reason"] = str(exc)
+        info["ms"] = int((time.monotonic() - t0) * 1000)
+        return result, info
+
+    workers = max(1, min(concurrency or CODE_REVIEW_CONCURRENCY, len(windows)))
+    pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="code-review")
+    try:
+        answers = list(pool.map(one, windows))
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    review = merge_reviews([(w, a[0]) for w, a in zip(windows, answers)], evidence)
+    chunks = {
+        "windows": [a[1] for a in answers],
+        "concurrency": workers,
+        "elapsed_ms": int((time.monotonic() - started) * 1000),
+    }
+    return review, chunks
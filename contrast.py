@@ -0,0 +1,596 @@
+"""
+contrast.py
+===========
+
+WCAG 2.x contrast-ratio engine for CSS colour pairs (success criterion
+1.4.3).
+
+* ``parse_color(value)`` — CSS colour → ``(r, g, b, a)`` with r/g/b in
+  0–255 and a in 0–1. Understands ``#rgb``/``#rgba``/``#rrggbb``/
+  ``#rrggbbaa``, ``rgb()``/``rgba()`` and ``hsl()``/``hsla()`` (comma and
+  space syntax, percentages, ``/ alpha``, angle units), the CSS named
+  colours and ``transparent``. Anything else — ``var()``, ``inherit``,
+  ``currentcolor``, gradients — is ``None``: it cannot be resolved
+  statically.
+* ``declared_pair(declarations)`` — the (foreground, background, large
+  text) a style attribute or rule body declares, if it sets both colours.
+* ``ContrastTally`` — accumulates pairs (deduplicated, with a count and a
+  first-seen sample each) and ``summary()`` evaluates them all at once;
+  ``add_css`` takes a stylesheet's rules from ``css_scan.rules``.
+* ``selector_matcher(inventory)`` — whether a rule's selector can match the
+  page: every simple selector in it (type, class, id, attribute, and the
+  attribute-backed ``:disabled``/``:checked``/``:required``/``:link``) names
+  something the page has (``inventory``: its element names, classes, ids
+  and attribute names). Rules that cannot match are tallied apart, under
+  ``unmatched``: informational, never a 1.4.3 failure.
+
+Ratios are computed per *distinct* pair in one batch: with numpy installed
+(optional: ``pip install numpy``) the whole batch is a handful of array
+operations; otherwise one pass over the distinct pairs with a per-colour
+luminance cache. Either way a page with thousands of styled elements but a
+few dozen colour combinations costs a few dozen evaluations, not one per
+element.
+
+Semi-transparent colours are composited the way a browser paints them: the
+background over white (the canvas), then the foreground over that.
+"""
+
+from __future__ import annotations
+
+import functools
+import math
+import re
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import css_scan
+
+try:
+    import numpy as _np  # type: ignore
+except ImportError:  # pragma: no cover — optional dependency
+    _np = None
+
+# WCAG thresholds: normal text / large text (≥ 24px, or ≥ 18.66px bold).
+AA_NORMAL = 4.5
+AA_LARGE = 3.0
+# Below this many distinct pairs the numpy set-up costs more than it saves.
+_NUMPY_MIN_PAIRS = 64
+# Names a page inventory may hold; past it every rule counts as matching.
+MAX_INVENTORY_NAMES = 4000
+
+RGBA = Tuple[float, float, float, float]
+ColourRule = Tuple[str, str, str, bool]
+
+NAMED_COLORS: Dict[str, Tuple[int, int, int]] = {
+    "aliceblue": (240, 248, 255), "antiquewhite": (250, 235, 215), "aqua": (0, 255, 255),
+    "aquamarine": (127, 255, 212), "azure": (240, 255, 255), "beige": (245, 245, 220),
+    "bisque": (255, 228, 196), "black": (0, 0, 0), "blanchedalmond": (255, 235, 205),
+    "blue": (0, 0, 255), "blueviolet": (138, 43, 226), "brown": (165, 42, 42),
+    "burlywood": (222, 184, 135), "cadetblue": (95, 158, 160), "chartreuse": (127, 255, 0),
+    "chocolate": (210, 105, 30), "coral": (255, 127, 80), "cornflowerblue": (100, 149, 237),
+    "cornsilk": (255, 248, 220), "crimson": (220, 20, 60), "cyan": (0, 255, 255),
+    "darkblue": (0, 0, 139), "darkcyan": (0, 139, 139), "darkgoldenrod": (184, 134, 11),
+    "darkgray": (169, 169, 169), "darkgreen": (0, 100, 0), "darkgrey": (169, 169, 169),
+    "darkkhaki": (189, 183, 107), "darkmagenta": (139, 0, 139), "darkolivegreen": (85, 107, 47),
+    "darkorange": (255, 140, 0), "darkorchid": (153, 50, 204), "darkred": (139, 0, 0),
+    "darksalmon": (233, 150, 122), "darkseagreen": (143, 188, 143), "darkslateblue": (72, 61, 139),
+    "darkslategray": (47, 79, 79), "darkslategrey": (47, 79, 79), "darkturquoise": (0, 206, 209),
+    "darkviolet": (148, 0, 211), "deeppink": (255, 20, 147), "deepskyblue": (0, 191, 255),
+    "dimgray": (105, 105, 105), "dimgrey": (105, 105, 105), "dodgerblue": (30, 144, 255),
+    "firebrick": (178, 34, 34), "floralwhite": (255, 250, 240), "forestgreen": (34, 139, 34),
+    "fuchsia": (255, 0, 255), "gainsboro": (220, 220, 220), "ghostwhite": (248, 248, 255),
+    "gold": (255, 215, 0), "goldenrod": (218, 165, 32), "gray": (128, 128, 128),
+    "green": (0, 128, 0), "greenyellow": (173, 255, 47), "grey": (128, 128, 128),
+    "honeydew": (240, 255, 240), "hotpink": (255, 105, 180), "indianred": (205, 92, 92),
+    "indigo": (75, 0, 130), "ivory": (255, 255, 240), "khaki": (240, 230, 140),
+    "lavender": (230, 230, 250), "lavenderblush": (255, 240, 245), "lawngreen": (124, 252, 0),
+    "lemonchiffon": (255, 250, 205), "lightblue": (173, 216, 230), "lightcoral": (240, 128, 128),
+    "lightcyan": (224, 255, 255), "lightgoldenrodyellow": (250, 250, 210), "lightgray": (211, 211, 211),
+    "lightgreen": (144, 238, 144), "lightgrey": (211, 211, 211), "lightpink": (255, 182, 193),
+    "lightsalmon": (255, 160, 122), "lightseagreen": (32, 178, 170), "lightskyblue": (135, 206, 250),
+    "lightslategray": (119, 136, 153), "lightslategrey": (119, 136, 153),
+    "lightsteelblue": (176, 196, 222), "lightyellow": (255, 255, 224), "lime": (0, 255, 0),
+    "limegreen": (50, 205, 50), "linen": (250, 240, 230), "magenta": (255, 0, 255),
+    "maroon": (128, 0, 0), "mediumaquamarine": (102, 205, 170), "mediumblue": (0, 0, 205),
+    "mediumorchid": (186, 85, 211), "mediumpurple": (147, 112, 219), "mediumseagreen": (60, 179, 113),
+    "mediumslateblue": (123, 104, 238), "mediumspringgreen": (0, 250, 154),
+    "mediumturquoise": (72, 209, 204), "mediumvioletred": (199, 21, 133), "midnightblue": (25, 25, 112),
+    "mintcream": (245, 255, 250), "mistyrose": (255, 228, 225), "moccasin": (255, 228, 181),
+    "navajowhite": (255, 222, 173), "navy": (0, 0, 128), "oldlace": (253, 245, 230),
+    "olive": (128, 128, 0), "olivedrab": (107, 142, 35), "orange": (255, 165, 0),
+    "orangered": (255, 69, 0), "orchid": (218, 112, 214), "palegoldenrod": (238, 232, 170),
+    "palegreen": (152, 251, 152), "paleturquoise": (175, 238, 238), "palevioletred": (219, 112, 147),
+    "papayawhip": (255, 239, 213), "peachpuff": (255, 218, 185), "peru": (205, 133, 63),
+    "pink": (255, 192, 203), "plum": (221, 160, 221), "powderblue": (176, 224, 230),
+    "purple": (128, 0, 128), "rebeccapurple": (102, 51, 153), "red": (255, 0, 0),
+    "rosybrown": (188, 143, 143), "royalblue": (65, 105, 225), "saddlebrown": (139, 69, 19),
+    "salmon": (250, 128, 114), "sandybrown": (244, 164, 96), "seagreen": (46, 139, 87),
+    "seashell": (255, 245, 238), "sienna": (160, 82, 45), "silver": (192, 192, 192),
+    "skyblue": (135, 206, 235), "slateblue": (106, 90, 205), "slategray": (112, 128, 144),
+    "slategrey": (112, 128, 144), "snow": (255, 250, 250), "springgreen": (0, 255, 127),
+    "steelblue": (70, 130, 180), "tan": (210, 180, 140), "teal": (0, 128, 128),
+    "thistle": (216, 191, 216), "tomato": (255, 99, 71), "turquoise": (64, 224, 208),
+    "violet": (238, 130, 238), "wheat": (245, 222, 179), "white": (255, 255, 255),
+    "whitesmoke": (245, 245, 245), "yellow": (255, 255, 0), "yellowgreen": (154, 205, 50),
+}
+
+_FUNC_RE = re.compile(r"(rgba?|hsla?)\(\s*([^()]*)\)$")
+_NUMBER_RE = re.compile(r"[+-]?(?:\d+\.?\d*|\.\d+)(?:e[+-]?\d+)?(%|deg|grad|rad|turn)?$")
+_HEX_DIGITS = frozenset("0123456789abcdef")
+
+
+# ---------------------------------------------------------------------------
+# Parsing
+# ---------------------------------------------------------------------------
+def _number(token: str) -> Optional[Tuple[float, str]]:
+    m = _NUMBER_RE.match(token)
+    if not m:
+        return None
+    unit = m.group(1) or ""
+    return float(token[: len(token) - len(unit)]), unit
+
+
+def _channel(token: str) -> Optional[float]:
+    parsed = _number(token)
+    if parsed is None or parsed[1] not in ("", "%"):
+        return None
+    value, unit = parsed
+    value = value * 2.55 if unit == "%" else value
+    return min(255.0, max(0.0, value))
+
+
+def _alpha(token: str) -> Optional[float]:
+    parsed = _number(token)
+    if parsed is None or parsed[1] not in ("", "%"):
+        return None
+    value, unit = parsed
+    return min(1.0, max(0.0, value / 100 if unit == "%" else value))
+
+
+def _hue(token: str) -> Optional[float]:
+    parsed = _number(token)
+    if parsed is None or parsed[1] == "%":
+        return None
+    value, unit = parsed
+    scale = {"": 1.0, "deg": 1.0, "grad": 0.9, "rad": 180 / math.pi, "turn": 360.0}[unit]
+    return (value * scale) % 360
+
+
+def _hsl_to_rgb(h: float, s: float, l: float) -> Tuple[float, float, float]:
+    # CSS Color 4, "Converting HSL colors to sRGB colors".
+    def f(n: int) -> float:
+        k = (n + h / 30) % 12
+        a = s * min(l, 1 - l)
+        return 255 * (l - a * max(-1, min(k - 3, 9 - k, 1)))
+    return f(0), f(8), f(4)
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_color(value: str) -> Optional[RGBA]:
+    """CSS colour → ``(r, g, b, a)``, or ``None`` if it cannot be resolved."""
+    text = value.strip().lower()
+    if text.endswith("!important"):
+        text = text[: -len("!important")].rstrip()
+    if not text:
+        return None
+    if text[0] == "#":
+        digits = text[1:]
+        if len(digits) not in (3, 4, 6, 8) or not set(digits) <= _HEX_DIGITS:
+            return None
+        if len(digits) <= 4:
+            digits = "".join(c * 2 for c in digits)
+        alpha = int(digits[6:8], 16) / 255 if len(digits) == 8 else 1.0
+        return (float(int(digits[0:2], 16)), float(int(digits[2:4], 16)),
+                float(int(digits[4:6], 16)), alpha)
+    if text == "transparent":
+        return (0.0, 0.0, 0.0, 0.0)
+    named = NAMED_COLORS.get(text)
+    if named is not None:
+        return (float(named[0]), float(named[1]), float(named[2]), 1.0)
+    m = _FUNC_RE.match(text)
+    if not m:
+        return None
+    func, args = m.groups()
+    if "," in args:
+        parts = [p.strip() for p in args.split(",")]
+        alpha_token = parts.pop() if len(parts) == 4 else None
+    else:
+        head, slash, tail = args.partition("/")
+        parts = head.split()
+        alpha_token = tail.strip() if slash else None
+    if len(parts) != 3:
+        return None
+    alpha = 1.0 if alpha_token is None else _alpha(alpha_token)
+    if alpha is None:
+        return None
+    if func.startswith("rgb"):
+        channels = [_channel(p) for p in parts]
+        if None in channels:
+            return None
+        return (channels[0], channels[1], channels[2], alpha)
+    h = _hue(parts[0])
+    s = _number(parts[1])
+    l = _number(parts[2])
+    if h is None or s is None or l is None or s[1] not in ("%", "") or l[1] not in ("%", ""):
+        return None
+    r, g, b = _hsl_to_rgb(h, min(100.0, max(0.0, s[0])) / 100, min(100.0, max(0.0, l[0])) / 100)
+    return (r, g, b, alpha)
+
+
+def _split_value(value: str) -> List[str]:
+    """Whitespace-separated tokens, keeping ``func(a b c)`` together."""
+    tokens: List[str] = []
+    depth = 0
+    start = 0
+    for i, ch in enumerate(value):
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth = max(0, depth - 1)
+        elif ch.isspace() and depth == 0:
+            if i > start:
+                tokens.append(value[start:i])
+            start = i + 1
+    if len(value) > start:
+        tokens.append(value[start:])
+    return tokens
+
+
+def background_color(value: str) -> Optional[str]:
+    """The colour in a ``background`` shorthand (or ``background-color``)."""
+    value = value.strip()
+    if value.lower().endswith("!important"):
+        value = value[: -len("!important")].rstrip()
+    if parse_color(value) is not None:
+        return value
+    # The colour may only appear in the final layer of the shorthand.
+    tokens = _split_value(value.rsplit(",", 1)[-1])
+    for token in tokens:
+        if parse_color(token) is not None:
+            return token
+    # A lone value we cannot resolve (``var(--bg)``) is still reported, as
+    # an unparsed pair; anything longer has no colour to speak of.
+    return value if len(tokens) == 1 and "," not in value else None
+
+
+def _is_large(declarations: Dict[str, str]) -> bool:
+    size = declarations.get("font-size", "").strip().lower()
+    m = re.match(r"(\d+(?:\.\d+)?)(px|pt)\b", size)
+    if not m:
+        return False
+    px = float(m.group(1)) * (4 / 3 if m.group(2) == "pt" else 1)
+    weight = declarations.get("font-weight", "").strip().lower()
+    bold = weight in ("bold", "bolder") or (weight.isdigit() and int(weight) >= 700)
+    return px >= 24 or (bold and px >= 18.66)
+
+
+def declarations(body: str) -> Dict[str, str]:
+    """``prop: value; …`` → ``{prop: value}`` (last declaration wins)."""
+    out: Dict[str, str] = {}
+    for start, end, _ in css_scan.declarations(body, -1, len(body), True):
+        prop, sep, value = body[start:end].partition(":")
+        if sep:
+            out[prop.strip().lower()] = value.strip()
+    return out
+
+
+@functools.lru_cache(maxsize=4096)
+def declared_pair(body: str) -> Optional[Tuple[str, str, bool]]:
+    """``(color, background, large_text)`` if ``body`` sets both colours.
+
+    Cached: pages repeat the same ``style`` attribute many times over.
+    """
+    decls = declarations(body)
+    fg = decls.get("color")
+    if fg is None:
+        return None
+    bg = None
+    if "background-color" in decls:
+        bg = decls["background-color"]
+    elif "background" in decls:
+        bg = background_color(decls["background"])
+    if bg is None:
+        return None
+    if fg.lower().endswith("!important"):
+        fg = fg[: -len("!important")].rstrip()
+    if bg.lower().endswith("!important"):
+        bg = bg[: -len("!important")].rstrip()
+    return fg, bg, _is_large(decls)
+
+
+# ---------------------------------------------------------------------------
+# Ratios
+# ---------------------------------------------------------------------------
+def _composite(fg: RGBA, bg: RGBA) -> Tuple[Tuple[float, float, float], Tuple[float, float, float]]:
+    ba = bg[3]
+    bg_rgb = tuple(c * ba + 255 * (1 - ba) for c in bg[:3])
+    fa = fg[3]
+    fg_rgb = tuple(c * fa + b * (1 - fa) for c, b in zip(fg[:3], bg_rgb))
+    return fg_rgb, bg_rgb  # type: ignore[return-value]
+
+
+def _luminance(rgb: Sequence[float]) -> float:
+    def lin(c: float) -> float:
+        c /= 255
+        return c / 12.92 if c <= 0.03928 else ((c + 0.055) / 1.055) ** 2.4
+    r, g, b = rgb
+    return 0.2126 * lin(r) + 0.7152 * lin(g) + 0.0722 * lin(b)
+
+
+def contrast_ratio(fg: str, bg: str) -> Optional[float]:
+    """WCAG contrast ratio of two CSS colours, or ``None`` if unparseable."""
+    ratios = contrast_ratios([(fg, bg)])
+    return ratios[0]
+
+
+def contrast_ratios(pairs: Sequence[Tuple[str, str]]) -> List[Optional[float]]:
+    """Contrast ratio for every ``(foreground, background)`` pair, batched."""
+    parsed: List[Optional[Tuple[RGBA, RGBA]]] = []
+    for fg, bg in pairs:
+        f, b = parse_color(fg), parse_color(bg)
+        parsed.append((f, b) if f is not None and b is not None else None)
+    valid = [p for p in parsed if p is not None]
+    if _np is not None and len(valid) >= _NUMPY_MIN_PAIRS:
+        computed = iter(_ratios_numpy(valid))
+    else:
+        computed = iter(_ratios_python(valid))
+    return [None if p is None else next(computed) for p in parsed]
+
+
+def _ratios_python(pairs: List[Tuple[RGBA, RGBA]]) -> List[float]:
+    cache: Dict[Tuple[float, float, float], float] = {}
+    out: List[float] = []
+    for fg, bg in pairs:
+        fg_rgb, bg_rgb = _composite(fg, bg)
+        lf = cache.get(fg_rgb)
+        if lf is None:
+            lf = cache[fg_rgb] = _luminance(fg_rgb)
+        lb = cache.get(bg_rgb)
+        if lb is None:
+            lb = cache[bg_rgb] = _luminance(bg_rgb)
+        hi, lo = (lf, lb) if lf >= lb else (lb, lf)
+        out.append((hi + 0.05) / (lo + 0.05))
+    return out
+
+
+def _ratios_numpy(pairs: List[Tuple[RGBA, RGBA]]) -> List[float]:
+    np = _np
+    arr = np.asarray(pairs, dtype=np.float64)           # (n, 2, 4)
+    fg, bg = arr[:, 0, :3], arr[:, 1, :3]
+    fa, ba = arr[:, 0, 3:4], arr[:, 1, 3:4]
+    bg = bg * ba + 255.0 * (1.0 - ba)
+    fg = fg * fa + bg * (1.0 - fa)
+    rgb = np.stack((fg, bg)) / 255.0                     # (2, n, 3)
+    lin = np.where(rgb <= 0.03928, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    lum = lin @ np.array([0.2126, 0.7152, 0.0722])       # (2, n)
+    hi, lo = lum.max(axis=0), lum.min(axis=0)
+    return ((hi + 0.05) / (lo + 0.05)).tolist()
+
+
+def colour_rules(css: str) -> List[ColourRule]:
+    """``(selector, color, background, large_text)`` of every rule in a
+    stylesheet that declares both colours."""
+    found: List[ColourRule] = []
+    for selector, body in css_scan.rules(css):
+        if "color" not in body and "background" not in body:
+            continue
+        pair = declared_pair(body)
+        if pair is not None:
+            found.append((selector, pair[0], pair[1], pair[2]))
+    return found
+
+
+# ---------------------------------------------------------------------------
+# Selector matching
+# ---------------------------------------------------------------------------
+_SELECTOR_TOKEN_RE = re.compile(r'''
+    "(?:[^"\\]|\\.)*"? | '(?:[^'\\]|\\.)*'?        # strings: skipped
+  | (?P<pseudo>::?[-\w]+)(?P<call>\()?
+  | \[\s*(?:[-\w*]*\|(?!=))?(?P<attr>[-\w]+)
+  | (?P<name>[.\#]?(?:[-\w]|\\.|[^\x00-\x7f])+)
+  | (?P<punct>[(),\]])
+''', re.X)
+_ESCAPE_RE = re.compile(r'\\(.)')
+# Pseudo-classes that hold only on elements with this attribute.
+_PSEUDO_ATTRIBUTES = {"disabled": "disabled", "checked": "checked", "required": "required",
+                      "link": "href", "any-link": "href", "visited": "href"}
+
+Inventory = Dict[str, List[str]]
+_IMPLIED_TAGS = frozenset({"html", "head", "body"})
+
+
+def inventory(tags: Iterable[str], classes: Iterable[str], ids: Iterable[str],
+              attributes: Iterable[str]) -> Optional[Inventory]:
+    """The JSON-able page inventory ``selector_matcher`` reads (``None``
+    past ``MAX_INVENTORY_NAMES``: too large to keep, so assume a match).
+
+    The elements a browser creates when the markup leaves them out —
+    ``html``, ``head``, ``body``, and ``tbody`` around table rows — are
+    always counted, so every parser backend yields the same inventory.
+    """
+    tags = set(tags) | _IMPLIED_TAGS
+    if "tr" in tags:
+        tags.add("tbody")
+    names = {"tags": sorted(tags), "classes": sorted(classes), "ids": sorted(ids),
+             "attributes": sorted(attributes)}
+    if sum(len(v) for v in names.values()) > MAX_INVENTORY_NAMES:
+        return None
+    return names
+
+
+def _requirements(selector: str) -> Iterator[List[Tuple[str, str]]]:
+    """``(kind, name)`` needs of each selector in a comma-separated list.
+
+    Arguments of functional pseudo-classes (``:not(.x)``, ``:is(…)``,
+    ``:nth-child(2n)``) and attribute values are skipped: they never make
+    the selector need more of the page.
+    """
+    needs: List[Tuple[str, str]] = []
+    depth = 0
+    in_attr = False
+    for m in _SELECTOR_TOKEN_RE.finditer(selector):
+        punct = m.group("punct")
+        if punct is not None:
+            if punct == "(":
+                depth += 1
+            elif punct == ")":
+                depth = max(0, depth - 1)
+            elif punct == "]":
+                in_attr = False
+            elif not depth and not in_attr:
+                yield needs
+                needs = []
+            continue
+        if m.group("call"):
+            depth += 1
+        if depth or in_attr:
+            continue
+        if m.group("pseudo"):
+            attr = _PSEUDO_ATTRIBUTES.get(m.group("pseudo").lstrip(":").lower())
+            if attr is not None:
+                needs.append(("attributes", attr))
+        elif m.group("attr"):
+            in_attr = True
+            needs.append(("attributes", m.group("attr").lower()))
+        elif m.group("name"):
+            name = m.group("name")
+            if name[0] == ".":
+                needs.append(("classes", _ESCAPE_RE.sub(r"\1", name[1:])))
+            elif name[0] == "#":
+                needs.append(("ids", _ESCAPE_RE.sub(r"\1", name[1:])))
+            else:
+                needs.append(("tags", name.lower()))
+    yield needs
+
+
+def selector_matcher(page: Optional[Inventory]) -> Optional[Callable[[str], bool]]:
+    """A test of whether a selector list can match the page described by
+    ``page`` (see ``inventory``); ``None`` — anything may match — without one."""
+    if page is None:
+        return None
+    sets = {kind: frozenset(names) for kind, names in page.items()}
+
+    @functools.lru_cache(maxsize=4096)
+    def matches(selector: str) -> bool:
+        return any(all(name in sets[kind] for kind, name in needs)
+                   for needs in _requirements(selector))
+
+    return matches
+
+
+# ---------------------------------------------------------------------------
+# Accumulating evidence
+# ---------------------------------------------------------------------------
+class ContrastTally:
+    """Distinct colour pairs seen on a page, with counts and first samples.
+
+    At most ``max_pairs`` distinct pairs are kept; later new pairs are only
+    counted in ``overflow``. Stylesheet rules that cannot match the page
+    go to a tally of their own, ``unmatched``.
+    """
+
+    def __init__(self, max_pairs: int = 5000) -> None:
+        self.max_pairs = max_pairs
+        # (fg, bg, large) -> [count, selector, source]
+        self.pairs: Dict[Tuple[str, str, bool], list] = {}
+        self.overflow = 0
+        self.unmatched: Optional[ContrastTally] = None
+
+    def count(self, fg: str, bg: str, large: bool) -> bool:
+        """Count another occurrence of a known pair; False if it is new."""
+        entry = self.pairs.get((fg.lower(), bg.lower(), large))
+        if entry is None:
+            return False
+        entry[0] += 1
+        return True
+
+    def add(self, fg: str, bg: str, large: bool, selector: str, source: str) -> None:
+        key = (fg.strip().lower(), bg.strip().lower(), large)
+        entry = self.pairs.get(key)
+        if entry is not None:
+            entry[0] += 1
+        elif len(self.pairs) < self.max_pairs:
+            self.pairs[key] = [1, selector, source]
+        else:
+            self.overflow += 1
+
+    def add_css(self, css: str, source: str,
+                matches: Optional[Callable[[str], bool]] = None) -> None:
+        """Every rule in a stylesheet that declares both colours."""
+        self.add_rules(colour_rules(css), source, matches)
+
+    def add_rules(self, rules: Iterable[ColourRule], source: str,
+                  matches: Optional[Callable[[str], bool]] = None) -> None:
+        """``colour_rules`` output; rules whose selector ``matches`` rejects
+        go to ``unmatched``."""
+        for selector, fg, bg, large in rules:
+            tally = self
+            if matches is not None and not matches(selector):
+                if self.unmatched is None:
+                    self.unmatched = ContrastTally(self.max_pairs)
+                tally = self.unmatched
+            tally.add(fg, bg, large, _short_selector(selector), source)
+
+    def summary(self) -> Dict[str, Any]:
+        """Evaluate every distinct pair in one batch; ``unmatched`` holds
+        the same counts for rules that match nothing on the page."""
+        summary = self._evaluate()
+        unmatched = self.unmatched._evaluate() if self.unmatched is not None else _empty()
+        summary["unmatched"] = unmatched
+        return summary
+
+    def _evaluate(self) -> Dict[str, Any]:
+        keys = list(self.pairs)
+        ratios = contrast_ratios([(fg, bg) for fg, bg, _ in keys])
+        checked = below = unparsed = 0
+        failing: List[Dict[str, Any]] = []
+        for (fg, bg, large), ratio in zip(keys, ratios):
+            count, selector, source = self.pairs[(fg, bg, large)]
+            if ratio is None:
+                unparsed += count
+                continue
+            checked += count
+            if ratio < (AA_LARGE if large else AA_NORMAL):
+                below += count
+                failing.append({
+                    "selector": selector, "color": fg, "background": bg,
+                    "ratio": round(ratio, 2), "large_text": large,
+                    "source": source, "count": count,
+                })
+        failing.sort(key=lambda f: f["ratio"])     # stable: document order on ties
+        return {
+            "pairs": len(keys),
+            "checked": checked,
+            "below_aa": below,
+            "unparsed": unparsed + self.overflow,
+            "worst": failing[:5],
+        }
+
+
+def _empty() -> Dict[str, Any]:
+    return {"pairs": 0, "checked": 0, "below_aa": 0, "unparsed": 0, "worst": []}
+
+
+def empty_summary() -> Dict[str, Any]:
+    """The ``summary()`` of a tally with no pairs."""
+    return dict(_empty(), unmatched=_empty())
+
+
+def _merge(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
+    worst = sorted(a["worst"] + b["worst"], key=lambda f: f["ratio"])[:5]
+    return {
+        "pairs": a["pairs"] + b["pairs"],
+        "checked": a["checked"] + b["checked"],
+        "below_aa": a["below_aa"] + b["below_aa"],
+        "unparsed": a["unparsed"] + b["unparsed"],
+        "worst": worst,
+    }
+
+
+def merge_summaries(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
+    """Combine two ``summary()`` results (e.g. page + linked stylesheets)."""
+    return dict(_merge(a, b), unmatched=_merge(a["unmatched"], b["unmatched"]))
+
+
+def _short_selector(selector: str, n: int = 80) -> str:
+    selector = " ".join(selector.split())
+    return selector if len(selector) <= n else selector[: n - 1] + "…"
@@ -0,0 +1,166 @@
+"""
+css_scan.py
+===========
+
+The stylesheet tokenizer shared by ``contrast`` (rules of linked and inline
+stylesheets) and the CSS rules in ``code_audit`` (``outline-none``,
+``color-contrast-suspect``). Every function is one linear pass.
+
+``scan(css)`` finds every brace once and returns the blocks:
+
+    (prelude_start, open, end, closed, depth)
+
+* ``prelude_start`` … ``open`` — the selector or at-rule prelude: the text
+  since the previous brace;
+* ``open`` — the ``{``; the body is ``css[open + 1:end]``, up to the next
+  brace, so a nested block (``@media … { a { … } }``) ends its parent's
+  body and the parent resumes after the nested ``}`` as a new segment;
+* ``closed`` — whether that next brace is a ``}`` (a leaf rule);
+* ``depth`` — how many blocks enclose it (stray ``}`` never go below 0).
+
+Braces inside comments and strings (``content: "}"``) are not braces, and
+an unterminated comment runs to the end of the sheet, as in a browser.
+
+``declarations(css, open, end, closed)`` splits a body at ``;`` into
+``(start, end, terminated)`` spans; the last one is terminated only by the
+block's ``}``. A ``;`` in a comment, a string or parentheses
+(``url(data:…;base64,…)``) does not split.
+
+``rules(css)`` yields ``(selector, body)`` for every style rule, at-rule
+blocks descended into, with comments removed; ``strip_comments(text)``
+does the removal.
+
+``raw=True`` (``scan``, ``declarations``) treats every brace and ``;`` as
+one, as the regexes the ``code_audit`` rules replaced did: their findings
+stay identical, and every finding lies inside one ``}``-terminated segment
+of the text — ``code_lsp`` and ``code_diff`` re-lint CSS per segment and
+rely on it.
+
+``bench_css_scan.py`` times the ``code_audit`` rules against the original
+regexes on pathological input and checks they agree.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Iterator, List, Tuple
+
+_RAW_BRACE_RE = re.compile(r'[{}]')
+_BRACE_RE = re.compile(r'''[{}"']|/\*''')
+_DECLARATION_RE = re.compile(r'''[;()"']|/\*''')
+_COMMENT_RE = re.compile(r'''["']|/\*''')
+# The rest of a string after its opening quote: up to the closing quote,
+# or an unescaped newline (a bad string ends there), or the end.
+_STRING_END_RE = {q: re.compile(r'(?:[^%s\\\n]|\\.)*' % q, re.DOTALL) for q in "\"'"}
+
+Block = Tuple[int, int, int, bool, int]
+
+
+def _skip(css: str, pos: int, token: str) -> int:
+    """Just past the comment or string starting with ``token`` at ``pos``."""
+    if token == "/*":
+        end = css.find("*/", pos + 2)
+        return len(css) if end < 0 else end + 2
+    end = _STRING_END_RE[token].match(css, pos + 1).end()
+    return end + 1 if end < len(css) and css[end] == token else end
+
+
+def scan(css: str, raw: bool = False) -> List[Block]:
+    """Every ``{`` block of ``css`` in text order; see the module docstring."""
+    blocks: List[Block] = []
+    n = len(css)
+    depth = 0
+    after = 0          # just past the previous brace
+    pending = -1       # the "{" waiting for its next brace
+    pending_start = pending_depth = 0
+    search = (_RAW_BRACE_RE if raw else _BRACE_RE).search
+    pos = 0
+    while True:
+        m = search(css, pos)
+        if m is None:
+            break
+        pos = m.start()
+        token = m.group()
+        if token != "{" and token != "}":
+            pos = _skip(css, pos, token)
+            continue
+        if pending >= 0:
+            blocks.append((pending_start, pending, pos, token == "}", pending_depth))
+            pending = -1
+        if token == "{":
+            pending, pending_start, pending_depth = pos, after, depth
+            depth += 1
+        elif depth:
+            depth -= 1
+        pos = after = pos + 1
+    if pending >= 0:
+        blocks.append((pending_start, pending, n, False, pending_depth))
+    return blocks
+
+
+def declarations(css: str, open_: int, end: int, closed: bool,
+                 raw: bool = False) -> List[Tuple[int, int, bool]]:
+    """The ``;``-separated pieces of the body ``css[open_ + 1:end]`` as
+    ``(start, end, terminated)``; ``end`` excludes the terminator."""
+    pieces: List[Tuple[int, int, bool]] = []
+    start = pos = open_ + 1
+    if raw:
+        while True:
+            semi = css.find(";", start, end)
+            if semi < 0:
+                pieces.append((start, end, closed))
+                return pieces
+            pieces.append((start, semi, True))
+            start = semi + 1
+    parens = 0
+    search = _DECLARATION_RE.search
+    while True:
+        m = search(css, pos, end)
+        if m is None:
+            pieces.append((start, end, closed))
+            return pieces
+        pos = m.start()
+        token = m.group()
+        if token == ";":
+            if not parens:
+                pieces.append((start, pos, True))
+                start = pos + 1
+            pos += 1
+        elif token == "(":
+            parens += 1
+            pos += 1
+        elif token == ")":
+            parens = max(0, parens - 1)
+            pos += 1
+        else:
+            pos = min(_skip(css, pos, token), end)
+
+
+def strip_comments(text: str) -> str:
+    """``text`` with each comment replaced by a space (strings kept)."""
+    if "/*" not in text:
+        return text
+    out: List[str] = []
+    kept = pos = 0
+    search = _COMMENT_RE.search
+    while True:
+        m = search(text, pos)
+        if m is None:
+            break
+        skipped = _skip(text, m.start(), m.group())
+        if m.group() == "/*":
+            out.append(text[kept:m.start()])
+            out.append(" ")
+            kept = skipped
+        pos = skipped
+    out.append(text[kept:])
+    return "".join(out)
+
+
+def rules(css: str) -> Iterator[Tuple[str, str]]:
+    """Yield ``(selector, body)`` for each style rule in ``css``: the leaf
+    blocks, so rules inside ``@media`` / ``@supports`` are included and the
+    at-rules themselves are not. Unclosed blocks are left out."""
+    for start, open_, end, closed, _ in scan(css):
+        if closed:
+            yield strip_comments(css[start:open_]).strip(), strip_comments(css[open_ + 1:end])
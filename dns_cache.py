@@ -0,0 +1,174 @@
+"""
+dns_cache.py
+============
+
+TTL-bounded DNS cache that doubles as the SSRF guard for outbound fetches.
+
+``resolve(host)`` looks the host up once, refuses it if *any* address it
+resolves to is private, loopback, link-local or reserved (or if it cannot be
+resolved at all — fail closed), and returns the single public IP the caller
+must connect to. ``http_pool`` connects to exactly that IP, so the address
+that was checked is the address that is used: a second lookup cannot be
+steered somewhere else (DNS rebinding), and every redirect hop goes through
+the same check when its connection is opened.
+
+Results are cached for ``DNS_CACHE_TTL`` seconds (failures for
+``DNS_NEGATIVE_TTL``), the cache holds at most ``DNS_CACHE_SIZE`` hosts
+(least recently used first out), and concurrent lookups of one host share a
+single ``getaddrinfo`` call.
+"""
+
+from __future__ import annotations
+
+import ipaddress
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# ---------------------------------------------------------------------------
+# Configuration (read from environment / .env)
+# ---------------------------------------------------------------------------
+DNS_CACHE_TTL = float(os.getenv("DNS_CACHE_TTL", "300"))
+DNS_NEGATIVE_TTL = float(os.getenv("DNS_NEGATIVE_TTL", "30"))
+DNS_CACHE_SIZE = int(os.getenv("DNS_CACHE_SIZE", "4096"))
+
+
+class BlockedHostError(Exception):
+    """``host`` must not be fetched (non-public address or unresolvable).
+
+    Deliberately not an ``OSError`` so connection libraries do not wrap it
+    into a generic connection failure on the way up.
+    """
+
+    def __init__(self, host: str, reason: str) -> None:
+        super().__init__(f"Refusing to fetch a private/loopback host ({host})")
+        self.host = host
+        self.reason = reason
+
+
+def is_blocked_ip(ip_str: str) -> bool:
+    """True for addresses an audit must never connect to."""
+    try:
+        ip = ipaddress.ip_address(ip_str.split("%", 1)[0])
+    except ValueError:
+        return True
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_private or ip.is_loopback or ip.is_link_local or ip.is_reserved
+
+
+def _check(addresses) -> Tuple[Optional[str], Optional[str]]:
+    """Return ``(pinned_ip, None)`` or ``(None, reason)``."""
+    if not addresses:
+        return None, "unresolvable"
+    for ip_str in addresses:
+        if is_blocked_ip(ip_str):
+            return None, f"resolves to non-public address {ip_str}"
+    return addresses[0], None
+
+
+class Resolver:
+    """The cache itself; use the module-level :func:`resolve`."""
+
+    def __init__(self, ttl: float = DNS_CACHE_TTL, negative_ttl: float = DNS_NEGATIVE_TTL,
+                 max_size: int = DNS_CACHE_SIZE) -> None:
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        # host -> (expires_at, pinned_ip, block_reason)
+        self._entries: "OrderedDict[str, Tuple[float, Optional[str], Optional[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._host_locks: Dict[str, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.blocked = 0
+
+    def _cached(self, key: str, now: float):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= now:
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def resolve(self, host: str) -> str:
+        """Return the validated IP to connect to, or raise ``BlockedHostError``."""
+        key = host.rstrip(".").lower().strip("[]")
+        try:
+            ipaddress.ip_address(key.split("%", 1)[0])
+        except ValueError:
+            pass
+        else:
+            # IP literal: nothing to resolve, just check it.
+            if is_blocked_ip(key):
+                with self._lock:
+                    self.blocked += 1
+                raise BlockedHostError(host, f"non-public address {key}")
+            return key
+
+        with self._lock:
+            entry = self._cached(key, time.monotonic())
+            if entry is None:
+                host_lock = self._host_locks.setdefault(key, threading.Lock())
+        if entry is None:
+            with host_lock:
+                # Another thread may have resolved it while we waited.
+                with self._lock:
+                    entry = self._cached(key, time.monotonic())
+                if entry is None:
+                    entry = self._lookup(key)
+                    with self._lock:
+                        self.misses += 1
+                        self._entries[key] = entry
+                        self._entries.move_to_end(key)
+                        while len(self._entries) > self.max_size:
+                            self._entries.popitem(last=False)
+                        self._host_locks.pop(key, None)
+
+        _, ip, reason = entry
+        if ip is None:
+            with self._lock:
+                self.blocked += 1
+            raise BlockedHostError(host, reason or "blocked")
+        return ip
+
+    def _lookup(self, key: str) -> Tuple[float, Optional[str], Optional[str]]:
+        try:
+            infos = socket.getaddrinfo(key, None, type=socket.SOCK_STREAM)
+        except (OSError, UnicodeError):
+            return time.monotonic() + self.negative_ttl, None, "unresolvable"
+        addresses = []
+        for info in infos:
+            ip_str = info[4][0]
+            if ip_str not in addresses:
+                addresses.append(ip_str)
+        ip, reason = _check(addresses)
+        return time.monotonic() + self.ttl, ip, reason
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits,
+                    "misses": self.misses, "blocked": self.blocked}
+
+
+_resolver = Resolver()
+
+
+def resolve(host: str) -> str:
+    """Validated, cached IP for ``host`` (see :class:`Resolver`)."""
+    return _resolver.resolve(host)
+
+
+def clear() -> None:
+    _resolver.clear()
+
+
+def stats() -> Dict[str, Any]:
+    return _resolver.stats()
@@ -0,0 +1,214 @@
+"""
+evidence_cache.py
+=================
+
+Content-hash memoization for the deterministic auditors (``audit_html``,
+``audit_code``, ``audit_text``, ``audit_image``).
+
+Each auditor is a pure function of its input, so resubmitting the same page,
+snippet, text or image can return the stored evidence instead of re-parsing.
+The cache key is a BLAKE2b digest of:
+
+* the auditor's name and a *module version* — a hash of the auditor's source
+  file, so editing a rule invalidates old entries without bumping anything;
+* every argument (input bytes and options such as ``hint_lang``), bound
+  against the signature so positional and keyword calls share entries.
+
+Entries are stored pickled: callers get a fresh copy each time and can
+mutate it freely, and the byte size is known for the size bound. Eviction is
+LRU once ``EVIDENCE_CACHE_MAX_ENTRIES`` or ``EVIDENCE_CACHE_MAX_BYTES`` is
+exceeded, and entries older than ``EVIDENCE_CACHE_TTL`` seconds are treated
+as misses. ``stats()`` reports hits, misses, hit rate, evictions and
+expirations. Set ``EVIDENCE_CACHE_ENABLED=false`` to bypass it entirely.
+
+Evidence an ``audit_limits`` time budget cut short is returned but never
+stored: how far the audit got depends on the load at the time.
+"""
+
+from __future__ import annotations
+
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+# ---------------------------------------------------------------------------
+# Configuration (read from environment / .env)
+# ---------------------------------------------------------------------------
+EVIDENCE_CACHE_ENABLED = os.getenv("EVIDENCE_CACHE_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+EVIDENCE_CACHE_MAX_ENTRIES = int(os.getenv("EVIDENCE_CACHE_MAX_ENTRIES", "2048"))
+EVIDENCE_CACHE_MAX_BYTES = int(os.getenv("EVIDENCE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+EVIDENCE_CACHE_TTL = float(os.getenv("EVIDENCE_CACHE_TTL", "3600"))
+
+
+class EvidenceCache:
+    """Thread-safe LRU of pickled evidence with entry, byte and age limits."""
+
+    def __init__(self, max_entries: int = EVIDENCE_CACHE_MAX_ENTRIES,
+                 max_bytes: int = EVIDENCE_CACHE_MAX_BYTES, ttl: float = EVIDENCE_CACHE_TTL) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[bytes, Tuple[float, bytes]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                self._drop(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: bytes, blob: bytes) -> None:
+        if len(blob) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic(), blob)
+            self._bytes += len(blob)
+            while self._entries and (len(self._entries) > self.max_entries
+                                     or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def _drop(self, key: bytes) -> None:
+        _, blob = self._entries.pop(key)
+        self._bytes -= len(blob)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+_cache = EvidenceCache()
+
+
+def module_version(module_name: str) -> bytes:
+    """Hash of a module's source file, for keys that must change with it."""
+    module = sys.modules.get(module_name)
+    path = getattr(module, "__file__", None)
+    try:
+        with open(path, "rb") as fh:
+            return hashlib.blake2b(fh.read(), digest_size=16).digest()
+    except (OSError, TypeError):
+        return b"unknown"
+
+
+def time_truncated(value: Any) -> bool:
+    """Whether ``value`` is evidence an ``audit_limits`` time budget cut short."""
+    return (isinstance(value, dict) and bool(value.get("truncated"))
+            and "time_budget" in (value.get("truncation") or {}).get("reasons", ()))
+
+
+def memoize(name: str, bypass_if: Iterable[str] = ()) -> Callable:
+    """Decorator: serve repeat calls of an auditor from the evidence cache.
+
+    ``bypass_if`` names arguments that make a call uncacheable when they are
+    not ``None`` (e.g. an output list the function appends to). The wrapped
+    function stays reachable as ``__wrapped__`` for benchmarks.
+
+    The wrapper also exposes ``cache_lookup(*args, **kwargs)`` →
+    ``(key, hit, value)`` and ``cache_store(key, value)`` so a caller that
+    computes the value elsewhere (``audit_executor`` runs it in a worker
+    process) still shares this process's cache.
+    """
+    bypass = tuple(bypass_if)
+
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+        version: Dict[str, bytes] = {}
+
+        def cache_key(*args, **kwargs) -> Optional[bytes]:
+            if not EVIDENCE_CACHE_ENABLED:
+                return None
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = bound.arguments
+            if any(arguments.get(arg) is not None for arg in bypass):
+                return None
+            if "v" not in version:
+                version["v"] = module_version(func.__module__)
+            digest = hashlib.blake2b(digest_size=32)
+            digest.update(name.encode())
+            digest.update(version["v"])
+            digest.update(pickle.dumps(sorted(arguments.items()), protocol=pickle.HIGHEST_PROTOCOL))
+            return digest.digest()
+
+        def cache_lookup(*args, **kwargs) -> Tuple[Optional[bytes], bool, Any]:
+            key = cache_key(*args, **kwargs)
+            blob = _cache.get(key) if key is not None else None
+            if blob is None:
+                return key, False, None
+            return key, True, pickle.loads(blob)
+
+        def cache_store(key: Optional[bytes], value: Any) -> None:
+            if key is not None and not time_truncated(value):
+                _cache.put(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key, hit, value = cache_lookup(*args, **kwargs)
+            if hit:
+                return value
+            result = func(*args, **kwargs)
+            cache_store(key, result)
+            return result
+
+        wrapper.cache_lookup = cache_lookup
+        wrapper.cache_store = cache_store
+        return wrapper
+
+    return decorator
+
+
+def configure(max_entries: Optional[int] = None, max_bytes: Optional[int] = None,
+              ttl: Optional[float] = None) -> None:
+    """Replace the shared cache with one using new limits (drops all entries)."""
+    global _cache
+    _cache = EvidenceCache(
+        EVIDENCE_CACHE_MAX_ENTRIES if max_entries is None else max_entries,
+        EVIDENCE_CACHE_MAX_BYTES if max_bytes is None else max_bytes,
+        EVIDENCE_CACHE_TTL if ttl is None else ttl,
+    )
+
+
+def clear() -> None:
+    _cache.clear()
+
+
+def stats() -> Dict[str, Any]:
+    return _cache.stats()
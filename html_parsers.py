@@ -0,0 +1,464 @@
+"""
+html_parsers.py
+===============
+
+Pluggable HTML parser backends for ``web_audit.audit_html``.
+
+Every backend turns markup into the same stream of callbacks on a *sink*
+object, so the audit walk never touches a parser-specific tree:
+
+* ``sink.start(element) -> bool`` — an element opened. ``element`` exposes
+  ``.name``, ``.attrs`` and ``.get()`` with BeautifulSoup semantics
+  (multi-valued attributes such as ``class`` / ``rel`` are lists). Return
+  ``False`` to skip the element's subtree; no ``end()`` follows in that case.
+* ``sink.end()`` — the most recently started (non-skipped) element closed.
+* ``sink.text(data, cdata=False)`` — one text node.
+* ``sink.doctype(data)`` / ``sink.instruction(data)`` — a doctype, or a
+  processing instruction / declaration. Comments are dropped.
+
+Incremental parsing
+-------------------
+``get_incremental(name).open(sink, encoding)`` returns a parser that takes
+the document as raw byte chunks (``feed(chunk)`` … ``close()``), decoding
+and tokenizing each chunk as it arrives without building a tree, so a page
+can be audited while it downloads. ``html.parser`` runs BeautifulSoup's own
+tokenizer against a tree-less stand-in for the soup, so it emits exactly the
+events ``walk_soup`` would; ``lxml`` feeds its event target chunk by chunk.
+Selectolax has no incremental API and is served by ``lxml`` (or
+``html.parser``) instead.
+
+Backends
+--------
+* ``html.parser`` — BeautifulSoup over the stdlib parser. Always available
+  and the reference behaviour.
+* ``lxml`` — libxml2's HTML parser via lxml's event target API (no tree is
+  built). Optional: ``pip install lxml``.
+* ``selectolax`` — the Lexbor HTML5 parser. Optional:
+  ``pip install selectolax``.
+
+The default is chosen once at import: ``AUDIT_HTML_PARSER`` (env / ``.env``)
+may name a backend, otherwise the fastest installed one is used. On the
+repo's own pages all backends yield identical evidence (see
+``test_html_parsers.py``); on malformed markup the HTML5 parsers repair the
+tree the way browsers do, so results can legitimately differ there.
+"""
+
+from __future__ import annotations
+
+import codecs
+import logging
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+from bs4 import BeautifulSoup, CData, Comment, Declaration, Doctype, ProcessingInstruction, Tag
+from bs4.builder import HTMLTreeBuilder
+from bs4.builder._htmlparser import BeautifulSoupHTMLParser
+
+try:
+    from lxml import etree as _lxml_etree  # type: ignore
+except ImportError:  # pragma: no cover — optional dependency
+    _lxml_etree = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as _LexborHTMLParser  # type: ignore
+except ImportError:  # pragma: no cover — optional dependency
+    _LexborHTMLParser = None
+
+log = logging.getLogger(__name__)
+
+# Backend named in config; "auto" picks the first available from _PREFERENCE.
+AUDIT_HTML_PARSER = os.getenv("AUDIT_HTML_PARSER", "auto").strip().lower()
+_PREFERENCE = ("selectolax", "lxml", "html.parser")
+
+# BeautifulSoup splits these attribute values into lists; the native
+# backends do the same so selectors and rel checks see identical values.
+_LIST_ATTRS = HTMLTreeBuilder.DEFAULT_CDATA_LIST_ATTRIBUTES
+_LIST_ATTRS_ANY = frozenset(_LIST_ATTRS.get("*", ()))
+
+
+class Element:
+    """Minimal stand-in for a BeautifulSoup ``Tag`` (name + attributes)."""
+
+    __slots__ = ("name", "attrs")
+
+    def __init__(self, name: str, attrs: Dict[str, Any]) -> None:
+        self.name = name
+        self.attrs = attrs
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.attrs.get(key, default)
+
+    def __getitem__(self, key: str) -> Any:
+        return self.attrs[key]
+
+
+def _normalise_attrs(name: str, raw) -> Dict[str, Any]:
+    attrs: Dict[str, Any] = {}
+    tag_specific = _LIST_ATTRS.get(name)
+    for key, value in raw.items():
+        if value is None:
+            value = ""
+        if key in _LIST_ATTRS_ANY or (tag_specific and key in tag_specific):
+            value = value.split()
+        attrs[key] = value
+    return attrs
+
+
+# ---------------------------------------------------------------------------
+# Backends
+# ---------------------------------------------------------------------------
+class ParserBackend:
+    """Base class: parse ``html`` and drive ``sink`` with callbacks."""
+
+    name = ""
+    incremental = False
+
+    def available(self) -> bool:
+        return True
+
+    def feed(self, html: str, sink) -> None:
+        raise NotImplementedError
+
+    def open(self, sink, encoding: Optional[str] = None) -> "IncrementalParser":
+        """Start an incremental parse of a byte stream into ``sink``."""
+        raise NotImplementedError
+
+
+class IncrementalParser:
+    """Decode byte chunks as they arrive and pass the text to ``consume``.
+
+    Decoding matches ``web_audit._decode``: the declared charset (utf-8 when
+    missing or unknown) with undecodable bytes replaced.
+    """
+
+    def __init__(self, consume: Callable[[str], None], finish: Callable[[], None],
+                 encoding: Optional[str]) -> None:
+        try:
+            decoder = codecs.getincrementaldecoder(encoding or "utf-8")
+        except LookupError:
+            decoder = codecs.getincrementaldecoder("utf-8")
+        self._decoder = decoder(errors="replace")
+        self._consume = consume
+        self._finish = finish
+
+    def feed(self, chunk: bytes) -> None:
+        text = self._decoder.decode(chunk)
+        if text:
+            self._consume(text)
+
+    def feed_text(self, text: str) -> None:
+        """Feed already-decoded markup (``audit_html``'s low-memory mode)."""
+        if text:
+            self._consume(text)
+
+    def close(self) -> None:
+        text = self._decoder.decode(b"", final=True)
+        if text:
+            self._consume(text)
+        self._finish()
+
+
+class HtmlParserBackend(ParserBackend):
+    name = "html.parser"
+    incremental = True
+
+    def feed(self, html: str, sink) -> None:
+        walk_soup(BeautifulSoup(html or "", "html.parser"), sink)
+
+    def open(self, sink, encoding: Optional[str] = None) -> IncrementalParser:
+        soup = _StreamingSoup(sink)
+        parser = BeautifulSoupHTMLParser(convert_charrefs=False)
+        parser.soup = soup
+
+        def finish() -> None:
+            parser.close()
+            soup.finish()
+
+        return IncrementalParser(parser.feed, finish, encoding)
+
+
+_STRING_EVENTS = {
+    None: "text", CData: "cdata", Doctype: "doctype",
+    Declaration: "instruction", ProcessingInstruction: "instruction", Comment: None,
+}
+
+
+class _StreamingSoup:
+    """The part of ``BeautifulSoup`` its html.parser builder talks to.
+
+    BeautifulSoup's ``BeautifulSoupHTMLParser`` reports tags and strings to
+    ``parser.soup``; this stand-in turns those reports into sink events
+    instead of tree nodes, repeating the tree-building rules that decide
+    what ``walk_soup`` would see: end tags close up to the nearest open
+    element of that name (and are ignored if there is none), whitespace-only
+    strings collapse outside ``<pre>``/``<textarea>``, and whatever is still
+    open at the end is closed. Only the stack of open tag names is kept.
+    """
+
+    original_encoding = None
+    _ASCII_SPACES = frozenset("\x20\x0a\x09\x0c\x0d")
+
+    def __init__(self, sink) -> None:
+        self.sink = sink
+        self.stack: List[str] = []  # open element names, innermost last
+        self.skip_depth = 0  # > 0 while inside a subtree the sink declined
+        self.preserve = 0  # open <pre>/<textarea> elements
+        self.current_data: List[str] = []
+
+    def handle_starttag(self, name, namespace, nsprefix, attrs, sourceline=None,
+                        sourcepos=None, namespaces=None):
+        self.endData()
+        element = Element(name, _normalise_attrs(name, attrs))
+        self.stack.append(name)
+        if name in _PRESERVE_WHITESPACE:
+            self.preserve += 1
+        if self.skip_depth:
+            self.skip_depth += 1
+        elif not self.sink.start(element):
+            self.skip_depth = 1
+        return _Opened(name in _EMPTY_ELEMENTS)
+
+    def handle_endtag(self, name, nsprefix=None) -> None:
+        self.endData()
+        if name not in self.stack:
+            return
+        while self.stack:
+            if self._pop() == name:
+                break
+
+    def _pop(self) -> str:
+        name = self.stack.pop()
+        if name in _PRESERVE_WHITESPACE:
+            self.preserve -= 1
+        if self.skip_depth:
+            self.skip_depth -= 1
+        else:
+            self.sink.end()
+        return name
+
+    def handle_data(self, data: str) -> None:
+        self.current_data.append(data)
+
+    def endData(self, containerClass=None) -> None:
+        if not self.current_data:
+            return
+        data = "".join(self.current_data)
+        self.current_data = []
+        if not self.preserve and self._ASCII_SPACES.issuperset(data):
+            data = "\n" if "\n" in data else " "
+        event = _STRING_EVENTS.get(containerClass, "instruction")
+        if self.skip_depth or event is None:
+            return
+        if event == "text":
+            self.sink.text(data)
+        elif event == "cdata":
+            self.sink.text(data, cdata=True)
+        elif event == "doctype":
+            self.sink.doctype(data)
+        else:
+            self.sink.instruction(data)
+
+    def finish(self) -> None:
+        self.endData()
+        while self.stack:
+            self._pop()
+
+
+class _Opened:
+    """What ``BeautifulSoupHTMLParser`` needs back from ``handle_starttag``."""
+
+    __slots__ = ("is_empty_element",)
+
+    def __init__(self, is_empty_element: bool) -> None:
+        self.is_empty_element = is_empty_element
+
+
+_EMPTY_ELEMENTS = frozenset(HTMLTreeBuilder.empty_element_tags)
+_PRESERVE_WHITESPACE = frozenset(HTMLTreeBuilder.DEFAULT_PRESERVE_WHITESPACE_TAGS)
+
+
+def walk_soup(soup, sink) -> None:
+    """Drive ``sink`` from an already-parsed BeautifulSoup tree."""
+    iters = [iter(soup.contents)]
+    while iters:
+        node = next(iters[-1], None)
+        if node is None:
+            iters.pop()
+            if iters:
+                sink.end()
+            continue
+        if isinstance(node, Tag):
+            if sink.start(node):
+                iters.append(iter(node.contents))
+        elif isinstance(node, Comment):
+            continue
+        elif isinstance(node, CData):
+            sink.text(str(node), cdata=True)
+        elif isinstance(node, Doctype):
+            sink.doctype(str(node))
+        elif isinstance(node, (Declaration, ProcessingInstruction)):
+            sink.instruction(str(node))
+        else:
+            sink.text(str(node))
+
+
+class _LxmlTarget:
+    """lxml parser target that forwards events to a sink.
+
+    libxml2 may deliver one text node in several ``data`` calls (around
+    entities, for example), so text is buffered until the next structural
+    event — the same merge BeautifulSoup performs.
+    """
+
+    def __init__(self, sink) -> None:
+        self.sink = sink
+        self.skip = 0
+        self.buffer: List[str] = []
+
+    def _flush(self) -> None:
+        if self.buffer:
+            text = "".join(self.buffer)
+            self.buffer = []
+            if not self.skip:
+                self.sink.text(text)
+
+    def start(self, tag, attrib) -> None:
+        self._flush()
+        if self.skip:
+            self.skip += 1
+        elif not self.sink.start(Element(tag, _normalise_attrs(tag, attrib))):
+            self.skip = 1
+
+    def end(self, tag) -> None:
+        self._flush()
+        if self.skip:
+            self.skip -= 1
+        else:
+            self.sink.end()
+
+    def data(self, data) -> None:
+        self.buffer.append(data)
+
+    def comment(self, text) -> None:
+        self._flush()
+
+    def doctype(self, name, pubid, system) -> None:
+        self._flush()
+        if not self.skip:
+            self.sink.doctype(name or "")
+
+    def pi(self, target, data=None) -> None:
+        self._flush()
+        if not self.skip:
+            self.sink.instruction(f"{target} {data or ''}".strip())
+
+    def close(self) -> None:
+        self._flush()
+
+
+class LxmlBackend(ParserBackend):
+    name = "lxml"
+    incremental = True
+
+    def available(self) -> bool:
+        return _lxml_etree is not None
+
+    def feed(self, html: str, sink) -> None:
+        target = _LxmlTarget(sink)
+        parser = _lxml_etree.HTMLParser(target=target, encoding="utf-8")
+        parser.feed((html or "").encode("utf-8"))
+        parser.close()
+
+    def open(self, sink, encoding: Optional[str] = None) -> IncrementalParser:
+        # Decode in Python (same rules as the other backends), then hand
+        # libxml2 a uniform utf-8 stream.
+        parser = _lxml_etree.HTMLParser(target=_LxmlTarget(sink), encoding="utf-8")
+        return IncrementalParser(lambda text: parser.feed(text.encode("utf-8")),
+                                 parser.close, encoding)
+
+
+class SelectolaxBackend(ParserBackend):
+    name = "selectolax"
+
+    def available(self) -> bool:
+        return _LexborHTMLParser is not None
+
+    def feed(self, html: str, sink) -> None:
+        root = _LexborHTMLParser(html or "").root
+        if root is None:
+            return
+        stack: list = []
+        node = root.parent.child  # first child of the document node
+        while True:
+            if node is None:
+                if not stack:
+                    break
+                sink.end()
+                node = stack.pop().next
+                continue
+            tag = node.tag
+            if tag == "-text":
+                sink.text(node.text_content or "")
+            elif tag == "-doctype":
+                sink.doctype("")
+            elif tag and tag[0] != "-":
+                if sink.start(Element(tag, _normalise_attrs(tag, node.attributes))):
+                    stack.append(node)
+                    node = node.child
+                    continue
+            node = node.next
+
+
+BACKENDS: Dict[str, ParserBackend] = {
+    b.name: b for b in (SelectolaxBackend(), LxmlBackend(), HtmlParserBackend())
+}
+
+
+def available_backends() -> List[str]:
+    """Names of the backends importable in this environment."""
+    return [name for name in _PREFERENCE if BACKENDS[name].available()]
+
+
+def get_backend(name: Optional[str] = None) -> ParserBackend:
+    """Return the backend called ``name`` (or the configured default).
+
+    Raises ``ValueError`` for an unknown or uninstalled backend when a name is
+    given explicitly.
+    """
+    if not name:
+        return DEFAULT_BACKEND
+    if name == "auto":
+        return BACKENDS[available_backends()[0]]
+    backend = BACKENDS.get(name)
+    if backend is None:
+        raise ValueError(f"Unknown HTML parser backend: {name!r} "
+                         f"(choose from {', '.join(_PREFERENCE)})")
+    if not backend.available():
+        raise ValueError(f"HTML parser backend {name!r} is not installed")
+    return backend
+
+
+def get_incremental(name: Optional[str] = None) -> ParserBackend:
+    """Like ``get_backend`` but always a backend that supports ``open()``.
+
+    A backend without incremental support (selectolax) is replaced by the
+    best one that has it.
+    """
+    backend = get_backend(name)
+    if backend.incremental:
+        return backend
+    for fallback in available_backends():
+        if BACKENDS[fallback].incremental:
+            return BACKENDS[fallback]
+    return BACKENDS["html.parser"]
+
+
+def _resolve_default() -> ParserBackend:
+    try:
+        return get_backend(AUDIT_HTML_PARSER or "auto")
+    except ValueError as exc:
+        log.warning("%s — falling back to html.parser", exc)
+        return BACKENDS["html.parser"]
+
+
+DEFAULT_BACKEND: ParserBackend = _resolve_default()
@@ -0,0 +1,363 @@
+"""
+http_cache.py
+=============
+
+On-disk HTTP cache for ``web_audit.fetch_page``.
+
+A successful fetch that carries an ``ETag`` or ``Last-Modified`` header is
+stored as two files under ``HTTP_CACHE_DIR``: ``<key>.body`` (the raw bytes,
+already capped at ``MAX_RESPONSE_BYTES``) and ``<key>.json`` (validators
+plus the page metadata ``fetch_page`` returns). On the next fetch of the
+same URL the validators go out as ``If-None-Match`` / ``If-Modified-Since``;
+a ``304 Not Modified`` is answered from disk, so an unchanged page costs a
+few hundred bytes instead of the whole document. Responses with
+``Cache-Control: max-age`` are served without contacting the server at all
+until they go stale. ``no-store`` responses are never written.
+
+The directory is bounded to ``HTTP_CACHE_MAX_BYTES``; when a store pushes it
+over, the least recently used entries (by file mtime, which every hit
+refreshes) are removed until it is back under 90% of the limit. Several
+worker processes may share one directory: files are written atomically and
+a missing or half-evicted entry is simply a miss.
+
+A cached entry is served as the page itself, so the directory must be
+private: the cache is off unless ``HTTP_CACHE_DIR`` names one (there is no
+default under the shared temp directory), it is created readable by its
+owner only, and a directory another user owns or others may write to is
+refused. ``*.tmp`` files left by a process that died mid-write are swept
+whenever the directory is scanned. Set ``HTTP_CACHE_ENABLED=false`` to turn
+the cache off.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+# ---------------------------------------------------------------------------
+# Configuration (read from environment / .env)
+# ---------------------------------------------------------------------------
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", "").strip()
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+_MAX_AGE_RE = re.compile(r"(?:^|,)\s*(?:s-)?max-age\s*=\s*\"?(\d+)", re.I)
+_NO_STORE_RE = re.compile(r"(?:^|,)\s*(no-store|private)\b", re.I)
+_NO_CACHE_RE = re.compile(r"(?:^|,)\s*no-cache\b", re.I)
+
+# A temp file older than this belongs to a writer that is gone.
+_STALE_TMP_SECONDS = 3600
+
+
+class CachedPage:
+    """A stored response: ``meta`` (JSON-able dict) plus the raw ``body``."""
+
+    __slots__ = ("key", "meta", "body")
+
+    def __init__(self, key: str, meta: Dict[str, Any], body: bytes) -> None:
+        self.key = key
+        self.meta = meta
+        self.body = body
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        return (now or time.time()) < self.meta.get("fresh_until", 0)
+
+    def validators(self) -> Dict[str, str]:
+        """Conditional-request headers for revalidating this entry."""
+        headers = {}
+        if self.meta.get("etag"):
+            headers["If-None-Match"] = self.meta["etag"]
+        if self.meta.get("last_modified"):
+            headers["If-Modified-Since"] = self.meta["last_modified"]
+        return headers
+
+
+def storable(headers) -> bool:
+    """Whether a 200 response with ``headers`` is worth caching."""
+    if not (headers.get("ETag") or headers.get("Last-Modified")
+            or _MAX_AGE_RE.search(headers.get("Cache-Control", ""))):
+        return False
+    if _NO_STORE_RE.search(headers.get("Cache-Control", "")):
+        return False
+    return headers.get("Vary", "").strip() != "*"
+
+
+def freshness(headers, now: Optional[float] = None) -> float:
+    """Unix time until which the response may be reused without revalidating."""
+    cache_control = headers.get("Cache-Control", "")
+    if _NO_CACHE_RE.search(cache_control):
+        return 0.0
+    match = _MAX_AGE_RE.search(cache_control)
+    if not match:
+        return 0.0
+    return (now or time.time()) + int(match.group(1))
+
+
+class HttpCache:
+    """LRU-bounded directory of cached responses, keyed by request URL."""
+
+    def __init__(self, directory: str = HTTP_CACHE_DIR, max_bytes: int = HTTP_CACHE_MAX_BYTES) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        _check_private(directory)
+        self._lock = threading.Lock()
+        self._size = self._disk_usage()
+        self.counters = {"hits": 0, "misses": 0, "revalidated": 0, "updated": 0,
+                         "stores": 0, "evictions": 0, "bytes_saved": 0}
+
+    # ---- paths -----------------------------------------------------------
+    @staticmethod
+    def key_for(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.directory, key)
+        return base + ".json", base + ".body"
+
+    def _disk_usage(self) -> int:
+        total = 0
+        stale = time.time() - _STALE_TMP_SECONDS
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    st = entry.stat()
+                    if entry.name.endswith(".tmp") and st.st_mtime < stale:
+                        _unlink(entry.path)
+                        continue
+                    total += st.st_size
+        return total
+
+    # ---- counters --------------------------------------------------------
+    def count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += amount
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.counters, size_bytes=self._size, max_bytes=self.max_bytes)
+
+    # ---- read / write ----------------------------------------------------
+    def get(self, url: str) -> Optional[CachedPage]:
+        """Return the stored entry for ``url`` (touching it for LRU), if any."""
+        key = self.key_for(url)
+        meta_path, body_path = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as fh:
+                meta = json.load(fh)
+            with open(body_path, "rb") as fh:
+                body = fh.read()
+        except (OSError, ValueError):
+            return None
+        if meta.get("url") != url or meta.get("body_size") != len(body):
+            return None  # hash collision or a torn write from another process
+        now = time.time()
+        for path in (meta_path, body_path):
+            try:
+                os.utime(path, (now, now))
+            except OSError:
+                pass
+        return CachedPage(key, meta, body)
+
+    def put(self, url: str, meta: Dict[str, Any], body: bytes) -> None:
+        writer = self.writer(url)
+        if writer is not None:
+            writer.write(body)
+            writer.commit(meta)
+
+    def writer(self, url: str) -> Optional["EntryWriter"]:
+        """Start storing ``url`` chunk by chunk (``None`` if the disk refuses)."""
+        try:
+            return EntryWriter(self, url)
+        except OSError:
+            return None
+
+    def _commit(self, url: str, body_tmp: str, body_size: int, meta: Dict[str, Any]) -> None:
+        key = self.key_for(url)
+        meta = dict(meta, url=url, body_size=body_size)
+        meta_bytes = json.dumps(meta).encode("utf-8")
+        meta_path, body_path = self._paths(key)
+        if body_size + len(meta_bytes) > self.max_bytes:
+            _unlink(body_tmp)
+            return
+        try:
+            old = sum(os.path.getsize(p) for p in (meta_path, body_path) if os.path.exists(p))
+            # Body first, metadata last: readers treat a body/size mismatch as a miss.
+            os.replace(body_tmp, body_path)
+            self._atomic_write(meta_path, meta_bytes)
+        except OSError:
+            _unlink(body_tmp)
+            return  # a full or read-only disk only costs us the cache
+        with self._lock:
+            self._size += body_size + len(meta_bytes) - old
+            self.counters["stores"] += 1
+            over = self._size > self.max_bytes
+        if over:
+            self._evict()
+
+    def refresh(self, cached: CachedPage) -> None:
+        """Rewrite only the metadata of ``cached`` (e.g. a new freshness time)."""
+        meta_path, _ = self._paths(cached.key)
+        try:
+            self._atomic_write(meta_path, json.dumps(cached.meta).encode("utf-8"))
+        except OSError:
+            pass
+
+    def _atomic_write(self, path: str, data: bytes) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            _unlink(tmp)
+            raise
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until under 90% of the limit."""
+        entries: Dict[str, list] = {}
+        stale = time.time() - _STALE_TMP_SECONDS
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                key, _, ext = entry.name.partition(".")
+                if ext not in ("json", "body", "tmp"):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                if ext == "tmp":
+                    if st.st_mtime < stale:
+                        _unlink(entry.path)
+                    continue
+                slot = entries.setdefault(key, [0.0, 0])
+                slot[0] = max(slot[0], st.st_mtime)
+                slot[1] += st.st_size
+        total = sum(size for _, size in entries.values())
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        for key, (_, size) in sorted(entries.items(), key=lambda kv: kv[1][0]):
+            if total <= target:
+                break
+            for path in self._paths(key):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            total -= size
+            evicted += 1
+        with self._lock:
+            self._size = total
+            self.counters["evictions"] += evicted
+
+    def clear(self) -> None:
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith((".json", ".body", ".tmp")):
+                    try:
+                        os.unlink(entry.path)
+                    except OSError:
+                        pass
+        with self._lock:
+            self._size = 0
+
+
+class EntryWriter:
+    """Streams one response body to a temp file; ``commit`` publishes it.
+
+    Lets ``fetch_page`` cache a page while handing each chunk on, without
+    holding the whole body in memory. Bodies that outgrow the cache, and any
+    write error, silently turn the entry into a no-op.
+    """
+
+    def __init__(self, cache: HttpCache, url: str) -> None:
+        self.cache = cache
+        self.url = url
+        self.size = 0
+        fd, self.tmp = tempfile.mkstemp(dir=cache.directory, suffix=".tmp")
+        self.fh: Optional[Any] = os.fdopen(fd, "wb")
+
+    def write(self, chunk: bytes) -> None:
+        if self.fh is None:
+            return
+        self.size += len(chunk)
+        if self.size > self.cache.max_bytes:
+            self.abort()
+            return
+        try:
+            self.fh.write(chunk)
+        except OSError:
+            self.abort()
+
+    def commit(self, meta: Dict[str, Any]) -> None:
+        if self.fh is None:
+            return
+        try:
+            self.fh.close()
+        except OSError:
+            self.abort()
+            return
+        self.fh = None
+        self.cache._commit(self.url, self.tmp, self.size, meta)
+
+    def abort(self) -> None:
+        if self.fh is not None:
+            try:
+                self.fh.close()
+            except OSError:
+                pass
+            self.fh = None
+            _unlink(self.tmp)
+
+
+def _check_private(directory: str) -> None:
+    """Refuse a cache directory another user could plant entries in."""
+    st = os.stat(directory)
+    if hasattr(os, "getuid") and st.st_uid != os.getuid():
+        raise PermissionError(f"{directory} is owned by another user")
+    if st.st_mode & 0o022:
+        raise PermissionError(f"{directory} is writable by group or others")
+
+
+def _unlink(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+_cache: Optional[HttpCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[HttpCache]:
+    """The process-wide cache, or ``None`` when disabled, unset or unusable."""
+    global _cache
+    if _cache is not None or not (HTTP_CACHE_ENABLED and HTTP_CACHE_DIR):
+        return _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                try:
+                    _cache = HttpCache()
+                except OSError:
+                    return None
+    return _cache
+
+
+def set_cache(cache: Optional[HttpCache]) -> None:
+    """Replace the process-wide cache (tests, or a custom directory)."""
+    global _cache
+    with _cache_lock:
+        _cache = cache
+
+
+def stats() -> Dict[str, Any]:
+    cache = get_cache()
+    return cache.stats() if cache is not None else {"enabled": False}
@@ -0,0 +1,398 @@
+"""
+http_pool.py
+============
+
+Shared, keep-alive HTTP connection pool for outbound page fetches
+(``web_audit.fetch_page``).
+
+One pool exists per process (it is rebuilt after a fork, so gunicorn
+workers never share sockets). Connections to a host are kept alive and
+reused across audits, which saves the TCP + TLS handshake on every page
+after the first. At most ``FETCH_POOL_PER_HOST`` requests to one host are
+in flight at a time; further callers wait for a slot (bounded by the
+request timeout).
+
+Two transports are available:
+
+* ``requests`` (default) — HTTP/1.1 over a ``requests.Session`` whose
+  adapter keeps ``FETCH_POOL_HOSTS`` host pools of ``FETCH_POOL_PER_HOST``
+  connections each.
+* ``httpx`` — enabled with ``FETCH_HTTP2=true``. Negotiates HTTP/2 via ALPN
+  when the ``h2`` package is installed (``pip install httpx[http2]``),
+  otherwise it speaks HTTP/1.1 and logs a warning.
+
+Every new connection — including those opened while following redirects —
+resolves its host through ``dns_cache`` and connects to the validated IP it
+returns, so the SSRF check applies to each hop and the address checked is
+the address used. TLS still verifies against (and sends SNI for) the
+hostname.
+
+Both transports raise :class:`FetchError` with the same ``kind`` values, and
+:func:`stats` reports connection reuse counters for whichever is active.
+"""
+
+from __future__ import annotations
+
+import http.cookiejar
+import logging
+import os
+import ssl
+import threading
+from typing import Any, Dict, Iterator, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.utils import get_encoding_from_headers
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util.connection import create_connection
+
+import dns_cache
+
+try:
+    import httpcore  # type: ignore
+    import httpx  # type: ignore
+except ImportError:  # pragma: no cover — httpx ships with the openai SDK
+    httpcore = httpx = None
+
+log = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Configuration (read from environment / .env)
+# ---------------------------------------------------------------------------
+FETCH_POOL_HOSTS = int(os.getenv("FETCH_POOL_HOSTS", "16"))
+FETCH_POOL_PER_HOST = int(os.getenv("FETCH_POOL_PER_HOST", "4"))
+FETCH_HTTP2 = os.getenv("FETCH_HTTP2", "false").strip().lower() in ("1", "true", "yes")
+
+
+_NO_COOKIES = http.cookiejar.DefaultCookiePolicy(allowed_domains=[])
+
+
+class FetchError(Exception):
+    """A request failed before a response arrived.
+
+    ``kind`` is one of ``private_host``, ``ssl``, ``timeout``, ``connection``
+    or ``request`` — the same ``error_kind`` values ``fetch_page`` reports.
+    """
+
+    def __init__(self, kind: str, message: str) -> None:
+        super().__init__(message)
+        self.kind = kind
+
+
+# ---------------------------------------------------------------------------
+# Counters
+# ---------------------------------------------------------------------------
+class _Stats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections_opened = 0
+        self.host_waits = 0
+
+    def incr(self, field: str) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            reused = max(0, self.requests - self.connections_opened)
+            return {
+                "requests": self.requests,
+                "connections_opened": self.connections_opened,
+                "connections_reused": reused,
+                "reuse_ratio": round(reused / self.requests, 3) if self.requests else 0.0,
+                "host_waits": self.host_waits,
+            }
+
+
+# ---------------------------------------------------------------------------
+# Responses
+# ---------------------------------------------------------------------------
+class PooledResponse:
+    """Transport-neutral view of a streamed response.
+
+    ``close()`` must be called once the body has been read; it returns the
+    connection to the pool and frees the per-host slot.
+    """
+
+    def __init__(self, raw, status_code: int, url: str, headers, http_version: str,
+                 iter_bytes, release) -> None:
+        self.raw = raw
+        self.status_code = status_code
+        self.url = url
+        self.headers = headers
+        self.http_version = http_version
+        # Same rule requests applies: the Content-Type charset, else
+        # ISO-8859-1 for text/*, else None.
+        self.encoding = get_encoding_from_headers(headers)
+        self._iter_bytes = iter_bytes
+        self._release = release
+
+    def iter_bytes(self, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        return self._iter_bytes(chunk_size)
+
+    def close(self) -> None:
+        release, self._release = self._release, None
+        if release is None:
+            return
+        try:
+            self.raw.close()
+        finally:
+            release()
+
+
+# ---------------------------------------------------------------------------
+# Transports
+# ---------------------------------------------------------------------------
+class _PinnedConnectionMixin:
+    """urllib3 connection that dials the IP ``dns_cache`` validated.
+
+    Mirrors ``HTTPConnection._new_conn`` except for the address; ``self.host``
+    is untouched so the Host header, SNI and certificate checks still use the
+    hostname.
+    """
+
+    def _new_conn(self):
+        ip = dns_cache.resolve(self._dns_host)
+        try:
+            return create_connection((ip, self.port), self.timeout,
+                                     source_address=self.source_address,
+                                     socket_options=self.socket_options)
+        except TimeoutError as exc:
+            raise ConnectTimeoutError(
+                self, f"Connection to {self.host} timed out. (connect timeout={self.timeout})"
+            ) from exc
+        except OSError as exc:
+            raise NewConnectionError(self, f"Failed to establish a new connection: {exc}") from exc
+
+
+class _PinnedHTTPConnection(_PinnedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _PinnedHTTPSConnection(_PinnedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _CountingHTTPPool(HTTPConnectionPool):
+    ConnectionCls = _PinnedHTTPConnection
+    stats: Optional[_Stats] = None
+
+    def _new_conn(self):
+        if self.stats is not None:
+            self.stats.incr("connections_opened")
+        return super()._new_conn()
+
+
+class _CountingHTTPSPool(HTTPSConnectionPool):
+    ConnectionCls = _PinnedHTTPSConnection
+    stats: Optional[_Stats] = None
+
+    def _new_conn(self):
+        if self.stats is not None:
+            self.stats.incr("connections_opened")
+        return super()._new_conn()
+
+
+class _PoolAdapter(HTTPAdapter):
+    """HTTPAdapter whose urllib3 pools pin IPs and count connections opened."""
+
+    def __init__(self, stats: _Stats, **kwargs) -> None:
+        self._stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        counting = {
+            "http": type("CountingHTTPPool", (_CountingHTTPPool,), {"stats": self._stats}),
+            "https": type("CountingHTTPSPool", (_CountingHTTPSPool,), {"stats": self._stats}),
+        }
+        self.poolmanager.pool_classes_by_scheme = counting
+
+
+class RequestsTransport:
+    name = "requests"
+
+    def __init__(self, stats: _Stats) -> None:
+        self.stats = stats
+        self.session = requests.Session()
+        # Audits of unrelated sites share this session: never keep cookies
+        # between them (cookies set during one redirect chain still apply).
+        self.session.cookies.set_policy(_NO_COOKIES)
+        adapter = _PoolAdapter(
+            stats,
+            pool_connections=FETCH_POOL_HOSTS,
+            pool_maxsize=FETCH_POOL_PER_HOST,
+            max_retries=0,
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def send(self, url: str, headers: Dict[str, str], timeout: float, release) -> PooledResponse:
+        try:
+            resp = self.session.get(url, headers=headers, timeout=timeout,
+                                    allow_redirects=True, stream=True)
+        except dns_cache.BlockedHostError as exc:
+            raise FetchError("private_host", str(exc)) from exc
+        except requests.exceptions.SSLError as exc:
+            raise FetchError("ssl", f"TLS error: {exc}") from exc
+        except requests.exceptions.Timeout as exc:
+            raise FetchError("timeout", f"Timed out after {timeout}s") from exc
+        except requests.exceptions.ConnectionError as exc:
+            raise FetchError("connection", f"Connection failed: {exc}") from exc
+        except requests.exceptions.RequestException as exc:
+            raise FetchError("request", f"Request failed: {exc}") from exc
+        return PooledResponse(resp, resp.status_code, resp.url, resp.headers, "HTTP/1.1",
+                              lambda size: resp.iter_content(chunk_size=size), release)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+if httpcore is not None:
+    class _PinnedNetworkBackend(httpcore.SyncBackend):
+        """httpcore backend that dials the IP ``dns_cache`` validated."""
+
+        def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+            return super().connect_tcp(dns_cache.resolve(host), port, timeout=timeout,
+                                       local_address=local_address,
+                                       socket_options=socket_options)
+
+
+class HttpxTransport:
+    name = "httpx"
+
+    def __init__(self, stats: _Stats, http2: bool = True) -> None:
+        self.stats = stats
+        limits = httpx.Limits(
+            max_connections=FETCH_POOL_HOSTS * FETCH_POOL_PER_HOST,
+            max_keepalive_connections=FETCH_POOL_HOSTS * FETCH_POOL_PER_HOST,
+        )
+        try:
+            transport = httpx.HTTPTransport(http2=http2, limits=limits)
+        except ImportError:
+            log.warning("FETCH_HTTP2 is set but the 'h2' package is missing; "
+                        "install httpx[http2]. Falling back to HTTP/1.1.")
+            transport = httpx.HTTPTransport(http2=False, limits=limits)
+        # HTTPTransport has no network_backend argument; swap it on the
+        # underlying httpcore pool before any connection exists.
+        transport._pool._network_backend = _PinnedNetworkBackend()
+        self.client = httpx.Client(transport=transport, follow_redirects=True)
+        self.client.cookies.jar.set_policy(_NO_COOKIES)
+
+    def _trace(self, event: str, info: Dict[str, Any]) -> None:
+        # httpcore only emits connect_tcp for a brand-new connection.
+        if event == "connection.connect_tcp.started":
+            self.stats.incr("connections_opened")
+
+    def send(self, url: str, headers: Dict[str, str], timeout: float, release) -> PooledResponse:
+        try:
+            request = self.client.build_request("GET", url, headers=headers, timeout=timeout,
+                                                extensions={"trace": self._trace})
+            resp = self.client.send(request, stream=True)
+        except dns_cache.BlockedHostError as exc:
+            raise FetchError("private_host", str(exc)) from exc
+        except httpx.TimeoutException as exc:
+            raise FetchError("timeout", f"Timed out after {timeout}s") from exc
+        except httpx.ConnectError as exc:
+            if _caused_by_ssl(exc):
+                raise FetchError("ssl", f"TLS error: {exc}") from exc
+            raise FetchError("connection", f"Connection failed: {exc}") from exc
+        except httpx.TransportError as exc:
+            raise FetchError("connection", f"Connection failed: {exc}") from exc
+        except (httpx.HTTPError, httpx.InvalidURL) as exc:
+            raise FetchError("request", f"Request failed: {exc}") from exc
+        return PooledResponse(resp, resp.status_code, str(resp.url), resp.headers,
+                              resp.http_version, resp.iter_bytes, release)
+
+    def close(self) -> None:
+        self.client.close()
+
+
+def _caused_by_ssl(exc: BaseException) -> bool:
+    while exc is not None:
+        if isinstance(exc, ssl.SSLError):
+            return True
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+# ---------------------------------------------------------------------------
+# Pool
+# ---------------------------------------------------------------------------
+class ConnectionPool:
+    """Per-process keep-alive pool with a per-host concurrency limit."""
+
+    def __init__(self, http2: bool = FETCH_HTTP2) -> None:
+        self.pid = os.getpid()
+        self.stats = _Stats()
+        if http2 and httpx is not None:
+            self.transport = HttpxTransport(self.stats, http2=True)
+        else:
+            self.transport = RequestsTransport(self.stats)
+        self._slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._slots_lock = threading.Lock()
+
+    def _slot(self, url: str) -> threading.BoundedSemaphore:
+        parsed = urlparse(url)
+        key = f"{parsed.scheme}://{parsed.netloc}".lower()
+        with self._slots_lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = self._slots[key] = threading.BoundedSemaphore(FETCH_POOL_PER_HOST)
+            return slot
+
+    def get(self, url: str, headers: Dict[str, str], timeout: float) -> PooledResponse:
+        """Start a streamed GET of ``url``; the caller must ``close()`` it.
+
+        Raises :class:`FetchError` if no response arrives.
+        """
+        slot = self._slot(url)
+        if not slot.acquire(blocking=False):
+            self.stats.incr("host_waits")
+            if not slot.acquire(timeout=timeout):
+                raise FetchError("timeout", f"Timed out after {timeout}s")
+        self.stats.incr("requests")
+        try:
+            return self.transport.send(url, headers, timeout, slot.release)
+        except BaseException:
+            slot.release()
+            raise
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Return this process's pool, creating it on first use (or after fork)."""
+    global _pool
+    pool = _pool
+    if pool is not None and pool.pid == os.getpid():
+        return pool
+    with _pool_lock:
+        if _pool is None or _pool.pid != os.getpid():
+            _pool = ConnectionPool()
+        return _pool
+
+
+def reset_pool(http2: Optional[bool] = None) -> ConnectionPool:
+    """Close the current pool and start a new one (tests, config reloads)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool.pid == os.getpid():
+            _pool.close()
+        _pool = ConnectionPool(FETCH_HTTP2 if http2 is None else http2)
+        return _pool
+
+
+def stats() -> Dict[str, Any]:
+    """Connection reuse and DNS cache counters for this process's pool."""
+    pool = get_pool()
+    return dict(pool.stats.snapshot(), transport=pool.transport.name, dns=dns_cache.stats())
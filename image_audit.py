@@ -26,10 +26,13 @@ from __future__ import annotations
 import base64
 import io
 from collections import Counter
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 from PIL import Image, ExifTags, ImageStat
 
+import evidence_cache
+import prompt_budget
+
 
 # Canonical references for image-accessibility guidance — every report
 # carries these so the user can verify what the LLM said.
@@ -110,6 +113,7 @@ def _classify_aspect(ratio: float) -> str:
     return "tall vertical"
 
 
+@evidence_cache.memoize("audit_image")
 def audit_image(image_b64: str) -> Dict[str, Any]:
     """Inspect a base64 image and return an evidence dict.
 
@@ -242,31 +246,36 @@ def audit_image(image_b64: str) -> Dict[str, Any]:
     return evidence
 
 
-def evidence_summary_for_prompt(evidence: Dict[str, Any]) -> str:
-    """Render the image-evidence dict into a compact LLM-friendly summary."""
+def evidence_summary_for_prompt(evidence: Dict[str, Any], max_tokens: Optional[int] = None) -> str:
+    """Render the image-evidence dict into a compact LLM-friendly summary.
+
+    Packed into ``max_tokens`` (default: the ``alt_text`` budget); EXIF
+    entries go first when it is tight, then the palette.
+    """
     e = evidence
     if not e.get("ok"):
         return f"IMAGE ANALYSIS FAILED: {e.get('error', 'unknown error')}"
-    lines = []
-    lines.append("IMAGE FILE ANALYSIS")
-    lines.append(f"  format={e['format']} mode={e['mode']} size={e['width']}x{e['height']}px "
+    out = prompt_budget.Packer(
+        prompt_budget.budget_for("alt_text") if max_tokens is None else max_tokens)
+    out.require("IMAGE FILE ANALYSIS")
+    out.require(f"  format={e['format']} mode={e['mode']} size={e['width']}x{e['height']}px "
                  f"({e['megapixels']} MP); ratio={e['aspect_ratio']} ({e['aspect_label']}); "
                  f"file={e['file_size_kb']} KB; alpha={e['has_alpha']}")
     if e.get("brightness_mean_0_255") is not None:
-        lines.append(f"  brightness={e['brightness_mean_0_255']}/255  contrast_stddev={e['contrast_stddev']}")
+        out.require(f"  brightness={e['brightness_mean_0_255']}/255  contrast_stddev={e['contrast_stddev']}")
     if e.get("dominant_colors"):
         palette = ", ".join(
             f"{c.get('hex', '?')} ({c['percentage']}%)" if 'percentage' in c
             else f"{c.get('hex', '?')}"
             for c in e["dominant_colors"]
         )
-        lines.append(f"  dominant_colors: {palette}")
+        out.add(f"  dominant_colors: {palette}", priority=1, group="palette")
     if e.get("exif"):
         for k, v in e["exif"].items():
-            lines.append(f"  exif.{k}={v}")
+            out.add(f"  exif.{k}={v}", priority=0, group="exif")
     h = e.get("heuristics", {})
     on_flags = [k for k, v in h.items() if v]
     if on_flags:
-        lines.append(f"  heuristic_flags: {', '.join(on_flags)}")
-    lines.append(f"  inferred_classifications: {', '.join(e.get('classifications') or ['general'])}")
-    return "\n".join(lines)
+        out.require(f"  heuristic_flags: {', '.join(on_flags)}")
+    out.require(f"  inferred_classifications: {', '.join(e.get('classifications') or ['general'])}")
+    return out.render()
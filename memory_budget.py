@@ -0,0 +1,111 @@
+"""
+memory_budget.py
+================
+
+Resident-memory accounting for the auditors.
+
+* ``rss_bytes()`` — current resident set size of this process, read from
+  ``/proc/self/statm`` (Linux); elsewhere the peak from ``getrusage`` stands
+  in for it.
+* ``peak_rss_bytes()`` / ``reset_peak()`` — the process's high-water mark
+  (``VmHWM``) and, on Linux, resetting it so the next reading covers one
+  task only. ``audit_executor`` reports this per task.
+* ``MemoryBudget`` — a per-audit ceiling: it records RSS when the audit
+  starts and ``check()`` raises ``MemoryLimitExceeded`` once the process has
+  grown by more than ``AUDIT_MAX_MEMORY_MB``. The streaming audit calls it
+  between chunks, so a runaway page is stopped within one chunk.
+
+The ceiling measures the whole process. In an ``audit_executor`` worker a
+process runs one audit at a time, so that is the audit's own footprint; with
+``AUDIT_WORKERS=0`` concurrent requests share the reading and the ceiling is
+only approximate.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # pragma: no cover — Windows
+    resource = None  # type: ignore
+
+# ---------------------------------------------------------------------------
+# Configuration (read from environment / .env)
+# ---------------------------------------------------------------------------
+# Growth allowed during one audit, in MB (0 disables the ceiling).
+AUDIT_MAX_MEMORY_MB = float(os.getenv("AUDIT_MAX_MEMORY_MB", "512"))
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+# ru_maxrss is in kilobytes on Linux and bytes on macOS.
+_MAXRSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+
+class MemoryLimitExceeded(MemoryError):
+    """An audit grew the process past its memory ceiling."""
+
+
+def _rusage_peak() -> int:
+    if resource is None:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _MAXRSS_UNIT
+
+
+def rss_bytes() -> int:
+    """Current resident set size in bytes (0 when it cannot be read)."""
+    try:
+        with open("/proc/self/statm", "rb") as fh:
+            return int(fh.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return _rusage_peak()
+
+
+def peak_rss_bytes() -> int:
+    """Highest resident set size since start-up or the last ``reset_peak()``."""
+    try:
+        with open("/proc/self/status", "rb") as fh:
+            for line in fh:
+                if line.startswith(b"VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return _rusage_peak()
+
+
+def reset_peak() -> bool:
+    """Reset the high-water mark to the current RSS (Linux only)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+        return True
+    except OSError:
+        return False
+
+
+class MemoryBudget:
+    """Tracks RSS growth during one audit against a ceiling."""
+
+    __slots__ = ("limit", "start", "peak")
+
+    def __init__(self, limit_mb: Optional[float] = None) -> None:
+        limit_mb = AUDIT_MAX_MEMORY_MB if limit_mb is None else limit_mb
+        self.limit = int(limit_mb * 1024 * 1024)
+        self.start = rss_bytes()
+        self.peak = self.start
+
+    def check(self) -> None:
+        """Sample RSS; raise ``MemoryLimitExceeded`` past the ceiling."""
+        current = rss_bytes()
+        if current > self.peak:
+            self.peak = current
+        if self.limit > 0 and current - self.start > self.limit:
+            raise MemoryLimitExceeded(
+                f"audit grew memory by {(current - self.start) // (1024 * 1024)} MB "
+                f"(limit {self.limit // (1024 * 1024)} MB)")
+
+    @property
+    def growth(self) -> int:
+        """Largest sampled growth over the starting RSS, in bytes."""
+        return self.peak - self.start
@@ -0,0 +1,220 @@
+"""
+prompt_budget.py
+================
+
+Token budgets for the prompts we send to Azure OpenAI.
+
+Prompt size drives both the model's latency and what each call costs, so
+every prompt builder packs its evidence into a fixed token budget instead
+of ad-hoc slices:
+
+* ``estimate_tokens(text)`` — a local, deterministic estimate of what the
+  model's tokenizer will count (common words one token, long and all-caps
+  words a few, digits in groups of three, punctuation in pairs, non-Latin
+  characters one each). It errs slightly high, so a prompt that fits here
+  fits in practice.
+* ``Packer`` — lines in document order, each either *required* or a
+  candidate with a priority. Candidates are admitted highest priority first
+  (ties: earlier lines first) until the budget is spent; dropped lines leave
+  a ``… N more`` note in their group. Output keeps the original order.
+* ``group_duplicates(items, key)`` — collapse repeated findings into one
+  entry with all occurrences, so twenty identical lint hits cost one line.
+* ``truncate_to_tokens(text, n)`` — cut raw text (submitted code, content)
+  at a line boundary and say how much was left out.
+* ``share_budget(...)`` — split what is left of a budget between an
+  evidence summary and the raw text it describes.
+* ``budget_for(endpoint)`` — the configured budget for an endpoint
+  (``PROMPT_TOKENS_*``); responses report the estimate they used.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+# ---------------------------------------------------------------------------
+# Configuration (read from environment / .env)
+# ---------------------------------------------------------------------------
+# Whole user prompt (template + evidence + submitted text), in tokens.
+PROMPT_TOKENS_SCORE = int(os.getenv("PROMPT_TOKENS_SCORE", "1500"))
+PROMPT_TOKENS_REVIEW_CODE = int(os.getenv("PROMPT_TOKENS_REVIEW_CODE", "4000"))
+PROMPT_TOKENS_SIMPLIFY = int(os.getenv("PROMPT_TOKENS_SIMPLIFY", "2500"))
+PROMPT_TOKENS_ALT_TEXT = int(os.getenv("PROMPT_TOKENS_ALT_TEXT", "800"))
+
+_BUDGETS = {
+    "score": lambda: PROMPT_TOKENS_SCORE,
+    "review_code": lambda: PROMPT_TOKENS_REVIEW_CODE,
+    "simplify": lambda: PROMPT_TOKENS_SIMPLIFY,
+    "alt_text": lambda: PROMPT_TOKENS_ALT_TEXT,
+}
+
+_PIECE_RE = re.compile(r"[^\W\d_]+|\d+|[^\w\s]+|_+")
+
+
+def budget_for(endpoint: str) -> int:
+    """Token budget for ``endpoint`` (``score``, ``review_code``, …)."""
+    return _BUDGETS[endpoint]()
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate BPE token count of ``text`` (deterministic, no model files)."""
+    if not text:
+        return 0
+    tokens = 0
+    for piece in _PIECE_RE.findall(text):
+        first = piece[0]
+        if first.isdigit():
+            tokens += (len(piece) + 2) // 3
+        elif first.isalpha():
+            if not piece.isascii():
+                tokens += len(piece)
+            elif piece.isupper() and len(piece) > 3:
+                tokens += (len(piece) + 2) // 3
+            else:
+                tokens += 1 if len(piece) <= 8 else (len(piece) + 4) // 5
+        elif piece == first * len(piece):
+            tokens += (len(piece) + 7) // 8     # "-----" rules, "..." etc.
+        else:
+            tokens += (len(piece) + 1) // 2
+    return tokens + text.count("\n") // 2
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> Tuple[str, bool]:
+    """``text`` cut at a line boundary to fit ``max_tokens``; ``(text, truncated)``.
+
+    A note saying how many lines were left out is appended when it is cut.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text, False
+    lines = text.split("\n")
+    kept: List[str] = []
+    used = estimate_tokens("… (N more lines not shown)") + 1
+    for line in lines:
+        cost = estimate_tokens(line) + 1
+        if used + cost > max_tokens:
+            break
+        kept.append(line)
+        used += cost
+    if not kept and lines and max_tokens > used:
+        # A single huge line: keep the longest prefix that fits, cut at a space.
+        first, room = lines[0], max_tokens - used - 1
+        lo, hi = 0, len(first)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if estimate_tokens(first[:mid]) <= room:
+                lo = mid
+            else:
+                hi = mid - 1
+        space = first.rfind(" ", 0, lo + 1)
+        kept.append(first[:space if space > 0 else lo])
+    omitted = len(lines) - len(kept)
+    kept.append(f"… ({omitted} more line{'s' if omitted != 1 else ''} not shown)")
+    return "\n".join(kept), True
+
+
+def share_budget(tokens_left: int, summarize: Callable[[int], str], text: str) -> Tuple[str, str, bool]:
+    """Split ``tokens_left`` between an evidence summary and ``text``.
+
+    ``summarize(max_tokens)`` builds the summary. It gets whatever ``text``
+    leaves over, but never less than 2/5 of the room; ``text`` then gets
+    the rest and is truncated if needed. Returns ``(summary, text,
+    truncated)``.
+    """
+    summary = summarize(max(tokens_left - estimate_tokens(text), tokens_left * 2 // 5))
+    text, truncated = truncate_to_tokens(text, tokens_left - estimate_tokens(summary))
+    return summary, text, truncated
+
+
+def group_duplicates(items: Iterable[Any], key: Callable[[Any], Hashable]) -> List[Tuple[Any, List[Any]]]:
+    """``[(first, [all with the same key]), …]`` in first-occurrence order."""
+    groups: Dict[Hashable, Tuple[Any, List[Any]]] = {}
+    for item in items:
+        k = key(item)
+        if k in groups:
+            groups[k][1].append(item)
+        else:
+            groups[k] = (item, [item])
+    return list(groups.values())
+
+
+class Packer:
+    """Pack lines into a token budget by priority, keeping document order.
+
+    ``require(line)`` lines are always kept. ``add(line, priority, group)``
+    lines are candidates: higher ``priority`` is admitted first. When some
+    candidates of a ``group`` are dropped, a ``… N more`` note (indented like
+    the group's lines) follows the group's last kept line.
+    """
+
+    def __init__(self, max_tokens: int) -> None:
+        self.max_tokens = max_tokens
+        # [text, priority (None = required), group, tokens]
+        self.lines: List[list] = []
+
+    def require(self, line: str) -> None:
+        self.lines.append([line, None, None, estimate_tokens(line)])
+
+    def add(self, line: str, priority: int = 0, group: Optional[str] = None) -> None:
+        self.lines.append([line, priority, group, estimate_tokens(line)])
+
+    def render(self) -> "Packed":
+        lines = self.lines
+        # Newlines are charged up front, as if every line were kept.
+        used = sum(entry[3] for entry in lines if entry[1] is None) + len(lines) // 2
+        candidates = sorted((i for i, entry in enumerate(lines) if entry[1] is not None),
+                            key=lambda i: (-lines[i][1], i))
+        kept = set()
+        dropped: Dict[Optional[str], int] = {}
+        notes = 0
+        for i in candidates:
+            group = lines[i][2]
+            # Room for this line plus the "… N more" notes already owed.
+            if used + lines[i][3] + notes <= self.max_tokens:
+                kept.add(i)
+                used += lines[i][3]
+            else:
+                if group not in dropped:
+                    notes += _NOTE_TOKENS
+                dropped[group] = dropped.get(group, 0) + 1
+        # A note owed by a later drop may not fit next to lines already in.
+        evictable = sorted(kept, key=lambda i: (lines[i][1], -i))
+        while used + notes > self.max_tokens and evictable:
+            i = evictable.pop(0)
+            kept.discard(i)
+            used -= lines[i][3]
+            group = lines[i][2]
+            if group not in dropped:
+                notes += _NOTE_TOKENS
+            dropped[group] = dropped.get(group, 0) + 1
+
+        out: List[str] = []
+        last_of_group: Dict[Optional[str], int] = {}
+        for i, entry in enumerate(lines):
+            if entry[1] is not None:
+                last_of_group[entry[2]] = i
+        for i, entry in enumerate(lines):
+            if entry[1] is None or i in kept:
+                out.append(entry[0])
+            group = entry[2]
+            if entry[1] is not None and last_of_group.get(group) == i and dropped.get(group):
+                indent = entry[0][: len(entry[0]) - len(entry[0].lstrip())]
+                out.append(f"{indent}… {dropped[group]} more not shown")
+        text = "\n".join(out)
+        return Packed(text, estimate_tokens(text), sum(dropped.values()))
+
+
+_NOTE_TOKENS = estimate_tokens("    … 999 more not shown") + 1  # + its newline
+
+
+class Packed(str):
+    """The packed text; also carries ``tokens`` and ``dropped`` (line count)."""
+
+    tokens: int
+    dropped: int
+
+    def __new__(cls, text: str, tokens: int, dropped: int) -> "Packed":
+        obj = super().__new__(cls, text)
+        obj.tokens = tokens
+        obj.dropped = dropped
+        return obj
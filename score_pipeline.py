@@ -0,0 +1,573 @@
+"""
+score_pipeline.py
+=================
+
+The ``/api/score`` pipeline: fetch → audit → styles → prompt → LLM → merge,
+run against a single overall deadline.
+
+Every stage gets a slice of what is left of ``SCORE_DEADLINE_SECONDS``:
+
+* **fetch** is capped at ``SCORE_FETCH_BUDGET_SECONDS`` (and never more than
+  ``web_audit.FETCH_TIMEOUT_SECONDS``); a page that cannot be fetched in
+  time is an error, since there is nothing to score without it.
+* **audit** runs on the ``audit_executor`` process pool, bounded by the
+  remaining budget, and records the worker's peak RSS (``peak_rss_mb``); a
+  page that needs more than ``AUDIT_MAX_MEMORY_MB`` is a 422.
+* **styles** fetches the page's linked stylesheets concurrently (see
+  ``web_audit.stylesheet_contrast``) and folds their colour pairs into the
+  1.4.3 contrast evidence. It is capped at ``SCORE_STYLES_BUDGET_SECONDS``
+  and leaves the LLM its minimum; stylesheets not loaded in time are left
+  out and the stage reports ``timeout`` without degrading the result.
+* **prompt** is cheap and runs inline.
+* **LLM** gets everything that remains minus ``SCORE_MERGE_RESERVE_SECONDS``.
+  If that is less than ``SCORE_LLM_MIN_SECONDS`` the call is skipped
+  outright; if the model overruns its slice the request stops waiting.
+* **merge** combines the model's answer with the deterministic evidence, or
+  builds the whole report from the evidence when the model was skipped,
+  slow, or returned garbage.
+
+Slow stages run on a small shared thread pool and are abandoned (not
+killed) when their budget expires, so a hung upstream costs one pool thread
+for a while instead of a gunicorn worker until its 120 s hard timeout.
+
+The response always has the same shape, plus a ``pipeline`` block with
+per-stage timings, whether the result is ``degraded`` and why.
+
+``score_batch`` is the ``/api/score/batch`` counterpart: it fetches and
+audits many URLs or raw HTML documents on a bounded thread pool — each
+through the same fetch and pooled audit stages as ``run`` — and yields
+one deterministic result per document as soon as it is ready, for the
+route to stream as NDJSON. Batches skip the LLM stage.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import ai_client
+import audit_executor
+import memory_budget
+import prompt_budget
+import web_audit
+from web_audit import WCAG_REFERENCES, evidence_summary_for_prompt
+
+# ---------------------------------------------------------------------------
+# Configuration (read from environment / .env)
+# ---------------------------------------------------------------------------
+SCORE_DEADLINE_SECONDS = float(os.getenv("SCORE_DEADLINE_SECONDS", "25"))
+SCORE_FETCH_BUDGET_SECONDS = float(os.getenv("SCORE_FETCH_BUDGET_SECONDS", "10"))
+SCORE_STYLES_BUDGET_SECONDS = float(os.getenv("SCORE_STYLES_BUDGET_SECONDS", "3"))
+SCORE_LLM_MIN_SECONDS = float(os.getenv("SCORE_LLM_MIN_SECONDS", "3"))
+SCORE_MERGE_RESERVE_SECONDS = float(os.getenv("SCORE_MERGE_RESERVE_SECONDS", "0.5"))
+SCORE_STAGE_WORKERS = int(os.getenv("SCORE_STAGE_WORKERS", "8"))
+SCORE_BATCH_MAX_ITEMS = int(os.getenv("SCORE_BATCH_MAX_ITEMS", "50"))
+SCORE_BATCH_CONCURRENCY = int(os.getenv("SCORE_BATCH_CONCURRENCY", "8"))
+
+# Criteria ``web_audit.audit_html`` can flag. Anything here that was not
+# flagged is reported as compliant (as far as static analysis can tell).
+CHECKED_CRITERIA = ("1.1.1", "1.3.1", "1.4.3", "1.4.10", "2.1.1", "2.4.1", "2.4.2",
+                    "2.4.4", "2.4.6", "3.1.1", "3.3.2", "4.1.2")
+
+# Points deducted per flagged finding, by conformance level.
+_LEVEL_PENALTY = {"A": 10, "AA": 6, "AAA": 3}
+
+# Fetch failures caused by the submitted URL itself (→ 400, not 502).
+_CLIENT_ERROR_KINDS = frozenset({"scheme", "host", "private_host"})
+
+
+class ScoreError(Exception):
+    """The page could not be scored at all (bad URL, fetch failure, timeout)."""
+
+    def __init__(self, status: int, message: str, kind: str = "") -> None:
+        super().__init__(message)
+        self.status = status
+        self.kind = kind
+
+
+class Deadline:
+    """Monotonic deadline that hands out per-stage budgets."""
+
+    def __init__(self, seconds: float) -> None:
+        self.seconds = seconds
+        self.started = time.monotonic()
+        self.expires = self.started + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+    def elapsed_ms(self) -> int:
+        return int((time.monotonic() - self.started) * 1000)
+
+    def budget(self, cap: Optional[float] = None, reserve: float = 0.0) -> float:
+        """Seconds a stage may use: what is left minus ``reserve``, up to ``cap``."""
+        left = self.remaining() - reserve
+        if cap is not None:
+            left = min(left, cap)
+        return max(0.0, left)
+
+
+# ---------------------------------------------------------------------------
+# Stage runner
+# ---------------------------------------------------------------------------
+_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+_executor_pid = 0
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> concurrent.futures.ThreadPoolExecutor:
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=SCORE_STAGE_WORKERS, thread_name_prefix="score-stage")
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def _call_with_budget(budget: float, func: Callable, *args, **kwargs) -> Any:
+    """Run ``func`` on the stage pool; raise ``TimeoutError`` after ``budget`` s."""
+    future = _get_executor().submit(func, *args, **kwargs)
+    try:
+        return future.result(timeout=budget)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise TimeoutError(f"stage exceeded its {budget:.1f}s budget") from None
+
+
+class _StageLog:
+    def __init__(self) -> None:
+        self.stages: List[Dict[str, Any]] = []
+
+    def record(self, name: str, started: float, status: str, budget: Optional[float] = None,
+               **extra: Any) -> None:
+        entry: Dict[str, Any] = {
+            "name": name,
+            "ms": int((time.monotonic() - started) * 1000),
+            "status": status,
+        }
+        if budget is not None:
+            entry["budget_ms"] = int(budget * 1000)
+        entry.update(extra)
+        self.stages.append(entry)
+
+
+# ---------------------------------------------------------------------------
+# Deterministic scoring
+# ---------------------------------------------------------------------------
+def compute_score(evidence: Dict[str, Any]) -> int:
+    """0–100 score from the flagged findings alone (Level A weighs most)."""
+    score = 100
+    for finding in evidence.get("flagged_findings", []):
+        level = WCAG_REFERENCES.get(finding["wcag"], {}).get("level", "A")
+        score -= _LEVEL_PENALTY.get(level, _LEVEL_PENALTY["A"])
+    return max(0, min(100, score))
+
+
+def _criterion(code: str) -> Dict[str, str]:
+    ref = WCAG_REFERENCES.get(code, {})
+    return {"code": code, "description": ref.get("title", ""), "level": ref.get("level", "")}
+
+
+def _wcag_standards(evidence: Dict[str, Any]) -> Dict[str, Any]:
+    by_criterion: Dict[str, List[str]] = {}
+    for finding in evidence.get("flagged_findings", []):
+        by_criterion.setdefault(finding["wcag"], []).append(finding["summary"])
+    return {
+        "compliant": [_criterion(c) for c in CHECKED_CRITERIA if c not in by_criterion],
+        "non_compliant": [_criterion(c) for c in sorted(by_criterion)],
+        "details": {code: "; ".join(summaries) for code, summaries in sorted(by_criterion.items())},
+    }
+
+
+def deterministic_report(evidence: Dict[str, Any]) -> Dict[str, Any]:
+    """A complete score response built from the evidence alone."""
+    flagged = evidence.get("flagged_findings", [])
+    score = compute_score(evidence)
+    issues = []
+    for finding in flagged:
+        ref = WCAG_REFERENCES.get(finding["wcag"], {})
+        issues.append({
+            "title": f"WCAG {finding['wcag']} {ref.get('title', '')}".strip(),
+            "description": finding["summary"],
+            "impact": "High" if ref.get("level", "A") == "A" else "Medium",
+            "fix": f"See {ref['w3c']}" if ref.get("w3c") else "",
+            "wcag_criterion": finding["wcag"],
+        })
+    explanation = (
+        f"Score based on static analysis of the page (AI commentary unavailable): "
+        f"{len(flagged)} issue(s) across {len({f['wcag'] for f in flagged})} WCAG "
+        f"criteria out of {len(CHECKED_CRITERIA)} checked."
+    )
+    return {
+        "score": score,
+        "explanation": explanation,
+        "score_explanation": explanation,
+        "wcag_standards": _wcag_standards(evidence),
+        "priority_issues": issues,
+        "recommendations": {
+            "short_term": "Fix the Level A issues listed above first; they block entire user groups.",
+            "medium_term": "Add an automated accessibility check (axe-core, pa11y) to CI.",
+            "long_term": "Test with screen-reader and keyboard-only users, and audit colour contrast manually.",
+        },
+    }
+
+
+# ---------------------------------------------------------------------------
+# Prompt + merge
+# ---------------------------------------------------------------------------
+SYSTEM_PROMPT = (
+    "You are a senior web accessibility auditor. You receive a deterministic "
+    "EVIDENCE REPORT extracted from a live page by an automated tool. Treat it "
+    "as ground truth: every flagged finding IS on the page. Explain the impact "
+    "on real users, rank the issues, and score the page.\n\n"
+    "RESPOND ONLY WITH JSON:\n"
+    "{\n"
+    '  "score": <int 0-100>,\n'
+    '  "explanation": "<one paragraph grounded in the evidence counts>",\n'
+    '  "wcag_standards": {\n'
+    '    "compliant":     [{"code": "1.1.1", "description": "..."}],\n'
+    '    "non_compliant": [{"code": "2.4.4", "description": "..."}],\n'
+    '    "details": {"<code>": "<what the evidence shows>"}\n'
+    "  },\n"
+    '  "priority_issues": [\n'
+    '    {"title": "...", "description": "...", "impact": "High|Medium|Low", "fix": "..."}\n'
+    "  ],\n"
+    '  "recommendations": {"short_term": "...", "medium_term": "...", "long_term": "..."}\n'
+    "}"
+)
+
+
+def _prompt_around(url: str, deterministic_score: int, summary: str) -> str:
+    return (
+        f"URL: {url}\n"
+        f"DETERMINISTIC SCORE: {deterministic_score} / 100\n\n"
+        "EVIDENCE REPORT:\n"
+        "----------------------------------------------------------\n"
+        f"{summary}\n"
+        "----------------------------------------------------------\n\n"
+        "Produce the JSON described in the system prompt. Every criterion the "
+        "evidence report flags MUST appear in non_compliant."
+    )
+
+
+def build_prompt(url: str, evidence: Dict[str, Any], deterministic_score: int,
+                 max_tokens: Optional[int] = None) -> str:
+    """User prompt for the score call, within ``max_tokens`` (default: the
+    ``score`` budget); the evidence report gets whatever the frame leaves."""
+    if max_tokens is None:
+        max_tokens = prompt_budget.budget_for("score")
+    frame = prompt_budget.estimate_tokens(_prompt_around(url, deterministic_score, ""))
+    summary = evidence_summary_for_prompt(evidence, max_tokens=max_tokens - frame)
+    return _prompt_around(url, deterministic_score, summary)
+
+
+def _as_criterion(item: Any) -> Optional[Dict[str, str]]:
+    if isinstance(item, dict) and item.get("code"):
+        return {"code": str(item["code"]), "description": str(item.get("description", ""))}
+    if isinstance(item, str) and item.strip():
+        return _criterion(item.strip())
+    return None
+
+
+def merge(ai_result: Dict[str, Any], fallback: Dict[str, Any]) -> Dict[str, Any]:
+    """Overlay the model's answer on the deterministic report.
+
+    The model's score and wording win when well-formed; criteria the static
+    audit flagged stay non-compliant whatever the model says.
+    """
+    result = dict(fallback)
+    score = ai_result.get("score")
+    if isinstance(score, (int, float)) and not isinstance(score, bool):
+        result["score"] = max(0, min(100, int(round(score))))
+    explanation = ai_result.get("explanation") or ai_result.get("score_explanation")
+    if isinstance(explanation, str) and explanation.strip():
+        result["explanation"] = result["score_explanation"] = explanation
+
+    standards = ai_result.get("wcag_standards")
+    if isinstance(standards, dict):
+        flagged = {c["code"] for c in fallback["wcag_standards"]["non_compliant"]}
+        non_compliant = list(fallback["wcag_standards"]["non_compliant"])
+        seen = set(flagged)
+        for item in standards.get("non_compliant") or []:
+            crit = _as_criterion(item)
+            if crit and crit["code"] not in seen:
+                non_compliant.append(crit)
+                seen.add(crit["code"])
+        compliant = [crit for crit in map(_as_criterion, standards.get("compliant") or [])
+                     if crit and crit["code"] not in seen]
+        details = dict(fallback["wcag_standards"]["details"])
+        if isinstance(standards.get("details"), dict):
+            for code, text in standards["details"].items():
+                details.setdefault(str(code), str(text))
+        result["wcag_standards"] = {
+            "compliant": compliant or fallback["wcag_standards"]["compliant"],
+            "non_compliant": non_compliant,
+            "details": details,
+        }
+
+    issues = ai_result.get("priority_issues")
+    if isinstance(issues, list) and issues:
+        result["priority_issues"] = [
+            {
+                "title": str(i.get("title", "Issue")),
+                "description": str(i.get("description", "")),
+                "impact": str(i.get("impact", "")),
+                "fix": str(i.get("fix", "")),
+            }
+            for i in issues if isinstance(i, dict)
+        ] or fallback["priority_issues"]
+
+    recs = ai_result.get("recommendations")
+    if isinstance(recs, dict):
+        result["recommendations"] = {
+            term: str(recs.get(term) or fallback["recommendations"][term])
+            for term in ("short_term", "medium_term", "long_term")
+        }
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Pipeline
+# ---------------------------------------------------------------------------
+def run(url: str, deadline_seconds: Optional[float] = None) -> Dict[str, Any]:
+    """Score ``url`` within the deadline. Raises ``ScoreError`` if unscorable."""
+    deadline = Deadline(SCORE_DEADLINE_SECONDS if deadline_seconds is None else deadline_seconds)
+    log = _StageLog()
+
+    # ---- 1. fetch ---------------------------------------------------------
+    started = time.monotonic()
+    budget = deadline.budget(min(SCORE_FETCH_BUDGET_SECONDS, web_audit.FETCH_TIMEOUT_SECONDS),
+                             reserve=SCORE_MERGE_RESERVE_SECONDS)
+    try:
+        page = _call_with_budget(budget, web_audit.fetch_page, url, timeout=budget)
+    except TimeoutError:
+        log.record("fetch", started, "timeout", budget)
+        raise ScoreError(504, f"Fetching {url} took longer than {budget:.0f}s", "timeout")
+    if not page.get("ok"):
+        log.record("fetch", started, "error", budget)
+        kind = page.get("error_kind", "")
+        status = 400 if kind in _CLIENT_ERROR_KINDS else 504 if kind == "timeout" else 502
+        raise ScoreError(status, page.get("error", "Could not fetch the page"), kind)
+    log.record("fetch", started, "ok", budget)
+
+    # ---- 2. audit ---------------------------------------------------------
+    started = time.monotonic()
+    budget = deadline.budget(audit_executor.AUDIT_TASK_TIMEOUT_SECONDS, reserve=SCORE_MERGE_RESERVE_SECONDS)
+    try:
+        evidence = audit_executor.run("audit_html", page["html"], page.get("final_url") or url,
+                                      timeout=budget)
+    except audit_executor.AuditTimeout:
+        log.record("audit", started, "timeout", budget)
+        raise ScoreError(504, "Auditing the page took too long", "audit_timeout")
+    except audit_executor.AuditCrashed:
+        log.record("audit", started, "crashed", budget)
+        raise ScoreError(503, "The audit worker stopped unexpectedly", "audit_crashed")
+    except memory_budget.MemoryLimitExceeded:
+        log.record("audit", started, "memory", budget)
+        raise ScoreError(422, "The page is too large to audit", "audit_memory")
+    peak = audit_executor.last_peak_rss()
+    if peak is None:
+        log.record("audit", started, "ok", budget)
+    else:
+        log.record("audit", started, "ok", budget, peak_rss_mb=round(peak / (1024 * 1024), 1))
+
+    # ---- 3. styles --------------------------------------------------------
+    started = time.monotonic()
+    stylesheets = evidence.get("contrast", {}).get("stylesheets") or []
+    budget = deadline.budget(SCORE_STYLES_BUDGET_SECONDS,
+                             reserve=SCORE_MERGE_RESERVE_SECONDS + SCORE_LLM_MIN_SECONDS)
+    if not stylesheets or budget <= 0:
+        log.record("styles", started, "skipped")
+    else:
+        try:
+            sheets = _call_with_budget(budget, web_audit.stylesheet_contrast, stylesheets,
+                                       timeout=budget,
+                                       page_selectors=evidence["contrast"]["page_selectors"])
+            evidence = web_audit.with_stylesheet_contrast(evidence, sheets)
+            log.record("styles", started, "ok", budget,
+                       fetched=sheets["fetched"], failed=sheets["failed"])
+        except TimeoutError:
+            log.record("styles", started, "timeout", budget)
+
+    # ---- 4. prompt --------------------------------------------------------
+    started = time.monotonic()
+    deterministic_score = compute_score(evidence)
+    fallback = deterministic_report(evidence)
+    token_budget = prompt_budget.budget_for("score")
+    prompt = build_prompt(page.get("final_url") or url, evidence, deterministic_score, token_budget)
+    log.record("prompt", started, "ok",
+               tokens=prompt_budget.estimate_tokens(prompt), token_budget=token_budget)
+
+    # ---- 5. LLM -----------------------------------------------------------
+    started = time.monotonic()
+    budget = deadline.budget(reserve=SCORE_MERGE_RESERVE_SECONDS)
+    ai_result: Optional[Dict[str, Any]] = None
+    fallback_reason: Optional[str] = None
+    if not ai_client.is_configured():
+        fallback_reason = "ai_not_configured"
+        log.record("llm", started, "skipped")
+    elif budget < SCORE_LLM_MIN_SECONDS:
+        fallback_reason = "deadline"
+        log.record("llm", started, "skipped", budget)
+    else:
+        try:
+            answer = _call_with_budget(budget, ai_client.generate_json, prompt,
+                                       system_message=SYSTEM_PROMPT, timeout=budget)
+            if not isinstance(answer, dict):
+                raise ValueError("Model did not return a JSON object")
+            ai_result = answer
+            log.record("llm", started, "ok", budget)
+        except Exception as exc:
+            timed_out = isinstance(exc, TimeoutError) or type(exc).__name__ == "APITimeoutError"
+            fallback_reason = "llm_timeout" if timed_out else f"llm_error: {exc}"
+            log.record("llm", started, "timeout" if timed_out else "error", budget)
+            print(f"[score] LLM stage failed, falling back: {exc}")
+
+    # ---- 6. merge ---------------------------------------------------------
+    started = time.monotonic()
+    result = merge(ai_result, fallback) if ai_result is not None else fallback
+    result.update({
+        "success": True,
+        "url": url,
+        "final_url": page.get("final_url") or url,
+        "deterministic_score": deterministic_score,
+        "evidence": evidence,
+        "sources": evidence["sources"],
+        "differentiator": (
+            "We fetched the live page and ran a deterministic accessibility audit "
+            f"first — {len(evidence['flagged_findings'])} finding(s) with hard evidence — "
+            "then grounded the AI in those facts. Flagged criteria are never "
+            "reported as compliant."
+        ),
+    })
+    log.record("merge", started, "ok")
+    result["pipeline"] = {
+        "deadline_ms": int(deadline.seconds * 1000),
+        "elapsed_ms": deadline.elapsed_ms(),
+        "stages": log.stages,
+        "degraded": ai_result is None,
+        "fallback_reason": fallback_reason,
+    }
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Batch scoring (NDJSON)
+# ---------------------------------------------------------------------------
+def parse_batch_items(items: Any) -> List[Dict[str, Any]]:
+    """Normalise a batch request body into ``{"id", "url"|"html", "base_url"}``.
+
+    Each item may be a URL string, ``{"url": ...}`` or ``{"html": ...,
+    "base_url": ...}``; an optional ``id`` is echoed back (the position in
+    the list otherwise). Raises ``ValueError`` with a client-facing message.
+    """
+    if not isinstance(items, list) or not items:
+        raise ValueError("No items provided")
+    if len(items) > SCORE_BATCH_MAX_ITEMS:
+        raise ValueError(f"Too many items ({len(items)}); the limit is {SCORE_BATCH_MAX_ITEMS}")
+    parsed = []
+    for index, item in enumerate(items):
+        if isinstance(item, str):
+            item = {"url": item}
+        if not isinstance(item, dict):
+            raise ValueError(f"Item {index} must be a URL string or an object")
+        entry: Dict[str, Any] = {"index": index, "id": item.get("id", index)}
+        if isinstance(item.get("html"), str):
+            if len(item["html"].encode("utf-8")) > web_audit.MAX_RESPONSE_BYTES:
+                raise ValueError(f"Item {index} exceeds {web_audit.MAX_RESPONSE_BYTES} bytes of HTML")
+            entry["html"] = item["html"]
+            entry["base_url"] = str(item.get("base_url") or item.get("url") or "")
+        elif isinstance(item.get("url"), str) and item["url"].strip():
+            entry["url"] = item["url"].strip()
+        else:
+            raise ValueError(f"Item {index} needs a 'url' or 'html'")
+        parsed.append(entry)
+    return parsed
+
+
+def _score_document(entry: Dict[str, Any], include_evidence: bool) -> Dict[str, Any]:
+    started = time.monotonic()
+    result: Dict[str, Any] = {"index": entry["index"], "id": entry["id"]}
+    try:
+        if "html" in entry:
+            result["source"] = "html"
+            evidence = audit_executor.run("audit_html", entry["html"], entry["base_url"])
+        else:
+            page = web_audit.fetch_page(entry["url"])
+            result.update(source="url", url=entry["url"])
+            if not page.get("ok"):
+                result.update(ok=False, error_kind=page.get("error_kind", ""),
+                              error=page.get("error", "Could not fetch the page"),
+                              elapsed_ms=int((time.monotonic() - started) * 1000))
+                return result
+            result.update(final_url=page.get("final_url") or entry["url"],
+                          status=page.get("status"), cache=page.get("cache"))
+            evidence = audit_executor.run("audit_html", page.pop("html"), result["final_url"])
+    except audit_executor.AuditTimeout as exc:
+        result.update(ok=False, error_kind="audit_timeout", error=str(exc),
+                      elapsed_ms=int((time.monotonic() - started) * 1000))
+        return result
+    except audit_executor.AuditCrashed as exc:
+        result.update(ok=False, error_kind="audit_crashed", error=str(exc),
+                      elapsed_ms=int((time.monotonic() - started) * 1000))
+        return result
+    except memory_budget.MemoryLimitExceeded as exc:
+        result.update(ok=False, error_kind="audit_memory", error=str(exc),
+                      elapsed_ms=int((time.monotonic() - started) * 1000))
+        return result
+    report = deterministic_report(evidence)
+    result.update(
+        ok=True,
+        score=report["score"],
+        wcag_standards=report["wcag_standards"],
+        flagged_findings=evidence["flagged_findings"],
+        sources=evidence["sources"],
+    )
+    if include_evidence:
+        result["evidence"] = evidence
+    result["elapsed_ms"] = int((time.monotonic() - started) * 1000)
+    return result
+
+
+def score_batch(entries: List[Dict[str, Any]], include_evidence: bool = False,
+                concurrency: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Yield one result per entry, in completion order, then a summary.
+
+    At most ``concurrency`` documents are in flight (``http_pool`` further
+    limits connections per host). Closing the generator early — e.g. the
+    client hung up — cancels everything not yet started.
+    """
+    started = time.monotonic()
+    workers = max(1, min(concurrency or SCORE_BATCH_CONCURRENCY, len(entries)))
+    pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="score-batch")
+    ok = failed = 0
+    try:
+        futures = {pool.submit(_score_document, entry, include_evidence): entry for entry in entries}
+        for future in concurrent.futures.as_completed(futures):
+            entry = futures[future]
+            try:
+                result = future.result()
+            except Exception as exc:  # an auditor bug must not end the stream
+                print(f"[score-batch] item {entry['index']} failed: {exc}")
+                result = {"index": entry["index"], "id": entry["id"], "ok": False,
+                          "error_kind": "internal", "error": "Failed to score document"}
+            if result["ok"]:
+                ok += 1
+            else:
+                failed += 1
+            yield result
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    yield {"done": True, "total": len(entries), "ok": ok, "failed": failed,
+           "elapsed_ms": int((time.monotonic() - started) * 1000)}
+
+
+def ndjson_lines(results: Iterator[Dict[str, Any]]) -> Iterator[str]:
+    for result in results:
+        yield json.dumps(result, separators=(",", ":")) + "\n"
@@ -0,0 +1,413 @@
+"""
+site_crawler.py
+===============
+
+Site-wide accessibility crawl built on ``web_audit.fetch_page`` and
+``web_audit.audit_html``.
+
+Starting from a page URL (or a ``sitemap.xml`` / sitemap index), the
+crawler discovers same-origin links and audits every HTML page it reaches:
+
+* **Fetching** runs on an asyncio event loop with at most ``concurrency``
+  pages in flight. ``fetch_page`` is blocking (it keeps the SSRF guard, size
+  cap, keep-alive pool and HTTP cache), so each fetch runs on a thread.
+* **Politeness** — at most ``per_host`` requests to one host at a time, an
+  optional minimum ``delay`` between them (raised to the site's
+  ``Crawl-delay`` if robots.txt sets one), and ``robots.txt`` rules for the
+  ``AccessAI-Auditor`` agent are honoured.
+* **Auditing** is CPU-bound, so pages are handed to a worker pool
+  (processes by default, ``audit_workers=0`` audits on threads instead).
+  Link discovery happens in the same DOM walk as the audit.
+
+The result is one aggregate report: per-WCAG-criterion page counts, summed
+totals for the countable checks, the worst pages, and a compact row per page.
+
+Command line::
+
+    python site_crawler.py https://example.com/ --max-pages 200
+    python site_crawler.py https://example.com/sitemap.xml --concurrency 32
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urldefrag, urlparse, urlunparse
+from urllib.robotparser import RobotFileParser
+
+import web_audit
+
+# ---------------------------------------------------------------------------
+# Tunables (read from environment / .env)
+# ---------------------------------------------------------------------------
+CRAWL_MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", "500"))
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "16"))
+CRAWL_PER_HOST = int(os.getenv("CRAWL_PER_HOST", "4"))
+CRAWL_DELAY_SECONDS = float(os.getenv("CRAWL_DELAY_SECONDS", "0"))
+CRAWL_AUDIT_WORKERS = int(os.getenv("CRAWL_AUDIT_WORKERS", str(os.cpu_count() or 2)))
+
+ROBOTS_AGENT = "AccessAI-Auditor"
+MAX_SITEMAPS = 50  # child sitemaps followed from one sitemap index
+
+# Links to these are never HTML; skip them without a request.
+_SKIP_EXTENSIONS = (
+    ".pdf", ".zip", ".gz", ".tar", ".rar", ".7z", ".exe", ".dmg", ".iso",
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".svg", ".ico", ".bmp", ".avif",
+    ".mp3", ".mp4", ".webm", ".mov", ".avi", ".wav", ".ogg",
+    ".css", ".js", ".json", ".xml", ".rss", ".atom", ".txt", ".csv",
+    ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx", ".woff", ".woff2", ".ttf",
+)
+
+# Countable checks summed across the site: report key -> evidence path.
+_TOTALS = {
+    "images_total": ("images", "total"),
+    "images_missing_alt": ("images", "missing_alt"),
+    "links_total": ("links", "total"),
+    "links_no_text": ("links", "no_text"),
+    "links_target_blank_missing_noopener": ("links", "target_blank_missing_noopener"),
+    "buttons_no_accessible_name": ("buttons", "no_accessible_name"),
+    "inputs_unlabeled": ("forms", "inputs_unlabeled"),
+    "iframes_missing_title": ("iframes", "missing_title"),
+    "tables_missing_th": ("tables", "missing_th"),
+    "inline_onclick_on_non_interactive": ("aria", "inline_onclick_on_non_interactive"),
+}
+
+
+# ---------------------------------------------------------------------------
+# URL helpers
+# ---------------------------------------------------------------------------
+def normalise_url(url: str) -> Optional[str]:
+    """Canonical form used for de-duplication, or None if not crawlable."""
+    url, _ = urldefrag(url.strip())
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        return None
+    netloc = parsed.hostname.lower()
+    if parsed.port and parsed.port != {"http": 80, "https": 443}[parsed.scheme]:
+        netloc = f"{netloc}:{parsed.port}"
+    return urlunparse((parsed.scheme, netloc, parsed.path or "/", "", parsed.query, ""))
+
+
+def _origin(url: str) -> str:
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+def _looks_like_html(url: str) -> bool:
+    return not urlparse(url).path.lower().endswith(_SKIP_EXTENSIONS)
+
+
+def parse_sitemap(xml_text: str) -> Tuple[List[str], List[str]]:
+    """Return ``(page_urls, child_sitemap_urls)`` from sitemap XML."""
+    try:
+        root = ET.fromstring(xml_text.strip())
+    except ET.ParseError:
+        return [], []
+    locs = [el.text.strip() for el in root.iter()
+            if el.tag.rsplit("}", 1)[-1] == "loc" and el.text and el.text.strip()]
+    if root.tag.rsplit("}", 1)[-1] == "sitemapindex":
+        return [], locs
+    return locs, []
+
+
+# ---------------------------------------------------------------------------
+# Worker-pool task (must be top level so process pools can pickle it)
+# ---------------------------------------------------------------------------
+def _audit_page(html: str, url: str) -> Tuple[Dict[str, Any], List[str]]:
+    links: List[str] = []
+    evidence = web_audit.audit_html(html, url, links=links)
+    return evidence, links
+
+
+# ---------------------------------------------------------------------------
+# Politeness
+# ---------------------------------------------------------------------------
+class _HostGate:
+    """Per-host concurrency limit plus a minimum gap between request starts."""
+
+    def __init__(self, per_host: int, delay: float) -> None:
+        self.slots = asyncio.Semaphore(per_host)
+        self.delay = delay
+        self.next_start = 0.0
+        self.lock = asyncio.Lock()
+
+    async def __aenter__(self) -> None:
+        await self.slots.acquire()
+        if self.delay > 0:
+            async with self.lock:
+                wait = self.next_start - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                self.next_start = time.monotonic() + self.delay
+
+    async def __aexit__(self, *exc) -> None:
+        self.slots.release()
+
+
+# ---------------------------------------------------------------------------
+# Crawler
+# ---------------------------------------------------------------------------
+class SiteCrawler:
+    """One crawl. Use :func:`crawl` / :func:`crawl_site` rather than this."""
+
+    def __init__(self, start_url: str, *, max_pages: int = CRAWL_MAX_PAGES,
+                 concurrency: int = CRAWL_CONCURRENCY, per_host: int = CRAWL_PER_HOST,
+                 delay: float = CRAWL_DELAY_SECONDS, respect_robots: bool = True,
+                 follow_links: bool = True, audit_executor: Optional[Executor] = None,
+                 audit_workers: int = CRAWL_AUDIT_WORKERS, include_evidence: bool = False,
+                 fetch: Callable[[str], Dict[str, Any]] = web_audit.fetch_page) -> None:
+        self.start_url = start_url
+        self.origin = _origin(normalise_url(start_url) or start_url)
+        self.max_pages = max(1, max_pages)
+        self.concurrency = max(1, concurrency)
+        self.per_host = max(1, per_host)
+        self.delay = delay
+        self.respect_robots = respect_robots
+        self.follow_links = follow_links
+        self.include_evidence = include_evidence
+        self.fetch = fetch
+        self._audit_executor = audit_executor
+        self._audit_workers = audit_workers
+
+        self.seen: set = set()
+        self.enqueued = 0
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self.pages: List[Dict[str, Any]] = []
+        self.skipped: Dict[str, int] = {"robots": 0, "not_html": 0, "off_origin": 0}
+        self.gates: Dict[str, _HostGate] = {}
+        self.robots: Optional[RobotFileParser] = None
+
+    # ---- plumbing --------------------------------------------------------
+    async def _blocking(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.io_pool, func, *args)
+
+    def _gate(self, url: str) -> _HostGate:
+        host = urlparse(url).netloc
+        gate = self.gates.get(host)
+        if gate is None:
+            gate = self.gates[host] = _HostGate(self.per_host, self.delay)
+        return gate
+
+    async def _fetch(self, url: str) -> Dict[str, Any]:
+        async with self._gate(url):
+            return await self._blocking(self.fetch, url)
+
+    def _enqueue(self, url: str) -> None:
+        url = normalise_url(url)
+        if (url is None or url in self.seen or self.enqueued >= self.max_pages
+                or _origin(url) != self.origin):
+            return
+        self.seen.add(url)
+        if not _looks_like_html(url):
+            self.skipped["not_html"] += 1
+            return
+        self.enqueued += 1
+        self.queue.put_nowait(url)
+
+    # ---- robots.txt / sitemaps ------------------------------------------
+    async def _load_robots(self) -> None:
+        robots = RobotFileParser(self.origin + "/robots.txt")
+        page = await self._fetch(self.origin + "/robots.txt")
+        status = page.get("status", 0)
+        if not page.get("ok"):
+            robots.allow_all = True
+        elif status in (401, 403) or status >= 500:
+            robots.disallow_all = True
+        elif status >= 400:
+            robots.allow_all = True
+        else:
+            robots.parse(page["html"].splitlines())
+            crawl_delay = robots.crawl_delay(ROBOTS_AGENT)
+            if crawl_delay:
+                self.delay = max(self.delay, float(crawl_delay))
+                for gate in self.gates.values():
+                    gate.delay = self.delay
+        self.robots = robots
+
+    def _allowed(self, url: str) -> bool:
+        return self.robots is None or self.robots.can_fetch(ROBOTS_AGENT, url)
+
+    async def _seed_from_sitemap(self, sitemap_url: str) -> None:
+        pending, visited = [sitemap_url], 0
+        while pending and visited < MAX_SITEMAPS and self.enqueued < self.max_pages:
+            url = pending.pop(0)
+            visited += 1
+            page = await self._fetch(url)
+            if not page.get("ok") or page.get("status") != 200:
+                continue
+            pages, children = parse_sitemap(page["html"])
+            for page_url in pages:
+                self._enqueue(page_url)
+            pending.extend(child for child in children if _origin(child) == self.origin)
+
+    # ---- per page --------------------------------------------------------
+    async def _process(self, url: str) -> None:
+        if not self._allowed(url):
+            self.skipped["robots"] += 1
+            return
+        page = await self._fetch(url)
+        row: Dict[str, Any] = {"url": url}
+        if not page.get("ok"):
+            row.update(error_kind=page.get("error_kind"), error=page.get("error"))
+            self.pages.append(row)
+            return
+        row.update(final_url=page["final_url"], status=page["status"],
+                   elapsed_ms=page["elapsed_ms"], cache=page.get("cache"))
+        final_url = normalise_url(page["final_url"]) or ""
+        if _origin(final_url) != self.origin:
+            self.skipped["off_origin"] += 1
+            return
+        self.seen.add(final_url)
+        if page["status"] >= 400:
+            row.update(error_kind="http_status", error=f"HTTP {page['status']}")
+            self.pages.append(row)
+            return
+        content_type = page.get("content_type", "").lower()
+        if content_type and "html" not in content_type:
+            self.skipped["not_html"] += 1
+            return
+
+        loop = asyncio.get_running_loop()
+        evidence, links = await loop.run_in_executor(
+            self.audit_pool, _audit_page, page["html"], page["final_url"])
+        row["flagged"] = [f["wcag"] for f in evidence["flagged_findings"]]
+        row["summaries"] = [f["summary"] for f in evidence["flagged_findings"]]
+        row["evidence"] = evidence
+        self.pages.append(row)
+        if self.follow_links:
+            for link in links:
+                self._enqueue(link)
+
+    async def _worker(self) -> None:
+        while True:
+            url = await self.queue.get()
+            try:
+                await self._process(url)
+            except Exception as exc:  # one bad page must not stop the crawl
+                self.pages.append({"url": url, "error_kind": "internal", "error": str(exc)})
+            finally:
+                self.queue.task_done()
+
+    # ---- entry point -----------------------------------------------------
+    async def run(self) -> Dict[str, Any]:
+        started = time.monotonic()
+        self.io_pool = ThreadPoolExecutor(max_workers=self.concurrency + 1,
+                                          thread_name_prefix="crawl-io")
+        owns_audit_pool = self._audit_executor is None
+        if self._audit_executor is not None:
+            self.audit_pool = self._audit_executor
+        elif self._audit_workers > 0:
+            # spawn, not fork: the event loop process already runs threads.
+            self.audit_pool = ProcessPoolExecutor(
+                max_workers=self._audit_workers,
+                mp_context=multiprocessing.get_context("spawn"))
+        else:
+            self.audit_pool = self.io_pool
+        try:
+            if self.respect_robots:
+                await self._load_robots()
+            if urlparse(self.start_url).path.lower().endswith(".xml"):
+                await self._seed_from_sitemap(self.start_url)
+            else:
+                self._enqueue(self.start_url)
+            workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+            await self.queue.join()
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        finally:
+            self.io_pool.shutdown(wait=False)
+            if owns_audit_pool and self.audit_pool is not self.io_pool:
+                self.audit_pool.shutdown(wait=True)
+        return self._report(time.monotonic() - started)
+
+    # ---- report ----------------------------------------------------------
+    def _report(self, elapsed: float) -> Dict[str, Any]:
+        audited = [p for p in self.pages if "evidence" in p]
+        failed = [p for p in self.pages if "error_kind" in p]
+        totals = {key: 0 for key in _TOTALS}
+        pages_missing = {"lang": 0, "title": 0, "main_landmark": 0, "viewport": 0}
+        criteria: Dict[str, Dict[str, Any]] = {}
+        for row in audited:
+            evidence = row["evidence"]
+            for key, (section, field) in _TOTALS.items():
+                totals[key] += evidence[section][field]
+            page_meta = evidence["page"]
+            pages_missing["lang"] += not page_meta["lang"]
+            pages_missing["title"] += not page_meta["title"]
+            pages_missing["viewport"] += not page_meta["viewport"]
+            landmarks = evidence["landmarks"]
+            pages_missing["main_landmark"] += not (landmarks["main"] or landmarks["role_main"])
+            for crit in sorted(set(row["flagged"])):
+                entry = criteria.setdefault(crit, {"wcag": crit, "pages": 0, "sample_urls": []})
+                entry["pages"] += 1
+                if len(entry["sample_urls"]) < 5:
+                    entry["sample_urls"].append(row["url"])
+        for crit, entry in criteria.items():
+            ref = web_audit.WCAG_REFERENCES.get(crit, {})
+            entry["title"] = ref.get("title", "")
+            entry["level"] = ref.get("level", "")
+            entry["w3c_understanding_url"] = ref.get("w3c", "")
+
+        worst = sorted(audited, key=lambda p: len(p["summaries"]), reverse=True)[:10]
+        rows = []
+        for row in sorted(self.pages, key=lambda p: p["url"]):
+            compact = {k: v for k, v in row.items() if k not in ("evidence", "summaries")}
+            if self.include_evidence and "evidence" in row:
+                compact["evidence"] = row["evidence"]
+            rows.append(compact)
+        return {
+            "start_url": self.start_url,
+            "origin": self.origin,
+            "pages_discovered": self.enqueued,
+            "pages_audited": len(audited),
+            "pages_failed": len(failed),
+            "pages_skipped": dict(self.skipped),
+            "elapsed_ms": int(elapsed * 1000),
+            "pages_per_second": round(len(self.pages) / elapsed, 2) if elapsed else 0.0,
+            "totals": totals,
+            "pages_missing": pages_missing,
+            "criteria": sorted(criteria.values(), key=lambda c: (-c["pages"], c["wcag"])),
+            "worst_pages": [{"url": p["url"], "issues": len(p["summaries"]),
+                             "summaries": p["summaries"][:5]} for p in worst if p["summaries"]],
+            "errors": [{"url": p["url"], "error_kind": p["error_kind"], "error": p["error"]}
+                       for p in failed[:50]],
+            "pages": rows,
+        }
+
+
+async def crawl_site(start_url: str, **options: Any) -> Dict[str, Any]:
+    """Crawl and audit a site from ``start_url``; see :class:`SiteCrawler`."""
+    return await SiteCrawler(start_url, **options).run()
+
+
+def crawl(start_url: str, **options: Any) -> Dict[str, Any]:
+    """Blocking wrapper around :func:`crawl_site` for scripts and tests."""
+    return asyncio.run(crawl_site(start_url, **options))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Crawl a site and audit every page for accessibility.")
+    parser.add_argument("url", help="start page or sitemap.xml URL")
+    parser.add_argument("--max-pages", type=int, default=CRAWL_MAX_PAGES)
+    parser.add_argument("--concurrency", type=int, default=CRAWL_CONCURRENCY)
+    parser.add_argument("--per-host", type=int, default=CRAWL_PER_HOST)
+    parser.add_argument("--delay", type=float, default=CRAWL_DELAY_SECONDS)
+    parser.add_argument("--audit-workers", type=int, default=CRAWL_AUDIT_WORKERS)
+    parser.add_argument("--ignore-robots", action="store_true")
+    args = parser.parse_args()
+    report = crawl(args.url, max_pages=args.max_pages, concurrency=args.concurrency,
+                   per_host=args.per_host, delay=args.delay, audit_workers=args.audit_workers,
+                   respect_robots=not args.ignore_robots)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import threading
+import time
+import unittest
+
+import audit_executor
+import code_audit
+import evidence_cache
+from code_audit import audit_code
+from web_audit import audit_html
+
+HTML = '<html lang="en"><body><img src="a.png"><a href="/">click here</a></body></html>'
+HEAVY_HTML = "<html><body>" + '<p><a href="/x">click here</a><img src="a.png"></p>' * 40000 + "</body></html>"
+
+
+class AuditExecutorTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.executor = audit_executor.AuditExecutor(workers=1, timeout=30)
+        cls.executor.prewarm()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.executor.shutdown()
+
+    def setUp(self):
+        evidence_cache.configure()
+        self.addCleanup(evidence_cache.configure)
+
+    def test_pool_result_matches_inline_and_is_cached_here(self):
+        before = self.executor.stats()
+        first = self.executor.run("audit_html", HTML, "https://example.com/")
+        second = self.executor.run("audit_html", HTML, "https://example.com/")
+        self.assertEqual(first, audit_html.__wrapped__(HTML, "https://example.com/"))
+        self.assertEqual(first, second)
+        after = self.executor.stats()
+        self.assertEqual(after["completed"] - before["completed"], 1)
+        self.assertEqual(after["cache_hits"] - before["cache_hits"], 1)
+        # the direct, memoized call shares the entry the executor stored
+        audit_html(HTML, "https://example.com/")
+        self.assertEqual(evidence_cache.stats()["hits"], 2)
+
+    def test_peak_rss_is_reported_per_task(self):
+        self.executor.run("audit_html", HTML, "https://peak.example/")
+        peak = self.executor.last_peak_rss()
+        self.assertGreater(peak, 0)
+        self.assertGreaterEqual(self.executor.stats()["max_peak_rss_bytes"], peak)
+        self.executor.run("audit_html", HTML, "https://peak.example/")
+        self.assertIsNone(self.executor.last_peak_rss())  # cache hit
+
+    def test_rule_counters_reach_this_process(self):
+        code_audit.reset_rule_stats()
+        self.addCleanup(code_audit.reset_rule_stats)
+        self.executor.run("audit_code", "<img src=counted.png>", hint_lang="html")
+        self.assertEqual(code_audit.rule_stats()["img-missing-alt"]["findings"], 1)
+        self.executor.run("audit_code", "<img src=counted.png>", hint_lang="html")
+        self.assertEqual(code_audit.rule_stats()["img-missing-alt"]["calls"], 1)  # cache hit
+
+    def test_keyword_arguments(self):
+        result = self.executor.run("audit_code", "<img src=x>", hint_lang="html")
+        self.assertEqual(result, audit_code.__wrapped__("<img src=x>", hint_lang="html"))
+
+    def test_timeout_and_cancellation(self):
+        started = time.monotonic()
+        pool = self.executor._get_pool()
+        processes = list(pool._processes.values())
+        # Four at once on the only worker: the first runs and the second
+        # waits in its call queue (both overrun); the others are still
+        # pending and get cancelled.
+        errors = []
+
+        def call(base):
+            try:
+                self.executor.run("audit_html", HEAVY_HTML, base, timeout=0.5)
+            except audit_executor.AuditTimeout as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=call, args=(base,)) for base in "abcd"]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(errors), 4)
+        self.assertLess(time.monotonic() - started, 3)
+        stats = self.executor.stats()
+        self.assertGreaterEqual(stats["timeouts"], 1)
+        self.assertGreaterEqual(stats["cancelled"], 1)
+        self.assertEqual(stats["recycled"], 1)
+        self.assertTrue(processes)
+        # The overrunning worker is terminated rather than left to finish,
+        # and a fresh pool serves the next task.
+        deadline = time.monotonic() + 5
+        while any(p.is_alive() for p in processes) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertFalse(any(p.is_alive() for p in processes))
+        self.assertIsNot(self.executor._get_pool(), pool)
+        self.assertEqual(self.executor.run("audit_html", HTML, "")["images"]["total"], 1)
+
+
+class InlineExecutorTests(unittest.TestCase):
+    def test_zero_workers_runs_inline(self):
+        executor = audit_executor.AuditExecutor(workers=0)
+        evidence_cache.clear()
+        self.assertEqual(executor.run("audit_html", HTML, "")["images"]["missing_alt"], 1)
+        self.assertEqual(executor.stats()["inline"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
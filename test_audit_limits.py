@@ -0,0 +1,152 @@
+import itertools
+import time
+import unittest
+from unittest.mock import patch
+
+import audit_limits
+import code_audit
+import code_diff
+import evidence_cache
+import text_audit
+import web_audit
+from bench_audit_limits import CORPUS
+
+SLACK = 0.5
+
+PAGE = """<!doctype html>
+<html lang="en">
+<head><title>Shop</title></head>
+<body>
+<h1>Shop</h1>
+<img src="a.png">
+<a href="/more">click here</a>
+</body>
+</html>
+"""
+
+
+def _new_file_diff(path: str, text: str) -> str:
+    lines = text.rstrip("\n").split("\n")
+    return (f"--- /dev/null\n+++ b/{path}\n@@ -0,0 +1,{len(lines)} @@\n"
+            + "\n".join("+" + line for line in lines) + "\n")
+
+
+class GuardTests(unittest.TestCase):
+    def test_cap_cuts_at_a_line_break(self):
+        guard = audit_limits.AuditGuard(max_chars=10, seconds=0)
+        self.assertEqual(guard.cap("line one\nline two\n"), "line one\n")
+        evidence = guard.mark({})
+        self.assertTrue(evidence["truncated"])
+        self.assertEqual(evidence["truncation"]["reasons"], ["input_cap"])
+        self.assertEqual(evidence["truncation"]["input_chars"], 18)
+        self.assertEqual(evidence["truncation"]["analyzed_chars"], 9)
+
+    def test_zero_disables_cap_and_budget(self):
+        guard = audit_limits.AuditGuard(max_chars=0, seconds=0)
+        self.assertEqual(guard.cap("x" * 100), "x" * 100)
+        self.assertFalse(guard.expired())
+        self.assertEqual(guard.mark({"ok": True}), {"ok": True})
+
+    def test_nested_guard_keeps_the_outer_deadline(self):
+        outer = audit_limits.AuditGuard(seconds=0.01)
+        with outer.active():
+            inner = audit_limits.AuditGuard(seconds=60)
+        self.assertEqual(inner.deadline, outer.deadline)
+        self.assertEqual(audit_limits.AuditGuard(seconds=60).seconds, 60)
+
+    def test_time_truncated_evidence_is_not_cached(self):
+        calls = []
+
+        @evidence_cache.memoize("test_audit_limits")
+        def audit(text):
+            calls.append(text)
+            return {"truncated": True, "truncation": {"reasons": ["time_budget"]}}
+
+        audit("same")
+        audit("same")
+        self.assertEqual(len(calls), 2)
+
+
+class AuditorLimitTests(unittest.TestCase):
+    def test_normal_input_is_unchanged(self):
+        with patch.object(audit_limits, "AUDIT_CODE_MAX_CHARS", 0), \
+                patch.object(audit_limits, "AUDIT_CODE_BUDGET_SECONDS", 0):
+            unlimited = code_audit.audit_code.__wrapped__(PAGE, "html")
+        limited = code_audit.audit_code.__wrapped__(PAGE, "html")
+        self.assertEqual(limited, unlimited)
+        self.assertNotIn("truncated", limited)
+        self.assertNotIn("truncated", text_audit.audit_text.__wrapped__("A short text. It is plain."))
+        self.assertNotIn("truncated", web_audit.audit_html.__wrapped__(PAGE, ""))
+
+    def test_code_input_cap(self):
+        with patch.object(audit_limits, "AUDIT_CODE_MAX_CHARS", PAGE.index("<img")):
+            evidence = code_audit.audit_code.__wrapped__(PAGE, "html")
+        self.assertEqual(evidence["truncation"]["reasons"], ["input_cap"])
+        self.assertEqual(evidence["char_count"], PAGE.index("<img"))
+        self.assertNotIn("img-missing-alt", {f["rule_id"] for f in evidence["findings"]})
+        self.assertIn(f"PARTIAL ANALYSIS (input size cap): only the first {PAGE.index('<img')} of "
+                      f"{len(PAGE)} characters", code_audit.evidence_summary_for_prompt(evidence))
+
+    def test_code_worst_cases_stop_at_the_budget(self):
+        budget = 0.2
+        with patch.object(audit_limits, "AUDIT_CODE_BUDGET_SECONDS", budget):
+            for case in ("unclosed-links", "unclosed-buttons"):
+                code = CORPUS["audit_code"][case](256 * 1024)
+                started = time.monotonic()
+                evidence = code_audit.audit_code.__wrapped__(code, "html")
+                self.assertLess(time.monotonic() - started, budget + SLACK, case)
+                truncation = evidence["truncation"]
+                self.assertEqual(truncation["reasons"], ["time_budget"], case)
+                self.assertLess(truncation["analyzed_chars"], len(code), case)
+                self.assertIn("missing-title", truncation["skipped"], case)
+                self.assertNotIn("missing-title", {f["rule_id"] for f in evidence["findings"]})
+
+    def test_language_sniff_is_linear(self):
+        code = CORPUS["audit_code"]["css-sniff"](256 * 1024)
+        started = time.monotonic()
+        evidence = code_audit.audit_code.__wrapped__(code, "auto")
+        self.assertLess(time.monotonic() - started, SLACK)
+        self.assertEqual(evidence["language"], "html")
+        self.assertEqual(code_audit._detect_language("a { color: red; }", ""), "css")
+
+    def test_text_budget_skips_issue_checks(self):
+        with patch.object(audit_limits, "AUDIT_TEXT_BUDGET_SECONDS", 1e-9):
+            evidence = text_audit.audit_text.__wrapped__("The form was submitted by the user. " * 50)
+        self.assertTrue(evidence["ok"])
+        self.assertEqual(evidence["stats"]["sentence_count"], 50)
+        self.assertEqual(evidence["truncation"]["skipped"], ["jargon", "passive_voice", "abbreviations"])
+
+    def test_html_deep_nesting_is_streamed_and_stopped(self):
+        html = CORPUS["audit_html"]["deep-nesting"](200 * 1024)
+        self.assertLess(len(html), web_audit.AUDIT_LOW_MEMORY_BYTES)
+        with patch.object(audit_limits, "AUDIT_HTML_BUDGET_SECONDS", 1e-9):
+            evidence = web_audit.audit_html.__wrapped__(html, "")
+        self.assertEqual(evidence["truncation"]["reasons"], ["time_budget"])
+        self.assertEqual(evidence["truncation"]["analyzed_chars"], 64 * 1024)
+
+    def test_diff_skips_whole_files_past_the_cap(self):
+        diff = _new_file_diff("a.html", PAGE) + _new_file_diff("b.html", PAGE)
+        with patch.object(audit_limits, "AUDIT_DIFF_MAX_CHARS", len(PAGE) + 64):
+            evidence = code_diff.audit_diff.__wrapped__(diff)
+        self.assertEqual([f["path"] for f in evidence["files"]], ["a.html"])
+        self.assertEqual(evidence["files_skipped"], [{"path": "b.html", "reason": "input cap"}])
+        self.assertEqual(evidence["truncation"]["reasons"], ["input_cap"])
+
+    def test_diff_budget_skips_the_rest(self):
+        with patch.object(audit_limits, "AUDIT_DIFF_BUDGET_SECONDS", 1e-9):
+            evidence = code_diff.audit_diff.__wrapped__(_new_file_diff("a.html", PAGE))
+        self.assertEqual(evidence["files_skipped"], [{"path": "a.html", "reason": "time budget"}])
+        self.assertEqual(evidence["truncation"]["reasons"], ["time_budget"])
+
+        # The deadline passing inside a file: its remaining regions and the
+        # document rules are skipped.
+        expiry = itertools.chain([False], itertools.repeat(True))
+        with patch.object(audit_limits.AuditGuard, "expired", side_effect=lambda: next(expiry)):
+            evidence = code_diff.audit_diff.__wrapped__(_new_file_diff("a.html", PAGE))
+        self.assertFalse(evidence["files"][0]["complete"])
+        self.assertEqual(evidence["files"][0]["document_rules"], "skipped: time budget")
+        self.assertEqual(evidence["findings"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
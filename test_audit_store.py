@@ -0,0 +1,140 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+import app as app_module
+import audit_executor
+import audit_store
+
+PAGE = ('<!DOCTYPE html><html><head><title></title></head><body>'
+        '<img src="a.png"><h1>Hi</h1><a href="/x">click here</a></body></html>')
+
+
+def _score(score, codes, created_at, key="https://example.com/"):
+    return {"kind": "score", "key": key, "label": key, "created_at": created_at, "score": score,
+            "deterministic_score": score, "findings": {code: 1 for code in codes},
+            "metrics": {"missing_alt": len(codes)}, "evidence": {"codes": codes}}
+
+
+class StoreTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.store = audit_store.AuditStore(os.path.join(self.dir, "audits.sqlite3"))
+
+    def test_trend_diff_and_evidence(self):
+        ids = self.store.insert_many([
+            _score(80, ["1.1.1"], 100.0),
+            _score(70, ["1.1.1", "2.4.2"], 200.0),
+            _score(90, ["1.1.1"], 300.0, key="https://other.example/"),
+        ])
+        self.assertEqual(self.store.count(), 3)
+        trend = self.store.trend("score", "https://example.com/")
+        self.assertEqual([(a["id"], a["score"]) for a in trend], [(ids[0], 80), (ids[1], 70)])
+        self.assertEqual(self.store.trend("score", "https://example.com/", since=150.0)[0]["id"], ids[1])
+        self.assertEqual(self.store.trend("score", "https://nowhere.example/"), [])
+
+        change = self.store.diff_latest("score", "https://example.com/")
+        self.assertEqual((change["score_change"], change["added"], change["resolved"]), (-10, {"2.4.2": 1}, {}))
+        self.assertEqual(change["metrics_change"], {"missing_alt": 1})
+        self.assertIsNone(self.store.diff_latest("score", "https://other.example/"))
+        self.assertEqual(self.store.evidence(ids[1]), {"codes": ["1.1.1", "2.4.2"]})
+
+    def test_database_files_are_private(self):
+        self.store.insert_many([_score(80, ["1.1.1"], 100.0)])
+        for name in ("audits.sqlite3", "audits.sqlite3-wal"):
+            self.assertEqual(os.stat(os.path.join(self.dir, name)).st_mode & 0o777, 0o600, name)
+
+    def test_off_by_default_and_without_a_path(self):
+        self.addCleanup(setattr, audit_store, "_store_failed", False)
+        with patch.object(audit_store, "_store", None):
+            with patch.object(audit_store, "AUDIT_STORE_ENABLED", False):
+                self.assertIsNone(audit_store.get_store())
+            with patch.object(audit_store, "AUDIT_STORE_ENABLED", True), \
+                    patch.object(audit_store, "AUDIT_STORE_PATH", ""):
+                self.assertIsNone(audit_store.get_store())
+        with self.assertRaises(ValueError):
+            audit_store.AuditStore("")
+
+    def test_top_regressions_compare_with_previous_audit(self):
+        records = []
+        for site in range(20):
+            key = f"https://site{site}.example/"
+            records.append(_score(90, [], 10.0, key))          # older than the window
+            records.append(_score(90 - site, [], 1000.0 + site, key))
+        records.append(_score(50, [], 5.0, "https://stale.example/"))
+        records.append(_score(10, [], 6.0, "https://stale.example/"))  # regressed, but before the window
+        self.store.insert_many(records)
+        worst = self.store.top_regressions("score", since=500.0, limit=3)
+        self.assertEqual([w["target"] for w in worst],
+                         ["https://site19.example/", "https://site18.example/", "https://site17.example/"])
+        self.assertEqual(worst[0]["score_change"], -19)
+        self.assertEqual(worst[0]["from"]["created_at"], 10.0)
+
+    def test_background_writer_batches(self):
+        threads = [threading.Thread(target=lambda n=n: [
+            self.store.enqueue(_score(n, [], float(n * 100 + i), f"https://t{n}.example/")) for i in range(50)])
+            for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(self.store.flush(timeout=10))
+        self.assertEqual(self.store.count(), 200)
+        self.assertEqual(len(self.store.trend("score", "https://t2.example/")), 50)
+
+    def test_normalize_keys(self):
+        self.assertEqual(audit_store.url_key("HTTPS://Example.COM#top"), "https://example.com/")
+        self.assertTrue(audit_store.content_key("x").startswith("sha256:"))
+        record = audit_store.normalize("review_code", "k", {"score": 71.6, "evidence": {
+            "findings": [{"rule_id": "img-alt"}, {"rule_id": "img-alt"}], "deterministic_score": 80,
+            "severity_counts": {"critical": 2}, "line_count": 4}})
+        self.assertEqual((record["score"], record["deterministic_score"], record["findings"]),
+                         (72, 80, {"img-alt": 2}))
+        with self.assertRaises(ValueError):
+            audit_store.normalize("nope", "k", {})
+
+
+@patch("ai_client.is_configured", return_value=False)
+class HistoryEndpointTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.store = audit_store.AuditStore(os.path.join(self.dir, "audits.sqlite3"))
+        audit_store.set_store(self.store)
+        self.addCleanup(audit_store.set_store, None)
+        audit_executor.set_executor(audit_executor.AuditExecutor(workers=0))
+        self.addCleanup(audit_executor.set_executor, None)
+        self.client = app_module.app.test_client()
+
+    def test_scores_are_recorded_and_queryable(self, _configured):
+        pages = iter([PAGE, PAGE.replace("<title></title>", "<title>Home</title>")])
+        with patch("web_audit.fetch_page", side_effect=lambda url, timeout=None: {
+                "ok": True, "url": url, "final_url": url, "status": 200, "html": next(pages)}):
+            for _ in range(2):
+                payload = self.client.post("/api/score", json={"url": "https://Example.com/#x"}).get_json()
+        self.assertEqual(payload["history"], {"kind": "score", "target": "https://example.com/"})
+        self.store.flush(timeout=10)
+        history = self.client.get("/api/history?target=https://example.com/").get_json()
+        self.assertEqual(len(history["audits"]), 2)
+        self.assertIn("2.4.2", history["latest_change"]["resolved"])
+        self.assertEqual(self.client.get("/api/history").status_code, 400)
+        self.assertEqual(self.client.get("/api/history?target=x&kind=bad").status_code, 400)
+        self.assertEqual(self.client.get("/api/history/regressions").get_json()["regressions"], [])
+
+    def test_code_reviews_keyed_by_name_or_hash(self, _configured):
+        named = self.client.post("/api/review-code", json={
+            "code": '<img src="a.png">', "history_key": "src/nav.html"}).get_json()
+        anonymous = self.client.post("/api/review-code", json={"code": '<img src="a.png">'}).get_json()
+        self.assertEqual(named["history"]["target"], "src/nav.html")
+        self.assertEqual(anonymous["history"]["target"], audit_store.content_key('<img src="a.png">'))
+        self.store.flush(timeout=10)
+        audits = self.client.get("/api/history?kind=review_code&target=src/nav.html").get_json()["audits"]
+        self.assertEqual(len(audits), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import contextlib
+import io
+import random
+import time
+import unittest
+from unittest.mock import patch
+
+import code_audit
+import bench_code_audit
+from bench_code_audit import legacy_lint_markup, lint_markup, template
+
+
+EDGE_CASES = {
+    "empty": "",
+    "unclosed_links": '<a href="/1"><a href="/2">click here</a><button><span></span>',
+    "closer_spellings": '<a href="/">read more</A ><button>\n</ button>< / a><BUTTON></button >',
+    "inner_markup": '<a href="/">{icon}<span> </span></a><button>{label}</button><a>{a{b}} here</a>',
+    "label_for": (
+        '<label for="q">Q</label><input id="q"><label for=\'Upper\'></label><input id="uPPer">'
+        '<label data-for="x" class="l" for = "y z"></label><input id="x"><input id="y"><input id="y z">'
+        '<label for="a\'b"></label><input id="a\'b"><label\nfor="later"><input id="later">'
+        '<label for="gt>"></label><input id="gt"><input id="none"><label'
+    ),
+    "document": (
+        '<!DOCTYPE html>\n<html>\n<head><meta name="viewport" content="maximum-scale=1"></head>\n'
+        '<body><h2>a</h2><h4>b</h4>\n<img src="x"><img alt="Photo of a cat">\n'
+        '<div id="d" onclick="f()" tabindex="2"></div><span id="d" aria-hidden="true"></span>\n'
+        '<iframe src="/"></iframe></body></html>'
+    ),
+}
+
+_FRAGMENTS = ['<a href="x">', '</a>', '</A >', '<a>', '<button>', '</button>', '<label for="q">',
+              "<label for='Q'>", '<input id="q">', '<input id="Q">', '<input type="text">', 'click here',
+              '{expr}', ' ', '\n', '<span>', '</span>', '<img src=x>', '<div onclick="f()">', '<h1>',
+              '<h3>', '<html>', '<', '>', '"', "'", 'for="q"', '<label', '<input id="d"><input id="d">']
+
+
+class MarkupLintTests(unittest.TestCase):
+    def assertSameFindings(self, code):
+        lines = code.splitlines()
+        self.assertEqual(lint_markup(code, lines), legacy_lint_markup(code, lines))
+
+    def test_matches_legacy_on_edge_cases(self):
+        for name, code in EDGE_CASES.items():
+            with self.subTest(case=name):
+                self.assertSameFindings(code)
+
+    def test_matches_legacy_on_random_markup(self):
+        rng = random.Random(17)
+        for _ in range(2000):
+            code = "".join(rng.choice(_FRAGMENTS) for _ in range(rng.randint(1, 30)))
+            with self.subTest(code=code):
+                self.assertSameFindings(code)
+
+    def test_matches_legacy_on_template(self):
+        self.assertSameFindings(template(2000))
+
+    def test_bench_comparison_runs(self):
+        code = template(1000)
+        self.assertTrue(bench_code_audit.identical(code, code.splitlines()))
+        out = io.StringIO()
+        with patch("sys.argv", ["bench_code_audit.py", "--max-lines", "1000", "--rounds", "1"]), \
+                contextlib.redirect_stdout(out):
+            bench_code_audit.main()
+        self.assertTrue(out.getvalue().rstrip().endswith("True"))
+
+    def test_label_for_and_line_numbers(self):
+        findings = code_audit.audit_code(EDGE_CASES["label_for"], "html")["findings"]
+        unlabeled = [f["snippet"] for f in findings if f["rule_id"] == "input-missing-label"]
+        self.assertEqual(len(unlabeled), 2)  # id="none", and id="gt" (for="gt>" never closes)
+        lines = {f["rule_id"]: f["line"] for f in code_audit.audit_code(EDGE_CASES["document"], "html")["findings"]}
+        self.assertEqual((lines["heading-skipped-level"], lines["img-missing-alt"], lines["duplicate-id"]), (4, 5, 6))
+
+    def test_scales_linearly(self):
+        def best(code):
+            lines = code.splitlines()
+            times = []
+            for _ in range(3):
+                started = time.perf_counter()
+                lint_markup(code, lines)
+                times.append(time.perf_counter() - started)
+            return min(times)
+        small, large = best(template(2000)), best(template(16000))
+        # 8x the input: linear is ~8x the time, the old quadratic lint ~60x.
+        self.assertLess(large / small, 20)
+
+
+class RuleRegistryTests(unittest.TestCase):
+    def test_every_rule_is_registered_with_metadata(self):
+        self.assertEqual(set(code_audit.RULES), set(code_audit.CODE_RULE_REFERENCES))
+        catalog = {r["rule_id"]: r for r in code_audit.rule_catalog()}
+        self.assertEqual(catalog["img-missing-alt"]["severity"], "critical")
+        self.assertEqual(catalog["outline-none"]["languages"], ["css", "html", "jsx", "vue"])
+        with self.assertRaises(KeyError):
+            code_audit.rule("not-a-rule")
+
+    def test_selection_runs_only_the_selected_rules(self):
+        code = EDGE_CASES["document"] + "<style>a:focus{outline:none}</style>"
+        full = code_audit.audit_code(code, "html")
+        selected = code_audit.audit_code(code, "html", rules=["duplicate-id", "outline-none"])
+        self.assertNotIn("rules", full)
+        self.assertEqual(selected["rules"], ["duplicate-id", "outline-none"])
+        self.assertEqual(selected["findings"],
+                         [f for f in full["findings"] if f["rule_id"] in {"duplicate-id", "outline-none"}])
+        self.assertEqual({f["rule_id"] for f in selected["findings"]}, {"duplicate-id", "outline-none"})
+        with self.assertRaises(ValueError):
+            code_audit.audit_code(code, "html", rules=["img-missing-alt", "nope"])
+
+    def test_dispatch_only_reaches_matching_tags(self):
+        code_audit.reset_rule_stats()
+        code_audit.audit_code.__wrapped__('<p>a</p><p>b</p><img src="x"><div>c</div>', "html")
+        stats = code_audit.rule_stats()
+        self.assertEqual(stats["img-missing-alt"]["calls"], 1)
+        self.assertEqual(stats["img-missing-alt"]["findings"], 1)
+        self.assertNotIn("iframe-missing-title", stats)
+        self.assertNotIn("positive-tabindex", stats)  # no tag mentions tabindex
+        self.assertEqual(stats["missing-title"]["calls"], 1)  # the document hook
+        code_audit.reset_rule_stats()
+        self.assertEqual(code_audit.rule_stats(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
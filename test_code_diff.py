@@ -0,0 +1,120 @@
+import difflib
+import random
+import unittest
+
+import code_audit
+import code_diff
+
+BASE = """<!DOCTYPE html>
+<html lang="en">
+<head><title>Shop</title><meta name="viewport" content="width=device-width"></head>
+<body>
+<h1>Shop</h1>
+<input id="q" aria-label="Search">
+<a href="/a">Apples</a>
+<h2>Fruit</h2>
+<p>Fresh today.</p>
+</body>
+</html>
+"""
+
+
+def _diff(old, new, path="page.html", context=3):
+    return "".join(difflib.unified_diff(old.splitlines(True), new.splitlines(True),
+                                        "a/" + path, "b/" + path, n=context))
+
+
+def _key(findings):
+    return sorted((f["rule_id"], f["line"]) for f in findings)
+
+
+class ParseTests(unittest.TestCase):
+    def test_round_trip(self):
+        new = BASE.replace("Apples", "Pears").replace("<p>Fresh today.</p>\n", "") + "<footer>x</footer>\n"
+        patches = code_diff.parse_unified_diff(_diff(BASE, new, context=1))
+        self.assertEqual(len(patches), 1)
+        self.assertEqual(patches[0]["path"], "page.html")
+        self.assertEqual(code_diff.apply_hunks(BASE, patches[0]["hunks"]), new)
+        with self.assertRaises(ValueError):
+            code_diff.apply_hunks(BASE.replace("Apples", "Plums"), patches[0]["hunks"])
+
+    def test_no_newline_at_end_of_file(self):
+        diff = ("--- a/x.html\n+++ b/x.html\n@@ -1,2 +1,2 @@\n <p>a</p>\n-<p>b</p>\n"
+                "\\ No newline at end of file\n+<p>c</p>\n")
+        hunk, = code_diff.parse_unified_diff(diff)[0]["hunks"]
+        self.assertFalse(hunk["old_eof_newline"])
+        self.assertTrue(hunk["new_eof_newline"])
+        self.assertEqual(code_diff.apply_hunks("<p>a</p>\n<p>b</p>", [hunk]), "<p>a</p>\n<p>c</p>\n")
+
+    def test_git_new_file(self):
+        diff = ("diff --git a/x.css b/x.css\nnew file mode 100644\n--- /dev/null\n+++ b/x.css\n"
+                "@@ -0,0 +1,2 @@\n+a:focus { outline: none; }\n+b { color: red; }\n")
+        patch, = code_diff.parse_unified_diff(diff)
+        self.assertTrue(patch["new_file"])
+        self.assertEqual(code_diff.apply_hunks("", patch["hunks"]), "a:focus { outline: none; }\nb { color: red; }\n")
+        evidence = code_diff.audit_diff.__wrapped__(diff)
+        self.assertEqual(_key(evidence["findings"]), [("outline-none", 1)])
+        self.assertEqual(evidence["findings"][0]["path"], "x.css")
+        with self.assertRaises(ValueError):
+            code_diff.audit_diff.__wrapped__("just text\n")
+
+
+class AuditDiffTests(unittest.TestCase):
+    def test_only_changed_lines_are_reported(self):
+        # Line 7 gets generic link text, line 8 skips a heading level and
+        # duplicates the input's id (reported at its first use, line 6, as
+        # a new finding); the untouched image on line 9 is not reported.
+        old = BASE.replace("<p>Fresh today.</p>", '<p>Fresh <img src="x.png"> today.</p>')
+        new = (old.replace("Apples", "click here")
+                  .replace("<h2>Fruit</h2>", '<h4 id="q">Fruit</h4>'))
+        diff = _diff(old, new)
+
+        with_base = code_diff.audit_diff.__wrapped__(diff, base=old)
+        self.assertEqual(_key(with_base["findings"]),
+                         [("duplicate-id", 6), ("heading-skipped-level", 8), ("link-generic-text", 7)])
+        self.assertEqual(with_base["files"][0]["document_rules"], "checked")
+
+        without = code_diff.audit_diff.__wrapped__(diff)
+        self.assertEqual(_key(without["findings"]), [("link-generic-text", 7)])
+        self.assertTrue(without["files"][0]["document_rules"].startswith("skipped"))
+
+        full = code_audit.audit_code.__wrapped__(new, "html")
+        self.assertIn(("img-missing-alt", 9), _key(full["findings"]))
+
+    def test_random_edits_agree_with_a_full_audit(self):
+        rnd = random.Random(21)
+        pieces = ['<a href="/">', '</a>', '<button>', '</button>', 'click here', '<img src=x>',
+                  '<h2 id="q">', '</h2>', '<h4>', '<input id="q">', '<label for="q">', '</label>',
+                  'a:focus { outline: none; }', 'ok', ' ', 'Go']
+        for trial in range(60):
+            old_lines = ["".join(rnd.choice(pieces) for _ in range(rnd.randint(0, 4))) for _ in range(20)]
+            new_lines = list(old_lines)
+            for _ in range(rnd.randint(1, 3)):
+                i = rnd.randrange(len(new_lines))
+                new_lines[i:i + rnd.randint(0, 2)] = [
+                    "".join(rnd.choice(pieces) for _ in range(rnd.randint(0, 4)))
+                    for _ in range(rnd.randint(0, 2))]
+            old, new = "\n".join(old_lines) + "\n", "\n".join(new_lines) + "\n"
+            diff = _diff(old, new, context=rnd.choice([0, 1, 3]))
+            if not diff:
+                continue
+            full = set(_key(code_audit.audit_code.__wrapped__(new, "html")["findings"]))
+            changed = set()
+            for hunk in code_diff.parse_unified_diff(diff)[0]["hunks"]:
+                changed |= code_diff._new_side(hunk)[1]
+            with self.subTest(trial=trial, new=new):
+                found = set(_key(code_diff.audit_diff.__wrapped__(diff, base=old)["findings"]))
+                self.assertLessEqual(found, full)
+                self.assertLessEqual({k for k in full if k[1] in changed}, found)
+
+    def test_diff_for_prompt(self):
+        new = BASE.replace("Apples", "click here").replace("<p>Fresh today.</p>\n", "")
+        text = code_diff.diff_for_prompt(_diff(BASE, new, context=1))
+        self.assertIn("=== page.html", text)
+        self.assertIn('    7 + <a href="/a">click here</a>', text)
+        self.assertIn('      - <a href="/a">Apples</a>', text)
+        self.assertIn("    8   <h2>Fruit</h2>", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
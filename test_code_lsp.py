@@ -0,0 +1,121 @@
+import io
+import json
+import random
+import unittest
+
+import bench_code_audit
+import code_audit
+import code_lsp
+
+PIECES = [
+    '<a href="/">', '</a>', '<button>', '</button>', 'click here', '<img src=x>', '<img alt="image of x">',
+    '<input id="q">', '<label for="q">', '</label>', '<h1>', '<h3>', '<h2 id="q">', '<div id="q" onClick={go}>',
+    '<html>', '<html lang="en">', '<!DOCTYPE html>', '<head>', '<title>', '<meta name="viewport">',
+    'a:focus { outline: none; }', '.x{color:#777;background:#888}', '{', '}', '\n', ' ', 'x', '<', '>', '"',
+    '<iframe>', '<span tabindex="3">', '<a aria-label="">', 'for="', '</ a >', '<label', 'outline:0;', 'Ω😀',
+]
+
+
+def _key(findings):
+    return [(f["rule_id"], f["line"], f["message"]) for f in findings]
+
+
+def _expected(text, language, rules=None):
+    if not text:
+        return []
+    return _key(code_audit.audit_code.__wrapped__(text, language, rules)["findings"])
+
+
+class DocumentTests(unittest.TestCase):
+    def test_random_edits_match_a_full_audit(self):
+        rnd = random.Random(20)
+
+        def snippet(n):
+            return "".join(rnd.choice(PIECES) for _ in range(n))
+
+        for trial in range(150):
+            language = rnd.choice(["html", "jsx", "vue", "css"])
+            rules = rnd.choice([None, None, ["link-empty-name", "duplicate-id", "outline-none"]])
+            doc = code_lsp.Document(snippet(rnd.randint(0, 60)), language, rules)
+            for _ in range(12):
+                start = rnd.randrange(len(doc.text) + 1)
+                end = min(len(doc.text), start + rnd.choice([0, 0, 1, 8, 20]))
+                doc.edit(start, end, snippet(rnd.randint(0, 3)))
+                with self.subTest(trial=trial, text=doc.text):
+                    self.assertEqual(_key(doc.findings()), _expected(doc.text, language, rules))
+
+    def test_edit_relints_only_what_it_touches(self):
+        doc = code_lsp.Document(bench_code_audit.template(4000), "html")
+        middle = doc.text.index('<a href="/items/200">')
+        doc.edit(middle + len('<a href="/items/200">'), middle + len('<a href="/items/200">click here'), "Item 200")
+        self.assertLessEqual(doc.last_edit["tags_relinted"], 2)
+        self.assertLessEqual(doc.last_edit["content_relinted"], 2)
+        self.assertEqual(doc.last_edit["document_rules"], [])
+
+        anchor = doc.text.index('id="note-201"')
+        doc.edit(anchor, anchor + len('id="note-201"'), 'id="note-200"')
+        self.assertEqual(sorted(doc.last_edit["document_rules"]), ["duplicate-id", "input-missing-label"])
+        self.assertEqual(_key(doc.findings()), _expected(doc.text, "html"))
+
+        body = doc.text.index("<body>")
+        doc.edit(body, body, "\n\n")  # only moves the document findings down
+        self.assertEqual(doc.last_edit["document_rules"], [])
+        self.assertEqual(_key(doc.findings()), _expected(doc.text, "html"))
+
+
+def _frame(message):
+    body = json.dumps(message).encode()
+    return b"Content-Length: %d\r\n\r\n" % len(body) + body
+
+
+def _read_all(data):
+    stream, out = io.BytesIO(data), []
+    while True:
+        message = code_lsp.read_message(stream)
+        if message is None:
+            return out
+        out.append(message)
+
+
+class ServerTests(unittest.TestCase):
+    def test_session(self):
+        uri = "file:///page.html"
+        text = '<p>😀 <img src="a.png"></p>\n<a href="/">x</a>'
+        requests = [
+            {"jsonrpc": "2.0", "id": 1, "method": "initialize",
+             "params": {"capabilities": {}, "initializationOptions": {"rules": ["img-missing-alt", "link-generic-text"]}}},
+            {"jsonrpc": "2.0", "method": "initialized", "params": {}},
+            {"jsonrpc": "2.0", "method": "textDocument/didOpen",
+             "params": {"textDocument": {"uri": uri, "languageId": "html", "version": 1, "text": text}}},
+            # Replace the link text "x" (UTF-16 position) with "more".
+            {"jsonrpc": "2.0", "method": "textDocument/didChange",
+             "params": {"textDocument": {"uri": uri, "version": 2},
+                        "contentChanges": [{"range": {"start": {"line": 1, "character": 12},
+                                                      "end": {"line": 1, "character": 13}}, "text": "more"}]}},
+            {"jsonrpc": "2.0", "id": 2, "method": "textDocument/hover", "params": {}},
+            {"jsonrpc": "2.0", "id": 3, "method": "shutdown"},
+            {"jsonrpc": "2.0", "method": "exit"},
+        ]
+        writer = io.BytesIO()
+        server = code_lsp.LanguageServer(io.BytesIO(b"".join(map(_frame, requests))), writer)
+        self.assertEqual(server.serve(), 0)
+        replies = _read_all(writer.getvalue())
+
+        self.assertEqual(replies[0]["result"]["capabilities"]["textDocumentSync"]["change"], 2)
+        opened, changed = [r["params"] for r in replies if r.get("method") == "textDocument/publishDiagnostics"]
+        self.assertEqual(opened["version"], 1)
+        image = opened["diagnostics"][0]
+        self.assertEqual(image["code"], "img-missing-alt")
+        self.assertEqual(image["severity"], 1)
+        self.assertIn("WCAG 1.1.1", image["message"])
+        # The emoji is two UTF-16 code units.
+        self.assertEqual(image["range"], {"start": {"line": 0, "character": 6},
+                                          "end": {"line": 0, "character": 23}})
+        self.assertEqual([d["code"] for d in changed["diagnostics"]], ["img-missing-alt", "link-generic-text"])
+        self.assertIn('"more"', changed["diagnostics"][1]["message"])
+        self.assertEqual(replies[-2]["error"]["code"], -32601)
+        self.assertEqual(replies[-1], {"id": 3, "result": None, "jsonrpc": "2.0"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,237 @@
+import functools
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import audit_limits
+import code_audit
+import code_project
+
+PROJECT = {
+    "index.html": '<!DOCTYPE html><html><head><title>x</title></head><body><img src="a.png"></body></html>',
+    "src/App.jsx": '<div onClick={go}>Go</div>\n<a href="/">click here</a>',
+    "src/Copy.tsx": '<div onClick={go}>Go</div>\n<a href="/">click here</a>',
+    "src/Card.vue": '<template><button></button></template>',
+    "styles/site.css": "a:focus { outline: none; }\n.muted { color: #777; background: #888; }",
+    "styles/clean.scss": ".ok { color: #000; background: #fff; }",
+    "README.md": "# not linted",
+    "node_modules/lib/x.html": "<img src=x>",
+    ".cache/y.css": "a:focus{outline:none}",
+}
+
+
+def _zip(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for path, text in files.items():
+            archive.writestr(path, text)
+    return buffer.getvalue()
+
+
+def _tar(files):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for path, text in files.items():
+            data = text.encode()
+            info = tarfile.TarInfo(path)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+        link = tarfile.TarInfo("linked.html")
+        link.type, link.linkname = tarfile.SYMTYPE, "/etc/passwd"
+        archive.addfile(link)
+    return buffer.getvalue()
+
+
+class SourceTests(unittest.TestCase):
+    def test_archives_and_directories_yield_the_same_files(self):
+        expected = sorted(p for p in PROJECT if code_project.language_of(p))
+        self.assertEqual(len(expected), 6)
+        from_zip, skipped = code_project.files_from_archive(_zip(PROJECT))
+        from_tar, _ = code_project.files_from_archive(_tar(PROJECT))
+        self.assertEqual(sorted(f[0] for f in from_zip), expected)
+        self.assertEqual(sorted(from_tar), sorted(from_zip))
+        self.assertEqual(skipped["unsupported"], 3)
+
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        for path, text in PROJECT.items():
+            os.makedirs(os.path.join(root, os.path.dirname(path)), exist_ok=True)
+            with open(os.path.join(root, path), "w") as fh:
+                fh.write(text)
+        from_dir, _ = code_project.files_from_directory(root)
+        self.assertEqual(sorted(from_dir), sorted(from_zip))
+
+    def test_limits(self):
+        files, skipped = code_project.files_from_archive(_zip(PROJECT), max_files=2, max_file_bytes=60)
+        self.assertEqual(len(files), 2)
+        self.assertEqual(skipped["too_large"] + skipped["over_limit"], 4)
+        with self.assertRaises(ValueError):
+            code_project.files_from_archive(b"not an archive")
+
+    def test_archive_entry_and_size_limits(self):
+        # Skipped entries count too: none of these is lintable.
+        noise = {f"img/{i}.png": "x" for i in range(50)}
+        for build in (_zip, _tar):
+            with self.subTest(archive=build.__name__):
+                archive = build(dict(PROJECT, **noise))
+                files, _ = code_project.files_from_archive(archive, max_entries=100)
+                self.assertEqual(len(files), 6)
+                with self.assertRaisesRegex(ValueError, "more than 40 entries"):
+                    code_project.files_from_archive(archive, max_entries=40)
+                with self.assertRaisesRegex(ValueError, "unpacks to more than"):
+                    code_project.files_from_archive(archive, max_archive_bytes=200)
+
+    def test_zip_entries_are_counted_before_they_are_loaded(self):
+        archive = _zip({f"{i}.txt": "" for i in range(300)})
+        self.assertEqual(code_project._zip_entries(archive), 300)
+        with patch("zipfile.ZipFile") as opened:
+            with self.assertRaises(ValueError):
+                code_project.files_from_archive(archive, max_entries=299)
+        opened.assert_not_called()
+
+
+class AuditProjectTests(unittest.TestCase):
+    def setUp(self):
+        code_project.clear_cache()
+        self.files, self.skipped = code_project.files_from_archive(_zip(PROJECT))
+
+    def test_report_matches_per_file_audits(self):
+        report = code_project.audit_project(self.files, self.skipped, workers=0)
+        self.assertEqual(report["files_audited"], 6)
+        rows = {r["path"]: r for r in report["files"]}
+        total = 0
+        for path, language, data in self.files:
+            evidence = code_audit.audit_code(data.decode(), language)
+            self.assertEqual(rows[path]["score"], evidence["deterministic_score"])
+            total += len(evidence["findings"])
+        self.assertEqual(report["findings_total"], total)
+        rules = {r["rule_id"]: r for r in report["rules"]}
+        self.assertEqual(rules["click-on-non-interactive"]["files"], 2)
+        self.assertEqual(rules["outline-none"]["locations"], ["styles/site.css:1"])
+        self.assertEqual(rows["styles/clean.scss"]["score"], 100)
+        self.assertLess(report["deterministic_score"], 100)
+
+    def test_cache_by_file_hash(self):
+        first = code_project.audit_project(self.files, workers=0)
+        # App.jsx and Copy.tsx have the same bytes and language: audited once.
+        self.assertEqual(first["cache"], {"hits": 0, "misses": 5})
+        changed = [(p, lang, data + b"\n<img src=y>" if p == "index.html" else data)
+                   for p, lang, data in self.files]
+        second = code_project.audit_project(changed, workers=0)
+        self.assertEqual(second["cache"], {"hits": 4, "misses": 1})
+        selected = code_project.audit_project(self.files, rules=["outline-none"], workers=0)
+        self.assertEqual(selected["cache"]["hits"], 0)
+        self.assertEqual([r["rule_id"] for r in selected["rules"]], ["outline-none"])
+
+    def test_time_truncated_files_are_flagged_and_not_cached(self):
+        page = [("many.html", "html", b'<img src="a.png">\n' * 2000)]
+        with patch.object(audit_limits, "AUDIT_CODE_BUDGET_SECONDS", 1e-9):
+            first = code_project.audit_project(page, workers=0)
+        self.assertTrue(first["truncated"])
+        self.assertEqual(first["files_truncated"], 1)
+        self.assertEqual(first["files"][0]["truncation"]["reasons"], ["time_budget"])
+        second = code_project.audit_project(page, workers=0)
+        self.assertEqual(second["cache"], {"hits": 0, "misses": 1})
+        self.assertFalse(second["truncated"])
+        self.assertNotIn("truncated", second["files"][0])
+        self.assertEqual(second["files"][0]["rules"]["img-missing-alt"], 2000)
+
+    def test_executor_gives_same_report(self):
+        code_audit.reset_rule_stats()
+        self.addCleanup(code_audit.reset_rule_stats)
+        inline = code_project.audit_project(self.files, workers=0)
+        counted = code_audit.rule_stats()
+        code_project.clear_cache()
+        code_audit.reset_rule_stats()
+        with ThreadPoolExecutor(2) as pool:
+            pooled = code_project.audit_project(self.files, executor=pool)
+        self.assertEqual({r: s["findings"] for r, s in code_audit.rule_stats().items()},
+                         {r: s["findings"] for r, s in counted.items()})
+        for report in (inline, pooled):
+            report.pop("elapsed_ms")
+            report.pop("files_per_second")
+        self.assertEqual(pooled, inline)
+
+
+class SharedExecutorTests(unittest.TestCase):
+    def tearDown(self):
+        code_project.shutdown_shared_executor()
+
+    def test_one_pool_across_calls(self):
+        files, _ = code_project.files_from_archive(_zip(PROJECT))
+        with patch.object(code_project, "CODE_PROJECT_WORKERS", 1):
+            pool = code_project.shared_executor()
+            self.assertIs(code_project.shared_executor(), pool)
+            code_project.clear_cache()
+            code_audit.reset_rule_stats()
+            self.addCleanup(code_audit.reset_rule_stats)
+            pooled = code_project.audit_project(files, executor=pool)
+            self.assertIs(code_project.shared_executor(), pool)
+            # counted in the worker process, reported here
+            self.assertGreater(code_audit.rule_stats()["img-missing-alt"]["findings"], 0)
+        code_project.clear_cache()
+        inline = code_project.audit_project(files, workers=0)
+        self.assertEqual(pooled["files"], inline["files"])
+        with patch.object(code_project, "CODE_PROJECT_WORKERS", 0):
+            self.assertIsNone(code_project.shared_executor())
+
+
+class ProjectEndpointTests(unittest.TestCase):
+    def setUp(self):
+        import app
+
+        for patcher in (patch.object(code_project, "CODE_PROJECT_WORKERS", 0),
+                        patch.object(code_project, "CODE_PROJECT_MAX_UPLOAD_BYTES", 64 * 1024)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        code_project.clear_cache()
+        self.client = app.app.test_client()
+
+    def test_raw_and_multipart_uploads(self):
+        raw = self.client.post("/api/review-code/project?rules=outline-none,img-missing-alt",
+                               data=_tar(PROJECT), content_type="application/gzip")
+        self.assertEqual(raw.status_code, 200)
+        report = raw.get_json()
+        self.assertEqual(report["files_audited"], 6)
+        self.assertEqual(sorted(report["rules_selected"]), ["img-missing-alt", "outline-none"])
+        self.assertNotIn("findings", report["files"][0])
+
+        form = self.client.post("/api/review-code/project?include_findings=1",
+                                data={"archive": (io.BytesIO(_zip(PROJECT)), "site.zip")},
+                                content_type="multipart/form-data")
+        self.assertEqual(form.status_code, 200)
+        rows = {r["path"]: r for r in form.get_json()["files"]}
+        self.assertEqual(sorted(rows), sorted(p for p in PROJECT if code_project.language_of(p)))
+        self.assertIn("findings", rows["index.html"])
+
+    def test_oversized_uploads_are_413(self):
+        big = b"x" * (64 * 1024 + 1)
+        self.assertEqual(self.client.post("/api/review-code/project", data=big).status_code, 413)
+        form = self.client.post("/api/review-code/project",
+                                data={"archive": (io.BytesIO(big), "big.zip")},
+                                content_type="multipart/form-data")
+        self.assertEqual(form.status_code, 413)
+
+    def test_bad_uploads_are_400(self):
+        for body, query, error in ((b"", "", "No archive provided"),
+                                   (b"not an archive", "", "not a zip or tar"),
+                                   (_zip(PROJECT), "?rules=no-such-rule", "no-such-rule")):
+            with self.subTest(error=error):
+                response = self.client.post("/api/review-code/project" + query, data=body)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(error, response.get_json()["error"])
+        limited = functools.partial(code_project.files_from_archive, max_entries=3)
+        with patch.object(code_project, "files_from_archive", limited):
+            response = self.client.post("/api/review-code/project", data=_zip(PROJECT))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("more than 3 entries", response.get_json()["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import re
+import threading
+import time
+import unittest
+
+import bench_code_audit
+import code_audit
+import code_review
+import prompt_budget
+
+
+class PlanWindowsTests(unittest.TestCase):
+    def test_windows_cover_the_file_at_element_boundaries(self):
+        code = bench_code_audit.template(300)
+        evidence = code_audit.audit_code(code, "html")
+        windows, left_out = code_review.plan_windows(code, "html", evidence["findings"], 1200, max_windows=99)
+        lines = code.split("\n")
+        self.assertGreater(len(windows), 3)
+        self.assertEqual(left_out, 0)
+        self.assertEqual(windows[0][0], 1)
+        self.assertEqual(windows[-1][1], len(lines))
+        for (_, last), (first, _) in zip(windows, windows[1:]):
+            self.assertEqual(first, last + 1)
+            self.assertTrue(lines[last - 1].strip().startswith("</"), lines[last - 1])
+        for first, last in windows:
+            text = code_review.window_text(lines, (first, last))
+            self.assertLessEqual(prompt_budget.estimate_tokens(text), 1200)
+
+    def test_never_cuts_inside_a_tag(self):
+        code = "\n".join('<img\n  src="a.png"\n  alt="">' for _ in range(60))
+        windows, _ = code_review.plan_windows(code, "html", [], 40, max_windows=99)
+        for first, _ in windows:
+            self.assertTrue(code.split("\n")[first - 1].startswith("<img"))
+
+    def test_keeps_the_windows_with_the_most_findings(self):
+        code = "\n".join(["<p>fine</p>"] * 200 + ['<img src="x.png">'] * 5 + ["<p>fine</p>"] * 200)
+        evidence = code_audit.audit_code(code, "html")
+        windows, left_out = code_review.plan_windows(code, "html", evidence["findings"], 200, max_windows=2)
+        self.assertEqual(len(windows), 2)
+        self.assertTrue(any(first <= 201 <= last for first, last in windows))
+        self.assertEqual(left_out, 405 - sum(b - a + 1 for a, b in windows))
+
+
+class ReviewWindowsTests(unittest.TestCase):
+    def setUp(self):
+        self.code = bench_code_audit.template(200)
+        self.evidence = code_audit.audit_code(self.code, "html")
+        self.windows, _ = code_review.plan_windows(self.code, "html", self.evidence["findings"], 900, max_windows=99)
+
+    def _prompt(self, scoped, text, window):
+        return text, False
+
+    def test_concurrent_calls_merge_with_file_line_numbers(self):
+        lock, state = threading.Lock(), {"now": 0, "peak": 0}
+
+        def generate(prompt):
+            with lock:
+                state["now"] += 1
+                state["peak"] = max(state["peak"], state["now"])
+            time.sleep(0.05)
+            with lock:
+                state["now"] -= 1
+            first = int(re.match(r"\s*(\d+)", prompt).group(1))
+            return {"score": 80, "recommendations": ["Label inputs."], "issues": [
+                # One issue cited with the file's numbering, one counted from
+                # the excerpt's top; the page-level one repeated everywhere.
+                {"title": "a", "severity": "low", "line": first + 1, "rule_id": ""},
+                {"title": "b", "severity": "high", "line": 2, "rule_id": ""},
+                {"title": "Missing title", "severity": "high", "line": 1, "rule_id": "missing-title"},
+            ]}
+
+        review, chunks = code_review.review_windows(
+            self.code, self.evidence, self.windows, self._prompt, generate, lambda e: {}, concurrency=3)
+        self.assertEqual(state["peak"], 3)
+        self.assertEqual(chunks["concurrency"], 3)
+        self.assertEqual(len(chunks["windows"]), len(self.windows))
+        a_lines = sorted(i["line"] for i in review["issues"] if i["title"] == "a")
+        b_lines = sorted(i["line"] for i in review["issues"] if i["title"] == "b")
+        self.assertEqual(a_lines, [w[0] + 1 for w in self.windows])
+        self.assertEqual(b_lines, a_lines)
+        self.assertEqual(sum(i["rule_id"] == "missing-title" for i in review["issues"]), 1)
+        self.assertEqual(review["issues"][0]["severity"], "high")
+        self.assertEqual(review["recommendations"], ["Label inputs."])
+        self.assertEqual(review["score"], 80)
+
+    def test_failed_window_falls_back_to_its_findings(self):
+        calls = []
+
+        def generate(prompt):
+            calls.append(prompt)
+            if len(calls) == 1:
+                raise TimeoutError("slow model")
+            return {"score": 90, "issues": []}
+
+        def fallback(scoped):
+            return {"score": scoped["deterministic_score"],
+                    "issues": [{"title": f["rule_id"], "severity": f["severity"], "line": f["line"],
+                                "rule_id": f["rule_id"]} for f in scoped["findings"]]}
+
+        review, chunks = code_review.review_windows(
+            self.code, self.evidence, self.windows, self._prompt, generate, fallback, concurrency=1)
+        failed = [w for w in chunks["windows"] if "fallback_reason" in w]
+        self.assertEqual(len(failed), 1)
+        first, last = failed[0]["lines"]
+        expected = [f for f in self.evidence["findings"] if first <= f["line"] <= last]
+        self.assertEqual(len(review["issues"]), len(expected))
+        self.assertEqual(failed[0]["findings"], len(expected))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,248 @@
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import code_audit
+import contrast
+import dns_cache
+import http_cache
+import http_pool
+import web_audit
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class ParseColorTests(unittest.TestCase):
+    def test_formats(self):
+        cases = {
+            "#fff": (255, 255, 255, 1.0),
+            "#0008": (0, 0, 0, 0x88 / 255),
+            "#7F7F7F": (127, 127, 127, 1.0),
+            "#ff000080": (255, 0, 0, 128 / 255),
+            "rgb(255, 0, 0)": (255, 0, 0, 1.0),
+            "rgba(0,0,0,.5)": (0, 0, 0, 0.5),
+            "rgb(100% 0% 0% / 25%)": (255, 0, 0, 0.25),
+            "hsl(120, 100%, 50%)": (0, 255, 0, 1.0),
+            "hsl(0.5turn 100% 50% / .5)": (0, 255, 255, 0.5),
+            "RebeccaPurple": (102, 51, 153, 1.0),
+            "transparent": (0, 0, 0, 0.0),
+            "#333 !important": (51, 51, 51, 1.0),
+        }
+        for value, expected in cases.items():
+            with self.subTest(value=value):
+                for got, want in zip(contrast.parse_color(value), expected):
+                    self.assertAlmostEqual(got, want, places=6)
+
+    def test_unresolvable(self):
+        for value in ("var(--fg)", "currentColor", "inherit", "#12", "#ggg",
+                      "rgb(1, 2)", "hsl(10%, 50%, 50%)", "linear-gradient(red, blue)", ""):
+            with self.subTest(value=value):
+                self.assertIsNone(contrast.parse_color(value))
+
+
+class RatioTests(unittest.TestCase):
+    def test_known_ratios(self):
+        self.assertAlmostEqual(contrast.contrast_ratio("black", "white"), 21.0)
+        self.assertAlmostEqual(contrast.contrast_ratio("#fff", "#fff"), 1.0)
+        self.assertAlmostEqual(contrast.contrast_ratio("#777", "#fff"), 4.48, places=2)
+        self.assertAlmostEqual(contrast.contrast_ratio("#767676", "#fff"), 4.54, places=2)
+        self.assertIsNone(contrast.contrast_ratio("var(--x)", "#fff"))
+
+    def test_alpha_is_composited(self):
+        # Half-transparent black on white paints as mid grey.
+        self.assertAlmostEqual(contrast.contrast_ratio("rgba(0,0,0,.5)", "#fff"),
+                               contrast.contrast_ratio("rgb(127.5,127.5,127.5)", "#fff"))
+        # A transparent background shows the white canvas.
+        self.assertAlmostEqual(contrast.contrast_ratio("#000", "transparent"), 21.0)
+
+    @unittest.skipUnless(numpy is not None, "numpy not installed")
+    def test_numpy_batch_matches_python(self):
+        colours = ["#%02x%02x%02x" % (i * 37 % 256, i * 91 % 256, i * 13 % 256) for i in range(200)]
+        pairs = [(fg, f"rgba(10, 200, 30, {i % 10 / 10})") for i, fg in enumerate(colours)]
+        parsed = [(contrast.parse_color(fg), contrast.parse_color(bg)) for fg, bg in pairs]
+        for fast, slow in zip(contrast._ratios_numpy(parsed), contrast._ratios_python(parsed)):
+            self.assertAlmostEqual(fast, slow, places=9)
+
+
+class RuleScanTests(unittest.TestCase):
+    def test_add_css(self):
+        tally = contrast.ContrastTally()
+        tally.add_css("/* p { color: #777; background: #888 } */ p { color: #777; background: #888 } "
+                      "@media print { .x { color: #777; background: #888 } }", "site.css")
+        self.assertEqual(tally.pairs, {("#777", "#888", False): [2, "p", "site.css"]})
+
+    def test_declared_pair(self):
+        self.assertEqual(contrast.declared_pair("color: #777; background: url(a.png) no-repeat #fff"),
+                         ("#777", "#fff", False))
+        self.assertEqual(contrast.declared_pair("COLOR:red;Background-Color:blue !important;font-size:18pt"),
+                         ("red", "blue", True))
+        self.assertEqual(contrast.declared_pair("color:red;font-size:19px;font-weight:700;background:#fff")[2], True)
+        self.assertIsNone(contrast.declared_pair("background-color: #fff"))
+        self.assertEqual(contrast.declared_pair('background: url("data:image/png;base64,AA") #fff; color: #000'),
+                         ("#000", "#fff", False))
+
+    def test_tally_counts_distinct_pairs_once(self):
+        tally = contrast.ContrastTally()
+        for _ in range(1000):
+            tally.add("#777", "#FFF", False, "p", "inline")
+        tally.add("#000", "#fff", False, "h1", "inline")
+        tally.add("var(--a)", "#fff", False, "b", "inline")
+        summary = tally.summary()
+        self.assertEqual((summary["pairs"], summary["checked"], summary["below_aa"], summary["unparsed"]),
+                         (3, 1001, 1000, 1))
+        self.assertEqual(summary["worst"][0]["count"], 1000)
+
+
+class PageContrastTests(unittest.TestCase):
+    PAGE = ("<html><head><base href='/static/'>"
+            "<link rel='stylesheet' href='site.css'><link rel='stylesheet' media='print' href='p.css'>"
+            "<link rel='alternate stylesheet' href='alt.css'><link rel='icon' href='i.png'>"
+            "<style>.muted { color: #999; background: #fff } .ok { color: #000; background: #fff }</style>"
+            "</head><body>"
+            "<p style='color: #aaa; background-color: white'>faint</p>"
+            "<p style='color: #aaa; background-color: white'>faint again</p>"
+            "<h1 style='color:#888;background:#fff;font-size:32px'>large</h1>"
+            "<span class='muted'>m</span> <span class='ok'>ok</span>"
+            "<template><p style='color:#fff;background:#fff'>inert</p></template>"
+            "</body></html>")
+
+    def test_evidence_and_flag(self):
+        evidence = web_audit.audit_html.__wrapped__(self.PAGE, "https://example.com/a/", parser="html.parser")
+        summary = evidence["contrast"]
+        self.assertEqual(summary["stylesheets"], ["https://example.com/static/site.css"])
+        self.assertEqual((summary["checked"], summary["below_aa"]), (5, 3))
+        self.assertEqual([(w["selector"], w["source"], w["count"]) for w in summary["worst"]],
+                         [("p", "inline", 2), (".muted", "style", 1)])
+        finding = [f for f in evidence["flagged_findings"] if f["wcag"] == "1.4.3"]
+        self.assertEqual(len(finding), 1)
+        self.assertIn("3 of 5", finding[0]["summary"])
+        self.assertIn("1.4.3", {s["wcag_criterion"] for s in evidence["sources"]})
+        self.assertIn("CONTRAST", web_audit.evidence_summary_for_prompt(evidence))
+
+    def test_rules_that_match_nothing_are_only_reported(self):
+        page = ("<html><head><style>.never-used, button:disabled{color:#999;background:#aaa}"
+                "template p, .inert {color:#ccc;background:#fff}</style></head>"
+                "<body><button>Go</button><template><p class='inert'>x</p></template></body></html>")
+        evidence = web_audit.audit_html.__wrapped__(page, "", parser="html.parser")
+        summary = evidence["contrast"]
+        self.assertEqual((summary["checked"], summary["below_aa"]), (0, 0))
+        self.assertEqual(summary["unmatched"]["below_aa"], 2)
+        self.assertNotIn("1.4.3", {f["wcag"] for f in evidence["flagged_findings"]})
+        self.assertIn("match no element", web_audit.evidence_summary_for_prompt(evidence))
+        enabled = web_audit.audit_html.__wrapped__(page.replace("<button>", "<button disabled>"), "",
+                                                   parser="html.parser")
+        self.assertEqual(enabled["contrast"]["below_aa"], 1)
+        self.assertIn("1.4.3", {f["wcag"] for f in enabled["flagged_findings"]})
+
+    def test_selector_matcher(self):
+        matches = contrast.selector_matcher(contrast.inventory(
+            ["html", "body", "a", "input", "p"], ["btn", "a:b"], ["main"], ["href", "type", "class"]))
+        for selector, expected in (("p", True), (".btn:hover", True), ("#main > p::before", True),
+                                   ("body .btn.btn", True), ("a:not(.gone)", True),
+                                   ("input[type='x.y']", True), (".a\\:b", True), ("*", True),
+                                   ("p:nth-child(2n+1)", True), (".gone, a[href]:link", True),
+                                   (".gone", False), ("input:checked", False), ("[data-x]", False),
+                                   ("svg", False), ("main", False), (".btn .gone", False)):
+            self.assertEqual(matches(selector), expected, selector)
+        self.assertIsNone(contrast.selector_matcher(None))
+        self.assertIsNone(contrast.inventory(["p"], [f"c{i}" for i in range(contrast.MAX_INVENTORY_NAMES)],
+                                             [], []))
+
+    def test_stylesheet_results_fold_into_evidence(self):
+        evidence = web_audit.audit_html.__wrapped__(
+            "<html><body><p style='color:#000;background:#fff'>x</p></body></html>", "https://example.com/")
+        self.assertNotIn("1.4.3", {f["wcag"] for f in evidence["flagged_findings"]})
+        tally = contrast.ContrastTally()
+        tally.add_css(".faint { color: #ccc; background: #fff }", "https://example.com/site.css")
+        sheets = dict(tally.summary(), fetched=1, failed=0)
+        combined = web_audit.with_stylesheet_contrast(evidence, sheets)
+        self.assertEqual(combined["contrast"]["below_aa"], 1)
+        self.assertEqual(combined["contrast"]["worst"][0]["source"], "https://example.com/site.css")
+        self.assertIn("1.4.3", {f["wcag"] for f in combined["flagged_findings"]})
+        self.assertNotIn("1.4.3", {f["wcag"] for f in evidence["flagged_findings"]})
+
+    def test_code_audit_reports_ratio(self):
+        css = ".a { color: #777; background: #fff; }\n.b { color: var(--x); background: var(--x); }\n.c { color: #000; background: #fff; }"
+        findings = [f for f in code_audit.audit_code(css, "css")["findings"]
+                    if f["rule_id"] == "color-contrast-suspect"]
+        self.assertEqual([f["line"] for f in findings], [1, 2])
+        self.assertIn("4.48:1", findings[0]["message"])
+
+
+class _CssHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    hits = {}
+    delay = 0.3
+
+    def do_GET(self):
+        _CssHandler.hits[self.path] = _CssHandler.hits.get(self.path, 0) + 1
+        time.sleep(self.delay)
+        if self.path == "/missing.css":
+            body, status = b"not found", 404
+        else:
+            body, status = (".x%s { color: #bbb; background: #fff }" % self.path[1:2]).encode(), 200
+        self.send_response(status)
+        self.send_header("Content-Type", "text/css")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StylesheetFetchTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _CssHandler)
+        cls.server.daemon_threads = True
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        for patcher in (patch("dns_cache.is_blocked_ip", return_value=False),
+                        patch.object(http_cache, "HTTP_CACHE_ENABLED", False)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        http_cache.set_cache(None)
+        dns_cache.clear()
+        http_pool.reset_pool()
+        web_audit._stylesheet_cache.clear()
+        _CssHandler.hits.clear()
+
+    def test_fetched_concurrently_and_cached_by_url(self):
+        urls = [f"{self.base}/{i}.css" for i in range(4)] + [f"{self.base}/missing.css"]
+        started = time.monotonic()
+        result = web_audit.stylesheet_contrast(urls, timeout=5)
+        self.assertLess(time.monotonic() - started, 4 * _CssHandler.delay)
+        self.assertEqual((result["fetched"], result["failed"]), (4, 1))
+        self.assertEqual((result["checked"], result["below_aa"]), (4, 4))
+        self.assertEqual([w["selector"] for w in result["worst"]], [".x0", ".x1", ".x2", ".x3"])
+
+        # Cached rules, matched against each page that links them.
+        page = contrast.inventory(["p"], ["x1"], [], ["class"])
+        again = web_audit.stylesheet_contrast(urls[:4], timeout=5, page_selectors=page)
+        self.assertEqual((again["checked"], again["below_aa"]), (1, 1))
+        self.assertEqual(again["unmatched"]["below_aa"], 3)
+        self.assertEqual(_CssHandler.hits[urls[0][len(self.base):]], 1)
+
+    def test_slow_sheets_count_as_failed(self):
+        with patch.object(_CssHandler, "delay", 1.0):
+            started = time.monotonic()
+            result = web_audit.stylesheet_contrast([f"{self.base}/slow.css"], timeout=0.2)
+        self.assertLess(time.monotonic() - started, 0.8)
+        self.assertEqual((result["fetched"], result["failed"]), (0, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
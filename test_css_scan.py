@@ -0,0 +1,74 @@
+import random
+import time
+import unittest
+
+import code_audit
+import css_scan
+from bench_css_scan import CASES, MAX_MS_PER_KB, legacy_css, scanner_css
+
+_FRAGMENTS = ["a", "a:focus", "button", "*", " ", "\n", "{", "}", ";", ":", "outline", "outline:none",
+              "OUTLINE : 0PX", "outline:0", " none", "box-shadow:0 0 2px", "color:#777", "background:#888",
+              "background-color:#777", "color:red", "@media x", ".x", "/* } */", "-moz-outline:none",
+              "font-size:24px", "var(--a)", "İ", "\t"]
+
+
+class ScanTests(unittest.TestCase):
+    def test_blocks(self):
+        css = "@media x {\n a:focus { outline: none; }\n .b{} }\n}{c"
+        blocks = css_scan.scan(css)
+        self.assertEqual([(css[s:o].strip(), closed, depth) for s, o, _, closed, depth in blocks],
+                         [("@media x", False, 0), ("a:focus", True, 1), (".b", True, 1), ("", False, 0)])
+        _, open_, end, closed, _ = blocks[1]
+        self.assertEqual([css[a:b].strip() for a, b, _ in css_scan.declarations(css, open_, end, closed)],
+                         ["outline: none", ""])
+
+    def test_comments_and_strings(self):
+        css = 'a { content: "}" } /* b { } */ c:focus { x: \'{\' } d { e: "unterminated\n f: 1 }'
+        self.assertEqual([css[s:o].strip() for s, o, _, closed, _ in css_scan.scan(css) if closed],
+                         ["a", "/* b { } */ c:focus", "d"])
+        self.assertEqual(len(css_scan.scan(css, raw=True)), 5)
+        self.assertEqual(css_scan.scan("a { } /* b { }"), [(0, 2, 4, True, 0)])
+
+    def test_declarations(self):
+        css = 'a { background: url(data:x;base64,AA); content: ";"; /* ; */ color: red }'
+        _, open_, end, closed, _ = css_scan.scan(css)[0]
+        self.assertEqual([css[a:b].strip() for a, b, _ in css_scan.declarations(css, open_, end, closed)],
+                         ["background: url(data:x;base64,AA)", 'content: ";"', "/* ; */ color: red"])
+        self.assertEqual(len(css_scan.declarations(css, open_, end, closed, raw=True)), 6)
+
+    def test_rules_media_and_comments(self):
+        css = ("/* a { color: red } */ p, li { color: #000 } "
+               "@media (min-width: 10em) { .x { background: #fff } @supports (color: red) { b { c: d } } } "
+               "} stray { ok: 1 } broken { no-close")
+        self.assertEqual([(sel, body.strip()) for sel, body in css_scan.rules(css)],
+                         [("p, li", "color: #000"), (".x", "background: #fff"),
+                          ("b", "c: d"), ("stray", "ok: 1")])
+        self.assertEqual(css_scan.strip_comments('a/* x */b "/* kept */"'), 'a b "/* kept */"')
+
+    def test_matches_legacy_on_random_css(self):
+        rng = random.Random(23)
+        for _ in range(3000):
+            code = "".join(rng.choice(_FRAGMENTS) for _ in range(rng.randint(1, 25)))
+            with self.subTest(code=code):
+                self.assertEqual(scanner_css(code), legacy_css(code))
+
+    def test_matches_legacy_on_pathological_css(self):
+        for name, build in CASES.items():
+            with self.subTest(case=name):
+                code = build(2048)
+                self.assertEqual(scanner_css(code), legacy_css(code))
+
+    def test_time_per_kilobyte(self):
+        for name, build in CASES.items():
+            code = build(256 * 1024)
+            best = float("inf")
+            for _ in range(3):
+                started = time.perf_counter()
+                code_audit.audit_code.__wrapped__(code, "css")
+                best = min(best, time.perf_counter() - started)
+            with self.subTest(case=name):
+                self.assertLess(best * 1000 / (len(code) / 1024), MAX_MS_PER_KB)
+
+
+if __name__ == "__main__":
+    unittest.main()
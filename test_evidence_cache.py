@@ -0,0 +1,65 @@
+import time
+import unittest
+
+import evidence_cache
+from code_audit import audit_code
+from text_audit import audit_text
+from web_audit import audit_html
+
+HTML = '<html lang="en"><body><img src="a.png"><a href="/">click here</a></body></html>'
+CODE = '<img src="logo.png"><button></button>'
+TEXT = "The committee will utilize a comprehensive methodology. It was decided by the board."
+
+
+class EvidenceCacheTests(unittest.TestCase):
+    def setUp(self):
+        evidence_cache.configure()
+        self.addCleanup(evidence_cache.configure)
+
+    def test_repeat_calls_hit_and_match_uncached(self):
+        for func, args in ((audit_html, (HTML, "https://example.com/")),
+                           (audit_code, (CODE,)), (audit_text, (TEXT,))):
+            with self.subTest(auditor=func.__name__):
+                first = func(*args)
+                second = func(*args)
+                self.assertEqual(first, second)
+                self.assertEqual(second, func.__wrapped__(*args))
+        stats = evidence_cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (3, 3))
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+    def test_options_are_part_of_the_key(self):
+        audit_code(CODE, hint_lang="html")
+        audit_code(CODE, "html")  # same call, positional
+        audit_code(CODE, hint_lang="css")
+        self.assertEqual(evidence_cache.stats()["hits"], 1)
+
+    def test_returned_evidence_is_a_private_copy(self):
+        audit_html(HTML, "")["images"]["total"] = 999
+        self.assertEqual(audit_html(HTML, "")["images"]["total"], 1)
+
+    def test_links_calls_bypass_the_cache(self):
+        links = []
+        audit_html(HTML, "https://example.com/", links=links)
+        audit_html(HTML, "https://example.com/", links=[])
+        self.assertEqual(links, ["https://example.com/"])
+        self.assertEqual(evidence_cache.stats()["misses"], 0)
+
+    def test_lru_and_ttl_eviction(self):
+        cache = evidence_cache.EvidenceCache(max_entries=2, max_bytes=1000, ttl=60)
+        for key in (b"a", b"b", b"c"):
+            cache.put(key, b"x")
+        self.assertIsNone(cache.get(b"a"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+        cache.put(b"big", b"y" * 1000)
+        self.assertEqual(cache.stats()["entries"], 1)
+
+        cache = evidence_cache.EvidenceCache(ttl=0.01)
+        cache.put(b"k", b"v")
+        time.sleep(0.02)
+        self.assertIsNone(cache.get(b"k"))
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import json
+import pickle
+import unittest
+
+import code_audit
+
+PAGE = """<!doctype html>
+<html>
+<body>
+<img src="a.png"><img src="b.png">
+<a href="/more">click here</a>
+</body>
+</html>
+"""
+
+
+class FindingTests(unittest.TestCase):
+    def setUp(self):
+        self.findings = code_audit.audit_code.__wrapped__(PAGE, "html")["findings"]
+        self.assertTrue(self.findings)
+
+    def test_reads_like_the_dict_it_stands_for(self):
+        for finding in self.findings:
+            as_dict = finding.to_dict()
+            self.assertEqual(finding, as_dict)
+            self.assertEqual(dict(finding), as_dict)
+            self.assertEqual(list(as_dict), ["rule_id", "severity", "wcag_criterion",
+                                             "line", "message", "snippet"])
+            self.assertEqual(finding["severity"], code_audit._SEVERITY[finding["rule_id"]])
+            self.assertIsNone(finding.get("path"))
+            self.assertNotIn("path", finding)
+            with self.assertRaises(KeyError):
+                finding["path"]
+
+    def test_same_line_findings_share_the_snippet(self):
+        first_line = [f for f in self.findings if f["line"] == 1]
+        self.assertGreater(len(first_line), 1)
+        for finding in first_line[1:]:
+            self.assertIs(finding.snippet, first_line[0].snippet)
+
+    def test_pickle_round_trip(self):
+        restored = pickle.loads(pickle.dumps(self.findings))
+        self.assertEqual(restored, self.findings)
+        self.assertIsInstance(restored[0], code_audit.Finding)
+
+    def test_json_at_the_boundary(self):
+        evidence = {"findings": self.findings}
+        with self.assertRaises(TypeError):
+            json.dumps(evidence)
+        dumped = json.loads(json.dumps(evidence, default=code_audit.json_default))
+        self.assertEqual(dumped["findings"], [f.to_dict() for f in self.findings])
+
+    def test_flask_responses_serialize_findings(self):
+        import app
+
+        with app.app.test_request_context():
+            body = app.jsonify({"findings": self.findings}).get_json()
+        self.assertEqual(body["findings"], [f.to_dict() for f in self.findings])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+import json
+import tracemalloc
+import unittest
+
+import html_parsers
+import web_audit
+from bench_web_audit import corpus, synthetic_page
+
+
+# Well-formed snippets every backend must read identically; malformed markup
+# is left out on purpose (HTML5 parsers repair it the way browsers do).
+SNIPPETS = {
+    "doctype": "<!DOCTYPE html><html lang=\"en\"><head><title> T </title></head><body><p>x</p></body></html>",
+    "no_doctype": "<html><head><meta charset=\"utf-8\"></head><body><h2>Skip</h2></body></html>",
+    "entities": "<body><a href=\"/\">Fish &amp; chips</a><button>&lt;ok&gt;</button></body>",
+    "forms": (
+        "<body><form><label>Name <input id=\"n\"></label><input id=\"e\" type=\"email\">"
+        "<label for=\"e\">E</label><input type=\"checkbox\" checked></form></body>"
+    ),
+    "links": (
+        "<body><a href=\"#main\" class=\"skip  link\">Skip to content</a>"
+        "<a href=\"/x\" target=\"_blank\" rel=\"noopener noreferrer\">go</a>"
+        "<a href=\"/y\" target=\"_blank\">here</a><main id=\"main\"></main></body>"
+    ),
+}
+
+
+def _evidence(html, parser):
+    return json.dumps(web_audit.audit_html(html, "https://example.com/", parser=parser))
+
+
+class BackendConformanceTests(unittest.TestCase):
+    def _pages(self):
+        for name, html in corpus():
+            if not name.startswith("synthetic-"):
+                yield name, html
+        yield "synthetic-32KB", synthetic_page(32 * 1024)
+        yield from SNIPPETS.items()
+
+    def test_backends_match_html_parser(self):
+        for backend in html_parsers.BACKENDS:
+            if backend == "html.parser":
+                continue
+            if not html_parsers.BACKENDS[backend].available():
+                continue
+            for name, html in self._pages():
+                with self.subTest(backend=backend, page=name):
+                    self.assertEqual(_evidence(html, backend), _evidence(html, "html.parser"))
+
+    def test_stripped_subtrees_are_skipped(self):
+        html = "<body><button><script>x()</script></button><noscript><img src=\"a\"></noscript></body>"
+        for backend in html_parsers.available_backends():
+            with self.subTest(backend=backend):
+                evidence = web_audit.audit_html(html, "", parser=backend)
+                self.assertEqual(evidence["images"]["total"], 0)
+                self.assertEqual(evidence["buttons"]["no_accessible_name"], 1)
+
+
+# Malformed markup: the incremental html.parser path must repeat
+# BeautifulSoup's tree-building quirks exactly.
+MALFORMED = {
+    "stray_end_tags": "<body></span><p>a</div>b</p></p><h1>t</h2></h1></body>",
+    "unclosed": "<html><body><main><a href=\"/\">x<button>y",
+    "void_closers": "<body><img src=\"a\"></img><br/><br></br><input></input><p/>z</body>",
+    "whitespace": "<body>\n  \t<pre>  \n </pre><a href=\"/\">  </a>\n</body>",
+    "declarations": "<?php echo 1 ?><!DOCTYPE html><body><![CDATA[x]]>a<!-- c -->b</body>",
+    "charrefs": "<body><a href=\"/\">&#147;q&#8221; &amp &nbsp;&bogus; &#x41;</a></body>",
+    "dup_attrs": "<body><img alt=\"\" alt=\"Logo\" class=\"a  b\" class=\"c\" src=x></body>",
+}
+
+
+def _streamed(html, backend, chunk_size, encoding="utf-8"):
+    walk = web_audit._DomWalk()
+    parser = html_parsers.get_backend(backend).open(walk, encoding)
+    data = html.encode(encoding)
+    for i in range(0, len(data), chunk_size):
+        parser.feed(data[i:i + chunk_size])
+    parser.close()
+    return json.dumps(web_audit._build_evidence(walk, "https://example.com/"))
+
+
+class IncrementalParserTests(unittest.TestCase):
+    def _incremental_backends(self):
+        return [b for b in html_parsers.available_backends() if html_parsers.BACKENDS[b].incremental]
+
+    def test_chunked_parse_matches_whole_document(self):
+        pages = dict(BackendConformanceTests._pages(self))
+        for backend in self._incremental_backends():
+            for name, html in pages.items():
+                for chunk_size in (7, 4096):
+                    with self.subTest(backend=backend, page=name, chunk=chunk_size):
+                        self.assertEqual(_streamed(html, backend, chunk_size), _evidence(html, backend))
+
+    def test_html_parser_matches_beautifulsoup_on_malformed_markup(self):
+        for name, html in MALFORMED.items():
+            with self.subTest(page=name):
+                self.assertEqual(_streamed(html, "html.parser", 3), _evidence(html, "html.parser"))
+
+    def test_multibyte_characters_split_across_chunks(self):
+        html = "<html lang=\"fr\"><head><title>Caf\u00e9 \u2014 men\u00fc</title></head><body></body></html>"
+        for encoding in ("utf-8", "utf-16"):
+            evidence = json.loads(_streamed(html, "html.parser", 1, encoding=encoding))
+            self.assertEqual(evidence["page"]["title"], "Caf\u00e9 \u2014 men\u00fc")
+
+    @unittest.skipUnless(html_parsers.BACKENDS["selectolax"].available(), "selectolax not installed")
+    def test_selectolax_falls_back_to_an_incremental_backend(self):
+        self.assertTrue(html_parsers.get_incremental("selectolax").incremental)
+
+
+class LowMemoryTests(unittest.TestCase):
+    def test_low_memory_matches_tree_audit(self):
+        pages = dict(BackendConformanceTests._pages(self))
+        pages.update(MALFORMED)
+        for backend in ("html.parser", "lxml"):
+            if not html_parsers.BACKENDS[backend].available():
+                continue
+            for name, html in pages.items():
+                if backend == "lxml" and name in MALFORMED:
+                    continue
+                with self.subTest(backend=backend, page=name):
+                    low = web_audit.audit_html.__wrapped__(html, "", parser=backend, low_memory=True)
+                    tree = web_audit.audit_html.__wrapped__(html, "", parser=backend, low_memory=False)
+                    self.assertEqual(low, tree)
+
+    def test_large_pages_skip_the_tree(self):
+        html = synthetic_page(web_audit.AUDIT_LOW_MEMORY_BYTES)
+        peaks = []
+        for low_memory in (False, None):
+            tracemalloc.start()
+            web_audit.audit_html.__wrapped__(html, "", parser="html.parser", low_memory=low_memory)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        self.assertLess(peaks[1] * 5, peaks[0])
+
+
+class GetBackendTests(unittest.TestCase):
+    def test_default_is_available(self):
+        self.assertTrue(html_parsers.get_backend().available())
+        self.assertIn(html_parsers.get_backend().name, html_parsers.available_backends())
+
+    def test_unknown_backend_raises(self):
+        with self.assertRaises(ValueError):
+            html_parsers.get_backend("html5lib-but-faster")
+
+    def test_html_parser_always_available(self):
+        self.assertEqual(html_parsers.get_backend("html.parser").name, "html.parser")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,197 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import dns_cache
+import http_cache
+import http_pool
+import web_audit
+
+PAGE = b"<html><body><h1>cached</h1>" + b"<p>filler</p>" * 2000 + b"</body></html>"
+BIG_PAGE = (b"<html lang='en'><head><title>Big</title></head><body><main>"
+            + b"<section><h2>Part</h2><p>Some text <a href='/x'>read more</a></p><img src='a.png'></section>" * 4000
+            + b"</main></body></html>")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    hits = {}
+
+    def do_GET(self):
+        _Handler.hits[self.path] = _Handler.hits.get(self.path, 0) + 1
+        headers = {"Content-Type": "text/html; charset=utf-8"}
+        if self.path == "/etag":
+            headers["ETag"] = '"v1"'
+            if self.headers.get("If-None-Match") == '"v1"':
+                return self._reply(304, headers, b"")
+        elif self.path == "/modified":
+            headers["Last-Modified"] = "Wed, 01 Jan 2025 00:00:00 GMT"
+            if self.headers.get("If-Modified-Since") == headers["Last-Modified"]:
+                return self._reply(304, headers, b"")
+        elif self.path == "/max-age":
+            headers["Cache-Control"] = "public, max-age=3600"
+        elif self.path == "/no-store":
+            headers["ETag"] = '"v1"'
+            headers["Cache-Control"] = "no-store"
+        elif self.path == "/big":
+            headers["ETag"] = '"big"'
+            return self._reply(200, headers, BIG_PAGE)
+        self._reply(200, headers, PAGE)
+
+    def _reply(self, status, headers, body):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FetchPageCacheTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        cls.server.daemon_threads = True
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        http_cache.set_cache(None)
+
+    def setUp(self):
+        patcher = patch("dns_cache.is_blocked_ip", return_value=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        dns_cache.clear()
+        http_pool.reset_pool()
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.cache = http_cache.HttpCache(self.dir, max_bytes=1024 * 1024)
+        http_cache.set_cache(self.cache)
+        _Handler.hits.clear()
+
+    def test_304_is_served_from_cache(self):
+        for path in ("/etag", "/modified"):
+            with self.subTest(path=path):
+                first = web_audit.fetch_page(self.base + path)
+                second = web_audit.fetch_page(self.base + path)
+                self.assertEqual(first["cache"], "miss")
+                self.assertEqual(second["cache"], "revalidated")
+                self.assertEqual(second["html"], first["html"])
+                self.assertEqual(second["status"], 200)
+                self.assertEqual(_Handler.hits[path], 2)
+        stats = self.cache.stats()
+        self.assertEqual((stats["misses"], stats["revalidated"], stats["stores"]), (2, 2, 2))
+        self.assertEqual(stats["bytes_saved"], 2 * len(PAGE))
+
+    def test_fresh_entries_skip_the_network(self):
+        web_audit.fetch_page(self.base + "/max-age")
+        page = web_audit.fetch_page(self.base + "/max-age")
+        self.assertEqual(page["cache"], "hit")
+        self.assertIn("<h1>cached</h1>", page["html"])
+        self.assertEqual(_Handler.hits["/max-age"], 1)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_no_store_and_unvalidated_responses_are_not_cached(self):
+        for path in ("/no-store", "/plain"):
+            web_audit.fetch_page(self.base + path)
+            self.assertEqual(web_audit.fetch_page(self.base + path)["cache"], "miss")
+        self.assertEqual(self.cache.stats()["stores"], 0)
+
+    def test_lru_eviction_keeps_size_bounded(self):
+        cache = http_cache.HttpCache(os.path.join(self.dir, "small"), max_bytes=3 * len(PAGE))
+        for i in range(5):
+            cache.put(f"https://example.com/{i}", {"status": 200}, PAGE)
+            if i == 0:
+                continue
+            cache.get("https://example.com/0")  # keep the first one hot
+        self.assertLessEqual(cache.stats()["size_bytes"], 3 * len(PAGE))
+        self.assertGreater(cache.stats()["evictions"], 0)
+        self.assertIsNotNone(cache.get("https://example.com/0"))
+        self.assertIsNone(cache.get("https://example.com/1"))
+        self.assertIsNotNone(cache.get("https://example.com/4"))
+
+    def test_only_a_private_directory_is_used(self):
+        with patch("http_cache.HTTP_CACHE_DIR", ""):
+            http_cache.set_cache(None)
+            self.assertIsNone(http_cache.get_cache())
+        http_cache.set_cache(self.cache)
+        created = os.path.join(self.dir, "new")
+        http_cache.HttpCache(created)
+        self.assertEqual(os.stat(created).st_mode & 0o077, 0)
+        shared = os.path.join(self.dir, "shared")
+        os.mkdir(shared)
+        os.chmod(shared, 0o777)
+        with self.assertRaises(PermissionError):
+            http_cache.HttpCache(shared)
+        with patch("os.getuid", return_value=os.getuid() + 1):
+            with self.assertRaises(PermissionError):
+                http_cache.HttpCache(created)
+
+    def test_stale_temp_files_are_swept(self):
+        cache = http_cache.HttpCache(os.path.join(self.dir, "sweep"), max_bytes=3 * len(PAGE))
+        stale = os.path.join(cache.directory, "dead.tmp")
+        live = os.path.join(cache.directory, "live.tmp")
+        for path in (stale, live):
+            with open(path, "wb") as fh:
+                fh.write(PAGE)
+        old = time.time() - 2 * http_cache._STALE_TMP_SECONDS
+        os.utime(stale, (old, old))
+        for i in range(5):
+            cache.put(f"https://example.com/{i}", {"status": 200}, PAGE)
+        self.assertFalse(os.path.exists(stale))
+        self.assertTrue(os.path.exists(live))
+        os.utime(live, (old, old))
+        http_cache.HttpCache(cache.directory)
+        self.assertFalse(os.path.exists(live))
+
+    def test_fetch_and_audit_streams_the_same_evidence(self):
+        self.cache.max_bytes = 8 * 1024 * 1024
+        url = self.base + "/big"
+        expected = web_audit.audit_html.__wrapped__(BIG_PAGE.decode(), "", parser="html.parser")
+        first = web_audit.fetch_and_audit(url, parser="html.parser")
+        entry = self.cache.get(url)
+        entry.meta["fresh_until"] = time.time() + 60
+        self.cache.refresh(entry)
+        second = web_audit.fetch_and_audit(url, parser="html.parser")
+        for page, cache_status in ((first, "miss"), (second, "hit")):
+            with self.subTest(cache=cache_status):
+                self.assertEqual(page["cache"], cache_status)
+                self.assertNotIn("html", page)
+                self.assertEqual(page["evidence"], expected)
+                self.assertEqual(page["content_length"], len(BIG_PAGE))
+
+    def test_streaming_holds_no_copy_of_the_page(self):
+        http_cache.set_cache(None)
+        self.addCleanup(http_cache.set_cache, self.cache)
+        with patch("http_cache.HTTP_CACHE_ENABLED", False):
+            web_audit.fetch_and_audit(self.base + "/big")  # warm the connection pool
+            peaks = {}
+            for name, run in (
+                ("buffered", lambda: web_audit.audit_html.__wrapped__(
+                    web_audit.fetch_page(self.base + "/big")["html"], "")),
+                ("streamed", lambda: web_audit.fetch_and_audit(self.base + "/big")),
+            ):
+                tracemalloc.start()
+                run()
+                peaks[name] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+        # No page bytes, decoded copy or tree are held; what remains is the
+        # walk's per-element signals.
+        self.assertLess(peaks["streamed"] * 3, peaks["buffered"])
+
+
+if __name__ == "__main__":
+    unittest.main()
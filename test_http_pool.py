@@ -0,0 +1,189 @@
+import socket
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import dns_cache
+import http_pool
+import web_audit
+
+_real_getaddrinfo = socket.getaddrinfo
+
+
+def _fake_getaddrinfo(host, *args, **kwargs):
+    if host == "pinned.test":
+        return _real_getaddrinfo("127.0.0.1", *args, **kwargs)
+    return _real_getaddrinfo(host, *args, **kwargs)
+
+
+def _only_10_blocked(ip):
+    return ip.startswith("10.")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_GET(self):
+        if self.path == "/to-private":
+            self.send_response(302)
+            self.send_header("Location", "http://10.0.0.7/admin")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path == "/host":
+            body = self.headers.get("Host", "").encode()
+        elif self.path == "/slow":
+            time.sleep(1.0)
+        elif self.path == "/big":
+            body = b"x" * (web_audit.MAX_RESPONSE_BYTES + 100 * 1024)
+        else:
+            body = b"<html><body><h1>ok</h1></body></html>"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass  # clients abandoning /big or /slow mid-response is expected
+
+
+class ConnectionPoolTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = _QuietServer(("127.0.0.1", 0), _Handler)
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    def setUp(self):
+        # The fixture server is on loopback; only 10.x stays blocked here.
+        patcher = patch("dns_cache.is_blocked_ip", side_effect=_only_10_blocked)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        dns_cache.clear()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        http_pool.reset_pool()
+
+    def _read(self, pool, path, timeout=5):
+        url = path if path.startswith("http") else self.base + path
+        resp = pool.get(url, {}, timeout)
+        try:
+            return b"".join(resp.iter_bytes())
+        finally:
+            resp.close()
+
+    def test_connections_are_reused(self):
+        for http2 in (False, True):
+            with self.subTest(http2=http2):
+                pool = http_pool.reset_pool(http2=http2)
+                for _ in range(3):
+                    self.assertIn(b"<h1>ok</h1>", self._read(pool, "/"))
+                snapshot = pool.stats.snapshot()
+                self.assertEqual(snapshot["requests"], 3)
+                self.assertEqual(snapshot["connections_opened"], 1)
+                self.assertEqual(snapshot["connections_reused"], 2)
+
+    def test_errors_map_to_fetch_error_kinds(self):
+        for http2 in (False, True):
+            pool = http_pool.reset_pool(http2=http2)
+            with self.subTest(http2=http2, kind="timeout"):
+                with self.assertRaises(http_pool.FetchError) as ctx:
+                    self._read(pool, "/slow", timeout=0.2)
+                self.assertEqual(ctx.exception.kind, "timeout")
+            with self.subTest(http2=http2, kind="connection"):
+                with self.assertRaises(http_pool.FetchError) as ctx:
+                    pool.get("http://127.0.0.1:1/", {}, 2)
+                self.assertEqual(ctx.exception.kind, "connection")
+
+    def test_fetch_page_keeps_size_cap(self):
+        http_pool.reset_pool()
+        page = web_audit.fetch_page(self.base + "/big")
+        self.assertTrue(page["ok"])
+        self.assertTrue(page["truncated"])
+        self.assertLessEqual(page["content_length"], web_audit.MAX_RESPONSE_BYTES + 64 * 1024)
+
+    def test_fetch_page_still_refuses_private_hosts(self):
+        patch.stopall()
+        dns_cache.clear()
+        page = web_audit.fetch_page(self.base + "/")
+        self.assertFalse(page["ok"])
+        self.assertEqual(page["error_kind"], "private_host")
+
+    def test_redirect_hops_are_checked(self):
+        for http2 in (False, True):
+            with self.subTest(http2=http2):
+                http_pool.reset_pool(http2=http2)
+                page = web_audit.fetch_page(self.base + "/to-private")
+                self.assertFalse(page["ok"])
+                self.assertEqual(page["error_kind"], "private_host")
+                self.assertIn("10.0.0.7", page["error"])
+
+    def test_connection_is_pinned_to_the_checked_ip(self):
+        port = self.server.server_address[1]
+        for http2 in (False, True):
+            with self.subTest(http2=http2):
+                dns_cache.clear()
+                pool = http_pool.reset_pool(http2=http2)
+                with patch("socket.getaddrinfo", side_effect=_fake_getaddrinfo) as gai:
+                    body = self._read(pool, f"http://pinned.test:{port}/host")
+                    self._read(pool, f"http://pinned.test:{port}/host")
+                self.assertEqual(body, f"pinned.test:{port}".encode())
+                lookups = [c for c in gai.call_args_list if c.args[0] == "pinned.test"]
+                self.assertEqual(len(lookups), 1)
+
+
+class DnsCacheTests(unittest.TestCase):
+    def test_lookups_are_cached(self):
+        resolver = dns_cache.Resolver(ttl=60)
+        with patch("socket.getaddrinfo", return_value=[(2, 1, 6, "", ("93.184.216.34", 0))]) as gai:
+            self.assertEqual(resolver.resolve("example.com"), "93.184.216.34")
+            self.assertEqual(resolver.resolve("EXAMPLE.com."), "93.184.216.34")
+        self.assertEqual(gai.call_count, 1)
+        self.assertEqual(resolver.stats()["hits"], 1)
+
+    def test_entries_expire(self):
+        resolver = dns_cache.Resolver(ttl=0)
+        with patch("socket.getaddrinfo", return_value=[(2, 1, 6, "", ("93.184.216.34", 0))]) as gai:
+            resolver.resolve("example.com")
+            resolver.resolve("example.com")
+        self.assertEqual(gai.call_count, 2)
+
+    def test_any_private_address_blocks(self):
+        resolver = dns_cache.Resolver()
+        answers = [(2, 1, 6, "", ("93.184.216.34", 0)), (2, 1, 6, "", ("192.168.1.5", 0))]
+        with patch("socket.getaddrinfo", return_value=answers):
+            with self.assertRaises(dns_cache.BlockedHostError):
+                resolver.resolve("mixed.example")
+        for literal in ("127.0.0.1", "::1", "169.254.169.254", "::ffff:10.0.0.1"):
+            with self.subTest(ip=literal), self.assertRaises(dns_cache.BlockedHostError):
+                resolver.resolve(literal)
+
+    def test_unresolvable_is_blocked(self):
+        resolver = dns_cache.Resolver()
+        with patch("socket.getaddrinfo", side_effect=socket.gaierror("nope")):
+            with self.assertRaises(dns_cache.BlockedHostError):
+                resolver.resolve("no-such-host.invalid")
+
+    def test_size_bound(self):
+        resolver = dns_cache.Resolver(max_size=2)
+        with patch("socket.getaddrinfo", return_value=[(2, 1, 6, "", ("93.184.216.34", 0))]):
+            for host in ("a.example", "b.example", "c.example"):
+                resolver.resolve(host)
+        self.assertEqual(resolver.stats()["entries"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+from unittest.mock import patch
+
+import memory_budget
+import web_audit
+from bench_web_audit import synthetic_page
+
+
+class MemoryBudgetTests(unittest.TestCase):
+    def test_rss_readings(self):
+        self.assertGreater(memory_budget.rss_bytes(), 0)
+        self.assertGreaterEqual(memory_budget.peak_rss_bytes(), memory_budget.rss_bytes())
+
+    def test_growth_past_the_ceiling_raises(self):
+        budget = memory_budget.MemoryBudget(limit_mb=8)
+        budget.check()
+        ballast = bytearray(32 * 1024 * 1024)
+        with self.assertRaises(memory_budget.MemoryLimitExceeded):
+            budget.check()
+        self.assertGreaterEqual(budget.growth, 24 * 1024 * 1024)
+        del ballast
+
+    def test_zero_disables_the_ceiling(self):
+        budget = memory_budget.MemoryBudget(limit_mb=0)
+        ballast = bytearray(32 * 1024 * 1024)
+        budget.check()
+        del ballast
+
+    def test_audit_stops_at_the_ceiling(self):
+        html = synthetic_page(web_audit.AUDIT_LOW_MEMORY_BYTES)
+        with patch.object(memory_budget, "AUDIT_MAX_MEMORY_MB", 1e-6), \
+                patch.object(memory_budget, "rss_bytes", side_effect=range(0, 1 << 40, 1 << 20)):
+            with self.assertRaises(memory_budget.MemoryLimitExceeded):
+                web_audit.audit_html.__wrapped__(html, "")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+import base64
+import io
+import unittest
+from unittest.mock import patch
+
+import audit_executor
+import code_audit
+import prompt_budget
+import text_audit
+import web_audit
+from prompt_budget import Packer, estimate_tokens, group_duplicates, truncate_to_tokens
+
+
+class EstimateTests(unittest.TestCase):
+    def test_rough_scale(self):
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertEqual(estimate_tokens("the cat sat on the mat"), 6)
+        self.assertEqual(estimate_tokens("1234567"), 3)
+        self.assertEqual(estimate_tokens("accessibility"), 3)
+        self.assertEqual(estimate_tokens("----------------"), 2)
+        self.assertEqual(estimate_tokens("日本語"), 3)
+        prose = "Every image needs a text alternative that serves the same purpose. " * 20
+        self.assertLess(abs(estimate_tokens(prose) - len(prose) / 4), len(prose) / 16)
+
+
+class PackerTests(unittest.TestCase):
+    def _packer(self, budget):
+        out = Packer(budget)
+        out.require("HEADER")
+        for i in range(10):
+            out.add(f"  low {i}", priority=0, group="low")
+        out.add("  important", priority=5, group="high")
+        out.require("FOOTER")
+        return out
+
+    def test_everything_fits(self):
+        packed = self._packer(10_000).render()
+        self.assertEqual(packed.dropped, 0)
+        self.assertEqual(packed.count("\n"), 12)
+        self.assertEqual(packed.tokens, estimate_tokens(packed))
+
+    def test_priority_wins_and_order_is_kept(self):
+        packed = self._packer(30).render()
+        lines = packed.split("\n")
+        self.assertLessEqual(packed.tokens, 30)
+        self.assertEqual((lines[0], lines[-1], lines[-2]), ("HEADER", "FOOTER", "  important"))
+        kept_low = [line for line in lines if line.startswith("  low")]
+        self.assertEqual(kept_low, [f"  low {i}" for i in range(len(kept_low))])
+        self.assertIn(f"  … {10 - len(kept_low)} more not shown", lines)
+        self.assertEqual(packed.dropped, 10 - len(kept_low))
+
+    def test_required_lines_survive_a_tiny_budget(self):
+        packed = self._packer(1).render()
+        self.assertTrue(packed.startswith("HEADER\n"))
+        self.assertTrue(packed.endswith("FOOTER"))
+        self.assertEqual(packed.dropped, 11)
+
+
+class HelperTests(unittest.TestCase):
+    def test_truncate_at_line_boundary(self):
+        text = "\n".join(f"line number {i}" for i in range(100))
+        self.assertEqual(truncate_to_tokens(text, 10_000), (text, False))
+        cut, truncated = truncate_to_tokens(text, 50)
+        self.assertTrue(truncated)
+        self.assertLessEqual(estimate_tokens(cut), 50)
+        *kept, note = cut.split("\n")
+        self.assertEqual(kept, [f"line number {i}" for i in range(len(kept))])
+        self.assertEqual(note, f"… ({100 - len(kept)} more lines not shown)")
+
+    def test_group_duplicates(self):
+        groups = group_duplicates(["b1", "a1", "b2", "c1", "a2"], key=lambda s: s[0])
+        self.assertEqual(groups, [("b1", ["b1", "b2"]), ("a1", ["a1", "a2"]), ("c1", ["c1"])])
+
+    def test_share_budget_keeps_room_for_evidence(self):
+        seen = []
+        summary, text, truncated = prompt_budget.share_budget(
+            100, lambda n: seen.append(n) or "summary", "word " * 1000)
+        self.assertEqual(seen, [40])
+        self.assertTrue(truncated)
+        self.assertLessEqual(estimate_tokens(text), 100 - estimate_tokens(summary))
+
+
+class SummaryTests(unittest.TestCase):
+    def test_code_findings_grouped_and_most_severe_first(self):
+        code = "\n".join(['<img src="a.png">'] * 30 + ['<input type="text">'] * 3)
+        evidence = code_audit.audit_code(code, "html")
+        summary = code_audit.evidence_summary_for_prompt(evidence)
+        findings = [line for line in summary.split("\n") if " @ L" in line]
+        self.assertEqual(len(findings), len({(f["rule_id"], f["message"]) for f in evidence["findings"]}))
+        self.assertIn("(30×)", summary)
+        ranks = [code_audit._SEVERITY_RANK[line.split(" — ")[1]] for line in findings]
+        self.assertEqual(ranks, sorted(ranks, reverse=True))
+
+    def test_code_summary_drops_low_severity_first(self):
+        code = "\n".join(f'<img src="{i}.png"><a href="#">click here</a>' for i in range(200))
+        evidence = code_audit.audit_code(code, "html")
+        full = code_audit.evidence_summary_for_prompt(evidence, max_tokens=100_000)
+        tight = code_audit.evidence_summary_for_prompt(evidence, max_tokens=full.tokens // 2)
+        self.assertLessEqual(tight.tokens, full.tokens // 2)
+        self.assertGreater(tight.dropped, 0)
+        self.assertIn("more not shown", tight)
+
+    def test_web_summary_respects_budget(self):
+        page = "<html><body>" + "".join(f'<img src="{i}.png">' for i in range(40)) + "</body></html>"
+        evidence = web_audit.audit_html.__wrapped__(page, "https://example.com/", parser="html.parser")
+        full = web_audit.evidence_summary_for_prompt(evidence, max_tokens=100_000)
+        tight = web_audit.evidence_summary_for_prompt(evidence, max_tokens=full.tokens - 20)
+        self.assertLessEqual(tight.tokens, full.tokens - 20)
+        self.assertIn("PRE-FLAGGED FINDINGS", tight)
+
+    def test_default_budget_comes_from_config(self):
+        evidence = text_audit.audit_text("The utilization of synergies facilitates paradigm shifts. " * 30)
+        with patch.object(prompt_budget, "PROMPT_TOKENS_SIMPLIFY", 5):
+            small = text_audit.evidence_summary_for_prompt(evidence)
+        self.assertLessEqual(small.tokens, text_audit.evidence_summary_for_prompt(evidence).tokens)
+        self.assertIn("READABILITY ANALYSIS", small)
+
+
+@patch("ai_client.is_configured", return_value=False)
+class AltTextPromptTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        audit_executor.set_executor(audit_executor.AuditExecutor(workers=0))
+
+    @classmethod
+    def tearDownClass(cls):
+        audit_executor.set_executor(None)
+
+    def setUp(self):
+        import app as app_module
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new("RGB", (40, 30), "#336699").save(buffer, "PNG")
+        self.image = "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+        self.client = app_module.app.test_client()
+
+    def _prompt_tokens(self, **body):
+        return self.client.post("/api/alt-text", json=dict(image=self.image, **body)).get_json()["prompt_tokens"]
+
+    def test_short_context_is_not_truncated(self, _configured):
+        self.assertFalse(self._prompt_tokens(context="A product photo")["truncated"])
+
+    def test_long_context_is_cut_to_the_budget(self, _configured):
+        tokens = self._prompt_tokens(context="A very long caption. " * 2000)
+        self.assertTrue(tokens["truncated"])
+        self.assertLessEqual(tokens["estimated"], tokens["budget"])
+
+
+if __name__ == "__main__":
+    unittest.main()
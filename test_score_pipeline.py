@@ -0,0 +1,251 @@
+import json
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import app as app_module
+import audit_executor
+import memory_budget
+import score_pipeline
+import web_audit
+
+PAGE = ('<!DOCTYPE html><html><head><title></title></head><body>'
+        '<img src="a.png"><h1>Hi</h1><a href="/x">click here</a></body></html>')
+
+
+def setUpModule():
+    # Audit inline: the timing tests must not wait for worker processes to spawn.
+    audit_executor.set_executor(audit_executor.AuditExecutor(workers=0))
+
+
+def tearDownModule():
+    audit_executor.set_executor(None)
+
+
+def _fetched(url, timeout=None):
+    return {"ok": True, "url": url, "final_url": url, "status": 200, "html": PAGE}
+
+
+@patch("web_audit.fetch_page", side_effect=_fetched)
+class ScoreEndpointTests(unittest.TestCase):
+    def setUp(self):
+        self.client = app_module.app.test_client()
+
+    def _post(self, **body):
+        return self.client.post("/api/score", json=body)
+
+    def test_validation_errors(self, _fetch):
+        self.assertEqual(self.client.open("/api/score", method="OPTIONS").get_json()["status"], "ok")
+        non_json = self.client.post("/api/score", data="url=x", content_type="text/plain")
+        self.assertEqual(non_json.status_code, 400)
+        self.assertIn("Content-Type", non_json.get_json()["error"])
+        bad_json = self.client.post("/api/score", data="{", content_type="application/json")
+        self.assertEqual(bad_json.get_json()["error"], "Invalid JSON format")
+        no_url = self._post(url=" ")
+        self.assertEqual((no_url.status_code, no_url.get_json()["error"]), (400, "No URL provided"))
+
+    def test_fetch_errors_map_to_status(self, fetch):
+        for kind, status in (("private_host", 400), ("connection", 502), ("timeout", 504)):
+            fetch.side_effect = lambda url, timeout=None, kind=kind: {
+                "ok": False, "url": url, "error_kind": kind, "error": "nope"}
+            response = self._post(url="https://example.com/")
+            self.assertEqual(response.status_code, status, kind)
+            self.assertEqual(response.get_json()["error_kind"], kind)
+
+    @patch("audit_executor.run", side_effect=memory_budget.MemoryLimitExceeded("too big"))
+    def test_page_over_memory_ceiling_is_422(self, _run, _fetch):
+        response = self._post(url="https://example.com/")
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(response.get_json()["error_kind"], "audit_memory")
+
+    def test_audit_failures_map_to_status(self, _fetch):
+        for error, status, kind in ((audit_executor.AuditTimeout("slow"), 504, "audit_timeout"),
+                                    (audit_executor.AuditCrashed("died"), 503, "audit_crashed")):
+            with patch("audit_executor.run", side_effect=error):
+                response = self._post(url="https://example.com/")
+            self.assertEqual(response.status_code, status, kind)
+            self.assertEqual(response.get_json()["error_kind"], kind)
+
+    @patch("ai_client.is_configured", return_value=False)
+    def test_deterministic_fallback_without_ai(self, _configured, _fetch):
+        payload = self._post(url="https://example.com/").get_json()
+        self.assertTrue(payload["success"])
+        self.assertEqual(payload["score"], payload["deterministic_score"])
+        non_compliant = {c["code"] for c in payload["wcag_standards"]["non_compliant"]}
+        self.assertTrue({"1.1.1", "2.4.2", "3.1.1", "2.4.4"} <= non_compliant)
+        compliant = {c["code"] for c in payload["wcag_standards"]["compliant"]}
+        self.assertFalse(compliant & non_compliant)
+        self.assertEqual(set(payload["recommendations"]), {"short_term", "medium_term", "long_term"})
+        self.assertTrue(payload["pipeline"]["degraded"])
+        self.assertEqual(payload["pipeline"]["fallback_reason"], "ai_not_configured")
+        self.assertEqual([s["name"] for s in payload["pipeline"]["stages"]],
+                         ["fetch", "audit", "styles", "prompt", "llm", "merge"])
+        self.assertEqual(payload["pipeline"]["stages"][2]["status"], "skipped")
+
+    @patch("ai_client.is_configured", return_value=False)
+    def test_linked_stylesheets_feed_contrast_evidence(self, _configured, fetch):
+        fetch.side_effect = lambda url, timeout=None: dict(
+            _fetched(url), html=PAGE.replace("<title>", "<link rel='stylesheet' href='/s.css'><title>"))
+        sheets = {"pairs": 1, "checked": 1, "below_aa": 1, "unparsed": 0, "fetched": 1, "failed": 0,
+                  "worst": [{"selector": ".x", "color": "#ccc", "background": "#fff", "ratio": 1.6,
+                             "large_text": False, "source": "https://example.com/s.css", "count": 1}],
+                  "unmatched": {"pairs": 0, "checked": 0, "below_aa": 0, "unparsed": 0, "worst": []}}
+        with patch("web_audit.stylesheet_contrast", return_value=sheets) as loaded:
+            payload = score_pipeline.run("https://example.com/")
+        loaded.assert_called_once()
+        self.assertEqual(loaded.call_args.args[0], ["https://example.com/s.css"])
+        self.assertIn("img", loaded.call_args.kwargs["page_selectors"]["tags"])
+        styles = payload["pipeline"]["stages"][2]
+        self.assertEqual((styles["name"], styles["status"], styles["fetched"]), ("styles", "ok", 1))
+        self.assertIn("1.4.3", {c["code"] for c in payload["wcag_standards"]["non_compliant"]})
+        self.assertEqual(payload["evidence"]["contrast"]["stylesheets_fetched"], 1)
+
+    @patch("ai_client.is_configured", return_value=False)
+    def test_slow_stylesheets_do_not_hold_up_the_score(self, _configured, fetch):
+        fetch.side_effect = lambda url, timeout=None: dict(
+            _fetched(url), html=PAGE.replace("<title>", "<link rel='stylesheet' href='/s.css'><title>"))
+        with patch.object(score_pipeline, "SCORE_STYLES_BUDGET_SECONDS", 0.2), \
+                patch("web_audit.stylesheet_contrast", side_effect=lambda *a, **kw: time.sleep(2)):
+            started = time.monotonic()
+            payload = score_pipeline.run("https://example.com/")
+        self.assertLess(time.monotonic() - started, 1.5)
+        self.assertEqual(payload["pipeline"]["stages"][2]["status"], "timeout")
+        self.assertNotIn("stylesheets_fetched", payload["evidence"]["contrast"])
+
+    @patch("ai_client.is_configured", return_value=True)
+    @patch("ai_client.generate_json")
+    def test_model_answer_is_merged(self, generate, _configured, _fetch):
+        generate.return_value = {
+            "score": 61,
+            "explanation": "Model says so.",
+            "wcag_standards": {"compliant": [{"code": "1.1.1", "description": "x"}],
+                               "non_compliant": ["1.4.3"]},
+        }
+        payload = self._post(url="https://example.com/").get_json()
+        self.assertEqual(payload["score"], 61)
+        self.assertEqual(payload["explanation"], "Model says so.")
+        non_compliant = [c["code"] for c in payload["wcag_standards"]["non_compliant"]]
+        self.assertIn("1.1.1", non_compliant)  # flagged evidence beats the model
+        self.assertIn("1.4.3", non_compliant)
+        self.assertFalse(payload["pipeline"]["degraded"])
+        self.assertLessEqual(generate.call_args.kwargs["timeout"], score_pipeline.SCORE_DEADLINE_SECONDS)
+        prompt_stage = payload["pipeline"]["stages"][3]
+        self.assertEqual(prompt_stage["name"], "prompt")
+        self.assertEqual(prompt_stage["token_budget"], score_pipeline.prompt_budget.PROMPT_TOKENS_SCORE)
+        self.assertLessEqual(prompt_stage["tokens"], prompt_stage["token_budget"])
+
+    @patch("ai_client.is_configured", return_value=True)
+    @patch("ai_client.generate_json", side_effect=lambda *a, **kw: time.sleep(3) or {"score": 1})
+    def test_slow_model_falls_back_within_deadline(self, _generate, _configured, _fetch):
+        with patch.object(score_pipeline, "SCORE_LLM_MIN_SECONDS", 0.1):
+            started = time.monotonic()
+            payload = score_pipeline.run("https://example.com/", deadline_seconds=0.8)
+            elapsed = time.monotonic() - started
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual(payload["pipeline"]["fallback_reason"], "llm_timeout")
+        self.assertEqual(payload["score"], payload["deterministic_score"])
+
+    @patch("ai_client.is_configured", return_value=True)
+    @patch("ai_client.generate_json")
+    def test_llm_skipped_when_budget_too_small(self, generate, _configured, _fetch):
+        payload = score_pipeline.run("https://example.com/", deadline_seconds=1)
+        generate.assert_not_called()
+        self.assertEqual(payload["pipeline"]["fallback_reason"], "deadline")
+
+
+class ScoreBatchTests(unittest.TestCase):
+    def setUp(self):
+        self.client = app_module.app.test_client()
+
+    def _lines(self, response):
+        return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    @patch("web_audit.fetch_page")
+    def test_streams_one_line_per_document_in_completion_order(self, fetch):
+        def slow_first(url, timeout=None):
+            time.sleep(0.3 if url.endswith("/slow") else 0)
+            if url.endswith("/down"):
+                return {"ok": False, "url": url, "error_kind": "connection", "error": "refused"}
+            return _fetched(url)
+        fetch.side_effect = slow_first
+        response = self.client.post("/api/score/batch", json={"items": [
+            "https://example.com/slow", {"url": "https://example.com/down", "id": "d"},
+            {"html": PAGE, "base_url": "https://example.com/raw", "id": "raw"},
+        ]})
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        lines = self._lines(response)
+        self.assertEqual(lines[-1], dict(lines[-1], done=True, total=3, ok=2, failed=1))
+        results = lines[:-1]
+        self.assertEqual(results[-1]["url"], "https://example.com/slow")
+        by_id = {r["id"]: r for r in results}
+        self.assertEqual(by_id["d"]["error_kind"], "connection")
+        self.assertEqual(by_id["raw"]["source"], "html")
+        self.assertEqual(by_id["raw"]["score"], by_id[0]["score"])
+        self.assertNotIn("evidence", by_id["raw"])
+
+    @patch("web_audit.fetch_page")
+    def test_concurrency_is_bounded(self, fetch):
+        lock, state = threading.Lock(), {"now": 0, "max": 0}
+
+        def tracked(url, timeout=None):
+            with lock:
+                state["now"] += 1
+                state["max"] = max(state["max"], state["now"])
+            time.sleep(0.05)
+            with lock:
+                state["now"] -= 1
+            return _fetched(url)
+        fetch.side_effect = tracked
+        entries = score_pipeline.parse_batch_items([f"https://example.com/{i}" for i in range(12)])
+        lines = list(score_pipeline.score_batch(entries, concurrency=3))
+        self.assertEqual(len(lines), 13)
+        self.assertEqual(state["max"], 3)
+
+    @patch("web_audit.fetch_page", side_effect=_fetched)
+    def test_url_items_are_audited_on_the_audit_pool(self, fetch):
+        entries = score_pipeline.parse_batch_items(["https://example.com/a", "https://example.com/b"])
+        with patch("audit_executor.run", side_effect=[
+                web_audit.audit_html.__wrapped__(PAGE, "https://example.com/a"),
+                audit_executor.AuditTimeout("audit_html did not finish within 20.0s")]) as run:
+            results = {r["url"]: r for r in score_pipeline.score_batch(entries, concurrency=1) if "url" in r}
+        self.assertEqual([c.args[0] for c in run.call_args_list], ["audit_html", "audit_html"])
+        self.assertTrue(results["https://example.com/a"]["ok"])
+        self.assertEqual(results["https://example.com/b"]["error_kind"], "audit_timeout")
+
+    def test_validation(self):
+        self.assertEqual(self.client.post("/api/score/batch", json={"items": []}).status_code, 400)
+        response = self.client.post("/api/score/batch", json={"items": [42]})
+        self.assertIn("Item 0", response.get_json()["error"])
+        too_many = ["https://example.com/"] * (score_pipeline.SCORE_BATCH_MAX_ITEMS + 1)
+        self.assertIn("Too many", self.client.post("/api/score/batch", json={"urls": too_many}).get_json()["error"])
+
+
+class ComputeScoreTests(unittest.TestCase):
+    def test_level_weights_and_clamp(self):
+        self.assertEqual(score_pipeline.compute_score({"flagged_findings": []}), 100)
+        a_only = {"flagged_findings": [{"wcag": "1.1.1", "summary": ""}]}
+        aa_only = {"flagged_findings": [{"wcag": "2.4.6", "summary": ""}]}
+        self.assertLess(score_pipeline.compute_score(a_only), score_pipeline.compute_score(aa_only))
+        many = {"flagged_findings": [{"wcag": "1.1.1", "summary": ""}] * 20}
+        self.assertEqual(score_pipeline.compute_score(many), 0)
+
+
+class WcagStandardsTests(unittest.TestCase):
+    def test_every_criterion_audit_html_flags_is_checked(self):
+        flagged = {f["wcag"] for f in web_audit.audit_html(
+            PAGE.replace("<body>", '<body><p style="color:#ccc;background:#fff">x</p>'), "")["flagged_findings"]}
+        self.assertIn("1.4.3", flagged)
+        self.assertLessEqual(flagged, set(score_pipeline.CHECKED_CRITERIA))
+
+    def test_contrast_listed_as_compliant_when_not_flagged(self):
+        report = score_pipeline.deterministic_report({"flagged_findings": [{"wcag": "1.1.1", "summary": "x"}]})
+        compliant = {c["code"] for c in report["wcag_standards"]["compliant"]}
+        self.assertIn("1.4.3", compliant)
+        self.assertEqual(len(compliant), len(score_pipeline.CHECKED_CRITERIA) - 1)
+        self.assertIn(f"out of {len(score_pipeline.CHECKED_CRITERIA)} checked", report["explanation"])
+        self.assertEqual(len(score_pipeline.CHECKED_CRITERIA), 12)
+
+
+if __name__ == "__main__":
+    unittest.main()
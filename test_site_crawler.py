@@ -0,0 +1,164 @@
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import dns_cache
+import http_cache
+import http_pool
+import site_crawler
+
+
+def _page(title, body):
+    return (f'<!DOCTYPE html><html lang="en"><head><title>{title}</title>'
+            f'<meta name="viewport" content="width=device-width"></head>'
+            f"<body><main>{body}</main></body></html>")
+
+
+SITE = {
+    "/": _page("Home", '<h1>Home</h1><a href="/a">A</a> <a href="b#frag">B</a> '
+                       '<a href="/private/x">secret</a> <a href="/doc.pdf">pdf</a> '
+                       '<a href="https://elsewhere.example/">away</a> <a href="mailto:x@y">mail</a>'),
+    "/a": _page("A", '<h1>A</h1><img src="x.png"><a href="/">home</a><a href="/c">C</a>'),
+    "/b": _page("B", '<h1>B</h1><a href="/a">A again</a><a href="/missing">gone</a>'),
+    "/c": _page("", "<h1>C</h1><button></button>"),
+    "/private/x": _page("Private", "<h1>no</h1>"),
+    "/only-in-sitemap": _page("S", "<h1>S</h1>"),
+}
+
+ROBOTS = "User-agent: *\nDisallow: /private/\n"
+
+SITEMAP = """<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url><loc>{base}/only-in-sitemap</loc></url>
+  <url><loc>{base}/c</loc></url>
+</urlset>"""
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    lock = threading.Lock()
+    in_flight = 0
+    max_in_flight = 0
+    requested = []
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+            cls.requested.append(self.path)
+        try:
+            time.sleep(0.02)
+            base = f"http://{self.headers['Host']}"
+            if self.path == "/robots.txt":
+                self._reply(200, "text/plain", ROBOTS)
+            elif self.path == "/sitemap.xml":
+                self._reply(200, "application/xml", SITEMAP.format(base=base))
+            elif self.path in SITE:
+                self._reply(200, "text/html; charset=utf-8", SITE[self.path])
+            else:
+                self._reply(404, "text/html", "<h1>Not found</h1>")
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+    def _reply(self, status, content_type, text):
+        body = text.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class SiteCrawlerTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        cls.server.daemon_threads = True
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        http_cache.set_cache(None)
+
+    def setUp(self):
+        patcher = patch("dns_cache.is_blocked_ip", return_value=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        dns_cache.clear()
+        http_pool.reset_pool()
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, True)
+        http_cache.set_cache(http_cache.HttpCache(cache_dir))
+        _Handler.requested = []
+        _Handler.max_in_flight = 0
+
+    def _urls(self, report):
+        return {row["url"].replace(self.base, "") for row in report["pages"]}
+
+    def test_crawls_same_origin_and_respects_robots(self):
+        report = site_crawler.crawl(self.base + "/", audit_workers=0, concurrency=4)
+        self.assertEqual(self._urls(report), {"/", "/a", "/b", "/c", "/missing"})
+        self.assertEqual(report["pages_audited"], 4)
+        self.assertEqual(report["pages_failed"], 1)
+        self.assertEqual(report["errors"][0]["error_kind"], "http_status")
+        self.assertEqual(report["pages_skipped"]["robots"], 1)
+        self.assertEqual(report["pages_skipped"]["not_html"], 1)
+        self.assertNotIn("/private/x", _Handler.requested)
+        self.assertNotIn("/doc.pdf", _Handler.requested)
+        self.assertEqual(_Handler.requested.count("/a"), 1)
+
+    def test_aggregate_report(self):
+        report = site_crawler.crawl(self.base + "/", audit_workers=0)
+        self.assertEqual(report["totals"]["images_missing_alt"], 1)
+        self.assertEqual(report["totals"]["buttons_no_accessible_name"], 1)
+        self.assertEqual(report["pages_missing"]["title"], 1)
+        by_criterion = {c["wcag"]: c for c in report["criteria"]}
+        self.assertEqual(by_criterion["1.1.1"]["pages"], 1)
+        self.assertEqual(by_criterion["2.4.2"]["sample_urls"], [self.base + "/c"])
+        self.assertTrue(by_criterion["2.4.2"]["w3c_understanding_url"].startswith("https://"))
+        self.assertEqual(report["worst_pages"][0]["url"], self.base + "/c")
+
+    def test_sitemap_seeds(self):
+        report = site_crawler.crawl(self.base + "/sitemap.xml", audit_workers=0, follow_links=False)
+        self.assertEqual(self._urls(report), {"/only-in-sitemap", "/c"})
+
+    def test_max_pages_and_per_host_limit(self):
+        report = site_crawler.crawl(self.base + "/", audit_workers=0, concurrency=8,
+                                    per_host=2, max_pages=3)
+        self.assertEqual(report["pages_discovered"], 3)
+        self.assertEqual(len(report["pages"]), 3)
+        self.assertLessEqual(_Handler.max_in_flight, 2)
+
+    def test_process_pool_audits(self):
+        report = site_crawler.crawl(self.base + "/", audit_workers=2)
+        self.assertEqual(report["pages_audited"], 4)
+
+
+class SitemapParsingTests(unittest.TestCase):
+    def test_sitemap_index(self):
+        xml = ('<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+               "<sitemap><loc>https://x.example/s1.xml</loc></sitemap></sitemapindex>")
+        self.assertEqual(site_crawler.parse_sitemap(xml), ([], ["https://x.example/s1.xml"]))
+
+    def test_invalid_xml(self):
+        self.assertEqual(site_crawler.parse_sitemap("<html>"), ([], []))
+
+    def test_normalise_url(self):
+        self.assertEqual(site_crawler.normalise_url("HTTP://Example.com:80#top"), "http://example.com/")
+        self.assertIsNone(site_crawler.normalise_url("javascript:void(0)"))
+
+
+if __name__ == "__main__":
+    unittest.main()
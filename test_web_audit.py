@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import unittest
+
+import html_parsers
+import web_audit
+from bench_web_audit import corpus, legacy_audit_html
+
+
+EDGE_CASES = {
+    "empty": "",
+    "no_body": '<div><img src="a.png"><a href="#x">Skip to main content</a><h3>Deep</h3></div>',
+    "outside_body": (
+        '<html><head><title>T</title></head><img src="head.png"><a href="/">here</a>'
+        '<body><img src="in.png"></body><img src="after.png"><button></button></html>'
+    ),
+    "nested_anchors": (
+        '<body><a href="/1">read more <a href="/2">click here</a></a>'
+        '<a href="/3"><img src="i.png" alt=""></a><a href="/4"></a></body>'
+    ),
+    "nested_headings": "<body><h1>Top <h3>inner</h3> tail</h1><h2>Next</h2></body>",
+    "stripped_content": (
+        '<!-- lead --><!DOCTYPE html><html><head><title><!-- x -->Real title</title>'
+        '<meta http-equiv="Content-Type" content="text/html; charset=ISO-8859-1"></head>'
+        '<body><button><script>alert(1)</script></button><noscript><img src="n.png"></noscript>'
+        '<h2>Visible<style>.x{}</style></h2></body></html>'
+    ),
+    "labels_and_tables": (
+        '<body><label>Name <input id="a"></label><input id="b"><label for="b">B</label>'
+        '<input type="hidden"><textarea title="t"></textarea><select aria-label="s"></select>'
+        '<table><caption>c</caption><tr><th>h</th></tr></table><table><tr><td>x</td></tr></table>'
+        '<iframe title=" "></iframe></body>'
+    ),
+    "styles_and_roles": (
+        '<body><div role="main" style="color: red; background: blue">Hi <b>there</b></div>'
+        '<span role="navigation" onclick="x()" aria-hidden="true">n</span>'
+        '<a target="_blank" rel="noopener" href="/">ok</a><a target="_blank" href="/">bad</a>'
+        '<template><a href="/">more</a></template></body>'
+    ),
+    "accessible_names": (
+        '<body><span id="lbl">Search</span><span id="blank"> </span>'
+        '<a href="/1" aria-labelledby="lbl"></a><a href="/2" aria-labelledby="later"></a>'
+        '<a href="/3" aria-labelledby="blank missing"></a><a href="/4" aria-label="  "></a>'
+        '<a href="/5"><img src="x" alt=""></a><a href="/6"><span aria-hidden="true">x</span></a>'
+        '<a href="/7"><svg aria-label="Home"></svg></a>'
+        '<button aria-labelledby="later"></button><button title=" "></button>'
+        '<label>  <input id="i1"></label><label><span>Name</span> <input></label>'
+        '<label for="i3"><img src="x" alt="Email"></label><input id="i3">'
+        '<label for="i4"> </label><input id="i4">'
+        '<input aria-labelledby="later"><input aria-labelledby="nope">'
+        '<div id="later"><p id="later"></p>Later <b>text</b></div></body>'
+    ),
+}
+
+
+class AuditHtmlTests(unittest.TestCase):
+    def assertSameEvidence(self, html):
+        self.assertEqual(
+            json.dumps(web_audit.audit_html(html, "https://example.com/", parser="html.parser")),
+            json.dumps(legacy_audit_html(html, "https://example.com/")),
+        )
+
+    def test_matches_legacy_on_edge_cases(self):
+        for name, html in EDGE_CASES.items():
+            with self.subTest(case=name):
+                self.assertSameEvidence(html)
+
+    def test_matches_legacy_on_repo_pages(self):
+        for name, html in corpus():
+            if name.startswith("synthetic-") and len(html) > 300 * 1024:
+                continue
+            with self.subTest(page=name):
+                self.assertSameEvidence(html)
+
+    def test_scope_is_first_body(self):
+        evidence = web_audit.audit_html(EDGE_CASES["outside_body"], "", parser="html.parser")
+        self.assertEqual(evidence["images"]["total"], 1)
+        self.assertEqual(evidence["buttons"]["total"], 0)
+        self.assertEqual(evidence["page"]["title"], "T")
+
+    def test_accessible_names_follow_accname_rules(self):
+        for backend in html_parsers.available_backends():
+            with self.subTest(backend=backend):
+                evidence = web_audit.audit_html(EDGE_CASES["accessible_names"], "", parser=backend)
+                self.assertEqual(evidence["links"]["no_text"], 4)
+                self.assertEqual(evidence["buttons"]["no_accessible_name"], 1)
+                self.assertEqual((evidence["forms"]["inputs_total"],
+                                  evidence["forms"]["inputs_unlabeled"]), (6, 3))
+                self.assertEqual([s["selector"] for s in evidence["forms"]["inputs_unlabeled_samples"]],
+                                 ["input#i1", "input#i4", "input"])
+
+    def test_stripped_content_ignored(self):
+        evidence = web_audit.audit_html(EDGE_CASES["stripped_content"], "", parser="html.parser")
+        self.assertTrue(evidence["page"]["doctype_present"])
+        self.assertEqual(evidence["page"]["title"], "Real title")
+        self.assertEqual(evidence["page"]["charset"], "ISO-8859-1")
+        self.assertEqual(evidence["images"]["total"], 0)
+        self.assertEqual(evidence["buttons"]["no_accessible_name"], 1)
+
+
+# audit_html's output before the single-walk rewrite, for the edge cases
+# and the corpus above (regenerate with the pre-rewrite web_audit.py only).
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_web_audit_baseline.json")
+# Signals a later change redefined on purpose: accessible names follow the
+# W3C accname rules (counts and samples of unnamed links, buttons and
+# inputs) and colour contrast is scored (1.4.3, the ``contrast`` block).
+_REDEFINED_FIELDS = {"links": ("no_text",), "buttons": ("no_accessible_name",),
+                     "forms": ("inputs_unlabeled", "inputs_unlabeled_samples")}
+_REDEFINED_SUMMARIES = ("with no accessible name", "without accessible name", "with no associated label")
+_REDEFINED_CRITERIA = ("1.4.3", "2.4.4", "3.3.2", "4.1.2")
+
+
+def _comparable(evidence):
+    evidence = json.loads(json.dumps(evidence))
+    evidence.pop("contrast", None)
+    for section, fields in _REDEFINED_FIELDS.items():
+        for field in fields:
+            evidence[section].pop(field, None)
+    evidence["flagged_findings"] = [
+        f for f in evidence["flagged_findings"]
+        if f["wcag"] != "1.4.3" and not any(s in f["summary"] for s in _REDEFINED_SUMMARIES)]
+    evidence["sources"] = [s for s in evidence["sources"] if s["wcag_criterion"] not in _REDEFINED_CRITERIA]
+    return evidence
+
+
+class BaselineTests(unittest.TestCase):
+    """The rewrite against pinned pre-rewrite output, not against
+    ``legacy_audit_html`` (which later changes kept in step)."""
+
+    def test_matches_pinned_baseline(self):
+        with open(BASELINE, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        pages = dict(EDGE_CASES, **dict(corpus()))
+        self.assertLessEqual(set(baseline), set(pages))
+        for name, expected in baseline.items():
+            html = pages[name]
+            with self.subTest(case=name):
+                self.assertEqual(hashlib.sha256(html.encode()).hexdigest(), expected["sha256"],
+                                 "input changed since the baseline was pinned")
+                evidence = web_audit.audit_html(html, "https://example.com/", parser="html.parser")
+                self.assertEqual(_comparable(evidence), _comparable(expected["evidence"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -11,6 +11,11 @@ length) so the LLM is grounded in real numbers when it claims "I lowered
 this from grade 12 to grade 6". The frontend then shows a before/after
 diff of the same metrics.
 
+Text past ``AUDIT_TEXT_MAX_CHARS`` is cut at a word break, and the issue
+checks (jargon, passive voice, acronyms) stop once
+``AUDIT_TEXT_BUDGET_SECONDS`` is spent (``audit_limits``); the evidence is
+then flagged ``truncated``.
+
 References (cited in the report):
 
   - Flesch Reading Ease — https://en.wikipedia.org/wiki/Flesch%E2%80%93Kincaid_readability_tests
@@ -23,7 +28,11 @@ from __future__ import annotations
 
 import re
 from collections import Counter
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
+
+import audit_limits
+import evidence_cache
+import prompt_budget
 
 
 READABILITY_REFERENCES: List[Dict[str, str]] = [
@@ -139,11 +148,14 @@ def _flesch_band(score: float) -> str:
     return "Very difficult — College graduate"
 
 
+@evidence_cache.memoize("audit_text")
 def audit_text(text: str) -> Dict[str, Any]:
     """Compute readability metrics for ``text``."""
     text = (text or "").strip()
     if not text:
         return {"ok": False, "error": "Empty text"}
+    guard = audit_limits.AuditGuard("audit_text")
+    text = guard.cap(text, " ")
 
     sentences = [s.strip() for s in SENTENCE_RE.findall(text) if s.strip() and re.search(r"[A-Za-z]", s)]
     sentence_count = max(1, len(sentences))
@@ -183,14 +195,27 @@ def audit_text(text: str) -> Dict[str, Any]:
     jargon_hits: List[str] = []
     text_lower = text.lower()
     for j in JARGON_WORDS:
+        if guard.expired():
+            guard.skip(["jargon"])
+            break
         if re.search(rf"\b{re.escape(j)}\b", text_lower):
             jargon_hits.append(j)
 
     # Passive voice
-    passive_count = len(PASSIVE_RE.findall(text))
+    passive_count = 0
+    if guard.expired():
+        guard.skip(["passive_voice"])
+    else:
+        passive_count = len(PASSIVE_RE.findall(text))
 
     # Acronyms / abbreviations
-    abbrevs = sorted(set(ABBREV_RE.findall(text)))[:10]
+    abbrevs: List[str] = []
+    if guard.expired():
+        guard.skip(["abbreviations"])
+    else:
+        abbrevs = sorted(set(ABBREV_RE.findall(text)))[:10]
+    if guard.skipped:
+        guard.stopped_at(len(text))
 
     # Most-frequent non-trivial words
     stopwords = {
@@ -202,7 +227,7 @@ def audit_text(text: str) -> Dict[str, Any]:
     }
     freq = Counter(w.lower() for w in words if w.lower() not in stopwords and len(w) > 3).most_common(8)
 
-    return {
+    return guard.mark({
         "ok": True,
         "stats": {
             "char_count": len(text),
@@ -231,16 +256,22 @@ def audit_text(text: str) -> Dict[str, Any]:
             "abbreviations_found": abbrevs,
         },
         "frequent_words": [{"word": w, "count": c} for w, c in freq],
-    }
+    })
 
 
-def evidence_summary_for_prompt(evidence: Dict[str, Any]) -> str:
+def evidence_summary_for_prompt(evidence: Dict[str, Any], max_tokens: Optional[int] = None) -> str:
+    """Readability summary packed into ``max_tokens`` (default: the
+    ``simplify`` budget). Statistics always fit; jargon and acronym lists
+    are trimmed if the budget runs out, jargon last."""
     if not evidence.get("ok"):
         return f"TEXT ANALYSIS FAILED: {evidence.get('error', 'unknown')}"
     s = evidence["stats"]
     r = evidence["readability"]
     i = evidence["issues"]
     lines = ["READABILITY ANALYSIS (deterministic, before LLM rewrite)"]
+    note = audit_limits.prompt_note(evidence)
+    if note:
+        lines.append("  " + note)
     lines.append(
         f"  words={s['word_count']} sentences={s['sentence_count']} "
         f"avg_words_per_sentence={s['avg_words_per_sentence']} "
@@ -265,8 +296,14 @@ def evidence_summary_for_prompt(evidence: Dict[str, Any]) -> str:
         f"({r['ari_grade_label']})"
     )
     lines.append(f"  passive_voice_clauses_detected={i['passive_voice_count']}")
-    if i["jargon_hits"]:
-        lines.append(f"  jargon_to_replace: {', '.join(i['jargon_hits'][:12])}")
+    out = prompt_budget.Packer(
+        prompt_budget.budget_for("simplify") if max_tokens is None else max_tokens)
+    for line in lines:
+        out.require(line)
+    jargon = i["jargon_hits"]
+    for start in range(0, len(jargon), 6):
+        label = "jargon_to_replace" if start == 0 else "jargon_to_replace (cont.)"
+        out.add(f"  {label}: {', '.join(jargon[start:start + 6])}", priority=1, group="jargon")
     if i["abbreviations_found"]:
-        lines.append(f"  acronyms_found: {', '.join(i['abbreviations_found'])}")
-    return "\n".join(lines)
+        out.add(f"  acronyms_found: {', '.join(i['abbreviations_found'])}", priority=0, group="acronyms")
+    return out.render()
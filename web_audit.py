@@ -18,30 +18,75 @@ Two responsibilities:
    coverage, heading hierarchy, landmarks, form labels, ARIA usage, link
    purpose, language declaration, etc.). The returned ``evidence`` dict is
    what we feed into the LLM prompt so its commentary cites real numbers and
-   real selectors rather than hallucinated ones.
+   real selectors rather than hallucinated ones. Colour pairs declared
+   inline and in ``<style>`` blocks are scored for WCAG contrast (see
+   ``contrast``); ``stylesheet_contrast`` adds the page's linked
+   stylesheets, fetched concurrently and cached by URL. A stylesheet rule
+   counts only if its selector can match the page's elements; the others
+   are reported as ``unmatched`` and never raise 1.4.3. Pages past
+   ``AUDIT_HTML_MAX_CHARS`` are cut, and the walk stops once
+   ``AUDIT_HTML_BUDGET_SECONDS`` is spent (``audit_limits``); the evidence
+   is then flagged ``truncated``.
 
-This module deliberately uses only ``requests`` + ``BeautifulSoup`` so it can
-run inside the existing Flask backend with no new system dependencies.
+Dependencies:
+
+* required: ``requests`` and ``BeautifulSoup`` — the same packages the
+  Flask backend already installs;
+* optional: ``lxml`` / ``selectolax`` (faster parsers, picked by
+  ``html_parsers``), ``httpx`` (HTTP/2 fetches in ``http_pool`` with
+  ``FETCH_HTTP2=true``) and ``numpy`` (batched ratios in ``contrast``);
+  each is used when installed and skipped otherwise;
+* project modules: fetches go through ``http_pool`` (keep-alive pool),
+  ``dns_cache`` (the SSRF check and resolved-address pinning) and
+  ``http_cache`` (conditional re-fetch from disk); ``audit_html`` uses
+  ``html_parsers``, ``contrast``, ``evidence_cache`` (memoized by content
+  hash), ``memory_budget`` and ``audit_limits`` (memory, size and time
+  ceilings); ``prompt_budget`` packs the prompt summary.
 """
 
 from __future__ import annotations
 
-import ipaddress
+import concurrent.futures
+import os
 import re
-import socket
+import threading
 import time
-from collections import Counter
-from typing import Any, Dict, List, Optional, Tuple
+from collections import Counter, OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
 from urllib.parse import urlparse, urljoin
 
-import requests
-from bs4 import BeautifulSoup, Comment
+import audit_limits
+import contrast
+import dns_cache
+import evidence_cache
+import html_parsers
+import http_cache
+import http_pool
+import memory_budget
+import prompt_budget
 
 # ---------------------------------------------------------------------------
 # Tunables
 # ---------------------------------------------------------------------------
 FETCH_TIMEOUT_SECONDS = 12
 MAX_RESPONSE_BYTES = 2 * 1024 * 1024  # 2 MB cap on downloaded HTML
+# audit_html skips the parse tree for pages at least this large (env / .env).
+AUDIT_LOW_MEMORY_BYTES = int(os.getenv("AUDIT_LOW_MEMORY_BYTES", str(256 * 1024)))
+_LOW_MEMORY_SLICE = 64 * 1024
+# Start tags without a matching end tag past which audit_html streams the
+# page even when it is small: lexbor's tree builder is quadratic in nesting
+# depth (a few MB of "<div>" take minutes), the incremental parsers are not.
+_MAX_TREE_NESTING = 4096
+# Linked stylesheets fetched per page, and how many at once (env / .env).
+STYLESHEET_MAX_PER_PAGE = int(os.getenv("STYLESHEET_MAX_PER_PAGE", "10"))
+STYLESHEET_FETCH_CONCURRENCY = int(os.getenv("STYLESHEET_FETCH_CONCURRENCY", "4"))
+# Parsed stylesheet colour pairs are kept this long per URL.
+STYLESHEET_CACHE_TTL_SECONDS = float(os.getenv("STYLESHEET_CACHE_TTL_SECONDS", "600"))
+STYLESHEET_CACHE_SIZE = 256
+# <style> text the walk evaluates per page (the rest is ignored).
+_MAX_STYLE_CHARS = 512 * 1024
+_HTML_ACCEPT = "text/html,application/xhtml+xml;q=0.9,*/*;q=0.5"
+_CSS_ACCEPT = "text/css,*/*;q=0.1"
 USER_AGENT = (
     "AccessAI-Auditor/1.0 (+https://github.com/rihitgandhi/AccessAI) "
     "Mozilla/5.0 (compatible; accessibility crawler)"
@@ -177,30 +222,73 @@ WCAG_REFERENCES: Dict[str, Dict[str, str]] = {
 def _is_private_host(host: str) -> bool:
     """Return True if host resolves to a private/loopback/link-local IP.
 
-    Used to refuse SSRF-style URLs (10.x, 192.168.x, 127.x, ::1, etc.)
+    Used to refuse SSRF-style URLs (10.x, 192.168.x, 127.x, ::1, etc.). The
+    lookup is cached by ``dns_cache`` and the connection is later pinned to
+    the same validated IP, so this costs no second DNS round trip.
     """
     try:
-        infos = socket.getaddrinfo(host, None)
-    except Exception:
-        return True  # fail-closed: if we cannot resolve, refuse
-    for info in infos:
-        ip_str = info[4][0]
-        try:
-            ip = ipaddress.ip_address(ip_str)
-        except ValueError:
-            continue
-        if ip.is_private or ip.is_loopback or ip.is_link_local or ip.is_reserved:
-            return True
+        dns_cache.resolve(host)
+    except dns_cache.BlockedHostError:
+        return True  # fail-closed: unresolvable hosts are refused too
     return False
 
 
-def fetch_page(url: str) -> Dict[str, Any]:
+def fetch_page(url: str, timeout: Optional[float] = None) -> Dict[str, Any]:
     """Fetch ``url`` safely and return a metadata dict.
 
+    ``timeout`` overrides ``FETCH_TIMEOUT_SECONDS`` (it is never raised above
+    it), so a caller with a deadline can hand over what is left of it.
+
     Returned dict always contains ``ok`` and ``url``. On success it also
     contains ``html`` plus ``status``, ``final_url``, ``elapsed_ms``,
-    ``content_type``, ``content_length``, ``server``, ``security_headers``.
-    On failure it contains ``error`` and ``error_kind``.
+    ``content_type``, ``content_length``, ``server``, ``security_headers``
+    and ``cache`` (``hit``, ``revalidated``, ``miss`` or ``bypass``; see
+    ``http_cache``). On failure it contains ``error`` and ``error_kind``.
+    """
+    chunks: List[bytes] = []
+    charset: List[Optional[str]] = []
+
+    def open_body(encoding: Optional[str]) -> Callable[[bytes], None]:
+        charset.append(encoding)
+        return chunks.append
+
+    page = _fetch(url, timeout, open_body)
+    if page["ok"]:
+        page["html"] = _decode(b"".join(chunks), charset[0])
+    return page
+
+
+def fetch_and_audit(url: str, timeout: Optional[float] = None,
+                    parser: Optional[str] = None) -> Dict[str, Any]:
+    """``fetch_page`` + ``audit_html`` in one pass over the download.
+
+    Each chunk is decoded and tokenized as it arrives (see
+    ``StreamingAudit``), so parsing overlaps the download and the page is
+    never held in memory whole — not as bytes, not as a string, not as a
+    tree. Returns ``fetch_page``'s dict with ``evidence`` in place of
+    ``html``. ``parser`` must support incremental parsing; see
+    ``html_parsers.get_incremental``.
+    """
+    stream: List[StreamingAudit] = []
+
+    def open_body(encoding: Optional[str]) -> Callable[[bytes], None]:
+        stream.append(StreamingAudit(encoding=encoding, parser=parser))
+        return stream[0].feed
+
+    page = _fetch(url, timeout, open_body)
+    if page["ok"]:
+        page["evidence"] = stream[0].close(page.get("final_url") or url)
+    return page
+
+
+def _fetch(url: str, timeout: Optional[float],
+           open_body: Callable[[Optional[str]], Callable[[bytes], None]],
+           accept: str = _HTML_ACCEPT) -> Dict[str, Any]:
+    """Fetch ``url`` and pass the body on chunk by chunk.
+
+    ``open_body(encoding)`` is called once the response (or cache entry) is
+    known to be usable and returns the callable each body chunk is written
+    to. The returned dict is ``fetch_page``'s, minus ``html``.
     """
     parsed = urlparse(url)
     if parsed.scheme not in ("http", "https"):
@@ -213,55 +301,64 @@ def fetch_page(url: str) -> Dict[str, Any]:
         return {"ok": False, "url": url, "error_kind": "private_host",
                 "error": f"Refusing to fetch a private/loopback host ({parsed.hostname})"}
 
+    cache = http_cache.get_cache()
+    cached = cache.get(url) if cache is not None else None
     started = time.monotonic()
+    if cached is not None and cached.is_fresh():
+        cache.count("hits")
+        cache.count("bytes_saved", len(cached.body))
+        return _page_from_cache(url, cached, started, "hit", open_body)
+
+    headers = {
+        "User-Agent": USER_AGENT,
+        "Accept": accept,
+        "Accept-Language": "en-US,en;q=0.9",
+    }
+    if cached is not None:
+        headers.update(cached.validators())
     try:
-        resp = requests.get(
-            url,
-            headers={
-                "User-Agent": USER_AGENT,
-                "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.5",
-                "Accept-Language": "en-US,en;q=0.9",
-            },
-            timeout=FETCH_TIMEOUT_SECONDS,
-            allow_redirects=True,
-            stream=True,
-        )
-    except requests.exceptions.SSLError as exc:
-        return {"ok": False, "url": url, "error_kind": "ssl",
-                "error": f"TLS error: {exc}"}
-    except requests.exceptions.Timeout:
-        return {"ok": False, "url": url, "error_kind": "timeout",
-                "error": f"Timed out after {FETCH_TIMEOUT_SECONDS}s"}
-    except requests.exceptions.ConnectionError as exc:
-        return {"ok": False, "url": url, "error_kind": "connection",
-                "error": f"Connection failed: {exc}"}
-    except requests.exceptions.RequestException as exc:
-        return {"ok": False, "url": url, "error_kind": "request",
-                "error": f"Request failed: {exc}"}
-
-    # Stream-read with size cap
-    chunks: List[bytes] = []
+        resp = http_pool.get_pool().get(
+            url, headers=headers,
+            timeout=FETCH_TIMEOUT_SECONDS if timeout is None else min(timeout, FETCH_TIMEOUT_SECONDS))
+    except http_pool.FetchError as exc:
+        return {"ok": False, "url": url, "error_kind": exc.kind, "error": str(exc)}
+
+    if cached is not None and resp.status_code == 304:
+        resp.close()
+        cache.count("revalidated")
+        cache.count("bytes_saved", len(cached.body))
+        # A 304 may carry a new freshness lifetime.
+        fresh_until = http_cache.freshness(resp.headers)
+        if fresh_until:
+            cached.meta["fresh_until"] = fresh_until
+            cache.refresh(cached)
+        return _page_from_cache(url, cached, started, "revalidated", open_body)
+
+    # Stream-read with size cap, handing each chunk on (and to the cache)
+    # as it arrives.
+    writer = None
+    if cache is not None and resp.status_code == 200 and http_cache.storable(resp.headers):
+        writer = cache.writer(url)
+    write = open_body(resp.encoding)
     total = 0
     try:
-        for chunk in resp.iter_content(chunk_size=64 * 1024):
+        for chunk in resp.iter_bytes(64 * 1024):
             if not chunk:
                 continue
             total += len(chunk)
             if total > MAX_RESPONSE_BYTES:
                 break
-            chunks.append(chunk)
+            write(chunk)
+            if writer is not None:
+                writer.write(chunk)
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        raise
     finally:
         resp.close()
-    body_bytes = b"".join(chunks)
     elapsed_ms = int((time.monotonic() - started) * 1000)
 
-    # Decode body using the declared charset, falling back to utf-8 with replace.
-    encoding = resp.encoding or "utf-8"
-    try:
-        html = body_bytes.decode(encoding, errors="replace")
-    except (LookupError, TypeError):
-        html = body_bytes.decode("utf-8", errors="replace")
-
     security_headers = {
         h: resp.headers.get(h) for h in (
             "Content-Security-Policy", "Strict-Transport-Security",
@@ -271,19 +368,152 @@ def fetch_page(url: str) -> Dict[str, Any]:
         if resp.headers.get(h)
     }
 
-    return {
-        "ok": True,
-        "url": url,
+    meta = {
         "final_url": resp.url,
         "status": resp.status_code,
-        "elapsed_ms": elapsed_ms,
         "content_type": resp.headers.get("Content-Type", ""),
         "content_length": total,
         "server": resp.headers.get("Server", ""),
         "security_headers": security_headers,
-        "html": html,
+        "http_version": resp.http_version,
         "truncated": total >= MAX_RESPONSE_BYTES,
     }
+    cache_status = "bypass"
+    if cache is not None:
+        cache.count("updated" if cached is not None else "misses")
+        cache_status = "miss"
+        if writer is not None:
+            writer.commit(dict(meta, encoding=resp.encoding,
+                               etag=resp.headers.get("ETag", ""),
+                               last_modified=resp.headers.get("Last-Modified", ""),
+                               fresh_until=http_cache.freshness(resp.headers)))
+
+    return dict({"ok": True, "url": url, "elapsed_ms": elapsed_ms}, **meta, cache=cache_status)
+
+
+def _decode(body_bytes: bytes, encoding: Optional[str]) -> str:
+    """Decode using the declared charset, falling back to utf-8 with replace."""
+    try:
+        return body_bytes.decode(encoding or "utf-8", errors="replace")
+    except (LookupError, TypeError):
+        return body_bytes.decode("utf-8", errors="replace")
+
+
+def _page_from_cache(url: str, cached, started: float, cache_status: str,
+                     open_body: Callable[[Optional[str]], Callable[[bytes], None]]) -> Dict[str, Any]:
+    meta = cached.meta
+    write = open_body(meta.get("encoding"))
+    body = memoryview(cached.body)
+    for offset in range(0, len(body), 64 * 1024):
+        write(bytes(body[offset:offset + 64 * 1024]))
+    return {
+        "ok": True,
+        "url": url,
+        "final_url": meta["final_url"],
+        "status": meta["status"],
+        "elapsed_ms": int((time.monotonic() - started) * 1000),
+        "content_type": meta["content_type"],
+        "content_length": meta["content_length"],
+        "server": meta["server"],
+        "security_headers": meta["security_headers"],
+        "http_version": meta["http_version"],
+        "truncated": meta["truncated"],
+        "cache": cache_status,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Linked stylesheets
+# ---------------------------------------------------------------------------
+_stylesheet_cache: "OrderedDict[str, Tuple[float, List[contrast.ColourRule]]]" = OrderedDict()
+_stylesheet_lock = threading.Lock()
+
+
+def _stylesheet_rules(url: str, timeout: Optional[float]) -> Optional[List[contrast.ColourRule]]:
+    """Colour rules of one stylesheet (``None`` if it cannot be fetched).
+
+    Kept unmatched: which rules apply depends on the page linking it."""
+    now = time.monotonic()
+    with _stylesheet_lock:
+        cached = _stylesheet_cache.get(url)
+        if cached is not None and cached[0] > now:
+            _stylesheet_cache.move_to_end(url)
+            return cached[1]
+    chunks: List[bytes] = []
+    charset: List[Optional[str]] = []
+
+    def open_body(encoding: Optional[str]) -> Callable[[bytes], None]:
+        charset.append(encoding)
+        return chunks.append
+
+    sheet = _fetch(url, timeout, open_body, accept=_CSS_ACCEPT)
+    if not sheet["ok"] or not 200 <= sheet.get("status", 0) < 300:
+        return None
+    rules = contrast.colour_rules(_decode(b"".join(chunks), charset[0]))
+    with _stylesheet_lock:
+        _stylesheet_cache[url] = (now + STYLESHEET_CACHE_TTL_SECONDS, rules)
+        _stylesheet_cache.move_to_end(url)
+        while len(_stylesheet_cache) > STYLESHEET_CACHE_SIZE:
+            _stylesheet_cache.popitem(last=False)
+    return rules
+
+
+def stylesheet_contrast(urls: List[str], timeout: Optional[float] = None,
+                        page_selectors: Optional[Dict[str, List[str]]] = None) -> Dict[str, Any]:
+    """Fetch ``urls`` concurrently and evaluate their colour pairs.
+
+    Each stylesheet goes through ``_fetch`` (SSRF checks, size cap,
+    ``http_cache``) and its parsed colour rules are cached by URL for
+    ``STYLESHEET_CACHE_TTL_SECONDS``, so a site's shared stylesheets are
+    parsed once, not once per page. Rules are matched against
+    ``page_selectors`` (the page evidence's ``contrast.page_selectors``);
+    those that match nothing there are only reported, under ``unmatched``.
+    Sheets not fetched within ``timeout`` are counted as failed. Returns a
+    ``contrast`` summary (see ``contrast.ContrastTally.summary``) plus
+    ``fetched`` and ``failed``.
+    """
+    urls = list(dict.fromkeys(urls))[:STYLESHEET_MAX_PER_PAGE]
+    matches = contrast.selector_matcher(page_selectors)
+    merged = contrast.empty_summary()
+    fetched = 0
+    if urls:
+        pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, min(len(urls), STYLESHEET_FETCH_CONCURRENCY)),
+            thread_name_prefix="stylesheets")
+        try:
+            futures = [pool.submit(_stylesheet_rules, url, timeout) for url in urls]
+            concurrent.futures.wait(futures, timeout=timeout)
+            # Merged in link order, so equal ratios keep document order.
+            for url, future in zip(urls, futures):
+                rules = future.result() if future.done() and not future.exception() else None
+                if rules is not None:
+                    tally = contrast.ContrastTally()
+                    tally.add_rules(rules, url, matches)
+                    merged = contrast.merge_summaries(merged, tally.summary())
+                    fetched += 1
+        finally:
+            pool.shutdown(wait=False)
+    merged.update(fetched=fetched, failed=len(urls) - fetched)
+    return merged
+
+
+def with_stylesheet_contrast(evidence: Dict[str, Any], sheets: Dict[str, Any]) -> Dict[str, Any]:
+    """``evidence`` with ``stylesheet_contrast``'s result folded into 1.4.3.
+
+    Returns a new dict; ``evidence`` (possibly shared with the evidence
+    cache) is not modified.
+    """
+    page = evidence["contrast"]
+    combined = contrast.merge_summaries(page, sheets)
+    combined.update(stylesheets=page["stylesheets"],
+                    page_selectors=page["page_selectors"],
+                    stylesheets_fetched=sheets["fetched"],
+                    stylesheets_failed=sheets["failed"])
+    flagged = [f for f in evidence["flagged_findings"] if f["wcag"] != "1.4.3"]
+    finding = _contrast_finding(combined)
+    if finding:
+        flagged.append(finding)
+    return dict(evidence, contrast=combined, flagged_findings=flagged, sources=_sources_for(flagged))
 
 
 # ---------------------------------------------------------------------------
@@ -305,197 +535,894 @@ def _short(text: str, n: int = 80) -> str:
     return text if len(text) <= n else text[: n - 1] + "…"
 
 
-def audit_html(html: str, base_url: str) -> Dict[str, Any]:
+# Elements whose subtrees are dropped before any text-content check.
+_STRIPPED_TAGS = frozenset({"script", "style", "noscript"})
+_HEADING_TAGS = frozenset({"h1", "h2", "h3", "h4", "h5", "h6"})
+# BeautifulSoup gives strings inside these their own string class, which
+# get_text() on any other element ignores.
+_STRING_CONTAINERS = frozenset({"template", "rt", "rp"})
+_LANDMARK_TAGS = ("main", "nav", "header", "footer", "aside", "section", "article")
+_LANDMARK_ROLES = {"main": "role_main", "navigation": "role_navigation",
+                   "contentinfo": "role_contentinfo"}
+_UNLABELED_INPUT_TYPES = ("hidden", "submit", "button", "reset", "image")
+_FG_COLOR_RE = re.compile(r"(?<!background-)color\s*:\s*([^;]+)", re.I)
+_BG_COLOR_RE = re.compile(r"background(?:-color)?\s*:\s*([^;]+)", re.I)
+_COLOR_HINT_RE = re.compile(r"color|background", re.I)
+_CHARSET_RE = re.compile(r"charset=([\w-]+)", re.I)
+_CONTENT_TYPE_RE = re.compile("content-type", re.I)
+
+# Bits a frame reports to its ancestors ("does my subtree contain …?") so
+# that checks like ``a.find("th")`` need no extra subtree search.
+_HAS_IMG_ALT = 1        # <img> with a non-empty alt
+_HAS_ARIA_LABEL = 2     # non-empty aria-label
+_HAS_TH = 4
+_HAS_CAPTION = 8
+_HAS_TEXT = 16          # non-whitespace text (as counted by get_text())
+# Any of these in a subtree gives it a non-empty name from content; they
+# do not propagate out of aria-hidden="true" subtrees.
+_NAME_BITS = _HAS_IMG_ALT | _HAS_ARIA_LABEL | _HAS_TEXT
+
+
+class _Frame:
+    """One open element on the traversal stack."""
+
+    __slots__ = ("tag", "own", "desc", "text_start", "text", "exits", "is_label",
+                 "hidden", "name_id", "container", "children", "string")
+
+    def __init__(self, tag, container: str = "") -> None:
+        self.tag = tag
+        self.own = 0
+        self.desc = 0
+        self.text_start = -1
+        self.text = ""              # memoized text_of(), set when the frame closes
+        self.exits: Optional[List[Tuple[Callable, list]]] = None
+        self.is_label = False
+        self.hidden = False         # aria-hidden="true"
+        self.name_id: Optional[str] = None  # id whose _Names entry this frame fills
+        self.container = container  # nearest enclosing template/rt/rp
+        self.children = 0           # child count, for BeautifulSoup ``.string``
+        self.string: Optional[str] = None
+
+
+class _Ordered:
+    """Per-element results that must be read in document order.
+
+    A slot (a list whose first item is a "resolved" flag) is opened when its
+    element starts and resolved when it closes. Resolved slots at the front
+    are handed to ``fold`` at once, so only slots queued behind a still-open
+    element are retained — memory tracks nesting depth, not page size.
+    """
+
+    __slots__ = ("pending", "fold")
+
+    def __init__(self, fold: Callable[[list], None]) -> None:
+        self.pending: Deque[list] = deque()
+        self.fold = fold
+
+    def open(self, slot: list) -> None:
+        self.pending.append(slot)
+
+    def resolve(self, slot: list) -> None:
+        slot[0] = True
+        pending = self.pending
+        while pending and pending[0][0]:
+            self.fold(pending.popleft())
+
+    def flush(self) -> None:
+        while self.pending:
+            self.fold(self.pending.popleft())
+
+
+class _Signals:
+    """Per-scope signals collected while walking ``<body>``.
+
+    Everything is a counter or a capped sample list, folded in as each
+    element closes, so a walk holds no per-element state beyond the open
+    elements themselves.
+    """
+
+    def __init__(self) -> None:
+        self.images_total = 0
+        self.imgs_missing_alt = 0
+        self.missing_alt_samples: List[Dict[str, str]] = []
+        self.imgs_empty_alt = 0
+        self.imgs_redundant_alt = 0
+        self.alt_samples: List[str] = []
+        self.headings = _Ordered(self._fold_heading)    # [done, level, text]
+        self.headings_total = 0
+        self.h1_count = 0
+        self.prev_level = 0
+        self.outline: List[Dict[str, Any]] = []
+        self.skipped_levels: List[str] = []
+        self.landmarks: Dict[str, int] = {
+            "main": 0, "nav": 0, "header": 0, "footer": 0, "aside": 0,
+            "section": 0, "article": 0, "role_main": 0,
+            "role_navigation": 0, "role_contentinfo": 0,
+        }
+        # no_text / no-name slots hold True, or aria-labelledby ids to resolve.
+        self.anchors = _Ordered(self._fold_anchor)      # [done, no_text, generic, blank_no_rel, skip]
+        self.links_total = 0
+        self.links_no_text = 0
+        self.links_labelledby: List[Tuple[str, ...]] = []
+        self.links_generic_text: List[str] = []
+        self.links_target_blank_no_rel = 0
+        self.skip_link_present = False
+        self.buttons = _Ordered(self._fold_button)      # [done, no_name]
+        self.buttons_total = 0
+        self.buttons_no_name = 0
+        self.buttons_labelledby: List[Tuple[str, ...]] = []
+        self.form_count = 0
+        self.inputs_total = 0
+        # Inputs whose label is not known on entry (see _visit_input).
+        self.input_candidates: List[list] = []
+        self.inputs_sure_unlabeled = 0
+        self.inputs_unlisted = 0
+        self.label_for_ids: set = set()
+        self.aria_attr_count = 0
+        self.inline_onclick_non_interactive = 0
+        self.tables = _Ordered(self._fold_table)        # [done, has_th, has_caption]
+        self.tables_total = 0
+        self.tables_no_th = 0
+        self.tables_no_caption = 0
+        self.iframes_total = 0
+        self.iframes_no_title = 0
+        self.styled_seen = 0
+        self.color_pairs: List[Dict[str, str]] = []
+        self.contrast = contrast.ContrastTally()      # every inline colour pair
+
+    def _fold_heading(self, slot: list) -> None:
+        _, lvl, text = slot
+        self.headings_total += 1
+        if lvl == 1:
+            self.h1_count += 1
+        if self.prev_level and lvl > self.prev_level + 1:
+            self.skipped_levels.append(f"jumped from h{self.prev_level} → h{lvl} at \"{text}\"")
+        self.prev_level = lvl
+        if len(self.outline) < 15:
+            self.outline.append({"level": lvl, "text": text})
+
+    def _fold_anchor(self, slot: list) -> None:
+        _, no_text, generic, blank_no_rel, skip = slot
+        self.links_total += 1
+        if no_text is True:
+            self.links_no_text += 1
+        elif no_text:
+            self.links_labelledby.append(no_text)
+        elif generic is not None and len(self.links_generic_text) < 5:
+            self.links_generic_text.append(generic)
+        if blank_no_rel:
+            self.links_target_blank_no_rel += 1
+        if skip:
+            self.skip_link_present = True
+
+    def _fold_button(self, slot: list) -> None:
+        self.buttons_total += 1
+        if slot[1] is True:
+            self.buttons_no_name += 1
+        elif slot[1]:
+            self.buttons_labelledby.append(slot[1])
+
+    def _fold_table(self, slot: list) -> None:
+        self.tables_total += 1
+        if not slot[1]:
+            self.tables_no_th += 1
+        if not slot[2]:
+            self.tables_no_caption += 1
+
+    def flush(self) -> None:
+        """Fold slots of elements the parser never closed."""
+        for ordered in (self.headings, self.anchors, self.buttons, self.tables):
+            ordered.flush()
+
+
+class _Names:
+    """The accessible-name table every check reads from.
+
+    Names follow the W3C accname rules, computed bottom-up as each element
+    closes rather than by re-walking subtrees per check:
+
+    * ``aria-labelledby`` — named if any referenced element (first with that
+      id, anywhere in the document) has a name of its own. References can
+      point forwards, so they are resolved after the walk.
+    * ``aria-label`` / ``title`` — named when not blank.
+    * native — ``<img alt>`` (not blank); for form controls an enclosing
+      ``<label>`` or a ``<label for>`` that itself has a name.
+    * content (links, buttons, referenced elements, labels) — any
+      non-blank text, ``aria-label`` or ``<img alt>`` in the subtree, except
+      under ``aria-hidden="true"``; tracked with the ``_NAME_BITS``.
+
+    Only "has a name" is recorded per id, so the table is one bool per id.
+    """
+
+    __slots__ = ("ids",)
+
+    def __init__(self) -> None:
+        self.ids: Dict[str, bool] = {}
+
+    def resolve(self, refs: Tuple[str, ...]) -> bool:
+        return any(self.ids.get(ref) for ref in refs)
+
+
+def _has_own_name(frame: "_Frame") -> bool:
+    """aria-label, alt, content or title — the name of a referenced element."""
+    if (frame.own | frame.desc) & _NAME_BITS:
+        return True
+    return bool((frame.tag.get("title") or "").strip())
+
+
+def _labelledby(tag) -> Tuple[str, ...]:
+    return tuple((tag.get("aria-labelledby") or "").split())
+
+
+class _DomWalk:
+    """Collect every audit signal in a single depth-first traversal.
+
+    This is the sink driven by an ``html_parsers`` backend. Per-tag visitors
+    live in ``_TAG_VISITORS``; a visitor may register an exit callback on
+    the frame when its check needs the element's text or descendants (those
+    are only known once the subtree has been walked). Results are written
+    into slots allocated on entry, so output order is document order even
+    for nested elements. Element text is memoized per frame as it closes
+    and accessible names come from the shared ``_Names`` table, so nested
+    links, buttons and headings never re-read a subtree.
+    """
+
+    def __init__(self) -> None:
+        self.signals = _Signals()
+        self.collecting = True
+        self.frames: List[_Frame] = [_Frame(None)]
+        self.body_frame: Optional[_Frame] = None
+        self.head_frame: Optional[_Frame] = None
+        self.in_head = False
+        self.html_tag = None
+        self.title_frame: Optional[_Frame] = None
+        self.viewport_meta = None
+        self.charset_meta = None
+        self.content_type_meta = None
+        self.doctype_first: Optional[bool] = None
+        self.label_depth = 0
+        self.labels: List[list] = []      # per open <label>: input candidates inside it
+        self.names = _Names()
+        self.text_depth = 0
+        self.strings: List[Tuple[str, str]] = []
+        # Raw hrefs of <a>/<area> (document-wide), collected only on request.
+        self.links: Optional[List[str]] = None
+        self.base_href: Optional[str] = None
+        # <style> blocks and <link rel=stylesheet> hrefs (document-wide).
+        self.style_text: Optional[List[str]] = None   # the open <style>'s text
+        self.style_chars = 0
+        self.style_css: List[str] = []
+        self.style_contrast = contrast.ContrastTally()
+        self.stylesheets: List[str] = []
+        # Element names, classes, ids and attribute names outside <template>,
+        # which stylesheet rules are matched against.
+        self.page_tags: set = set()
+        self.page_classes: set = set()
+        self.page_ids: set = set()
+        self.page_attributes: set = set()
+
+    # ---- sink interface (see html_parsers) --------------------------------
+    def start(self, tag) -> bool:
+        name = tag.name
+        if name in _STRIPPED_TAGS or self.style_text is not None:
+            if name == "style" and self.style_text is None and self.frames[-1].container != "template":
+                # Not a frame: only its text is kept, for the contrast check.
+                self.style_text = []
+                return True
+            return False
+        parent = self.frames[-1]
+        if self.doctype_first is None and len(self.frames) == 1:
+            self.doctype_first = False
+        container = name if name in _STRING_CONTAINERS else parent.container
+        frame = _Frame(tag, container)
+        self.frames.append(frame)
+        self._enter(tag, frame)
+        return True
+
+    def end(self) -> None:
+        if self.style_text is not None:
+            self._close_style()
+            return
+        frame = self.frames.pop()
+        parent = self.frames[-1]
+        parent.children += 1
+        parent.string = frame.string if frame.children == 1 else None
+        self._leave(frame, parent)
+
+    def text(self, data: str, cdata: bool = False) -> None:
+        if self.style_text is not None:
+            self.style_text.append(data)
+            return
+        frames = self.frames
+        parent = frames[-1]
+        parent.children += 1
+        parent.string = data
+        blank = not data or data.isspace()
+        if self.doctype_first is None and len(frames) == 1 and (cdata or not blank):
+            self.doctype_first = False
+        if blank:
+            return
+        kind = "cdata" if cdata else parent.container
+        if kind == "" or kind == "cdata":
+            parent.desc |= _HAS_TEXT
+        if self.text_depth:
+            self.strings.append((kind, data.strip()))
+
+    def doctype(self, data: str) -> None:
+        self._special(data)
+        if self.doctype_first is None and len(self.frames) == 1:
+            self.doctype_first = True
+
+    def instruction(self, data: str) -> None:
+        self._special(data)
+        if self.doctype_first is None and len(self.frames) == 1:
+            self.doctype_first = False
+
+    def _special(self, data: str) -> None:
+        parent = self.frames[-1]
+        parent.children += 1
+        parent.string = data
+
+    # ---- traversal --------------------------------------------------------
+    def _enter(self, tag, frame: _Frame) -> None:
+        name = tag.name
+        attrs = tag.attrs
+        if frame.container != "template":
+            self.page_tags.add(name)
+            if attrs:
+                self._note_attrs(attrs)
+        if name == "base":
+            if self.base_href is None and attrs.get("href"):
+                self.base_href = attrs["href"]
+        elif name == "link":
+            self._visit_link(attrs)
+        elif self.links is not None and name in ("a", "area"):
+            href = attrs.get("href")
+            if href:
+                self.links.append(href)
+        if "aria-label" in attrs and (attrs["aria-label"] or "").strip():
+            frame.own |= _HAS_ARIA_LABEL
+        if "aria-hidden" in attrs and (attrs["aria-hidden"] or "").strip().lower() == "true":
+            frame.hidden = True
+        if "id" in attrs:
+            el_id = attrs["id"]
+            if el_id and el_id not in self.names.ids:
+                # Reserved on entry so the first element with the id wins, as
+                # with getElementById, even if a nested duplicate closes first.
+                self.names.ids[el_id] = False
+                frame.name_id = el_id
+        if name == "img" and (attrs.get("alt") or "").strip():
+            frame.own |= _HAS_IMG_ALT
+        elif name == "th":
+            frame.own |= _HAS_TH
+        elif name == "caption":
+            frame.own |= _HAS_CAPTION
+        elif name == "label":
+            frame.is_label = True
+            self.label_depth += 1
+            self.labels.append([])
+
+        if name == "html" and self.html_tag is None:
+            self.html_tag = tag
+        elif name == "title" and self.title_frame is None:
+            self.title_frame = frame
+        elif name == "head" and self.head_frame is None:
+            self.head_frame = frame
+            self.in_head = True
+        elif name == "meta" and self.in_head:
+            self._visit_head_meta(tag)
+        elif name == "body" and self.body_frame is None:
+            # Everything seen so far was outside <body>: start a fresh scope.
+            self.body_frame = frame
+            self.signals = _Signals()
+            self.collecting = True
+            return
+
+        if self.collecting:
+            _visit_any(self, tag, frame)
+            visitor = _TAG_VISITORS.get(name)
+            if visitor is not None:
+                visitor(self, tag, frame)
+
+    def _leave(self, frame: _Frame, parent: _Frame) -> None:
+        bits = frame.own | frame.desc
+        parent.desc |= bits & ~_NAME_BITS if frame.hidden else bits
+        if frame.name_id is not None:
+            self.names.ids[frame.name_id] = _has_own_name(frame)
+        if frame.text_start >= 0:
+            self._close_text(frame)
+        if frame.exits:
+            for callback, slot in frame.exits:
+                callback(self, frame, slot)
+        if frame.text_start >= 0:
+            self.text_depth -= 1
+            if not self.text_depth:
+                self.strings.clear()
+        if frame.is_label:
+            self.label_depth -= 1
+            inside = self.labels.pop()
+            if _has_own_name(frame):
+                for candidate in inside:
+                    candidate[3] = True
+            elif self.labels:
+                # An unnamed label may still sit inside a named one.
+                self.labels[-1].extend(inside)
+        if frame is self.head_frame:
+            self.in_head = False
+        elif frame is self.body_frame:
+            self.collecting = False
+
+    def _visit_link(self, attrs) -> None:
+        href = (attrs.get("href") or "").strip()
+        if not href or len(self.stylesheets) >= STYLESHEET_MAX_PER_PAGE:
+            return
+        rel = attrs.get("rel") or []
+        rel = [r.lower() for r in (rel if isinstance(rel, list) else str(rel).split())]
+        if "stylesheet" not in rel or "alternate" in rel:
+            return
+        if (attrs.get("media") or "").strip().lower() == "print":
+            return
+        if href not in self.stylesheets:
+            self.stylesheets.append(href)
+
+    def _close_style(self) -> None:
+        # Tallied once the whole page is known (see ``_build_evidence``).
+        css = "".join(self.style_text)[:_MAX_STYLE_CHARS - self.style_chars]
+        self.style_text = None
+        self.style_chars += len(css)
+        if css:
+            self.style_css.append(css)
+
+    def _note_attrs(self, attrs) -> None:
+        self.page_attributes.update(attrs)
+        classes = attrs.get("class")
+        if classes:
+            self.page_classes.update(classes)
+        el_id = attrs.get("id")
+        if el_id:
+            self.page_ids.add(el_id)
+
+    def _visit_head_meta(self, tag) -> None:
+        attrs = tag.attrs
+        if self.viewport_meta is None and attrs.get("name") == "viewport":
+            self.viewport_meta = tag
+        if self.charset_meta is None and "charset" in attrs:
+            self.charset_meta = tag
+        if self.content_type_meta is None:
+            equiv = attrs.get("http-equiv")
+            if equiv is not None and _CONTENT_TYPE_RE.search(equiv):
+                self.content_type_meta = tag
+
+    # ---- helpers for visitors --------------------------------------------
+    def want_text(self, frame: _Frame) -> None:
+        if frame.text_start < 0:
+            frame.text_start = len(self.strings)
+            self.text_depth += 1
+
+    def on_exit(self, frame: _Frame, callback: Callable, slot: list) -> None:
+        if frame.exits is None:
+            frame.exits = []
+        frame.exits.append((callback, slot))
+
+    def _close_text(self, frame: _Frame) -> None:
+        """Memoize ``frame``'s text and fold its strings into one per kind.
+
+        Text is the equivalent of ``tag.get_text(" ", strip=True)``. Like
+        BeautifulSoup, strings inside <template>/<rt>/<rp> only count
+        towards the text of that container element itself, so the strings
+        are grouped by kind (plain text first); an enclosing frame that
+        wants text then joins a few pre-joined pieces instead of rescanning
+        every string of this subtree.
+        """
+        strings = self.strings
+        start = frame.text_start
+        name = frame.tag.name
+        if len(strings) - start <= 1:
+            # Nothing to fold; the (at most one) string stays where it is.
+            kind, text = strings[start] if len(strings) > start else ("", "")
+            wanted = name if name in _STRING_CONTAINERS else ""
+            frame.text = text if ("" if kind == "cdata" else kind) == wanted else ""
+            return
+        groups: Dict[str, List[str]] = {"": []}
+        for kind, text in strings[start:]:
+            groups.setdefault("" if kind == "cdata" else kind, []).append(text)
+        frame.text = " ".join(groups.get(name, ()) if name in _STRING_CONTAINERS else groups[""])
+        del strings[start:]
+        strings.extend((kind, " ".join(parts)) for kind, parts in groups.items() if parts)
+
+    def text_of(self, frame: _Frame) -> str:
+        """Text of a closed frame that asked for it with ``want_text``."""
+        return frame.text
+
+    @property
+    def title(self) -> str:
+        frame = self.title_frame
+        if frame is None or frame.children != 1 or not frame.string:
+            return ""
+        return frame.string.strip()
+
+
+# ---- visitors -------------------------------------------------------------
+def _visit_any(walk: _DomWalk, tag, frame: _Frame) -> None:
+    """Attribute-driven checks that apply to every element in scope."""
+    sig = walk.signals
+    attrs = tag.attrs
+    for attr in attrs:
+        if attr.startswith("aria-") or attr == "role":
+            sig.aria_attr_count += 1
+    role = attrs.get("role")
+    if role is not None:
+        key = _LANDMARK_ROLES.get(role)
+        if key:
+            sig.landmarks[key] += 1
+    if "onclick" in attrs and tag.name not in ("button", "a", "input"):
+        sig.inline_onclick_non_interactive += 1
+    if "style" in attrs and sig.styled_seen < 100 and len(sig.color_pairs) < 5:
+        sig.styled_seen += 1
+        style = attrs.get("style", "")
+        fg = _FG_COLOR_RE.search(style)
+        bg = _BG_COLOR_RE.search(style)
+        if fg and bg:
+            pair = {
+                "selector": _selector_for(tag),
+                "color": fg.group(1).strip(),
+                "background": bg.group(1).strip(),
+                "sample_text": "",
+            }
+            sig.color_pairs.append(pair)
+            walk.want_text(frame)
+            walk.on_exit(frame, _leave_styled, [pair])
+    if ("style" in attrs and attrs["style"] and frame.container != "template"
+            and _COLOR_HINT_RE.search(attrs["style"])):
+        declared = contrast.declared_pair(attrs["style"])
+        if declared is not None and not sig.contrast.count(*declared):
+            sig.contrast.add(declared[0], declared[1], declared[2], _selector_for(tag), "inline")
+
+
+def _leave_styled(walk: _DomWalk, frame: _Frame, slot: list) -> None:
+    slot[0]["sample_text"] = _short(walk.text_of(frame), 40)
+
+
+def _visit_img(walk: _DomWalk, img, frame: _Frame) -> None:
+    sig = walk.signals
+    sig.images_total += 1
+    alt = img.get("alt")
+    src = img.get("src", "") or img.get("data-src", "")
+    if alt is None:
+        sig.imgs_missing_alt += 1
+        if len(sig.missing_alt_samples) < 5:
+            sig.missing_alt_samples.append({
+                "selector": _selector_for(img),
+                "src": _short(src, 100),
+            })
+    elif alt.strip() == "":
+        sig.imgs_empty_alt += 1
+    else:
+        alt_low = alt.lower().strip()
+        if (alt_low.startswith(("image of", "picture of", "photo of", "graphic of"))
+                or alt_low.endswith((".jpg", ".png", ".jpeg", ".gif", ".webp", ".svg"))):
+            sig.imgs_redundant_alt += 1
+        if len(sig.alt_samples) < 5:
+            sig.alt_samples.append(_short(alt, 60))
+
+
+def _visit_heading(walk: _DomWalk, h, frame: _Frame) -> None:
+    slot = [False, int(h.name[1]), ""]
+    walk.signals.headings.open(slot)
+    walk.want_text(frame)
+    walk.on_exit(frame, _leave_heading, slot)
+
+
+def _leave_heading(walk: _DomWalk, frame: _Frame, slot: list) -> None:
+    slot[2] = _short(walk.text_of(frame), 80)
+    walk.signals.headings.resolve(slot)
+
+
+def _visit_landmark(walk: _DomWalk, tag, frame: _Frame) -> None:
+    walk.signals.landmarks[tag.name] += 1
+
+
+def _visit_anchor(walk: _DomWalk, a, frame: _Frame) -> None:
+    blank_no_rel = False
+    if a.get("target") == "_blank":
+        rel = (a.get("rel") or [])
+        if isinstance(rel, list):
+            rel_str = " ".join(rel).lower()
+        else:
+            rel_str = str(rel).lower()
+        blank_no_rel = "noopener" not in rel_str
+    slot = [False, False, None, blank_no_rel, False]
+    walk.signals.anchors.open(slot)
+    walk.want_text(frame)
+    walk.on_exit(frame, _leave_anchor, slot)
+
+
+def _leave_anchor(walk: _DomWalk, frame: _Frame, slot: list) -> None:
+    a = frame.tag
+    text = walk.text_of(frame)
+    href = a.get("href")
+    if href is not None and href.startswith("#") and href != "#":
+        low = text.lower()
+        if "skip" in low and ("content" in low or "main" in low or "navigation" in low):
+            slot[4] = True
+    if not _has_own_name(frame):
+        # Unnamed unless aria-labelledby resolves once the walk is done.
+        slot[1] = _labelledby(a) or True
+    elif text and text.lower().strip(".:! ") in GENERIC_LINK_TEXTS:
+        slot[2] = _short(text, 30)
+    walk.signals.anchors.resolve(slot)
+
+
+def _visit_button(walk: _DomWalk, b, frame: _Frame) -> None:
+    slot = [False, False]
+    walk.signals.buttons.open(slot)
+    walk.on_exit(frame, _leave_button, slot)
+
+
+def _leave_button(walk: _DomWalk, frame: _Frame, slot: list) -> None:
+    if not _has_own_name(frame):
+        slot[1] = _labelledby(frame.tag) or True
+    walk.signals.buttons.resolve(slot)
+
+
+def _visit_form(walk: _DomWalk, form, frame: _Frame) -> None:
+    walk.signals.form_count += 1
+
+
+def _visit_input(walk: _DomWalk, el, frame: _Frame) -> None:
+    if el.name == "input" and el.get("type", "text").lower() in _UNLABELED_INPUT_TYPES:
+        return
+    sig = walk.signals
+    sig.inputs_total += 1
+    if (el.get("aria-label") or "").strip() or (el.get("title") or "").strip():
+        return
+    # An enclosing <label> is known when it closes; <label for> and
+    # aria-labelledby after the walk, once every label and id is known.
+    # Only the id is kept, plus a sample while fewer than five certainly
+    # unlabeled inputs precede it.
+    el_id = el.get("id") or None
+    refs = _labelledby(el)
+    sample = None
+    if sig.inputs_sure_unlabeled < 5:
+        sample = {
+            "selector": _selector_for(el),
+            "type": el.get("type", el.name),
+            "placeholder": _short(el.get("placeholder", ""), 40),
+        }
+    if el_id is None and not refs and not walk.label_depth:
+        sig.inputs_sure_unlabeled += 1
+        if sample is None:
+            sig.inputs_unlisted += 1
+            return
+    candidate = [el_id, sample, refs, False]      # [id, sample, labelledby, labelled]
+    sig.input_candidates.append(candidate)
+    if walk.label_depth:
+        walk.labels[-1].append(candidate)
+
+
+def _visit_label(walk: _DomWalk, lbl, frame: _Frame) -> None:
+    target = lbl.get("for")
+    if target:
+        walk.on_exit(frame, _leave_label, [walk.signals, target])
+
+
+def _leave_label(walk: _DomWalk, frame: _Frame, slot: list) -> None:
+    sig, target = slot
+    if _has_own_name(frame):
+        sig.label_for_ids.add(target)
+
+
+def _visit_table(walk: _DomWalk, table, frame: _Frame) -> None:
+    slot = [False, False, False]
+    walk.signals.tables.open(slot)
+    walk.on_exit(frame, _leave_table, slot)
+
+
+def _leave_table(walk: _DomWalk, frame: _Frame, slot: list) -> None:
+    slot[1] = bool(frame.desc & _HAS_TH)
+    slot[2] = bool(frame.desc & _HAS_CAPTION)
+    walk.signals.tables.resolve(slot)
+
+
+def _visit_iframe(walk: _DomWalk, f, frame: _Frame) -> None:
+    sig = walk.signals
+    sig.iframes_total += 1
+    if not (f.get("title") or "").strip():
+        sig.iframes_no_title += 1
+
+
+_TAG_VISITORS: Dict[str, Callable[[_DomWalk, Any, _Frame], None]] = {
+    "img": _visit_img,
+    "a": _visit_anchor,
+    "button": _visit_button,
+    "form": _visit_form,
+    "input": _visit_input,
+    "textarea": _visit_input,
+    "select": _visit_input,
+    "label": _visit_label,
+    "table": _visit_table,
+    "iframe": _visit_iframe,
+}
+_TAG_VISITORS.update({h: _visit_heading for h in _HEADING_TAGS})
+_TAG_VISITORS.update({name: _visit_landmark for name in _LANDMARK_TAGS})
+
+
+@evidence_cache.memoize("audit_html", bypass_if=("links",))
+def audit_html(html: str, base_url: str, parser: Optional[str] = None,
+               links: Optional[List[str]] = None,
+               low_memory: Optional[bool] = None) -> Dict[str, Any]:
     """Walk the fetched HTML and return an objective evidence dict.
 
     The returned shape is intentionally JSON-serialisable and stable so the
     frontend can render it directly and the LLM can cite specific numbers.
+    All signals come from one depth-first traversal (see ``_DomWalk``) fed
+    by the ``parser`` backend from ``html_parsers`` (default: configured /
+    fastest installed).
+
+    When ``links`` is a list, the absolute URL of every ``<a>``/``<area>``
+    href on the page (resolved against ``<base href>`` and ``base_url``) is
+    appended to it during the same walk — the site crawler uses this.
+    Calls without ``links`` are memoized by ``evidence_cache``.
+
+    ``low_memory`` (default: pages of ``AUDIT_LOW_MEMORY_BYTES`` or more)
+    skips the parse tree: the markup is tokenized slice by slice by the
+    incremental backend (selectolax is replaced by lxml, see
+    ``html_parsers.get_incremental``), the walk materializes only the
+    attributes of elements still open, and skipped subtrees
+    (``<script>``/``<style>``/``<noscript>``) are never built. Either way
+    ``memory_budget.MemoryBudget`` enforces ``AUDIT_MAX_MEMORY_MB`` and
+    raises ``MemoryLimitExceeded`` past it. Deeply nested pages (more than
+    ``_MAX_TREE_NESTING`` unclosed start tags) are streamed as well.
+
+    The page is cut at ``AUDIT_HTML_MAX_CHARS``; a streamed page stops
+    being fed once ``AUDIT_HTML_BUDGET_SECONDS`` is spent, and the evidence
+    then covers what was walked, flagged ``truncated``.
     """
-    soup = BeautifulSoup(html or "", "html.parser")
+    walk = _DomWalk()
+    walk.links = [] if links is not None else None
+    guard = audit_limits.AuditGuard("audit_html")
+    html = guard.cap(html or "")
+    budget = memory_budget.MemoryBudget()
+    if low_memory is None:
+        low_memory = (len(html) >= AUDIT_LOW_MEMORY_BYTES
+                      or html.count("<") - 2 * html.count("</") > _MAX_TREE_NESTING)
+    if low_memory:
+        stream = html_parsers.get_incremental(parser).open(walk)
+        for start in range(0, len(html), _LOW_MEMORY_SLICE):
+            stream.feed_text(html[start:start + _LOW_MEMORY_SLICE])
+            budget.check()
+            if start + _LOW_MEMORY_SLICE < len(html) and guard.expired():
+                guard.stopped_at(start + _LOW_MEMORY_SLICE)
+                break
+        stream.close()
+    else:
+        html_parsers.get_backend(parser).feed(html, walk)
+    budget.check()
+    if links is not None:
+        base = urljoin(base_url, walk.base_href) if walk.base_href else base_url
+        links.extend(urljoin(base, href.strip()) for href in walk.links)
+    return guard.mark(_build_evidence(walk, base_url))
 
-    # Strip script/style/comments so text-content checks aren't polluted
-    for s in soup(["script", "style", "noscript"]):
-        s.extract()
-    for c in soup.find_all(string=lambda t: isinstance(t, Comment)):
-        c.extract()
 
-    html_tag = soup.find("html")
-    head = soup.find("head")
-    body = soup.find("body") or soup
+class StreamingAudit:
+    """``audit_html`` for a document that arrives in byte chunks.
+
+    ``feed()`` decodes and tokenizes each chunk immediately, updating the
+    same ``_DomWalk`` signals ``audit_html`` collects; ``close()`` returns
+    the evidence dict. Nothing but the walk's running state is retained, so
+    memory stays at roughly one chunk regardless of page size. The result is
+    identical to ``audit_html`` on the decoded page with the same backend.
+    The memory ceiling is checked after every chunk; past it ``feed()``
+    raises ``MemoryLimitExceeded``, which also abandons the download. Once
+    ``AUDIT_HTML_BUDGET_SECONDS`` is spent further chunks are ignored and
+    the evidence is flagged ``truncated`` (sizes in bytes).
+    """
+
+    def __init__(self, encoding: Optional[str] = None, parser: Optional[str] = None) -> None:
+        self.walk = _DomWalk()
+        self.backend = html_parsers.get_incremental(parser)
+        self.budget = memory_budget.MemoryBudget()
+        self.guard = audit_limits.AuditGuard("audit_html")
+        self.guard.input_chars = self.fed = 0
+        self._parser = self.backend.open(self.walk, encoding)
+
+    def feed(self, chunk: bytes) -> None:
+        self.guard.input_chars += len(chunk)
+        if self.guard.expired():
+            self.guard.stopped_at(self.fed)
+            return
+        self._parser.feed(chunk)
+        self.fed += len(chunk)
+        self.budget.check()
+
+    def close(self, base_url: str = "") -> Dict[str, Any]:
+        """Finish the parse; ``base_url`` resolves linked stylesheet URLs."""
+        self._parser.close()
+        self.budget.check()
+        return self.guard.mark(_build_evidence(self.walk, base_url))
+
+
+def _audit_soup(soup) -> Dict[str, Any]:
+    """Audit an already-parsed BeautifulSoup tree (used by the benchmark)."""
+    walk = _DomWalk()
+    html_parsers.walk_soup(soup, walk)
+    return _build_evidence(walk)
+
+
+def _build_evidence(walk: _DomWalk, base_url: str = "") -> Dict[str, Any]:
+    sig = walk.signals
 
     # ---- Meta -----------------------------------------------------------
-    title = (soup.title.string.strip() if soup.title and soup.title.string else "")
+    title = walk.title
+    html_tag = walk.html_tag
     lang = html_tag.get("lang", "").strip() if html_tag else ""
     viewport_meta = ""
-    if head:
-        vp = head.find("meta", attrs={"name": "viewport"})
-        if vp:
-            viewport_meta = vp.get("content", "")
+    if walk.viewport_meta is not None:
+        viewport_meta = walk.viewport_meta.get("content", "")
     charset = ""
-    if head:
-        meta_charset = head.find("meta", attrs={"charset": True})
-        if meta_charset:
-            charset = meta_charset.get("charset", "")
-        else:
-            ct = head.find("meta", attrs={"http-equiv": re.compile("content-type", re.I)})
-            if ct and ct.get("content"):
-                m = re.search(r"charset=([\w-]+)", ct["content"], re.I)
-                if m:
-                    charset = m.group(1)
+    if walk.charset_meta is not None:
+        charset = walk.charset_meta.get("charset", "")
+    elif walk.content_type_meta is not None:
+        ct = walk.content_type_meta
+        if ct.get("content"):
+            m = _CHARSET_RE.search(ct["content"])
+            if m:
+                charset = m.group(1)
 
     # ---- Images ---------------------------------------------------------
-    images = body.find_all("img")
-    imgs_total = len(images)
-    imgs_missing_alt: List[Dict[str, str]] = []
-    imgs_empty_alt = 0  # decorative — alt="" present, this is OK
-    imgs_redundant_alt = 0  # alt that just says "image of …" / filename
-    alt_samples: List[str] = []
-    for img in images:
-        alt = img.get("alt")
-        src = img.get("src", "") or img.get("data-src", "")
-        if alt is None:
-            imgs_missing_alt.append({
-                "selector": _selector_for(img),
-                "src": _short(src, 100),
-            })
-        elif alt.strip() == "":
-            imgs_empty_alt += 1
-        else:
-            alt_low = alt.lower().strip()
-            if (alt_low.startswith(("image of", "picture of", "photo of", "graphic of"))
-                    or alt_low.endswith((".jpg", ".png", ".jpeg", ".gif", ".webp", ".svg"))):
-                imgs_redundant_alt += 1
-            if len(alt_samples) < 5:
-                alt_samples.append(_short(alt, 60))
+    sig.flush()
+    names = walk.names
+    imgs_total = sig.images_total
+    imgs_missing_alt = sig.imgs_missing_alt
 
     # ---- Headings -------------------------------------------------------
-    headings: List[Tuple[int, str]] = []
-    for h in body.find_all(re.compile(r"^h[1-6]$")):
-        level = int(h.name[1])
-        headings.append((level, _short(h.get_text(" ", strip=True), 80)))
-    h1_count = sum(1 for lvl, _ in headings if lvl == 1)
-    skipped_levels: List[str] = []
-    if headings:
-        prev = 0
-        for lvl, text in headings:
-            if prev and lvl > prev + 1:
-                skipped_levels.append(f"jumped from h{prev} → h{lvl} at \"{text}\"")
-            prev = lvl
-
-    # ---- Landmarks ------------------------------------------------------
-    landmarks = {
-        "main": len(body.find_all("main")),
-        "nav": len(body.find_all("nav")),
-        "header": len(body.find_all("header")),
-        "footer": len(body.find_all("footer")),
-        "aside": len(body.find_all("aside")),
-        "section": len(body.find_all("section")),
-        "article": len(body.find_all("article")),
-        "role_main": len(body.find_all(attrs={"role": "main"})),
-        "role_navigation": len(body.find_all(attrs={"role": "navigation"})),
-        "role_contentinfo": len(body.find_all(attrs={"role": "contentinfo"})),
-    }
-    # Skip link — first anchor whose href starts with '#' (excluding '#')
-    skip_link_present = False
-    for a in body.find_all("a", href=True):
-        if a["href"].startswith("#") and a["href"] != "#":
-            text = a.get_text(" ", strip=True).lower()
-            if "skip" in text and ("content" in text or "main" in text or "navigation" in text):
-                skip_link_present = True
-                break
+    headings_total = sig.headings_total
+    h1_count = sig.h1_count
+    skipped_levels = sig.skipped_levels
 
-    # ---- Links ----------------------------------------------------------
-    anchors = body.find_all("a")
-    links_total = len(anchors)
-    links_no_text = 0
-    links_generic_text: List[str] = []
-    links_target_blank_no_rel = 0
-    for a in anchors:
-        text = a.get_text(" ", strip=True)
-        aria_label = (a.get("aria-label") or "").strip()
-        title_attr = (a.get("title") or "").strip()
-        effective = text or aria_label or title_attr
-        if not effective and not a.find("img", alt=True):
-            links_no_text += 1
-        elif text and text.lower().strip(".:! ") in GENERIC_LINK_TEXTS:
-            if len(links_generic_text) < 5:
-                links_generic_text.append(_short(text, 30))
-        if a.get("target") == "_blank":
-            rel = (a.get("rel") or [])
-            if isinstance(rel, list):
-                rel_str = " ".join(rel).lower()
-            else:
-                rel_str = str(rel).lower()
-            if "noopener" not in rel_str:
-                links_target_blank_no_rel += 1
+    # ---- Landmarks / links ---------------------------------------------
+    landmarks = sig.landmarks
+    skip_link_present = sig.skip_link_present
+    links_no_text = sig.links_no_text + sum(
+        1 for refs in sig.links_labelledby if not names.resolve(refs))
+    links_generic_text = sig.links_generic_text
 
     # ---- Buttons --------------------------------------------------------
-    buttons = body.find_all("button")
-    buttons_no_accessible_name = 0
-    for b in buttons:
-        if (b.get_text(" ", strip=True) or b.get("aria-label") or b.get("title")):
-            continue
-        if b.find("img", alt=True) or b.find(attrs={"aria-label": True}):
-            continue
-        buttons_no_accessible_name += 1
+    buttons_no_accessible_name = sig.buttons_no_name + sum(
+        1 for refs in sig.buttons_labelledby if not names.resolve(refs))
 
     # ---- Forms ----------------------------------------------------------
-    forms = body.find_all("form")
-    inputs = body.find_all(["input", "textarea", "select"])
-    inputs_total = 0
-    inputs_unlabeled: List[Dict[str, str]] = []
-    label_for_ids = {lbl.get("for") for lbl in body.find_all("label") if lbl.get("for")}
-    for el in inputs:
-        if el.name == "input" and el.get("type", "text").lower() in ("hidden", "submit", "button", "reset", "image"):
-            continue
-        inputs_total += 1
-        el_id = el.get("id")
-        has_label = bool(el_id and el_id in label_for_ids)
-        wrapped_in_label = bool(el.find_parent("label"))
-        has_aria_label = bool(el.get("aria-label") or el.get("aria-labelledby"))
-        has_title = bool(el.get("title"))
-        if not (has_label or wrapped_in_label or has_aria_label or has_title):
-            inputs_unlabeled.append({
-                "selector": _selector_for(el),
-                "type": el.get("type", el.name),
-                "placeholder": _short(el.get("placeholder", ""), 40),
-            })
+    inputs_unlabeled = sig.inputs_unlisted
+    inputs_unlabeled_samples: List[Dict[str, str]] = []
+    for el_id, sample, refs, labelled in sig.input_candidates:
+        if not (labelled or (el_id is not None and el_id in sig.label_for_ids)
+                or (refs and names.resolve(refs))):
+            inputs_unlabeled += 1
+            if sample is not None and len(inputs_unlabeled_samples) < 5:
+                inputs_unlabeled_samples.append(sample)
 
-    # ---- ARIA / interactive -------------------------------------------
-    aria_attr_count = 0
-    for tag in body.find_all(True):
-        for attr in tag.attrs:
-            if attr.startswith("aria-") or attr == "role":
-                aria_attr_count += 1
-    inline_onclick_non_interactive = 0
-    for tag in body.find_all(attrs={"onclick": True}):
-        if tag.name not in ("button", "a", "input"):
-            inline_onclick_non_interactive += 1
-
-    # ---- Tables ---------------------------------------------------------
-    tables = body.find_all("table")
-    tables_no_th = sum(1 for t in tables if not t.find("th"))
-    tables_no_caption = sum(1 for t in tables if not t.find("caption"))
-
-    # ---- iframes --------------------------------------------------------
-    iframes = body.find_all("iframe")
-    iframes_no_title = sum(1 for f in iframes if not (f.get("title") or "").strip())
-
-    # ---- Inline style colours (best-effort sample) ----------------------
-    style_color_pairs: List[Dict[str, str]] = []
-    for tag in body.find_all(style=True)[:100]:
-        style = tag.get("style", "")
-        fg = re.search(r"(?<!background-)color\s*:\s*([^;]+)", style, re.I)
-        bg = re.search(r"background(?:-color)?\s*:\s*([^;]+)", style, re.I)
-        if fg and bg:
-            style_color_pairs.append({
-                "selector": _selector_for(tag),
-                "color": fg.group(1).strip(),
-                "background": bg.group(1).strip(),
-                "sample_text": _short(tag.get_text(" ", strip=True), 40),
-            })
-        if len(style_color_pairs) >= 5:
-            break
+    # ---- Tables / iframes ----------------------------------------------
+    iframes_no_title = sig.iframes_no_title
+    aria_attr_count = sig.aria_attr_count
+    inline_onclick_non_interactive = sig.inline_onclick_non_interactive
+    style_color_pairs = sig.color_pairs
+
+    # ---- Contrast (1.4.3) ----------------------------------------------
+    if walk.style_text is not None:
+        walk._close_style()
+    page_selectors = contrast.inventory(walk.page_tags, walk.page_classes, walk.page_ids,
+                                        walk.page_attributes)
+    matches = contrast.selector_matcher(page_selectors)
+    for css in walk.style_css:
+        walk.style_contrast.add_css(css, "style", matches)
+    contrast_summary = contrast.merge_summaries(walk.style_contrast.summary(),
+                                                sig.contrast.summary())
+    base = urljoin(base_url, walk.base_href) if walk.base_href else base_url
+    contrast_summary["stylesheets"] = [
+        url for url in (urljoin(base, href) for href in walk.stylesheets)
+        if urlparse(url).scheme in ("http", "https")
+    ]
+    contrast_summary["page_selectors"] = page_selectors
 
     # ---- Build evidence ------------------------------------------------
     evidence = {
@@ -505,67 +1432,68 @@ def audit_html(html: str, base_url: str) -> Dict[str, Any]:
             "lang": lang,
             "viewport": viewport_meta,
             "charset": charset,
-            "doctype_present": str(soup).lstrip()[:9].lower().startswith("<!doctype"),
+            "doctype_present": bool(walk.doctype_first),
         },
         "images": {
             "total": imgs_total,
-            "missing_alt": len(imgs_missing_alt),
-            "missing_alt_samples": imgs_missing_alt[:5],
-            "decorative_alt_empty": imgs_empty_alt,
-            "redundant_alt": imgs_redundant_alt,
-            "alt_samples": alt_samples,
+            "missing_alt": imgs_missing_alt,
+            "missing_alt_samples": sig.missing_alt_samples,
+            "decorative_alt_empty": sig.imgs_empty_alt,
+            "redundant_alt": sig.imgs_redundant_alt,
+            "alt_samples": sig.alt_samples,
             "coverage_percent": (
-                round(100 * (imgs_total - len(imgs_missing_alt)) / imgs_total, 1)
+                round(100 * (imgs_total - imgs_missing_alt) / imgs_total, 1)
                 if imgs_total else 100.0
             ),
         },
         "headings": {
-            "total": len(headings),
+            "total": headings_total,
             "h1_count": h1_count,
-            "outline": [{"level": lvl, "text": txt} for lvl, txt in headings[:15]],
+            "outline": sig.outline,
             "skipped_levels": skipped_levels,
         },
         "landmarks": landmarks,
         "skip_link_present": skip_link_present,
         "links": {
-            "total": links_total,
+            "total": sig.links_total,
             "no_text": links_no_text,
             "generic_text_samples": links_generic_text,
-            "target_blank_missing_noopener": links_target_blank_no_rel,
+            "target_blank_missing_noopener": sig.links_target_blank_no_rel,
         },
         "buttons": {
-            "total": len(buttons),
+            "total": sig.buttons_total,
             "no_accessible_name": buttons_no_accessible_name,
         },
         "forms": {
-            "form_count": len(forms),
-            "inputs_total": inputs_total,
-            "inputs_unlabeled": len(inputs_unlabeled),
-            "inputs_unlabeled_samples": inputs_unlabeled[:5],
+            "form_count": sig.form_count,
+            "inputs_total": sig.inputs_total,
+            "inputs_unlabeled": inputs_unlabeled,
+            "inputs_unlabeled_samples": inputs_unlabeled_samples,
         },
         "aria": {
             "attribute_count": aria_attr_count,
             "inline_onclick_on_non_interactive": inline_onclick_non_interactive,
         },
         "tables": {
-            "total": len(tables),
-            "missing_th": tables_no_th,
-            "missing_caption": tables_no_caption,
+            "total": sig.tables_total,
+            "missing_th": sig.tables_no_th,
+            "missing_caption": sig.tables_no_caption,
         },
         "iframes": {
-            "total": len(iframes),
+            "total": sig.iframes_total,
             "missing_title": iframes_no_title,
         },
         "color_samples_inline": style_color_pairs,
+        "contrast": contrast_summary,
     }
 
     # Lightweight pre-flagging — these are the criteria the LLM should at
     # minimum address (since we have hard evidence one way or the other).
     flagged: List[Dict[str, Any]] = []
-    if imgs_total and len(imgs_missing_alt) > 0:
+    if imgs_total and imgs_missing_alt > 0:
         flagged.append({
             "wcag": "1.1.1",
-            "summary": f"{len(imgs_missing_alt)} of {imgs_total} images have no alt attribute",
+            "summary": f"{imgs_missing_alt} of {imgs_total} images have no alt attribute",
         })
     if not lang:
         flagged.append({"wcag": "3.1.1", "summary": "<html> is missing a lang attribute"})
@@ -573,7 +1501,7 @@ def audit_html(html: str, base_url: str) -> Dict[str, Any]:
         flagged.append({"wcag": "2.4.2", "summary": "<title> is empty or missing"})
     if not viewport_meta:
         flagged.append({"wcag": "1.4.10", "summary": "No <meta name='viewport'> declared"})
-    if h1_count == 0 and len(headings) > 0:
+    if h1_count == 0 and headings_total > 0:
         flagged.append({"wcag": "2.4.6", "summary": "No <h1> heading on the page"})
     if h1_count > 1:
         flagged.append({"wcag": "1.3.1", "summary": f"Multiple <h1> elements found ({h1_count})"})
@@ -595,10 +1523,10 @@ def audit_html(html: str, base_url: str) -> Dict[str, Any]:
             "wcag": "4.1.2",
             "summary": f"{buttons_no_accessible_name} button(s) without accessible name",
         })
-    if len(inputs_unlabeled) > 0:
+    if inputs_unlabeled > 0:
         flagged.append({
             "wcag": "3.3.2",
-            "summary": f"{len(inputs_unlabeled)} form input(s) with no associated label",
+            "summary": f"{inputs_unlabeled} form input(s) with no associated label",
         })
     if iframes_no_title > 0:
         flagged.append({
@@ -610,8 +1538,29 @@ def audit_html(html: str, base_url: str) -> Dict[str, Any]:
             "wcag": "2.1.1",
             "summary": f"{inline_onclick_non_interactive} non-interactive element(s) with inline onclick — likely keyboard-inaccessible",
         })
+    contrast_finding = _contrast_finding(contrast_summary)
+    if contrast_finding:
+        flagged.append(contrast_finding)
+
+    evidence["flagged_findings"] = flagged
+    evidence["sources"] = _sources_for(flagged)
+    return evidence
 
-    # Attach canonical sources for every flagged criterion.
+
+def _contrast_finding(summary: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if not summary["below_aa"]:
+        return None
+    worst = summary["worst"][0]
+    return {
+        "wcag": "1.4.3",
+        "summary": (f"{summary['below_aa']} of {summary['checked']} colour declaration(s) "
+                    f"below the AA contrast ratio (worst {worst['ratio']}:1, "
+                    f"{worst['color']} on {worst['background']} at {worst['selector']})"),
+    }
+
+
+def _sources_for(flagged: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """Canonical sources for every flagged criterion."""
     referenced_criteria = sorted({f["wcag"] for f in flagged})
     sources: List[Dict[str, str]] = []
     for crit in referenced_criteria:
@@ -626,86 +1575,109 @@ def audit_html(html: str, base_url: str) -> Dict[str, Any]:
             "w3c_understanding_url": ref["w3c"],
             "deep_dive_url": ref["deep_dive"],
         })
+    return sources
 
-    evidence["flagged_findings"] = flagged
-    evidence["sources"] = sources
-    return evidence
 
-
-def evidence_summary_for_prompt(evidence: Dict[str, Any]) -> str:
+def evidence_summary_for_prompt(evidence: Dict[str, Any], max_tokens: Optional[int] = None) -> str:
     """Render a compact human-readable summary of the evidence dict so the
     LLM can ingest it cheaply and ground every claim in real numbers.
+
+    Counts and pre-flagged findings are always included; samples (missing
+    alt, unlabeled inputs, low-contrast pairs, the outline, inline colours)
+    fill what is left of ``max_tokens`` (default: the ``score`` budget, see
+    ``prompt_budget``), most useful first. The returned string carries
+    ``.tokens``, the estimate for what it contains.
     """
     e = evidence
-    lines: List[str] = []
-    lines.append("PAGE METADATA")
-    lines.append(
+    out = prompt_budget.Packer(prompt_budget.budget_for("score") if max_tokens is None else max_tokens)
+    note = audit_limits.prompt_note(e)
+    if note:
+        out.require(note)
+    out.require("PAGE METADATA")
+    out.require(
         f"  title='{e['page']['title']}' (len={e['page']['title_length']}); "
         f"lang='{e['page']['lang']}'; viewport='{e['page']['viewport']}'; "
         f"charset='{e['page']['charset']}'; doctype={e['page']['doctype_present']}"
     )
-    lines.append("IMAGES")
+    out.require("IMAGES")
     img = e["images"]
-    lines.append(
+    out.require(
         f"  total={img['total']}; missing_alt={img['missing_alt']}; "
         f"decorative_empty_alt={img['decorative_alt_empty']}; "
         f"redundant_alt={img['redundant_alt']}; coverage={img['coverage_percent']}%"
     )
-    if img["missing_alt_samples"]:
-        for s in img["missing_alt_samples"]:
-            lines.append(f"    NO-ALT: {s['selector']}  src={s['src']}")
-    lines.append("HEADINGS")
+    for s in img["missing_alt_samples"]:
+        out.add(f"    NO-ALT: {s['selector']}  src={s['src']}", priority=3, group="no_alt")
+    out.require("HEADINGS")
     h = e["headings"]
-    lines.append(f"  total={h['total']}; h1_count={h['h1_count']}; skipped_levels={h['skipped_levels'] or 'none'}")
+    out.require(f"  total={h['total']}; h1_count={h['h1_count']}; skipped_levels={h['skipped_levels'] or 'none'}")
     if h["outline"]:
         outline_str = " > ".join(f"h{o['level']}:{o['text'][:24]}" for o in h["outline"][:6])
-        lines.append(f"  outline: {outline_str}")
-    lines.append("LANDMARKS")
+        out.add(f"  outline: {outline_str}", priority=1, group="outline")
+    out.require("LANDMARKS")
     l = e["landmarks"]
-    lines.append(
+    out.require(
         f"  main={l['main']} nav={l['nav']} header={l['header']} footer={l['footer']} "
         f"aside={l['aside']} role_main={l['role_main']}"
     )
-    lines.append(f"  skip_link_present={e['skip_link_present']}")
-    lines.append("LINKS")
+    out.require(f"  skip_link_present={e['skip_link_present']}")
+    out.require("LINKS")
     lk = e["links"]
-    lines.append(
+    out.require(
         f"  total={lk['total']}; no_text={lk['no_text']}; "
         f"generic_text={lk['generic_text_samples'] or 'none'}; "
         f"target_blank_missing_noopener={lk['target_blank_missing_noopener']}"
     )
-    lines.append("BUTTONS")
-    lines.append(f"  total={e['buttons']['total']}; no_accessible_name={e['buttons']['no_accessible_name']}")
-    lines.append("FORMS")
+    out.require("BUTTONS")
+    out.require(f"  total={e['buttons']['total']}; no_accessible_name={e['buttons']['no_accessible_name']}")
+    out.require("FORMS")
     f = e["forms"]
-    lines.append(
+    out.require(
         f"  form_count={f['form_count']}; inputs_total={f['inputs_total']}; "
         f"inputs_unlabeled={f['inputs_unlabeled']}"
     )
-    if f["inputs_unlabeled_samples"]:
-        for s in f["inputs_unlabeled_samples"]:
-            lines.append(
-                f"    UNLABELED: {s['selector']} type={s['type']} placeholder='{s['placeholder']}'"
-            )
-    lines.append("ARIA")
-    lines.append(
+    for s in f["inputs_unlabeled_samples"]:
+        out.add(
+            f"    UNLABELED: {s['selector']} type={s['type']} placeholder='{s['placeholder']}'",
+            priority=3, group="unlabeled",
+        )
+    out.require("ARIA")
+    out.require(
         f"  aria_attribute_count={e['aria']['attribute_count']}; "
         f"inline_onclick_non_interactive={e['aria']['inline_onclick_on_non_interactive']}"
     )
-    lines.append("TABLES")
+    out.require("TABLES")
     t = e["tables"]
-    lines.append(f"  total={t['total']}; missing_th={t['missing_th']}; missing_caption={t['missing_caption']}")
-    lines.append("IFRAMES")
+    out.require(f"  total={t['total']}; missing_th={t['missing_th']}; missing_caption={t['missing_caption']}")
+    out.require("IFRAMES")
     fr = e["iframes"]
-    lines.append(f"  total={fr['total']}; missing_title={fr['missing_title']}")
+    out.require(f"  total={fr['total']}; missing_title={fr['missing_title']}")
     if e.get("color_samples_inline"):
-        lines.append("INLINE COLOR PAIRS (sampled)")
+        out.require("INLINE COLOR PAIRS (sampled)")
         for s in e["color_samples_inline"]:
-            lines.append(
-                f"  {s['selector']}: color={s['color']} on background={s['background']}  text='{s['sample_text']}'"
+            out.add(
+                f"  {s['selector']}: color={s['color']} on background={s['background']}  text='{s['sample_text']}'",
+                priority=0, group="inline_colors",
+            )
+    if e.get("contrast"):
+        c = e["contrast"]
+        out.require("CONTRAST (WCAG ratios of declared colour pairs)")
+        out.require(
+            f"  checked={c['checked']}; below_aa={c['below_aa']}; unparsed={c['unparsed']}; "
+            f"linked_stylesheets={len(c['stylesheets'])}"
+            + (f" (fetched={c['stylesheets_fetched']})" if "stylesheets_fetched" in c else "")
+        )
+        for s in c["worst"]:
+            out.add(
+                f"    LOW: {s['selector']}: {s['color']} on {s['background']} = {s['ratio']}:1 ({s['source']})",
+                priority=2, group="contrast",
             )
+        unmatched = c["unmatched"]
+        if unmatched["below_aa"]:
+            out.add(f"  not counted: {unmatched['below_aa']} low-contrast stylesheet rule(s) "
+                    "whose selectors match no element on this page", priority=2, group="contrast")
     if e.get("flagged_findings"):
-        lines.append("PRE-FLAGGED FINDINGS (from deterministic audit)")
+        out.require("PRE-FLAGGED FINDINGS (from deterministic audit)")
         for f in e["flagged_findings"]:
-            lines.append(f"  WCAG {f['wcag']}: {f['summary']}")
-    return "\n".join(lines)
+            out.require(f"  WCAG {f['wcag']}: {f['summary']}")
+    return out.render()